@@ -30,13 +30,18 @@ from pyopentracks.app_window import PyopentracksWindow
 from pyopentracks.views.file_chooser import (
     ImportFileChooserDialog, ImportFolderChooserWindow, FolderChooserWindow, FileChooserWindow
 )
+from pyopentracks.io.elevation.provider import OpenElevationProvider
 from pyopentracks.models.migrations import Migration
 from pyopentracks.models.database import Database
+from pyopentracks.models.database_helper import DatabaseHelper
+from pyopentracks.tasks.db_maintenance import DatabaseMaintenance
+from pyopentracks.tasks.executor import Priority, TaskExecutor
 from pyopentracks.views.preferences.dialog import PreferencesDialog
 from pyopentracks.views.dialogs import (
     ImportResultDialog,
     ExportResultDialog,
-    PyotDialog
+    PyotDialog,
+    StatsRecomputeDialog
 )
 from pyopentracks.app_analytic import AppAnalytic
 from pyopentracks.app_segments import AppSegments
@@ -46,6 +51,9 @@ from pyopentracks.io.proxy.proxy import RecordProxy
 
 class Application(Gtk.Application):
 
+    # Seconds between the database maintenance steps (see DatabaseMaintenance).
+    MAINTENANCE_INTERVAL_S = 60
+
     @dataclass
     class AppLoaded:
         class_var: any
@@ -114,6 +122,14 @@ class Application(Gtk.Application):
 
     def on_quit(self, action, param):
         self._window.on_quit()
+        executor = TaskExecutor.instance()
+        pyot_logging.get_logger(__name__).debug(f"Task executor's metrics: {executor.metrics()}")
+        executor.shutdown()
+        OpenElevationProvider.close_instance()
+        try:
+            DatabaseMaintenance().optimize()
+        except Exception as error:
+            pyot_logging.get_logger(__name__).exception(f"Error optimizing the database: {error}")
         self.quit()
 
     def on_open_file(self, action, param):
@@ -168,6 +184,8 @@ class Application(Gtk.Application):
             updated_prefs = dialog.get_updated_preferences()
             for pref, value in updated_prefs.items():
                 self.set_pref(pref, value)
+            if AppPreferences.HEART_RATE_MAX in updated_prefs or AppPreferences.HEART_RATE_ZONES in updated_prefs:
+                DatabaseHelper.recompute_hr_zones()
             dialog.destroy()
 
         dialog = PreferencesDialog(self._window, self, on_ok_button_clicked)
@@ -220,6 +238,18 @@ class Application(Gtk.Application):
         action.connect("activate", self._on_export_all)
         self.add_action(action)
 
+        action = Gio.SimpleAction.new("export_all_archive", None)
+        action.connect("activate", self._on_export_all, True, False)
+        self.add_action(action)
+
+        action = Gio.SimpleAction.new("export_changed_archive", None)
+        action.connect("activate", self._on_export_all, True, True)
+        self.add_action(action)
+
+        action = Gio.SimpleAction.new("recompute_stats", None)
+        action.connect("activate", self._on_recompute_stats)
+        self.add_action(action)
+
         action = Gio.SimpleAction.new("open_file", None)
         action.connect("activate", self.on_open_file)
         self.add_action(action)
@@ -242,6 +272,28 @@ class Application(Gtk.Application):
         )
         db_version = migration.migrate()
         self._preferences.set_pref(AppPreferences.DB_VERSION, db_version)
+        DatabaseHelper.index_routes()
+        DatabaseHelper.index_footprints()
+        DatabaseHelper.index_heatmap()
+        DatabaseHelper.index_hr_zones()
+        DatabaseHelper.index_import_fingerprints()
+        GLib.timeout_add_seconds(Application.MAINTENANCE_INTERVAL_S, self._on_maintenance_timeout)
+
+    def _on_maintenance_timeout(self):
+        # Free pages are released little by little in the background lane,
+        # only when nothing else is using the database.
+        if self._is_idle():
+            TaskExecutor.instance().submit(
+                DatabaseMaintenance().idle_step, key="database-maintenance", priority=Priority.BACKGROUND
+            )
+        return True
+
+    def _is_idle(self) -> bool:
+        """Return True if there are not background processes nor queued or running tasks."""
+        if DatabaseHelper.is_busy():
+            return False
+        metrics = TaskExecutor.instance().metrics()
+        return metrics["running"] == 0 and sum(metrics["queued"].values()) == 0
 
     def _on_folder_import(self, action, param):
         dialog = ImportFolderChooserWindow(parent=self._window, on_response=self._on_import)
@@ -265,11 +317,17 @@ class Application(Gtk.Application):
         if response == Gtk.ResponseType.ACCEPT:
             self._load_main_app()
 
-    def _on_export_all(self, action, param):
+    def _on_recompute_stats(self, action, param):
+        dialog = StatsRecomputeDialog(parent=self._window, on_response_cb=self._on_import_response)
+        dialog.show_and_run()
+
+    def _on_export_all(self, action, param, archive=False, incremental=False):
         def on_response(dialog, response):
             if response == Gtk.ResponseType.ACCEPT:
                 folder = dialog.get_file().get_path()
-                export_dialog = ExportResultDialog(parent=self._window, folder=folder)
+                export_dialog = ExportResultDialog(
+                    parent=self._window, folder=folder, archive=archive, incremental=incremental
+                )
                 export_dialog.show()
 
         dialog = FolderChooserWindow(parent=self._window, on_response=on_response)
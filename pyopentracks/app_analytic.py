@@ -20,7 +20,7 @@ from typing import List
 
 from pyopentracks.app_interfaces import Action
 from pyopentracks.views.layouts.analytic_layout import (
-    AggregatedStatsYear, AggregatedStatsMonth, AggregatedStats
+    AggregatedStatsYear, AggregatedStatsMonth, AggregatedStats, Heatmap
 )
 from pyopentracks.app_external import AppExternal
 from pyopentracks.views.layouts.notebook_layout import NotebookLayout
@@ -38,6 +38,7 @@ class AppAnalytic(AppExternal):
         self._layout.append(AggregatedStatsMonth(), _("Monthly Aggregated Stats"))
         self._layout.append(AggregatedStatsYear(), _("Yearly Aggregated Stats"))
         self._layout.append(AggregatedStats(), _("All Aggregated Stats"))
+        self._layout.append(Heatmap(), _("Heatmap"))
         self._layout.build()
 
     def get_layout(self):
@@ -0,0 +1,464 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+class ColumnarException(Exception):
+    """Exception raised when a columnar export/import fails.
+
+    Attributes:
+        filename -- the file or folder with the problem
+        message  -- explanation of the error
+    """
+
+    def __init__(self, filename, message="Error in columnar export/import"):
+        self._filename = filename
+        self._message = message
+        super().__init__(self._message)
+
+    def __str__(self):
+        return f"{self._filename} -> {self._message}"
+
+
+class ColumnarTable:
+    """Definition of a table of the columnar export.
+
+    Attributes:
+        name    -- table's name (also the file's name without extension).
+        query   -- SELECT that returns the columns in order.
+        columns -- list of tuples (column's name, type) where type is one
+                   of "int", "float" or "str".
+    """
+
+    def __init__(self, name: str, query: str, columns: list):
+        self.name = name
+        self.query = query
+        self.columns = columns
+
+    @property
+    def column_names(self):
+        return [name for name, _ in self.columns]
+
+
+STATS_COLUMNS = [
+    ("starttime", "int"), ("stoptime", "int"), ("totaldistance", "float"),
+    ("totaltime", "int"), ("movingtime", "int"), ("avgspeed", "float"),
+    ("avgmovingspeed", "float"), ("maxspeed", "float"), ("minelevation", "float"),
+    ("maxelevation", "float"), ("elevationgain", "float"), ("elevationloss", "float"),
+    ("maxhr", "float"), ("avghr", "float"), ("maxcadence", "float"), ("avgcadence", "float"),
+    ("normalizedpower", "float"), ("maxpower", "float"), ("mintemperature", "float"),
+    ("maxtemperature", "float"), ("avgtemperature", "float"), ("totalcalories", "int"),
+]
+
+TRACKPOINTS_COLUMNS = [
+    ("longitude", "float"), ("latitude", "float"), ("time", "int"), ("speed", "float"),
+    ("altitude", "float"), ("gain", "float"), ("loss", "float"), ("heartrate", "float"),
+    ("cadence", "float"), ("power", "float"), ("temperature", "float"),
+]
+
+SEGMENTRACKS_COLUMNS = [
+    ("trackpointid_start", "int"), ("trackpointid_end", "int"), ("time", "int"),
+    ("maxspeed", "float"), ("avgspeed", "float"), ("maxhr", "float"), ("avghr", "float"),
+    ("maxcadence", "float"), ("avgcadence", "float"), ("avgpower", "float"),
+]
+
+ACTIVITIES = ColumnarTable(
+    "activities",
+    "SELECT a._id, CAST(a.uuid AS TEXT), a.name, a.description, a.category, a.recorded_with, "
+    "a.starttime, a.activityid, s._id, " + ", ".join(f"s.{c}" for c, _ in STATS_COLUMNS) + " "
+    "FROM activities a JOIN stats s ON s._id = a.statsid ORDER BY a._id",
+    [
+        ("activity_id", "int"), ("uuid", "str"), ("name", "str"), ("description", "str"),
+        ("category", "str"), ("recorded_with", "int"), ("starttime", "int"),
+        ("parent_activity_id", "int"), ("stats_id", "int"),
+    ] + [(f"stats_{c}", t) for c, t in STATS_COLUMNS]
+)
+
+TRACKPOINTS = ColumnarTable(
+    "trackpoints",
+    "SELECT t._id, s.activityid, t.sectionid, s.name, " + ", ".join(f"t.{c}" for c, _ in TRACKPOINTS_COLUMNS) + " "
+    "FROM trackpoints t JOIN sections s ON s._id = t.sectionid ORDER BY t._id",
+    [
+        ("trackpoint_id", "int"), ("activity_id", "int"), ("section_id", "int"), ("section_name", "str"),
+    ] + TRACKPOINTS_COLUMNS
+)
+
+SEGMENT_EFFORTS = ColumnarTable(
+    "segment_efforts",
+    "SELECT st._id, st.segmentid, sg.name, sg.distance, sg.gain, sg.loss, st.activityid, " +
+    ", ".join(f"st.{c}" for c, _ in SEGMENTRACKS_COLUMNS) + " "
+    "FROM segmentracks st JOIN segments sg ON sg._id = st.segmentid ORDER BY st._id",
+    [
+        ("effort_id", "int"), ("segment_id", "int"), ("segment_name", "str"),
+        ("segment_distance", "float"), ("segment_gain", "float"), ("segment_loss", "float"),
+        ("activity_id", "int"),
+    ] + SEGMENTRACKS_COLUMNS
+)
+
+# Segments are exported on their own so the ones without efforts aren't
+# lost. Efforts are useless without the segments' geometry, so it's
+# exported too and the import gives back segments the app can use.
+SEGMENTS = ColumnarTable(
+    "segments",
+    "SELECT _id, name, distance, gain, loss FROM segments ORDER BY _id",
+    [
+        ("segment_id", "int"), ("name", "str"), ("distance", "float"), ("gain", "float"), ("loss", "float"),
+    ]
+)
+
+SEGMENT_POINTS = ColumnarTable(
+    "segment_points",
+    "SELECT _id, segmentid, latitude, longitude, altitude FROM segmentpoints ORDER BY _id",
+    [
+        ("segmentpoint_id", "int"), ("segment_id", "int"), ("latitude", "float"),
+        ("longitude", "float"), ("altitude", "float"),
+    ]
+)
+
+# In import order: rows referenced by others go first.
+TABLES = [ACTIVITIES, TRACKPOINTS, SEGMENTS, SEGMENT_POINTS, SEGMENT_EFFORTS]
+
+
+class ColumnarFormat:
+    PARQUET = "parquet"
+    ARROW = "arrow"
+    CSV = "csv"
+
+    ALL = [PARQUET, ARROW, CSV]
+
+    @staticmethod
+    def available() -> list:
+        """Return the formats that can be used with the installed libraries."""
+        if pa is None:
+            return [ColumnarFormat.CSV]
+        return ColumnarFormat.ALL
+
+    @staticmethod
+    def default() -> str:
+        return ColumnarFormat.available()[0]
+
+    @staticmethod
+    def filename(folder: str, table: ColumnarTable, fmt: str) -> str:
+        return os.path.join(folder, f"{table.name}.{fmt}")
+
+
+def _arrow_schema(table: ColumnarTable):
+    types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+    return pa.schema([(name, types[typ]) for name, typ in table.columns])
+
+
+class _ArrowTableWriter:
+    """Writes row groups (Parquet) or record batches (Arrow IPC)."""
+
+    def __init__(self, filename: str, table: ColumnarTable, fmt: str):
+        self._schema = _arrow_schema(table)
+        if fmt == ColumnarFormat.PARQUET:
+            self._writer = pq.ParquetWriter(filename, self._schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(filename, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+        self._fmt = fmt
+
+    def write(self, rows: list) -> None:
+        columns = zip(*rows)
+        batch = pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema
+        )
+        if self._fmt == ColumnarFormat.PARQUET:
+            # Every batch is a row group.
+            self._writer.write_batch(batch, row_group_size=len(rows))
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+        if self._fmt == ColumnarFormat.ARROW:
+            self._sink.close()
+
+
+class _CsvTableWriter:
+
+    def __init__(self, filename: str, table: ColumnarTable):
+        self._file = open(filename, "w", newline="", encoding="utf-8", buffering=1024 * 1024)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(table.column_names)
+
+    def write(self, rows: list) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _arrow_batches(filename: str, fmt: str, batch_size: int):
+    if fmt == ColumnarFormat.PARQUET:
+        for batch in pq.ParquetFile(filename).iter_batches(batch_size=batch_size):
+            yield batch
+    else:
+        with pa.memory_map(filename, "r") as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+
+def _read_rows(filename: str, table: ColumnarTable, fmt: str, batch_size: int):
+    """Yield lists of rows (tuples in table.columns order) from the file."""
+    if fmt == ColumnarFormat.CSV:
+        converters = [{"int": int, "float": float, "str": str}[typ] for _, typ in table.columns]
+        with open(filename, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header != table.column_names:
+                raise ColumnarException(filename, f"Unexpected columns: {header}")
+            while True:
+                chunk = list(islice(reader, batch_size))
+                if not chunk:
+                    break
+                yield [
+                    tuple(None if v == "" else conv(v) for conv, v in zip(converters, row))
+                    for row in chunk
+                ]
+        return
+
+    for batch in _arrow_batches(filename, fmt, batch_size):
+        if batch.schema.names != table.column_names:
+            raise ColumnarException(filename, f"Unexpected columns: {batch.schema.names}")
+        yield list(zip(*(column.to_pylist() for column in batch.columns)))
+
+
+class ColumnarExporter:
+    """Export the database into columnar files for analysis.
+
+    Every table is read with a cursor and written in row groups of
+    ROW_GROUP_SIZE rows, so only one row group is in memory at a time
+    whatever the database's size.
+    """
+
+    ROW_GROUP_SIZE = 65536
+
+    def __init__(self, db_file: str, folder: str, fmt: str = None, row_group_size: int = ROW_GROUP_SIZE):
+        """Creates the exporter.
+
+        Arguments:
+        db_file        -- PyOpenTracks' SQLite database.
+        folder         -- folder where the files are written (one per table).
+        fmt            -- (optional) one of ColumnarFormat; the best one
+                          available by default.
+        row_group_size -- (optional) rows per row group/chunk.
+        """
+        self._db_file = db_file
+        self._folder = folder
+        self._fmt = fmt or ColumnarFormat.default()
+        self._row_group_size = row_group_size
+        if self._fmt not in ColumnarFormat.available():
+            raise ColumnarException(folder, f"Format {self._fmt} is not available (pyarrow is needed)")
+
+    @property
+    def format(self):
+        return self._fmt
+
+    def export(self, on_progress=None) -> dict:
+        """Export all tables.
+
+        Arguments:
+        on_progress -- (optional) callable(table's name, rows written).
+
+        Return:
+        A dictionary table's name -> filename.
+        """
+        os.makedirs(self._folder, exist_ok=True)
+        filenames = {}
+        conn = sqlite3.connect(f"file:{self._db_file}?mode=ro", uri=True)
+        try:
+            for table in TABLES:
+                filename = ColumnarFormat.filename(self._folder, table, self._fmt)
+                self._export_table(conn, table, filename, on_progress)
+                filenames[table.name] = filename
+        except sqlite3.Error as error:
+            raise ColumnarException(self._db_file, str(error))
+        finally:
+            conn.close()
+        return filenames
+
+    def _export_table(self, conn, table: ColumnarTable, filename: str, on_progress):
+        if self._fmt == ColumnarFormat.CSV:
+            writer = _CsvTableWriter(filename, table)
+        else:
+            writer = _ArrowTableWriter(filename, table, self._fmt)
+        total = 0
+        try:
+            cursor = conn.execute(table.query)
+            while True:
+                rows = cursor.fetchmany(self._row_group_size)
+                if not rows:
+                    break
+                writer.write(rows)
+                total += len(rows)
+                if on_progress:
+                    on_progress(table.name, total)
+        finally:
+            writer.close()
+
+
+class ColumnarImporter:
+    """Import the files written by ColumnarExporter into a database.
+
+    Ids are kept so the relations between tables are the same than in
+    the exported database. The database must have PyOpenTracks' schema
+    and must not have rows with the same ids: in that case nothing is
+    imported.
+    """
+
+    BATCH_SIZE = 65536
+
+    def __init__(self, db_file: str, folder: str, batch_size: int = BATCH_SIZE):
+        self._db_file = db_file
+        self._folder = folder
+        self._batch_size = batch_size
+
+    def detect_format(self) -> str:
+        for fmt in ColumnarFormat.ALL:
+            if os.path.isfile(ColumnarFormat.filename(self._folder, ACTIVITIES, fmt)):
+                if fmt not in ColumnarFormat.available():
+                    raise ColumnarException(self._folder, f"Format {fmt} is not available (pyarrow is needed)")
+                return fmt
+        raise ColumnarException(self._folder, "There are not columnar files to import")
+
+    def import_all(self, on_progress=None) -> dict:
+        """Import all tables in a single transaction.
+
+        Arguments:
+        on_progress -- (optional) callable(table's name, rows imported).
+
+        Return:
+        A dictionary table's name -> number of rows imported.
+        """
+        fmt = self.detect_format()
+        counts = {}
+        conn = sqlite3.connect(self._db_file)
+        try:
+            with conn:
+                for table in TABLES:
+                    filename = ColumnarFormat.filename(self._folder, table, fmt)
+                    if not os.path.isfile(filename):
+                        continue
+                    insert = getattr(self, f"_insert_{table.name}")
+                    total = 0
+                    for rows in _read_rows(filename, table, fmt, self._batch_size):
+                        insert(conn, rows)
+                        total += len(rows)
+                        if on_progress:
+                            on_progress(table.name, total)
+                    counts[table.name] = total
+        except sqlite3.Error as error:
+            raise ColumnarException(self._db_file, str(error))
+        finally:
+            conn.close()
+        return counts
+
+    @staticmethod
+    def _insert_activities(conn, rows):
+        stats_columns = ", ".join(c for c, _ in STATS_COLUMNS)
+        conn.executemany(
+            f"INSERT INTO stats (_id, {stats_columns}) VALUES ({', '.join('?' * (len(STATS_COLUMNS) + 1))})",
+            (row[8:] for row in rows)
+        )
+        conn.executemany(
+            "INSERT INTO activities (_id, uuid, name, description, category, recorded_with, starttime, activityid, statsid) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (row[:9] for row in rows)
+        )
+
+    @staticmethod
+    def _insert_trackpoints(conn, rows):
+        # Rows are sorted by track point's id so sections come in order,
+        # but a section may continue in the next batch.
+        sections = {row[2]: (row[2], row[3], row[1]) for row in rows}
+        conn.executemany(
+            "INSERT OR IGNORE INTO sections (_id, name, activityid) VALUES (?, ?, ?)", sections.values()
+        )
+        columns = ", ".join(c for c, _ in TRACKPOINTS_COLUMNS)
+        conn.executemany(
+            f"INSERT INTO trackpoints (_id, sectionid, {columns}) "
+            f"VALUES ({', '.join('?' * (len(TRACKPOINTS_COLUMNS) + 2))})",
+            ((row[0], row[2]) + row[4:] for row in rows)
+        )
+
+    @staticmethod
+    def _insert_segments(conn, rows):
+        conn.executemany("INSERT INTO segments (_id, name, distance, gain, loss) VALUES (?, ?, ?, ?, ?)", rows)
+
+    @staticmethod
+    def _insert_segment_points(conn, rows):
+        conn.executemany(
+            "INSERT INTO segmentpoints (_id, segmentid, latitude, longitude, altitude) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    @staticmethod
+    def _insert_segment_efforts(conn, rows):
+        columns = ", ".join(c for c, _ in SEGMENTRACKS_COLUMNS)
+        conn.executemany(
+            f"INSERT INTO segmentracks (_id, segmentid, activityid, {columns}) "
+            f"VALUES ({', '.join('?' * (len(SEGMENTRACKS_COLUMNS) + 3))})",
+            ((row[0], row[1], row[6]) + row[7:] for row in rows)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar export/import of a PyOpenTracks database")
+    parser.add_argument("-d", "--database-file", required=True, help="sqlite3 database file")
+    parser.add_argument("-i", "--import-folder", action="store_true", help="import the folder into the database")
+    parser.add_argument("-f", "--format", choices=ColumnarFormat.ALL, help="export format")
+    parser.add_argument("folder", help="folder to export to or import from")
+    args = parser.parse_args()
+
+    def progress(name, rows):
+        print(f"\r{name}: {rows} rows", end="", flush=True)
+
+    try:
+        if args.import_folder:
+            counts = ColumnarImporter(args.database_file, args.folder).import_all(progress)
+        else:
+            exporter = ColumnarExporter(args.database_file, args.folder, args.format)
+            counts = exporter.export(progress)
+    except ColumnarException as error:
+        print(f"\n{error}")
+        return 1
+    print()
+    for name, value in counts.items():
+        print(f"{name}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,210 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import http.client
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+class ElevationClientException(Exception):
+    """Exception raised when the elevation API can't be reached.
+
+    Attributes:
+        url     -- the API's URL
+        message -- explanation of the error
+    """
+
+    def __init__(self, url, message="Error requesting elevations"):
+        self._url = url
+        self._message = message
+        super().__init__(self._message)
+
+    def __str__(self):
+        return f"{self._url} -> {self._message}"
+
+
+class ElevationCache:
+    """Persistent cache of elevations keyed by rounded coordinates.
+
+    Coordinates are rounded to PRECISION decimals (about 1 meter) and
+    stored as integers in a SQLite database.
+    """
+
+    PRECISION = 5
+
+    def __init__(self, filename: str = None):
+        self._filename = filename if filename is not None else ElevationCache.default_filename()
+        with sqlite3.connect(self._filename) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS elevations (
+                    lat INTEGER NOT NULL,
+                    lon INTEGER NOT NULL,
+                    elevation FLOAT,
+                    PRIMARY KEY (lat, lon)
+                ) WITHOUT ROWID
+            """)
+
+    @staticmethod
+    def default_filename() -> str:
+        from pyopentracks.settings import xdg_data_home
+        return os.path.join(xdg_data_home(), "elevations_cache.db")
+
+    @staticmethod
+    def keys(latitudes, longitudes):
+        """Return the integer keys (two numpy arrays) of the coordinates."""
+        factor = 10 ** ElevationCache.PRECISION
+        return (
+            np.round(np.asarray(latitudes, dtype=np.float64) * factor).astype(np.int64),
+            np.round(np.asarray(longitudes, dtype=np.float64) * factor).astype(np.int64)
+        )
+
+    def get(self, lat_keys, lon_keys) -> dict:
+        """Return a dictionary (lat_key, lon_key) -> elevation with the cached keys."""
+        with sqlite3.connect(self._filename) as conn:
+            conn.execute("CREATE TEMP TABLE lookup (lat INTEGER, lon INTEGER)")
+            conn.executemany("INSERT INTO lookup VALUES (?, ?)", zip(lat_keys.tolist(), lon_keys.tolist()))
+            rows = conn.execute("""
+                SELECT e.lat, e.lon, e.elevation
+                FROM lookup l JOIN elevations e ON e.lat = l.lat AND e.lon = l.lon
+            """).fetchall()
+            conn.execute("DROP TABLE lookup")
+        return {(lat, lon): elevation for lat, lon, elevation in rows}
+
+    def put(self, lat_keys, lon_keys, elevations) -> None:
+        with sqlite3.connect(self._filename) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO elevations VALUES (?, ?, ?)",
+                (
+                    (lat, lon, ele) for lat, lon, ele
+                    in zip(lat_keys.tolist(), lon_keys.tolist(), np.asarray(elevations).tolist())
+                    if ele == ele  # skip NaN
+                )
+            )
+            conn.commit()
+
+
+class OpenElevationClient:
+    """Client for the Open Elevation lookup API.
+
+    Batches are sent concurrently (at most max_workers in flight), each
+    worker thread reuses its own keep-alive connection and failed
+    requests are retried with exponential backoff.
+    """
+
+    BULK_NUM = 500
+    MAX_WORKERS = 4
+    RETRIES = 3
+    BACKOFF = 0.5
+    TIMEOUT = 30
+
+    def __init__(
+        self, url: str, bulk_num: int = BULK_NUM, max_workers: int = MAX_WORKERS,
+        retries: int = RETRIES, backoff: float = BACKOFF, timeout: float = TIMEOUT
+    ):
+        self._url = url
+        parts = urlsplit(url)
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path or "/"
+        self._bulk_num = bulk_num
+        self._max_workers = max_workers
+        self._retries = retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._local = threading.local()
+        self._executor = None
+
+    def close(self):
+        """Finish the worker threads (and so their connections)."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def lookup(self, latitudes, longitudes) -> np.ndarray:
+        """Return the elevations of the locations (NaN if the API has no data).
+
+        Raises:
+        ElevationClientException if a batch fails after all the retries.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        result = np.full(len(latitudes), np.nan, dtype=np.float64)
+        starts = range(0, len(latitudes), self._bulk_num)
+        if not starts:
+            return result
+
+        def batch(start):
+            end = start + self._bulk_num
+            return start, self._request(latitudes[start:end], longitudes[start:end])
+
+        if self._executor is None:
+            # Worker threads live as long as the client so their
+            # connections are kept alive between lookups.
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        for start, elevations in self._executor.map(batch, starts):
+            result[start:start + len(elevations)] = elevations
+        return result
+
+    def _connection(self, renew=False):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and renew:
+            connection.close()
+            connection = None
+        if connection is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            connection = cls(self._host, self._port, timeout=self._timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, latitudes, longitudes):
+        body = json.dumps({"locations": [
+            {"latitude": lat, "longitude": lon} for lat, lon in zip(latitudes.tolist(), longitudes.tolist())
+        ]}).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+        error = None
+        for attempt in range(self._retries + 1):
+            if attempt > 0:
+                time.sleep(self._backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            try:
+                connection = self._connection(renew=error is not None)
+                connection.request("POST", self._path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+                if response.status == 200:
+                    return [
+                        r["elevation"] if r.get("elevation") is not None else np.nan
+                        for r in json.loads(data.decode("utf8"))["results"]
+                    ]
+                error = f"HTTP {response.status}"
+                if response.status < 500 and response.status != 429:
+                    break
+            except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+                error = str(e) or e.__class__.__name__
+        raise ElevationClientException(self._url, f"Batch failed: {error}")
@@ -0,0 +1,475 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+import os
+import re
+import shutil
+import struct
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from pyopentracks.io.elevation.provider import ElevationProvider
+
+
+class DemTileException(Exception):
+    """Exception raised for DEM tiles that can't be read.
+
+    Attributes:
+        filename -- the filename
+        message  -- explanation of the error
+    """
+
+    def __init__(self, filename, message="Error reading DEM tile"):
+        self._filename = filename
+        self._message = message
+        super().__init__(self._message)
+
+    def __str__(self):
+        return f"{self._filename} -> {self._message}"
+
+
+class DemTile:
+    """A grid of elevations mapped in memory.
+
+    The grid is a 2D array (rows from north to south, columns from west
+    to east) of elevation samples. (lat0, lon0) is the location of the
+    first sample and lat_step/lon_step the distance, in degrees, between
+    two samples.
+
+    Supported formats:
+    - SRTM .hgt files (1 or 3 arc-second, named like N38W001.hgt).
+    - Uncompressed, single band, stripped GeoTIFF files (.tif/.tiff).
+    """
+
+    SUFFIXES = (".hgt", ".tif", ".tiff")
+    HGT_NAME_RE = re.compile(r"([NS])(\d{1,2})([EW])(\d{1,3})", re.IGNORECASE)
+    HGT_VOID = -32768
+
+    def __init__(self, filename, data, lat0, lon0, lat_step, lon_step, bounds, nodata=None):
+        self._filename = filename
+        self._data = data
+        self._lat0 = lat0
+        self._lon0 = lon0
+        self._lat_step = lat_step
+        self._lon_step = lon_step
+        self._bounds = bounds
+        self._nodata = nodata
+
+    @staticmethod
+    def from_file(filename):
+        """Open the tile in filename.
+
+        Raises:
+        DemTileException if the file can't be read.
+        """
+        suffix = os.path.splitext(filename)[1].lower()
+        try:
+            if suffix == ".hgt":
+                return DemTile._from_hgt(filename)
+            if suffix in (".tif", ".tiff"):
+                return DemTile._from_geotiff(filename)
+        except DemTileException:
+            raise
+        except (OSError, ValueError, struct.error) as error:
+            raise DemTileException(filename, str(error))
+        raise DemTileException(filename, "Unknown DEM tile extension")
+
+    @staticmethod
+    def hgt_bounds(filename):
+        """Return (south, west, north, east) from the SRTM name of filename or None."""
+        match = DemTile.HGT_NAME_RE.match(os.path.basename(filename))
+        if match is None:
+            return None
+        south = int(match.group(2)) * (1 if match.group(1).upper() == "N" else -1)
+        west = int(match.group(4)) * (1 if match.group(3).upper() == "E" else -1)
+        return south, west, south + 1, west + 1
+
+    @staticmethod
+    def _from_hgt(filename):
+        bounds = DemTile.hgt_bounds(filename)
+        if bounds is None:
+            raise DemTileException(filename, "The name of the HGT file is not a SRTM name")
+        size = int(math.isqrt(os.path.getsize(filename) // 2))
+        if size < 2 or size * size * 2 != os.path.getsize(filename):
+            raise DemTileException(filename, "Wrong HGT file size")
+        data = np.memmap(filename, dtype=">i2", mode="r", shape=(size, size))
+        south, west, north, east = bounds
+        step = 1.0 / (size - 1)
+        return DemTile(filename, data, north, west, step, step, bounds, DemTile.HGT_VOID)
+
+    @staticmethod
+    def _from_geotiff(filename):
+        tags = GeoTiffReader(filename).read_tags()
+        width, height = tags.get(256, [0])[0], tags.get(257, [0])[0]
+        if tags.get(259, [1])[0] != 1:
+            raise DemTileException(filename, "Compressed GeoTIFF files are not supported")
+        if tags.get(277, [1])[0] != 1:
+            raise DemTileException(filename, "Only single band GeoTIFF files are supported")
+        if 322 in tags or 273 not in tags:
+            raise DemTileException(filename, "Tiled GeoTIFF files are not supported")
+        if 33550 not in tags or 33922 not in tags:
+            raise DemTileException(filename, "It is not a GeoTIFF file")
+
+        bits = tags.get(258, [16])[0]
+        sample_format = tags.get(339, [1])[0]
+        kind = {1: "u", 2: "i", 3: "f"}.get(sample_format)
+        if kind is None or bits not in (8, 16, 32, 64):
+            raise DemTileException(filename, "Unsupported GeoTIFF sample format")
+        dtype = np.dtype(f"{tags.byteorder}{kind}{bits // 8}")
+
+        offsets, counts = tags[273], tags.get(279, [])
+        for i in range(len(offsets) - 1):
+            if offsets[i] + counts[i] != offsets[i + 1]:
+                raise DemTileException(filename, "GeoTIFF strips are not contiguous")
+        data = np.memmap(filename, dtype=dtype, mode="r", offset=offsets[0], shape=(height, width))
+
+        lon_step, lat_step = tags[33550][0], tags[33550][1]
+        i, j, _, x, y, _ = tags[33922][:6]
+        west = x - i * lon_step
+        north = y + j * lat_step
+        # GTRasterTypeGeoKey (1025): 1 is PixelIsArea (the default), 2 is PixelIsPoint.
+        geokeys = tags.get(34735, [])
+        raster_type = 1
+        for k in range(4, len(geokeys) - 3, 4):
+            if geokeys[k] == 1025:
+                raster_type = geokeys[k + 3]
+        half = 0.5 if raster_type == 1 else 0.0
+        lat0 = north - half * lat_step
+        lon0 = west + half * lon_step
+        if raster_type == 1:
+            bounds = (north - height * lat_step, west, north, west + width * lon_step)
+        else:
+            bounds = (north - (height - 1) * lat_step, west, north, west + (width - 1) * lon_step)
+
+        nodata = None
+        if 42113 in tags:
+            try:
+                nodata = float(tags[42113].strip("\x00 "))
+            except ValueError:
+                nodata = None
+        return DemTile(filename, data, lat0, lon0, lat_step, lon_step, bounds, nodata)
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def bounds(self):
+        """Return (south, west, north, east)."""
+        return self._bounds
+
+    def contains(self, latitudes, longitudes) -> np.ndarray:
+        south, west, north, east = self._bounds
+        return (latitudes >= south) & (latitudes <= north) & (longitudes >= west) & (longitudes <= east)
+
+    def sample(self, latitudes, longitudes) -> np.ndarray:
+        """Bilinear interpolation of the elevations at the locations.
+
+        Samples with no data are ignored. The result is NaN for the
+        locations whose four surrounding samples have no data.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        rows, cols = self._data.shape
+
+        row = np.clip((self._lat0 - latitudes) / self._lat_step, 0, rows - 1)
+        col = np.clip((longitudes - self._lon0) / self._lon_step, 0, cols - 1)
+        r0 = np.clip(np.floor(row).astype(np.int64), 0, max(rows - 2, 0))
+        c0 = np.clip(np.floor(col).astype(np.int64), 0, max(cols - 2, 0))
+        r1 = np.minimum(r0 + 1, rows - 1)
+        c1 = np.minimum(c0 + 1, cols - 1)
+        fr = row - r0
+        fc = col - c0
+
+        values = np.stack([
+            self._data[r0, c0], self._data[r0, c1], self._data[r1, c0], self._data[r1, c1]
+        ]).astype(np.float64)
+        weights = np.stack([
+            (1 - fr) * (1 - fc), (1 - fr) * fc, fr * (1 - fc), fr * fc
+        ])
+        invalid = ~np.isfinite(values)
+        if self._nodata is not None:
+            invalid |= values == self._nodata
+        weights[invalid] = 0
+        values[invalid] = 0
+        total = weights.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = (values * weights).sum(axis=0) / total
+        # A point over a void sample has weight 0 on the valid ones.
+        all_invalid = invalid.all(axis=0)
+        result[all_invalid] = np.nan
+        zero = (total == 0) & ~all_invalid
+        if np.any(zero):
+            result[zero] = np.nanmean(np.where(invalid, np.nan, values)[:, zero], axis=0)
+        return result
+
+
+class GeoTiffReader:
+    """Minimal TIFF's tags reader (classic TIFF only, not BigTIFF)."""
+
+    TYPES = {
+        1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("I", 4), 5: ("II", 8),
+        6: ("b", 1), 7: ("B", 1), 8: ("h", 2), 9: ("i", 4), 10: ("ii", 8),
+        11: ("f", 4), 12: ("d", 8)
+    }
+
+    class Tags(dict):
+        byteorder = "<"
+
+    def __init__(self, filename):
+        self._filename = filename
+
+    def read_tags(self):
+        tags = GeoTiffReader.Tags()
+        with open(self._filename, "rb") as f:
+            header = f.read(8)
+            if header[:2] == b"II":
+                bo = "<"
+            elif header[:2] == b"MM":
+                bo = ">"
+            else:
+                raise DemTileException(self._filename, "It is not a TIFF file")
+            magic, ifd_offset = struct.unpack(f"{bo}HI", header[2:8])
+            if magic != 42:
+                raise DemTileException(self._filename, "Only classic TIFF files are supported")
+            tags.byteorder = bo
+
+            f.seek(ifd_offset)
+            num_entries = struct.unpack(f"{bo}H", f.read(2))[0]
+            entries = f.read(num_entries * 12)
+            for n in range(num_entries):
+                tag, typ, count, raw = struct.unpack(f"{bo}HHI4s", entries[n * 12:(n + 1) * 12])
+                if typ not in GeoTiffReader.TYPES:
+                    continue
+                fmt, size = GeoTiffReader.TYPES[typ]
+                length = size * count
+                if length <= 4:
+                    data = raw[:length]
+                else:
+                    position = f.tell()
+                    f.seek(struct.unpack(f"{bo}I", raw)[0])
+                    data = f.read(length)
+                    f.seek(position)
+                if typ == 2:
+                    tags[tag] = data.decode("ascii", errors="ignore")
+                elif typ in (5, 10):
+                    values = struct.unpack(f"{bo}{fmt[0] * 2 * count}", data)
+                    tags[tag] = [values[k] / values[k + 1] for k in range(0, len(values), 2)]
+                else:
+                    tags[tag] = list(struct.unpack(f"{bo}{fmt * count}", data))
+        return tags
+
+
+class DemTileCache:
+    """Directory with DEM tiles.
+
+    It indexes the tiles of the directory, keeps the last used tiles
+    opened (memory mapped) and lets add new tiles to the directory.
+    """
+
+    MAX_OPENED = 8
+
+    def __init__(self, directory: str = None, max_opened: int = MAX_OPENED):
+        self._directory = directory if directory is not None else DemTileCache.default_directory()
+        os.makedirs(self._directory, exist_ok=True)
+        self._max_opened = max_opened
+        self._opened = OrderedDict()
+        self._hgt_index = None
+        self._other_index = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_directory() -> str:
+        from pyopentracks.settings import xdg_data_home
+        return os.path.join(xdg_data_home(), "dem")
+
+    @staticmethod
+    def tile_name(latitude: float, longitude: float) -> str:
+        """Return the SRTM's name of the tile where the location is in (without extension)."""
+        lat = int(math.floor(latitude))
+        lon = int(math.floor(longitude))
+        return f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lon >= 0 else 'W'}{abs(lon):03d}"
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def refresh(self):
+        """Index again the tiles of the directory."""
+        hgt_index = {}
+        other_index = []
+        for entry in sorted(os.listdir(self._directory)):
+            filename = os.path.join(self._directory, entry)
+            suffix = os.path.splitext(entry)[1].lower()
+            if suffix not in DemTile.SUFFIXES or not os.path.isfile(filename):
+                continue
+            bounds = DemTile.hgt_bounds(entry) if suffix == ".hgt" else None
+            if bounds is not None:
+                hgt_index[(bounds[0], bounds[1])] = filename
+                continue
+            try:
+                other_index.append((DemTile.from_file(filename).bounds, filename))
+            except DemTileException:
+                continue
+        with self._lock:
+            self._hgt_index = hgt_index
+            self._other_index = other_index
+            self._opened.clear()
+
+    def add(self, filename: str) -> str:
+        """Copy the tile in filename to the directory and return the new path.
+
+        Raises:
+        DemTileException if the tile can't be read.
+        """
+        DemTile.from_file(filename)
+        destination = os.path.join(self._directory, os.path.basename(filename))
+        if os.path.abspath(filename) != os.path.abspath(destination):
+            shutil.copyfile(filename, destination)
+        self.refresh()
+        return destination
+
+    def tile_filename(self, latitude: float, longitude: float) -> str:
+        """Return the filename of the tile with the location or None."""
+        if self._hgt_index is None:
+            self.refresh()
+        key = (int(math.floor(latitude)), int(math.floor(longitude)))
+        filename = self._hgt_index.get(key)
+        if filename is not None:
+            return filename
+        for (south, west, north, east), filename in self._other_index:
+            if south <= latitude <= north and west <= longitude <= east:
+                return filename
+        return None
+
+    def locate(self, latitudes, longitudes) -> list:
+        """Return the tiles with the locations.
+
+        SRTM tiles are looked up by the 1 degree cell of the locations
+        and the other tiles (GeoTIFF files, that don't need to be aligned
+        to whole degrees) by their own bounds.
+
+        Arguments:
+        latitudes  -- NumPy array of latitudes.
+        longitudes -- NumPy array of longitudes.
+
+        Return:
+        A list of tuples (tile's filename, NumPy array with the indices of
+        the locations in the tile). A location is in one tuple at most.
+        """
+        if self._hgt_index is None:
+            self.refresh()
+        with self._lock:
+            hgt_index, other_index = self._hgt_index, self._other_index
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        pending = np.ones(len(latitudes), dtype=bool)
+        located = []
+        if len(latitudes) == 0:
+            return located
+
+        if hgt_index:
+            cell_lat = np.floor(latitudes).astype(np.int64)
+            cell_lon = np.floor(longitudes).astype(np.int64)
+            cells, inverse = np.unique(np.stack([cell_lat, cell_lon], axis=1), axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            for k, (lat, lon) in enumerate(cells.tolist()):
+                filename = hgt_index.get((lat, lon))
+                if filename is None:
+                    continue
+                idx = np.flatnonzero(inverse == k)
+                located.append((filename, idx))
+                pending[idx] = False
+
+        for (south, west, north, east), filename in other_index:
+            if not pending.any():
+                break
+            idx = np.flatnonzero(
+                pending & (latitudes >= south) & (latitudes <= north) &
+                (longitudes >= west) & (longitudes <= east)
+            )
+            if len(idx) > 0:
+                located.append((filename, idx))
+                pending[idx] = False
+        return located
+
+    def tile(self, latitude: float, longitude: float) -> DemTile:
+        """Return the (opened) tile with the location or None."""
+        filename = self.tile_filename(latitude, longitude)
+        if filename is None:
+            return None
+        return self.open(filename)
+
+    def open(self, filename: str) -> DemTile:
+        """Return the (opened) tile in filename.
+
+        Raises:
+        DemTileException if the tile can't be read.
+        """
+        with self._lock:
+            tile = self._opened.get(filename)
+            if tile is not None:
+                self._opened.move_to_end(filename)
+                return tile
+        tile = DemTile.from_file(filename)
+        with self._lock:
+            self._opened[filename] = tile
+            while len(self._opened) > self._max_opened:
+                self._opened.popitem(last=False)
+        return tile
+
+    def missing_tiles(self, latitudes, longitudes) -> list:
+        """Return the sorted SRTM's names of the tiles needed for the locations not found in any tile."""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        missing = np.ones(len(latitudes), dtype=bool)
+        for _, idx in self.locate(latitudes, longitudes):
+            missing[idx] = False
+        cells = set(zip(
+            np.floor(latitudes[missing]).astype(np.int64).tolist(),
+            np.floor(longitudes[missing]).astype(np.int64).tolist()
+        ))
+        return sorted(DemTileCache.tile_name(lat, lon) for lat, lon in cells)
+
+
+class DemElevationProvider(ElevationProvider):
+    """Elevation provider that uses local DEM tiles (offline)."""
+
+    def __init__(self, tile_cache: DemTileCache = None):
+        self._tile_cache = tile_cache if tile_cache is not None else DemTileCache()
+
+    @property
+    def tile_cache(self):
+        return self._tile_cache
+
+    def elevations(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        result = np.full(len(latitudes), np.nan, dtype=np.float64)
+        if len(latitudes) == 0:
+            return result
+
+        for filename, idx in self._tile_cache.locate(latitudes, longitudes):
+            tile = self._tile_cache.open(filename)
+            result[idx] = tile.sample(latitudes[idx], longitudes[idx])
+        return result
@@ -0,0 +1,122 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import threading
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from pyopentracks.io.elevation.client import ElevationCache, OpenElevationClient
+
+
+class ElevationProvider(ABC):
+    """Interface for the elevation's sources used to correct altitudes."""
+
+    @abstractmethod
+    def elevations(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """Return the elevations (in meters) of the locations.
+
+        Arguments:
+        latitudes  -- numpy array with latitudes in decimal degrees.
+        longitudes -- numpy array with longitudes in decimal degrees.
+
+        Return:
+        A numpy array of floats with the same length than latitudes. Locations
+        without elevation data are NaN.
+        """
+        pass
+
+    def close(self):
+        """Release the resources of the provider (nothing by default)."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class OpenElevationProvider(ElevationProvider):
+    """Elevation provider that uses the Open Elevation API.
+
+    Locations are rounded (see ElevationCache) and only the ones that are
+    not in the cache are requested, so repeated routes are not requested
+    again.
+
+    The client, and so its keep-alive connections, lives as long as the
+    provider: call close (or use the provider as a context manager) when
+    it isn't needed anymore. The app uses the shared instance(), that is
+    closed on quit with close_instance().
+    """
+
+    API_BASE_URL = "https://api.open-elevation.com/api/v1/lookup"
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, url: str = API_BASE_URL, cache: ElevationCache = None, **client_args):
+        """Creates the provider.
+
+        Arguments:
+        url         -- (optional) the API's lookup URL.
+        cache       -- (optional) ElevationCache object. If it's not passed,
+                       the default cache is used.
+        client_args -- (optional) OpenElevationClient's arguments.
+        """
+        self._client = OpenElevationClient(url, **client_args)
+        self._cache = cache if cache is not None else ElevationCache()
+
+    @staticmethod
+    def instance():
+        """Return the application-wide OpenElevationProvider."""
+        with OpenElevationProvider._instance_lock:
+            if OpenElevationProvider._instance is None:
+                OpenElevationProvider._instance = OpenElevationProvider()
+            return OpenElevationProvider._instance
+
+    @staticmethod
+    def close_instance():
+        """Close the application-wide OpenElevationProvider, if it was created."""
+        with OpenElevationProvider._instance_lock:
+            if OpenElevationProvider._instance is not None:
+                OpenElevationProvider._instance.close()
+                OpenElevationProvider._instance = None
+
+    def close(self):
+        self._client.close()
+
+    def elevations(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        lat_keys, lon_keys = ElevationCache.keys(latitudes, longitudes)
+        keys, inverse = np.unique(np.stack([lat_keys, lon_keys], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        unique_lat, unique_lon = keys[:, 0], keys[:, 1]
+
+        cached = self._cache.get(unique_lat, unique_lon)
+        elevations = np.array(
+            [cached.get(key, np.nan) for key in zip(unique_lat.tolist(), unique_lon.tolist())],
+            dtype=np.float64
+        )
+        missing = np.flatnonzero(np.isnan(elevations))
+        if len(missing) > 0:
+            factor = 10 ** ElevationCache.PRECISION
+            elevations[missing] = self._client.lookup(unique_lat[missing] / factor, unique_lon[missing] / factor)
+            self._cache.put(unique_lat[missing], unique_lon[missing], elevations[missing])
+        return elevations[inverse]
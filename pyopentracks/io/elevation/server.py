@@ -0,0 +1,190 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+
+class OpenElevationServer:
+    """Local stand-in server of the Open Elevation lookup API.
+
+    It implements the lookup contract of Open Elevation:
+    - POST /api/v1/lookup with {"locations": [{"latitude": ..., "longitude": ...}]}
+    - GET /api/v1/lookup?locations=lat,lon|lat,lon
+
+    Both return {"results": [{"latitude": ..., "longitude": ..., "elevation": ...}]}.
+
+    It's used by tests and benchmarks of the elevation's client.
+    """
+
+    PATH = "/api/v1/lookup"
+
+    def __init__(self, elevation_func=None, host: str = "127.0.0.1", port: int = 0, delay: float = 0):
+        """Creates the server (use start to run it).
+
+        Arguments:
+        elevation_func -- (optional) callable(latitudes, longitudes) returning
+                          a numpy array with elevations (NaN for no data). For
+                          example DemElevationProvider(...).elevations. By
+                          default a synthetic surface is used.
+        host           -- (optional) host to bind.
+        port           -- (optional) port to bind (0 for a free one).
+        delay          -- (optional) seconds to wait before every response.
+        """
+        self._elevation_func = elevation_func if elevation_func is not None else OpenElevationServer.synthetic
+        self._delay = delay
+        self._lock = threading.Lock()
+        self._failures = []
+        self.requests = 0
+        self.locations = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @staticmethod
+    def synthetic(latitudes, longitudes):
+        """A deterministic elevation surface for tests."""
+        return np.round(1000 + 500 * np.sin(np.radians(latitudes) * 100) * np.cos(np.radians(longitudes) * 100), 1)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{OpenElevationServer.PATH}"
+
+    def fail_next(self, count: int, status: int = 503):
+        """The next count requests will be answered with the status."""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def _lookup(self, locations):
+        latitudes = np.array([float(loc["latitude"]) for loc in locations], dtype=np.float64)
+        longitudes = np.array([float(loc["longitude"]) for loc in locations], dtype=np.float64)
+        elevations = np.asarray(self._elevation_func(latitudes, longitudes), dtype=np.float64)
+        with self._lock:
+            self.requests += 1
+            self.locations += len(locations)
+        return {"results": [
+            {"latitude": lat, "longitude": lon, "elevation": ele if ele == ele else None}
+            for lat, lon, ele in zip(latitudes.tolist(), longitudes.tolist(), elevations.tolist())
+        ]}
+
+    def _next_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path != OpenElevationServer.PATH:
+                    return self._send(404, {"error": "Not found"})
+                query = parse_qs(parts.query).get("locations", [""])[0]
+                try:
+                    locations = [
+                        {"latitude": lat, "longitude": lon}
+                        for lat, lon in (item.split(",") for item in query.split("|") if item)
+                    ]
+                except ValueError:
+                    return self._send(400, {"error": "Invalid locations"})
+                self._answer(locations)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if urlsplit(self.path).path != OpenElevationServer.PATH:
+                    return self._send(404, {"error": "Not found"})
+                try:
+                    locations = json.loads(body.decode("utf8"))["locations"]
+                except (ValueError, KeyError, TypeError):
+                    return self._send(400, {"error": "Invalid JSON"})
+                self._answer(locations)
+
+            def _answer(self, locations):
+                if server._delay:
+                    time.sleep(server._delay)
+                failure = server._next_failure()
+                if failure is not None:
+                    return self._send(failure, {"error": "Injected failure"})
+                try:
+                    self._send(200, server._lookup(locations))
+                except (ValueError, KeyError, TypeError):
+                    self._send(400, {"error": "Invalid locations"})
+
+            def _send(self, status, data):
+                payload = json.dumps(data).encode("utf8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in Open Elevation server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--dem", help="Directory with DEM tiles (a synthetic surface is used otherwise)")
+    parser.add_argument("--delay", type=float, default=0, help="Seconds to wait before every response")
+    args = parser.parse_args()
+
+    elevation_func = None
+    if args.dem:
+        from pyopentracks.io.elevation.dem import DemElevationProvider, DemTileCache
+        elevation_func = DemElevationProvider(DemTileCache(args.dem)).elevations
+
+    server = OpenElevationServer(elevation_func, args.host, args.port, args.delay)
+    print(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
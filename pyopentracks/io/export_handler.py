@@ -17,144 +17,167 @@ You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import io
 import threading
-from os import path
+from os import path, remove, sep
 
 from gi.repository import GLib, GObject
 
 from pyopentracks.utils import logging as pyot_logging
 from pyopentracks.models.database_helper import DatabaseHelper
-from pyopentracks.utils.utils import TimeUtils
+from pyopentracks.io.exporter.archive import ArchiveExporter, ExportManifest
+from pyopentracks.io.exporter.fit import FitWriter
+from pyopentracks.io.exporter.gpx import GpxWriter
 from pyopentracks.io.parser.result import Result, ResultCode
 
 
 class ExportActivity():
-    def __init__(self, activity_id, folder):
+    GPX = "gpx"
+    FIT = "fit"
+
+    WRITERS = {
+        GPX: GpxWriter,
+        FIT: FitWriter,
+    }
+
+    def __init__(self, activity_id, folder, fmt=GPX):
+        """Creates the exporter.
+
+        Arguments:
+        activity_id -- the activity's id.
+        folder      -- folder where the file is written.
+        fmt         -- (optional) ExportActivity.GPX or ExportActivity.FIT.
+        """
+        self._activity_id = activity_id
         self._activity = DatabaseHelper.get_activity_by_id(activity_id)
         self._folder = folder
-        self._segment = None
+        self._fmt = fmt
+
+    @staticmethod
+    def basename(activity, fmt=GPX):
+        """The name of the exported file of the activity."""
+        name = activity.name.replace(sep, "_") if activity.name else ""
+        return str(activity.id) + name + "." + fmt
+
+    @property
+    def filename(self):
+        """The path of the exported file."""
+        return path.join(self._folder, ExportActivity.basename(self._activity, self._fmt))
 
     def run(self):
         if not self._activity:
-            return Result(code=Result.ERROR, message=_(f"Error: there are not activities identified by {self._activity.id}"))
-        trackpoints = DatabaseHelper.get_track_points(self._activity.id)
-        if not trackpoints or len(trackpoints) == 0:
-            return Result(code=Result.ERROR, message=_(f"Error: there are not track points into activity identified by {self._activity.id}"))
+            return Result(
+                code=ResultCode.ERROR,
+                filename=str(self._activity_id),
+                message=_(f"Error: there are not activities identified by {self._activity_id}")
+            )
 
         try:
-            with open(path.join(self._folder, str(self._activity.id) + self._activity.name + ".gpx"), "w") as gpx:
-                self._segment = trackpoints[0].segment
-                segment_buffer = []
-
-                gpx.write(self._header)
-                gpx.write(self._metadata)
-                gpx.write(self._open_track)
-                gpx.write(self._extensions)
-                for tp in trackpoints:
-                    if self._segment != tp.segment:
-                        self._segment = tp.segment
-                        gpx.write("<trkseg>\n")
-                        for i in segment_buffer:
-                            gpx.write(self._trkpt(i))
-                        gpx.write("</trkseg>\n")
-                        segment_buffer = []
-                    segment_buffer.append(tp)
-                if len(segment_buffer) > 1:
-                    gpx.write("<trkseg>\n")
-                    for i in segment_buffer:
-                        gpx.write(self._trkpt(i))
-                    gpx.write("</trkseg>\n")
-                gpx.write(self._close_track)
-                gpx.write(self._footer)
+            total = ExportActivity.WRITERS[self._fmt](self.filename).write(
+                self._activity, DatabaseHelper.iter_track_points_rows(self._activity.id)
+            )
         except Exception as e:
+            if path.exists(self.filename):
+                remove(self.filename)
             message = _(f"Error exporting the track {self._activity.name}: {e}")
             pyot_logging.get_logger(__name__).exception(message)
-            return Result(code=ResultCode.ERROR, message=message)
-        return Result(code=ResultCode.OK, message=_(f"Activity {self._activity.name} exported correctly"))
-
-    @property
-    def _header(self):
-        return "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n" \
-            "<gpx\n" \
-            "version=\"1.1\"\n" \
-            "creator=\"PyOpenTracks\"\n" \
-            "xmlns=\"http://www.topografix.com/GPX/1/1\"\n" \
-            "xmlns:topografix=\"http://www.topografix.com/GPX/Private/TopoGrafix/0/1\"\n" \
-            "xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\"\n" \
-            "xmlns:opentracks=\"http://opentracksapp.com/xmlschemas/v1\"\n" \
-            "xmlns:gpxtpx=\"http://www.garmin.com/xmlschemas/TrackPointExtension/v2\"\n" \
-            "xmlns:pwr=\"http://www.garmin.com/xmlschemas/PowerExtension/v1\"\n" \
-            "xsi:schemaLocation=\"http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd " \
-                "http://www.topografix.com/GPX/Private/TopoGrafix/0/1 http://www.topografix.com/GPX/Private/TopoGrafix/0/1/topografix.xsd " \
-                "http://www.garmin.com/xmlschemas/TrackPointExtension/v2 https://www8.garmin.com/xmlschemas/TrackPointExtensionv2.xsd " \
-                "http://www.garmin.com/xmlschemas/PowerExtension/v1 https://www8.garmin.com/xmlschemas/PowerExtensionv1.xsd " \
-                "http://opentracksapp.com/xmlschemas/v1 http://opentracksapp.com/xmlschemas/OpenTracks_v1.xsd\">\n"
-
-    @property
-    def _metadata(self):
-        return "<metadata>\n" \
-            f"<name>{self._activity.name}</name>\n" \
-            f"<time>{TimeUtils.ms_to_iso(self._activity.start_time_ms)}</time>\n" \
-            f"<desc>{self._activity.description}</desc>\n" \
-            f"<type>{self._activity.category}</type>\n" \
-            "</metadata>\n"
-
-    @property
-    def _open_track(self):
-        return "<trk>\n"
-
-    @property
-    def _extensions(self):
-        if self._activity and self._activity.uuid:
-            return "<extensions>\n" \
-                f"<opentracks:trackid>{self._activity.uuid}</opentracks:trackid>\n" \
-                "</extensions>\n"
-        return ""
-
-    @property
-    def _close_track(self):
-        return "</trk>\n"
-
-    @property
-    def _footer(self):
-        return "</gpx>"
-
-    def _trkpt(self, tp):
-        result = f"<trkpt lat=\"{tp.latitude}\" lon=\"{tp.longitude}\">\n"
-        result = result + f"<time>{TimeUtils.ms_to_iso(tp.time_ms)}</time>\n"
-        if tp.speed_mps is not None:
-            result = result + f"<gpxtpx:speed>{tp.speed_mps}</gpxtpx:speed>\n"
-        if tp.altitude is not None:
-            result = result + f"<ele>{tp.altitude}</ele>\n"
-        if tp.elevation_gain is not None:
-            result = result + f"<gpxtpx:gain>{tp.elevation_gain}</gpxtpx:gain>\n"
-        if tp.elevation_loss is not None:
-            result = result + f"<gpxtpx:loss>{tp.elevation_loss}</gpxtpx:loss>\n"
-        if tp.heart_rate is not None:
-            result = result + f"<gpxtpx:hr>{tp.heart_rate}</gpxtpx:hr>\n"
-        if tp.cadence is not None:
-            result = result + f"<gpxtpx:cad>{tp.cadence}</gpxtpx:cad>\n"
-        result = result + "</trkpt>\n"
-        return result
+            return Result(code=ResultCode.ERROR, filename=self._activity.name, message=message)
+
+        if total == 0:
+            remove(self.filename)
+            return Result(
+                code=ResultCode.ERROR,
+                filename=self._activity.name,
+                message=_(f"Error: there are not track points into activity identified by {self._activity.id}")
+            )
+        return Result(
+            code=ResultCode.OK,
+            filename=self._activity.name,
+            message=_(f"Activity {self._activity.name} exported correctly")
+        )
+
+
+def render_gpx(activity_id):
+    """Render the activity as GPX and return a tuple (file's name, bytes).
+
+    It's used by the ArchiveExporter's worker processes.
+    """
+    activity = DatabaseHelper.get_activity_by_id(activity_id)
+    if not activity:
+        raise ValueError(_(f"Error: there are not activities identified by {activity_id}"))
+    output = io.StringIO()
+    if GpxWriter(output).write(activity, DatabaseHelper.iter_track_points_rows(activity_id)) == 0:
+        raise ValueError(_(f"Error: there are not track points into activity identified by {activity_id}"))
+    return ExportActivity.basename(activity), output.getvalue().encode("utf-8")
 
 
 class ExportAllHandler(GObject.GObject):
+    """Export all activities to a folder.
+
+    By default every activity is exported to its own GPX file. With
+    archive, the activities are exported in parallel to a single zip
+    archive and, with incremental too, only the activities added or
+    changed since the last export to the folder are exported (see
+    ExportManifest).
+    """
 
     __gsignals__ = {
         "total-activities-to-export": (GObject.SIGNAL_RUN_FIRST, None, (int,)),
     }
 
-    def __init__(self, path, cb):
+    def __init__(self, path, cb, archive=False, incremental=False):
         GObject.GObject.__init__(self)
         self._folder = path
         self._callback = cb
+        self._archive = archive
+        self._incremental = incremental
 
     def run(self):
         threading.Thread(target=self._export_in_thread, daemon=True).start()
 
     def _export_in_thread(self):
+        if self._archive:
+            self._export_archive_in_thread()
+            return
         activities = DatabaseHelper.get_activities()
-        self.emit("total-activities-to-export", len(activities))
+        GLib.idle_add(self.emit, "total-activities-to-export", len(activities))
         for activity in activities:
             result = ExportActivity(activity.id, self._folder).run()
             GLib.idle_add(self._callback, result)
+
+    def _export_archive_in_thread(self):
+        names = {activity.id: activity.name for activity in DatabaseHelper.get_activities()}
+        fingerprints = DatabaseHelper.get_activities_fingerprints()
+        manifest = ExportManifest(self._folder)
+        changed = set(manifest.changed(fingerprints)) if self._incremental else set(fingerprints)
+        activities_ids = [activity_id for activity_id in names if activity_id in changed]
+
+        GLib.idle_add(self.emit, "total-activities-to-export", len(activities_ids))
+        if not activities_ids:
+            return
+
+        reported = set()
+
+        def on_result(activity_id, filename, error):
+            reported.add(activity_id)
+            if error is None:
+                result = Result(
+                    code=ResultCode.OK,
+                    filename=names[activity_id],
+                    message=_(f"Activity {names[activity_id]} exported correctly")
+                )
+            else:
+                result = Result(code=ResultCode.ERROR, filename=names[activity_id], message=error)
+            GLib.idle_add(self._callback, result)
+
+        exporter = ArchiveExporter(ArchiveExporter.default_filename(self._folder, self._incremental), render_gpx)
+        try:
+            exported = exporter.export(activities_ids, on_result)
+            manifest.update({activity_id: fingerprints[activity_id] for activity_id in exported})
+            manifest.save()
+        except Exception as e:
+            message = _(f"Error exporting to {exporter.filename}: {e}")
+            pyot_logging.get_logger(__name__).exception(message)
+            for activity_id in activities_ids:
+                if activity_id not in reported:
+                    on_result(activity_id, None, message)
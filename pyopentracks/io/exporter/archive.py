@@ -0,0 +1,162 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import zipfile
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+
+class ExportManifest:
+    """Manifest of the activities exported to a folder.
+
+    It's a JSON file with the fingerprint of every exported activity,
+    so an incremental export only includes the activities added or
+    changed since the last export.
+    """
+
+    FILENAME = "pyopentracks-export-manifest.json"
+    VERSION = 1
+
+    def __init__(self, folder: str):
+        self._filename = os.path.join(folder, ExportManifest.FILENAME)
+        self._activities = {}
+        if os.path.isfile(self._filename):
+            try:
+                with open(self._filename, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == ExportManifest.VERSION:
+                    self._activities = data.get("activities", {})
+            except (OSError, ValueError, AttributeError):
+                self._activities = {}
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def changed(self, fingerprints: dict) -> list:
+        """Return the ids whose fingerprint is not in the manifest or has changed.
+
+        Arguments:
+        fingerprints -- dictionary activity's id -> fingerprint.
+        """
+        return [
+            activity_id for activity_id, fingerprint in fingerprints.items()
+            if self._activities.get(str(activity_id)) != fingerprint
+        ]
+
+    def update(self, fingerprints: dict) -> None:
+        for activity_id, fingerprint in fingerprints.items():
+            self._activities[str(activity_id)] = fingerprint
+
+    def save(self) -> None:
+        tmp_filename = self._filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump({"version": ExportManifest.VERSION, "activities": self._activities}, f)
+        os.replace(tmp_filename, self._filename)
+
+
+class ArchiveExporter:
+    """Export activities in parallel into a single zip archive.
+
+    A pool of processes renders the activities and the results are
+    written (compressed while they are written) into the archive in the
+    main process, so only a bounded number of rendered activities are in
+    memory at the same time.
+    """
+
+    MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, filename: str, render_func, max_workers: int = MAX_WORKERS, compresslevel: int = 6):
+        """Creates the exporter.
+
+        Arguments:
+        filename      -- the archive's filename.
+        render_func   -- picklable callable(activity_id) that returns a
+                         tuple (entry's name, bytes). It's called in the
+                         worker processes.
+        max_workers   -- (optional) number of worker processes.
+        compresslevel -- (optional) deflate compression level.
+        """
+        self._filename = filename
+        self._render_func = render_func
+        self._max_workers = max_workers
+        self._compresslevel = compresslevel
+
+    @staticmethod
+    def default_filename(folder: str, incremental: bool = False) -> str:
+        suffix = "-incremental" if incremental else ""
+        return os.path.join(folder, f"pyopentracks-{datetime.now().strftime('%Y%m%d-%H%M%S')}{suffix}.zip")
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def export(self, activities_ids, on_result=None) -> list:
+        """Export the activities.
+
+        Arguments:
+        activities_ids -- list of activities ids.
+        on_result      -- (optional) callable(activity_id, entry's name, error)
+                          called in this process after every activity is
+                          written (error is None) or fails (error is the
+                          message).
+
+        Return:
+        The list of ids exported correctly.
+        """
+        exported = []
+        with zipfile.ZipFile(
+                self._filename, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=self._compresslevel
+        ) as archive, ProcessPoolExecutor(max_workers=self._max_workers) as executor:
+            pending = deque()
+            ids = iter(activities_ids)
+            # At most two rendered activities per worker are waiting to be written.
+            for activity_id in ids:
+                pending.append((activity_id, executor.submit(self._render_func, activity_id)))
+                if len(pending) >= 2 * self._max_workers:
+                    break
+            while pending:
+                activity_id, future = pending.popleft()
+                next_id = next(ids, None)
+                if next_id is not None:
+                    pending.append((next_id, executor.submit(self._render_func, next_id)))
+                try:
+                    name, data = future.result()
+                    self._write_entry(archive, name, data)
+                except Exception as error:
+                    if on_result:
+                        on_result(activity_id, None, str(error))
+                    continue
+                exported.append(activity_id)
+                if on_result:
+                    on_result(activity_id, name, None)
+        return exported
+
+    def _write_entry(self, archive, name, data):
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        view = memoryview(data)
+        with archive.open(info, "w", force_zip64=len(data) > 0x7FFFFFFF) as entry:
+            for start in range(0, len(view), ArchiveExporter.CHUNK_SIZE):
+                entry.write(view[start:start + ArchiveExporter.CHUNK_SIZE])
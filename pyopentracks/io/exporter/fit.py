@@ -0,0 +1,124 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from pyopentracks.libs.fitsegmentencoder.definitions import SPORT, SUB_SPORT
+from pyopentracks.libs.fitsegmentencoder.fit_encoder import FitActivityEncoder
+
+
+class FitWriter:
+    """Write an activity to a FIT file.
+
+    Track points are received as chunks of trackpoints table rows (see
+    Database.iter_track_points_rows) that are converted to NumPy columns
+    and packed in bulk by FitActivityEncoder.
+
+    Every section of the activity is a lap.
+    """
+
+    # Columns of the trackpoints table.
+    ID, SECTION_ID, LONGITUDE, LATITUDE, TIME, SPEED, ALTITUDE, GAIN, LOSS, HR, CADENCE, POWER, TEMPERATURE = range(13)
+
+    # Activity's category -> (sport, sub sport).
+    SPORTS = {
+        "running": ("running", "generic"),
+        "trail running": ("running", "trail"),
+        "biking": ("cycling", "generic"),
+        "cycling": ("cycling", "generic"),
+        "road biking": ("cycling", "road"),
+        "mountain biking": ("cycling", "mountain"),
+        "walking": ("walking", "generic"),
+        "trail walking": ("walking", "generic"),
+        "hiking": ("hiking", "generic"),
+        "trail hiking": ("hiking", "generic"),
+        "driving": ("driving", "generic"),
+        "e_biking": ("e_biking", "generic"),
+        "motorcycling": ("motorcycling", "generic"),
+        "inline_skating": ("inline_skating", "generic"),
+        "ice_skating": ("ice_skating", "generic"),
+    }
+
+    def __init__(self, file):
+        """Creates the writer.
+
+        Arguments:
+        file -- a filename or a binary file object opened for writing.
+        """
+        self._file = file
+
+    @staticmethod
+    def sport(category: str) -> tuple:
+        """Return the FIT (sport, sub sport) values for the activity's category."""
+        sport, sub_sport = FitWriter.SPORTS.get(category.lower() if category else None, ("generic", "generic"))
+        return SPORT[sport], SUB_SPORT[sub_sport]
+
+    def write(self, activity, chunks) -> int:
+        """Write the FIT file.
+
+        Arguments:
+        activity -- object with name, category and stats properties (an
+                    Activity object).
+        chunks   -- iterable of tuples (section's id, list of trackpoints rows).
+
+        Return:
+        The number of track points written.
+        """
+        sport, sub_sport = FitWriter.sport(activity.category)
+        stats = activity.stats
+        encoder = FitActivityEncoder(
+            sport, sub_sport, activity.name, stats.total_calories_value if stats is not None else None
+        )
+
+        total = 0
+        current_section = None
+        for section_id, rows in chunks:
+            if not rows:
+                continue
+            if section_id != current_section:
+                encoder.end_section()
+                current_section = section_id
+            FitWriter._add_rows(encoder, rows)
+            total += len(rows)
+
+        data = encoder.end_and_get()
+        if isinstance(self._file, str):
+            with open(self._file, "wb") as f:
+                f.write(data)
+        else:
+            self._file.write(data)
+        return total
+
+    @staticmethod
+    def _add_rows(encoder: FitActivityEncoder, rows):
+        # None values become NaN.
+        columns = np.array(rows, dtype=np.float64).T
+        encoder.add_records(
+            columns[FitWriter.TIME],
+            columns[FitWriter.LATITUDE],
+            columns[FitWriter.LONGITUDE],
+            altitudes=columns[FitWriter.ALTITUDE],
+            speeds=columns[FitWriter.SPEED],
+            heart_rates=columns[FitWriter.HR],
+            cadences=columns[FitWriter.CADENCE],
+            powers=columns[FitWriter.POWER],
+            temperatures=columns[FitWriter.TEMPERATURE],
+            gains=columns[FitWriter.GAIN],
+            losses=columns[FitWriter.LOSS],
+        )
@@ -0,0 +1,180 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+
+class GpxWriter:
+    """Write an activity to a GPX file streaming its track points.
+
+    Track points are received as chunks of trackpoints table rows (see
+    Database.iter_track_points_rows) so the memory used doesn't depend
+    on the activity's size: every chunk is formatted (timestamps in
+    bulk with NumPy) and written to a large buffered file.
+
+    Every section of the activity is a trkseg.
+    """
+
+    BUFFER_SIZE = 1024 * 1024
+
+    # Columns of the trackpoints table.
+    ID, SECTION_ID, LONGITUDE, LATITUDE, TIME, SPEED, ALTITUDE, GAIN, LOSS, HR, CADENCE, POWER, TEMPERATURE = range(13)
+
+    HEADER = (
+        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+        "<gpx\n"
+        "version=\"1.1\"\n"
+        "creator=\"PyOpenTracks\"\n"
+        "xmlns=\"http://www.topografix.com/GPX/1/1\"\n"
+        "xmlns:topografix=\"http://www.topografix.com/GPX/Private/TopoGrafix/0/1\"\n"
+        "xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\"\n"
+        "xmlns:opentracks=\"http://opentracksapp.com/xmlschemas/v1\"\n"
+        "xmlns:gpxtpx=\"http://www.garmin.com/xmlschemas/TrackPointExtension/v2\"\n"
+        "xmlns:pwr=\"http://www.garmin.com/xmlschemas/PowerExtension/v1\"\n"
+        "xsi:schemaLocation=\"http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd "
+        "http://www.topografix.com/GPX/Private/TopoGrafix/0/1 http://www.topografix.com/GPX/Private/TopoGrafix/0/1/topografix.xsd "
+        "http://www.garmin.com/xmlschemas/TrackPointExtension/v2 https://www8.garmin.com/xmlschemas/TrackPointExtensionv2.xsd "
+        "http://www.garmin.com/xmlschemas/PowerExtension/v1 https://www8.garmin.com/xmlschemas/PowerExtensionv1.xsd "
+        "http://opentracksapp.com/xmlschemas/v1 http://opentracksapp.com/xmlschemas/OpenTracks_v1.xsd\">\n"
+    )
+
+    def __init__(self, file):
+        """Creates the writer.
+
+        Arguments:
+        file -- a filename or a text file object opened for writing.
+        """
+        self._file = file
+
+    def write(self, activity, chunks) -> int:
+        """Write the GPX.
+
+        Arguments:
+        activity -- object with name, description, category, start_time_ms
+                    and uuid properties (an Activity object).
+        chunks   -- iterable of tuples (section's id, list of trackpoints rows).
+
+        Return:
+        The number of track points written.
+        """
+        if isinstance(self._file, str):
+            with open(self._file, "w", encoding="utf-8", buffering=GpxWriter.BUFFER_SIZE) as f:
+                return self._write(f, activity, chunks)
+        return self._write(self._file, activity, chunks)
+
+    def _write(self, f, activity, chunks):
+        f.write(GpxWriter.HEADER)
+        f.write(self._metadata(activity))
+        f.write("<trk>\n")
+        f.write(self._extensions(activity))
+
+        total = 0
+        current_section = None
+        for section_id, rows in chunks:
+            if not rows:
+                continue
+            if section_id != current_section:
+                if current_section is not None:
+                    f.write("</trkseg>\n")
+                f.write("<trkseg>\n")
+                current_section = section_id
+            f.write(self._trkpts(rows))
+            total += len(rows)
+        if current_section is not None:
+            f.write("</trkseg>\n")
+
+        f.write("</trk>\n")
+        f.write("</gpx>\n")
+        return total
+
+    @staticmethod
+    def _text(value) -> str:
+        return escape(str(value)) if value is not None else ""
+
+    @staticmethod
+    def _metadata(activity) -> str:
+        start_time = ""
+        if activity.start_time_ms is not None:
+            start_time = f"<time>{GpxWriter.iso_times([activity.start_time_ms])[0]}</time>\n"
+        return (
+            "<metadata>\n"
+            f"<name>{GpxWriter._text(activity.name)}</name>\n"
+            f"{start_time}"
+            f"<desc>{GpxWriter._text(activity.description)}</desc>\n"
+            f"<type>{GpxWriter._text(activity.category)}</type>\n"
+            "</metadata>\n"
+        )
+
+    @staticmethod
+    def _extensions(activity) -> str:
+        if activity.uuid:
+            return (
+                "<extensions>\n"
+                f"<opentracks:trackid>{GpxWriter._text(activity.uuid)}</opentracks:trackid>\n"
+                "</extensions>\n"
+            )
+        return ""
+
+    @staticmethod
+    def iso_times(times_ms) -> list:
+        """Format a sequence of milliseconds (UTC) as ISO 8601 strings in bulk."""
+        values = np.asarray(times_ms, dtype=np.float64)
+        result = np.datetime_as_string(
+            np.round(values).astype(np.int64).astype("datetime64[ms]"), unit="ms", timezone="UTC"
+        )
+        return result.tolist()
+
+    @staticmethod
+    def _trkpts(rows) -> str:
+        times = [row[GpxWriter.TIME] for row in rows]
+        has_time = [t is not None for t in times]
+        iso = iter(GpxWriter.iso_times([t for t in times if t is not None]))
+
+        parts = []
+        append = parts.append
+        for row, timed in zip(rows, has_time):
+            append(f"<trkpt lat={quoteattr(str(row[GpxWriter.LATITUDE]))} lon={quoteattr(str(row[GpxWriter.LONGITUDE]))}>\n")
+            if row[GpxWriter.ALTITUDE] is not None:
+                append(f"<ele>{row[GpxWriter.ALTITUDE]}</ele>\n")
+            if timed:
+                append(f"<time>{next(iso)}</time>\n")
+
+            speed, hr, cadence = row[GpxWriter.SPEED], row[GpxWriter.HR], row[GpxWriter.CADENCE]
+            gain, loss = row[GpxWriter.GAIN], row[GpxWriter.LOSS]
+            if speed is None and hr is None and cadence is None and gain is None and loss is None:
+                append("</trkpt>\n")
+                continue
+            append("<extensions>\n")
+            if gain is not None:
+                append(f"<opentracks:gain>{gain}</opentracks:gain>\n")
+            if loss is not None:
+                append(f"<opentracks:loss>{loss}</opentracks:loss>\n")
+            if speed is not None or hr is not None or cadence is not None:
+                append("<gpxtpx:TrackPointExtension>\n")
+                if speed is not None:
+                    append(f"<gpxtpx:speed>{speed}</gpxtpx:speed>\n")
+                if hr is not None:
+                    append(f"<gpxtpx:hr>{hr}</gpxtpx:hr>\n")
+                if cadence is not None:
+                    append(f"<gpxtpx:cad>{cadence}</gpxtpx:cad>\n")
+                append("</gpxtpx:TrackPointExtension>\n")
+            append("</extensions>\n</trkpt>\n")
+        return "".join(parts)
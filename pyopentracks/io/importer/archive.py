@@ -0,0 +1,76 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+import zipfile
+
+from typing import Generator, List, Tuple
+
+from pyopentracks.io.parser.factory import ParserFactory
+
+
+class ArchiveReader:
+    """Reads the GPX and FIT files of a zip archive without extracting it.
+
+    Members are listed from the archive's central directory and every member
+    is opened as a stream so it is parsed while it is decompressed. Members
+    can be compressed too (.gpx.gz and .fit.gz), ParserFactory decompresses
+    them on the fly.
+    """
+
+    EXTENSION = ".zip"
+
+    def __init__(self, filename: str):
+        """
+        Arguments:
+        filename -- zip archive's path.
+        """
+        self._filename = filename
+
+    @staticmethod
+    def is_archive(filename: str) -> bool:
+        return str(filename).lower().endswith(ArchiveReader.EXTENSION)
+
+    def members(self) -> List[str]:
+        """Return the names of the archive's members that can be imported.
+
+        Raises zipfile.BadZipFile (or OSError) if the archive can't be read.
+        """
+        with zipfile.ZipFile(self._filename) as archive:
+            return [
+                info.filename for info in archive.infolist()
+                if not info.is_dir() and ParserFactory.is_supported(info.filename)
+            ]
+
+    def open(self, members: List[str] = None) -> Generator[Tuple[str, str, object], None, None]:
+        """Open the archive's members one by one.
+
+        Every stream is only valid until the next member is requested.
+
+        Arguments:
+        members -- (optional) names of the members to open. By default, all
+                   members returned by members method.
+
+        Return:
+        generator of tuples (display name, member's name, binary stream). The
+        display name is the member's path inside the archive's path.
+        """
+        with zipfile.ZipFile(self._filename) as archive:
+            for member in members if members is not None else self.members():
+                with archive.open(member) as stream:
+                    yield os.path.join(self._filename, member), member, stream
@@ -18,7 +18,8 @@ along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
 import os
 
-from pyopentracks.io.importer.importer import Importer, FileImporter, FolderImporter
+from pyopentracks.io.importer.archive import ArchiveReader
+from pyopentracks.io.importer.importer import Importer, ArchiveImporter, FileImporter, FolderImporter
 
 
 class ImporterFactory:
@@ -28,10 +29,12 @@ class ImporterFactory:
         """Makes an importer according to the file.
         
         Arguments:
-            file -- it can be a regular file or a directory.
+            file -- it can be a regular file, a zip archive or a directory.
         """
         if os.path.isdir(file):
             return FolderImporter(file)
+        elif os.path.isfile(file) and ArchiveReader.is_archive(file):
+            return ArchiveImporter(file)
         elif os.path.isfile(file):
             return FileImporter(file)
         else:
@@ -16,16 +16,21 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
+import zipfile
+
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
+from itertools import islice
 from typing import Generator, List
 from pathlib import Path
 
+from pyopentracks.io.importer.archive import ArchiveReader
 from pyopentracks.io.parser.records import Record, TrackRecord, SetRecord, MultiRecord
 from pyopentracks.io.parser.factory import ParserFactory
 from pyopentracks.io.proxy.proxy import RecordProxy
 from pyopentracks.models.database_helper import DatabaseHelper
 from pyopentracks.utils import logging as pyot_logging
+from pyopentracks.utils.fingerprint import ActivityFingerprint
 
 
 @dataclass
@@ -83,18 +88,20 @@ class FileImporter(Importer):
     def run(self) -> Generator[ImportResult, None, None]:
         try:
             record = ParserFactory.make(self._filename).parse()
-            yield self._import(record)
+            result = self._import(record)
+            DatabaseHelper.index_inserted()
+            yield result
         except Exception as error:
             message = f"Error parsing the file {self._filename}: {error}"
             pyot_logging.get_logger(__name__).exception(message)
             yield ImportResult(filename=self._filename, total=1, imported=0, errors=[message])
 
+    @staticmethod
+    def is_importable(record: Record) -> bool:
+        return bool(record) and isinstance(record, (TrackRecord, SetRecord, MultiRecord))
+
     def _import(self, record: Record):
-        if not record or (
-                not isinstance(record, TrackRecord) and
-                not isinstance(record, SetRecord) and
-                not isinstance(record, MultiRecord)
-        ):
+        if not FileImporter.is_importable(record):
             return ImportResult(
                 record=record,
                 filename=self._filename,
@@ -108,17 +115,22 @@ class FileImporter(Importer):
 
         activity = RecordProxy(record).to_activity()
         if DatabaseHelper.get_existed_activities(activity):
-            return ImportResult(
-                record=record,
-                filename=self._filename,
-                total=1,
-                imported=0,
-                errors=[_(
-                    f"Error importing the file {self._filename}: "
-                    f"activity '{activity.name}' already exists"
-                )]
-            )
-
+            return self._exists_result(record, activity)
+        return self._insert(record, activity)
+
+    def _exists_result(self, record: Record, activity):
+        return ImportResult(
+            record=record,
+            filename=self._filename,
+            total=1,
+            imported=0,
+            errors=[_(
+                f"Error importing the file {self._filename}: "
+                f"activity '{activity.name}' already exists"
+            )]
+        )
+
+    def _insert(self, record: Record, activity):
         if isinstance(record, TrackRecord):
             activity_id = DatabaseHelper.insert_track_activity(activity)
         elif isinstance(record, SetRecord):
@@ -158,28 +170,152 @@ class FileImporter(Importer):
 
 
 class FolderImporter(Importer):
+    """Imports the GPX and FIT files of a folder.
+
+    Gzip compressed files (.gpx.gz and .fit.gz) and the members of the zip
+    archives in the folder are imported too: they are parsed from the
+    decompressed streams, without temporary files, and every member counts as
+    one file to import.
+    """
+
+    BATCH_SIZE = 50
+    PATTERNS = ("*.gpx", "*.fit", "*.gpx.gz", "*.fit.gz")
 
     def __init__(self, foldername: str):
         super().__init__(foldername)
 
-        # Select all GPX and FIT files from path folder.
-        path_object = Path(self._filename)
-        self._files_path = [f for f in path_object.glob("*.gpx")]
-        self._files_path.extend([f for f in path_object.glob("*.fit")])
+        files_path, archives_path = self._find()
+        self._files_path = files_path
+
+        # Archive's members are listed from its central directory.
+        self._archives = []
+        self._archives_errors = []
+        for archive_path in archives_path:
+            reader = ArchiveReader(str(archive_path))
+            try:
+                self._archives.append((reader, reader.members()))
+            except (zipfile.BadZipFile, OSError) as error:
+                message = f"Error reading the archive {archive_path}: {error}"
+                pyot_logging.get_logger(__name__).exception(message)
+                self._archives_errors.append(message)
 
         # Initialize ImportResult with folder name and total files to import.
         self._result: ImportResult = ImportResult()
         self._result.filename = foldername
-        self._result.total = len(self._files_path)
+        self._result.total = (
+            len(self._files_path) +
+            sum(len(members) for _reader, members in self._archives) +
+            len(self._archives_errors)
+        )
 
     def files_to_import(self) -> int:
         return self._result.total
 
-    def run(self) -> Generator[ImportResult, None, None]:
+    def _find(self):
+        """Return a tuple with the list of files and the list of zip archives to import."""
+        path_object = Path(self._filename)
+        files_path = [f for pattern in FolderImporter.PATTERNS for f in path_object.glob(pattern)]
+        archives_path = sorted(path_object.glob("*" + ArchiveReader.EXTENSION))
+        return files_path, archives_path
+
+    def _sources(self) -> Generator[tuple, None, None]:
+        """Yield tuples (display name, file's name, binary stream or None) for every file to import."""
         for f in self._files_path:
-            result = next(FileImporter(str(f)).run())
-            if result.is_ok:
-                self._result.imported += 1
-            else:
-                self._result.errors.append(result.errors[0])
+            yield str(f), str(f), None
+        for reader, members in self._archives:
+            yield from reader.open(members)
+
+    def run(self) -> Generator[ImportResult, None, None]:
+        for message in self._archives_errors:
+            self._result.errors.append(message)
             yield self._result
+
+        # Files are parsed in batches so the activities that already exist
+        # are looked for with only one query per batch and the inserted ones
+        # are indexed by only one background task per batch.
+        try:
+            yield from self._run_batches()
+        finally:
+            DatabaseHelper.index_inserted()
+
+    def _run_batches(self) -> Generator[ImportResult, None, None]:
+        seen = set()
+        sources = self._sources()
+        while True:
+            batch = []
+            parsed = 0
+            for name, filename, fileobj in islice(sources, FolderImporter.BATCH_SIZE):
+                parsed += 1
+                importer = FileImporter(name)
+                try:
+                    record = ParserFactory.make(filename, fileobj).parse()
+                except Exception as error:
+                    yield self._error(name, f"Error parsing the file {name}: {error}")
+                    continue
+                if not FileImporter.is_importable(record):
+                    self._add(importer._import(record))
+                    yield self._result
+                    continue
+                try:
+                    activity = RecordProxy(record).to_activity()
+                except Exception as error:
+                    yield self._error(name, f"Error importing the file {name}: {error}")
+                    continue
+                batch.append((importer, record, activity))
+            if parsed == 0:
+                break
+
+            try:
+                existing = DatabaseHelper.get_existed_activities_batch([activity for _i, _r, activity in batch])
+            except Exception as error:
+                # Every activity is looked for on its own.
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error looking for the existing activities of the batch: {error}"
+                )
+                existing = None
+            for idx, (importer, record, activity) in enumerate(batch):
+                try:
+                    # Same activity in two files of the folder: same uuid, same
+                    # start and end times or same fingerprint.
+                    end_time_ms = activity.stats.end_time_ms if activity.stats else None
+                    keys = {
+                        k for k in (
+                            activity.uuid,
+                            ("time", activity.start_time_ms, end_time_ms) if end_time_ms is not None else None,
+                            ActivityFingerprint.from_activity(activity)
+                        ) if k is not None
+                    }
+                    if existing is not None:
+                        exists = idx in existing
+                    else:
+                        exists = bool(DatabaseHelper.get_existed_activities(activity))
+                    if exists or keys & seen:
+                        self._add(importer._exists_result(record, activity))
+                    else:
+                        seen.update(keys)
+                        self._add(importer._insert(record, activity))
+                except Exception as error:
+                    name = importer._filename
+                    yield self._error(name, f"Error importing the file {name}: {error}")
+                    continue
+                yield self._result
+            DatabaseHelper.index_inserted()
+
+    def _error(self, filename: str, message: str) -> ImportResult:
+        """Log the message, add it as the error of the file and return the folder's result."""
+        pyot_logging.get_logger(__name__).exception(message)
+        self._add(ImportResult(filename=filename, total=1, imported=0, errors=[message]))
+        return self._result
+
+    def _add(self, result: ImportResult):
+        if result.is_ok:
+            self._result.imported += 1
+        else:
+            self._result.errors.append(result.errors[0])
+
+
+class ArchiveImporter(FolderImporter):
+    """Imports the GPX and FIT files of a zip archive."""
+
+    def _find(self):
+        return [], [Path(self._filename)]
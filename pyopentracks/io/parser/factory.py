@@ -16,6 +16,8 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
+import gzip
+
 from abc import ABC, abstractmethod
 from itertools import chain
 
@@ -36,23 +38,56 @@ class ParserFactory:
     
     It uses abstract factory pattern to create the parser that can parse the
     file.
+
+    Gzip compressed files (.gpx.gz and .fit.gz) are decompressed on the fly
+    while they are parsed.
     """
 
+    EXTENSIONS = (".gpx", ".fit")
+    COMPRESSED_EXTENSION = ".gz"
+
+    @staticmethod
+    def is_supported(filename: str) -> bool:
+        """Return True if filename has an extension a parser can be made for."""
+        return ParserFactory._extension(filename) in ParserFactory.EXTENSIONS
+
     @staticmethod
-    def make(filename: str):
-        if filename.endswith(".gpx"):
-            return GpxFactory().make(filename)
-        elif filename.endswith(".fit"):
-            return FitFactory().make(filename)
+    def make(filename: str, fileobj=None):
+        """Make the parser for filename.
+
+        Arguments:
+        filename -- file's name, its extension tells the parser to use.
+        fileobj  -- (optional) binary stream with the filename's content
+                    (for example, a zip archive's member). If it is not
+                    given then filename is opened.
+        """
+        extension = ParserFactory._extension(filename)
+        if extension == ".gpx":
+            factory = GpxFactory()
+        elif extension == ".fit":
+            factory = FitFactory()
         else:
             raise ParserExtensionUnknownException(f"File extension unknown: {filename}")
 
+        if not filename.lower().endswith(ParserFactory.COMPRESSED_EXTENSION):
+            return factory.make(filename, fileobj)
+        with gzip.open(fileobj if fileobj is not None else filename, "rb") as stream:
+            return factory.make(filename, stream)
+
+    @staticmethod
+    def _extension(filename: str) -> str:
+        """Return the filename's extension without the compression one."""
+        name = filename.lower()
+        if name.endswith(ParserFactory.COMPRESSED_EXTENSION):
+            name = name[:-len(ParserFactory.COMPRESSED_EXTENSION)]
+        return name[name.rfind("."):] if "." in name else ""
+
 
 class Factory(ABC):
     """Abstract factory class."""
 
     @abstractmethod
-    def make(self, filename: str) -> Parser:
+    def make(self, filename: str, fileobj=None) -> Parser:
         pass
 
 
@@ -62,8 +97,8 @@ class GpxFactory(Factory):
     It has to parse the GPX (first step) to know what kind of GPX it is.
     """
 
-    def make(self, filename: str) -> Parser:
-        record = GpxPreParser(filename).parse()
+    def make(self, filename: str, fileobj=None) -> Parser:
+        record = GpxPreParser(filename, fileobj).parse()
         all_points = list(chain(*[ s.points for s in record.segments ]))
         if not list(filter(lambda p: p.time or (p.latitude and p.longitude), all_points)):
             raise GpxParserException(filename, "there are not valid points in the GPX file")
@@ -77,8 +112,8 @@ class GpxFactory(Factory):
 class FitFactory(Factory):
     """FIT factory that creates the parser needed."""
 
-    def make(self, filename: str) -> Parser:
-        fitfile, file_id = FitPreParser(filename).parse()
+    def make(self, filename: str, fileobj=None) -> Parser:
+        fitfile, file_id = FitPreParser(filename, fileobj).parse()
 
         sport_messages = [FitSportMessage(mesg) for mesg in list(fitfile.get_messages("sport"))]
 
@@ -16,6 +16,8 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
+import io
+
 from typing import List
 from functools import reduce
 
@@ -241,8 +243,15 @@ class FitSegment(Fit):
 class PreParser:
     """Do a FIT file pre-parse."""
 
-    def __init__(self, filename):
+    def __init__(self, filename, fileobj=None):
+        """
+        Arguments:
+        filename -- FIT file's name.
+        fileobj  -- (optional) binary stream to read the FIT from instead of
+                    opening filename (a gzip stream or a zip's member).
+        """
         self._filename = filename
+        self._fileobj = fileobj
         self._fitparse = None
 
     def parse(self) -> tuple:
@@ -253,7 +262,7 @@ class PreParser:
         Return:
             A tuple with fitfile and fitfileid message.
         """
-        fitfile = fitparse.FitFile(self._filename)
+        fitfile = fitparse.FitFile(self._source())
         messages = list(fitfile.get_messages("file_id"))
         file_id = messages[0] if len(messages) > 0 else None
         if not file_id:
@@ -265,3 +274,15 @@ class PreParser:
             raise FitParserException(filename=self._filename, message="type of the 'file_id' is wrong")
 
         return (fitfile, FitFileIdMessage(fields))
+
+    def _source(self):
+        """Return what fitparse has to read.
+
+        fitparse needs to know the size of the data so it seeks to the end of
+        the stream, which gzip streams cannot do and zip members can do only
+        decompressing twice. So the stream is read into memory once: a FIT
+        file is small and no temporary file is needed.
+        """
+        if self._fileobj is None:
+            return self._filename
+        return io.BytesIO(self._fileobj.read())
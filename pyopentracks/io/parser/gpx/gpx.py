@@ -16,6 +16,7 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
+from contextlib import nullcontext
 from itertools import chain
 
 from xml.etree.ElementTree import XMLParser
@@ -32,13 +33,20 @@ class PreParser:
     It uses the GpxParser class for parsing the GPX file.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, fileobj=None):
+        """
+        Arguments:
+        filename -- GPX file's name.
+        fileobj  -- (optional) binary stream to read the GPX from instead of
+                    opening filename (a gzip stream or a zip's member).
+        """
         self._filename = filename
+        self._fileobj = fileobj
 
     def parse(self) -> Record:
         parser = GpxParser()
         xmlparser = XMLParser(target=parser)
-        with open(self._filename, "rb") as file:
+        with nullcontext(self._fileobj) if self._fileobj is not None else open(self._filename, "rb") as file:
             for data in file:
                 xmlparser.feed(data)
             xmlparser.close()
@@ -77,6 +85,9 @@ class GpxParser:
         self._record = RecordBuilder.new_track_record()
         self._segment = Segment()
         self._point = None
+        # Points of the segment with their time strings: they are converted
+        # all at once when the segment ends.
+        self._times = []
 
         self._tag = None
         self._data = ""
@@ -103,8 +114,7 @@ class GpxParser:
         elif tag == GpxParser.TAG_TRK:
             self._tag = tag
         elif tag == GpxParser.TAG_TRKSEG:
-            if self._segment.points:
-                self._record.segments.append(self._segment)
+            self._append_segment()
             self._segment = Segment()
         elif tag == GpxParser.TAG_TRKPT:
             self._tag = tag
@@ -125,10 +135,20 @@ class GpxParser:
 
     def close(self):
         if self._segment.points:
-            self._record.segments.append(self._segment)
+            self._append_segment()
             self._record.start_time = self._record.segments[0].points[0].time
             self._record.end_time = self._record.segments[-1].points[-1].time
 
+    def _append_segment(self):
+        """Set the time of the segment's points and append it to the record if it has points."""
+        if self._times:
+            points, times = zip(*self._times)
+            for point, time_ms in zip(points, TimeUtils.isos_to_ms(list(times))):
+                point.time = time_ms
+            self._times = []
+        if self._segment.points:
+            self._record.segments.append(self._segment)
+
     def _end_tag_inside_metadata_trk(self, tag):
         """Compute the tag tag that is inside metadata or trk tag."""
         if tag == GpxParser.TAG_NAME:
@@ -149,7 +169,7 @@ class GpxParser:
         elif tag == GpxParser.TAG_LOSS:
             self._point.loss = self._data
         elif tag == GpxParser.TAG_TIME:
-            self._point.time = TimeUtils.iso_to_ms(self._data)
+            self._times.append((self._point, self._data))
         elif tag == GpxParser.TAG_SPEED:
             self._point.speed = self._data
         elif tag == GpxParser.TAG_HR:
@@ -38,6 +38,12 @@ FIT_BASE_TYPES = {
 
 MANUFACTURER = {
     "garmin": 1,
+    "development": 255,
+}
+
+FILE = {
+    "activity": 4,
+    "segment": 34,
 }
 
 PRODUCT = {
@@ -98,6 +104,23 @@ SPORT = {
     "all": 254,
 }
 
+SUB_SPORT = {
+    "generic": 0,
+    "treadmill": 1,
+    "street": 2,
+    "trail": 3,
+    "track": 4,
+    "spin": 5,
+    "indoor_cycling": 6,
+    "road": 7,
+    "mountain": 8,
+}
+
+ACTIVITY = {
+    "manual": 0,
+    "auto_multi_sport": 1,
+}
+
 EVENT = {
     "timer": 0,
     "workout": 3,
@@ -16,12 +16,17 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with fit-segment-encoder. If not, see <https://www.gnu.org/licenses/>.
 """
+import math
 import uuid
 from dataclasses import dataclass
-from struct import pack
+from struct import pack, Struct
 from typing import List
 
-from .definitions import MANUFACTURER, PRODUCT, SEGMENT_LEADERBOARD_TYPE
+import numpy as np
+
+from .definitions import (
+    ACTIVITY, EVENT, EVENT_TYPE, FILE, FIT_BASE_TYPES, MANUFACTURER, PRODUCT, SEGMENT_LEADERBOARD_TYPE, SUB_SPORT
+)
 from .profile import Record, get_message, Crc
 
 
@@ -253,3 +258,511 @@ class FitSegmentEncoder:
         crc_pack = pack("H", crc_file.value)
 
         return header + self._data_bytes + crc_pack
+
+
+# Seconds between the Unix epoch and the FIT epoch (UTC 00:00 Dec 31 1989).
+FIT_EPOCH_S = 631065600
+
+# Read https://gis.stackexchange.com/questions/371656/garmin-fit-coodinate-system
+SEMICIRCLES_PER_DEGREE = pow(2, 31) / 180
+
+
+class MessageDefinition:
+    """Definition of a local message type with precomputed formats.
+
+    Data messages are packed with a struct built once from the fields
+    and, for many messages at once, with a NumPy structured dtype that
+    has the same layout (used for the record messages).
+
+    Fields are tuples (name, number, base type's name) or, for strings,
+    (name, number, "string", size).
+    """
+
+    # Base type's name -> (struct's format, invalid value).
+    BASE_TYPES = {
+        "enum": ("B", 0xFF),
+        "sint8": ("b", 0x7F),
+        "uint8": ("B", 0xFF),
+        "sint16": ("h", 0x7FFF),
+        "uint16": ("H", 0xFFFF),
+        "sint32": ("i", 0x7FFFFFFF),
+        "uint32": ("I", 0xFFFFFFFF),
+        "uint32z": ("I", 0),
+        "string": ("s", b""),
+    }
+
+    def __init__(self, local_number: int, global_number: int, fields: list):
+        self._local_number = local_number
+        self._names = [f[0] for f in fields]
+        self._invalid = []
+        formats = []
+        definition_fields = b""
+        for field in fields:
+            name, number, base_type = field[:3]
+            fmt, invalid = MessageDefinition.BASE_TYPES[base_type]
+            if base_type == "string":
+                fmt = f"{field[3]}s"
+            size = Struct("<" + fmt).size
+            formats.append(fmt)
+            self._invalid.append(invalid)
+            definition_fields += pack("<BBB", number, size, FIT_BASE_TYPES[base_type])
+
+        self._struct = Struct("<B" + "".join(formats))
+        self._definition = pack("<BBBHB", 0x40 | local_number, 0, 0, global_number, len(fields)) + definition_fields
+        self._dtype = np.dtype(
+            [("header", "u1")] + [(name, "<" + fmt) for name, fmt in zip(self._names, formats) if fmt[-1] != "s"]
+        )
+
+    @property
+    def definition(self) -> bytes:
+        """The definition message's bytes."""
+        return self._definition
+
+    def pack(self, **values) -> bytes:
+        """Pack a data message. Missing fields and None values are invalid values."""
+        return self._struct.pack(self._local_number, *(
+            invalid if values.get(name) is None else values[name]
+            for name, invalid in zip(self._names, self._invalid)
+        ))
+
+    def pack_columns(self, size: int, **columns) -> bytes:
+        """Pack size data messages from arrays with the fields' values.
+
+        Arguments:
+        size    -- number of messages.
+        columns -- numpy integer arrays (see column function) by field's
+                   name. Missing fields are invalid values.
+        """
+        data = np.empty(size, dtype=self._dtype)
+        data["header"] = self._local_number
+        for name, invalid in zip(self._names, self._invalid):
+            data[name] = columns[name] if columns.get(name) is not None else invalid
+        return data.tobytes()
+
+    @staticmethod
+    def column(values, base_type: str, scale: float = 1, offset: float = 0):
+        """Convert float values (NaN or None if missing) to the base type's integers.
+
+        Return:
+        A numpy array with round((value + offset) * scale) or the invalid
+        value for the missing ones, or None if all of them are missing.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not valid.any():
+            return None
+        fmt, invalid = MessageDefinition.BASE_TYPES[base_type]
+        info = np.iinfo(np.dtype(fmt))
+        result = np.full(len(values), invalid, dtype=np.int64)
+        result[valid] = np.clip(np.round((values[valid] + offset) * scale), info.min, info.max)
+        return result
+
+
+FILE_ID = MessageDefinition(0, 0, [
+    ("type", 0, "enum"),
+    ("manufacturer", 1, "uint16"),
+    ("serial_number", 3, "uint32z"),
+    ("time_created", 4, "uint32"),
+])
+
+EVENT_MESSAGE = MessageDefinition(2, 21, [
+    ("timestamp", 253, "uint32"),
+    ("event", 0, "enum"),
+    ("event_type", 1, "enum"),
+])
+
+RECORD = MessageDefinition(3, 20, [
+    ("timestamp", 253, "uint32"),
+    ("position_lat", 0, "sint32"),
+    ("position_long", 1, "sint32"),
+    ("distance", 5, "uint32"),
+    ("enhanced_altitude", 78, "uint32"),
+    ("enhanced_speed", 73, "uint32"),
+    ("heart_rate", 3, "uint8"),
+    ("cadence", 4, "uint8"),
+    ("fractional_cadence", 53, "uint8"),
+    ("power", 7, "uint16"),
+    ("temperature", 13, "sint8"),
+])
+
+LAP = MessageDefinition(4, 19, [
+    ("timestamp", 253, "uint32"),
+    ("message_index", 254, "uint16"),
+    ("event", 0, "enum"),
+    ("event_type", 1, "enum"),
+    ("start_time", 2, "uint32"),
+    ("start_position_lat", 3, "sint32"),
+    ("start_position_long", 4, "sint32"),
+    ("end_position_lat", 5, "sint32"),
+    ("end_position_long", 6, "sint32"),
+    ("total_elapsed_time", 7, "uint32"),
+    ("total_timer_time", 8, "uint32"),
+    ("total_distance", 9, "uint32"),
+    ("avg_heart_rate", 15, "uint8"),
+    ("max_heart_rate", 16, "uint8"),
+    ("total_ascent", 21, "uint16"),
+    ("total_descent", 22, "uint16"),
+    ("sport", 25, "enum"),
+    ("enhanced_avg_speed", 110, "uint32"),
+    ("enhanced_max_speed", 111, "uint32"),
+])
+
+SESSION = MessageDefinition(5, 18, [
+    ("timestamp", 253, "uint32"),
+    ("message_index", 254, "uint16"),
+    ("event", 0, "enum"),
+    ("event_type", 1, "enum"),
+    ("start_time", 2, "uint32"),
+    ("start_position_lat", 3, "sint32"),
+    ("start_position_long", 4, "sint32"),
+    ("sport", 5, "enum"),
+    ("sub_sport", 6, "enum"),
+    ("total_elapsed_time", 7, "uint32"),
+    ("total_timer_time", 8, "uint32"),
+    ("total_distance", 9, "uint32"),
+    ("total_calories", 11, "uint16"),
+    ("avg_heart_rate", 16, "uint8"),
+    ("max_heart_rate", 17, "uint8"),
+    ("total_ascent", 22, "uint16"),
+    ("total_descent", 23, "uint16"),
+    ("first_lap_index", 25, "uint16"),
+    ("num_laps", 26, "uint16"),
+    ("avg_temperature", 57, "sint8"),
+    ("max_temperature", 58, "sint8"),
+    ("enhanced_avg_speed", 124, "uint32"),
+    ("enhanced_max_speed", 125, "uint32"),
+])
+
+ACTIVITY_MESSAGE = MessageDefinition(6, 34, [
+    ("timestamp", 253, "uint32"),
+    ("total_timer_time", 0, "uint32"),
+    ("num_sessions", 1, "uint16"),
+    ("type", 2, "enum"),
+    ("event", 3, "enum"),
+    ("event_type", 4, "enum"),
+])
+
+
+@dataclass
+class LapSummary:
+    start_time: float = None
+    end_time: float = None
+    start_latitude: float = None
+    start_longitude: float = None
+    end_latitude: float = None
+    end_longitude: float = None
+    distance: float = 0
+    max_speed: float = None
+    hr_sum: float = 0
+    hr_count: int = 0
+    max_hr: float = None
+    ascent: float = 0
+    descent: float = 0
+    temperature_sum: float = 0
+    temperature_count: int = 0
+    max_temperature: float = None
+
+    def add(self, other: "LapSummary"):
+        """Accumulate other (a later lap) into this summary."""
+        if self.start_time is None:
+            self.start_time = other.start_time
+            self.start_latitude, self.start_longitude = other.start_latitude, other.start_longitude
+        self.end_time = other.end_time
+        self.end_latitude, self.end_longitude = other.end_latitude, other.end_longitude
+        self.distance += other.distance
+        self.max_speed = LapSummary._max(self.max_speed, other.max_speed)
+        self.hr_sum += other.hr_sum
+        self.hr_count += other.hr_count
+        self.max_hr = LapSummary._max(self.max_hr, other.max_hr)
+        self.ascent += other.ascent
+        self.descent += other.descent
+        self.temperature_sum += other.temperature_sum
+        self.temperature_count += other.temperature_count
+        self.max_temperature = LapSummary._max(self.max_temperature, other.max_temperature)
+
+    @property
+    def elapsed_time(self):
+        return self.end_time - self.start_time
+
+    @property
+    def avg_hr(self):
+        return self.hr_sum / self.hr_count if self.hr_count else None
+
+    @property
+    def avg_speed(self):
+        return self.distance / self.elapsed_time if self.elapsed_time > 0 else None
+
+    @property
+    def avg_temperature(self):
+        return self.temperature_sum / self.temperature_count if self.temperature_count else None
+
+    @staticmethod
+    def _max(a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return max(a, b)
+
+
+class FitActivityEncoder:
+    """Class to be used to encode activity FIT files.
+
+    Activity FIT files will contain:
+    - One file_id message with type=activity.
+    - One sport message with the sport and the activity's name.
+    - Several record messages, one per track point.
+    - One timer start event before the records of every section and one
+      timer stop_all event after them.
+    - One lap message per section.
+    - One session message and one activity message.
+
+    Records are added as columns (NumPy arrays) with add_records and
+    packed in bulk, so encoding doesn't need a Python call per point.
+    """
+
+    EARTH_RADIUS = 6371000
+
+    def __init__(self, sport: int, sub_sport: int = SUB_SPORT["generic"], name: str = None, total_calories: int = None):
+        self._sport = sport
+        self._sub_sport = sub_sport
+        self._total_calories = total_calories
+        self._chunks = [FILE_ID.definition]
+        self._laps: List[LapSummary] = []
+        self._lap: LapSummary = None
+        self._last_position = None
+        self._distance = 0
+
+        self._sport_message = self._sport_definition(name)
+        self._chunks.append(self._sport_message.definition)
+        self._chunks.append(self._sport_message.pack(
+            sport=sport, sub_sport=sub_sport, name=FitActivityEncoder._string(name)
+        ))
+        for definition in (EVENT_MESSAGE, RECORD, LAP):
+            self._chunks.append(definition.definition)
+
+    @staticmethod
+    def _string(value: str):
+        return (value + "\0").encode("utf-8") if value else None
+
+    @staticmethod
+    def _sport_definition(name: str):
+        fields = [("sport", 0, "enum"), ("sub_sport", 1, "enum")]
+        if name:
+            fields.append(("name", 3, "string", len(FitActivityEncoder._string(name))))
+        return MessageDefinition(1, 12, fields)
+
+    @staticmethod
+    def timestamps(times_ms):
+        """Convert Unix milliseconds to FIT date_time values."""
+        return np.floor(np.asarray(times_ms, dtype=np.float64) / 1000).astype(np.int64) - FIT_EPOCH_S
+
+    @staticmethod
+    def timestamp(time_ms: float) -> int:
+        return int(math.floor(time_ms / 1000)) - FIT_EPOCH_S
+
+    def add_records(self, times_ms, latitudes, longitudes, altitudes=None, speeds=None, heart_rates=None,
+                    cadences=None, powers=None, temperatures=None, gains=None, losses=None):
+        """Add the track points of the current section (it's started if needed).
+
+        Arguments:
+        times_ms     -- Unix times in milliseconds.
+        latitudes    -- latitudes in degrees.
+        longitudes   -- longitudes in degrees.
+        The rest of arguments are optional and they can have None or NaN
+        values: altitudes (m), speeds (m/s), heart_rates (bpm), cadences
+        (rpm), powers (W), temperatures (ºC), gains and losses (m).
+        """
+        times_ms = np.asarray(times_ms, dtype=np.float64)
+        size = len(times_ms)
+        if size == 0:
+            return
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        timestamps = FitActivityEncoder.timestamps(times_ms)
+        if self._lap is None:
+            self._lap = LapSummary(
+                start_time=float(times_ms[0]) / 1000,
+                start_latitude=float(latitudes[0]), start_longitude=float(longitudes[0])
+            )
+            self._last_position = None
+            self._chunks.append(EVENT_MESSAGE.pack(
+                timestamp=int(timestamps[0]), event=EVENT["timer"], event_type=EVENT_TYPE["start"]
+            ))
+
+        distances = self._distances(latitudes, longitudes)
+        # Cadence in 1/128 rpm: integer part plus fractional_cadence.
+        cadences = self._optional_column(cadences, "uint32", 128)
+        invalid_cadences = None if cadences is None else cadences == MessageDefinition.BASE_TYPES["uint32"][1]
+        self._chunks.append(RECORD.pack_columns(
+            size,
+            timestamp=timestamps,
+            position_lat=MessageDefinition.column(latitudes, "sint32", SEMICIRCLES_PER_DEGREE),
+            position_long=MessageDefinition.column(longitudes, "sint32", SEMICIRCLES_PER_DEGREE),
+            distance=MessageDefinition.column(distances, "uint32", 100),
+            enhanced_altitude=self._optional_column(altitudes, "uint32", 5, 500),
+            enhanced_speed=self._optional_column(speeds, "uint32", 1000),
+            heart_rate=self._optional_column(heart_rates, "uint8"),
+            cadence=None if cadences is None else np.where(invalid_cadences, 0xFF, np.minimum(cadences // 128, 0xFE)),
+            fractional_cadence=None if cadences is None else np.where(invalid_cadences, 0xFF, cadences % 128),
+            power=self._optional_column(powers, "uint16"),
+            temperature=self._optional_column(temperatures, "sint8"),
+        ))
+
+        lap = self._lap
+        lap.end_time = float(times_ms[-1]) / 1000
+        lap.end_latitude, lap.end_longitude = float(latitudes[-1]), float(longitudes[-1])
+        lap.max_speed = LapSummary._max(lap.max_speed, self._nanmax(speeds))
+        if heart_rates is not None:
+            hr = np.asarray(heart_rates, dtype=np.float64)
+            hr = hr[~np.isnan(hr)]
+            lap.hr_sum += float(hr.sum())
+            lap.hr_count += len(hr)
+            lap.max_hr = LapSummary._max(lap.max_hr, self._nanmax(hr))
+        if temperatures is not None:
+            temperature = np.asarray(temperatures, dtype=np.float64)
+            temperature = temperature[~np.isnan(temperature)]
+            lap.temperature_sum += float(temperature.sum())
+            lap.temperature_count += len(temperature)
+            lap.max_temperature = LapSummary._max(lap.max_temperature, self._nanmax(temperature))
+        lap.ascent += self._nansum(gains)
+        lap.descent += self._nansum(losses)
+
+    def end_section(self):
+        """End the current section: it's a lap."""
+        lap = self._lap
+        if lap is None:
+            return
+        self._lap = None
+        timestamp = FitActivityEncoder.timestamp(lap.end_time * 1000)
+        self._chunks.append(EVENT_MESSAGE.pack(
+            timestamp=timestamp, event=EVENT["timer"], event_type=EVENT_TYPE["stop_all"]
+        ))
+        self._chunks.append(LAP.pack(
+            timestamp=timestamp,
+            message_index=len(self._laps),
+            event=EVENT["lap"],
+            event_type=EVENT_TYPE["stop"],
+            sport=self._sport,
+            **self._summary_values(lap)
+        ))
+        self._laps.append(lap)
+
+    def _summary_values(self, lap: LapSummary) -> dict:
+        def scaled(value, scale=1):
+            return None if value is None else int(round(value * scale))
+
+        def semicircles(value):
+            return scaled(value, SEMICIRCLES_PER_DEGREE)
+
+        return dict(
+            start_time=FitActivityEncoder.timestamp(lap.start_time * 1000),
+            start_position_lat=semicircles(lap.start_latitude),
+            start_position_long=semicircles(lap.start_longitude),
+            end_position_lat=semicircles(lap.end_latitude),
+            end_position_long=semicircles(lap.end_longitude),
+            total_elapsed_time=scaled(lap.elapsed_time, 1000),
+            total_timer_time=scaled(lap.elapsed_time, 1000),
+            total_distance=scaled(lap.distance, 100),
+            avg_heart_rate=scaled(lap.avg_hr),
+            max_heart_rate=scaled(lap.max_hr),
+            total_ascent=scaled(lap.ascent),
+            total_descent=scaled(lap.descent),
+            avg_temperature=scaled(lap.avg_temperature),
+            max_temperature=scaled(lap.max_temperature),
+            enhanced_avg_speed=scaled(lap.avg_speed, 1000),
+            enhanced_max_speed=scaled(lap.max_speed, 1000),
+        )
+
+    def end_and_get(self):
+        """Finish FIT activity binary encoded data and return it.
+
+        The return value is ready for saving into a binary file.
+        """
+        self.end_section()
+        if self._laps:
+            session = LapSummary()
+            for lap in self._laps:
+                session.add(lap)
+            timer_time = sum(lap.elapsed_time for lap in self._laps)
+            timestamp = FitActivityEncoder.timestamp(session.end_time * 1000)
+            values = self._summary_values(session)
+            values["total_timer_time"] = int(round(timer_time * 1000))
+            values["enhanced_avg_speed"] = int(round(session.distance / timer_time * 1000)) if timer_time > 0 else None
+            self._chunks.append(SESSION.definition)
+            self._chunks.append(SESSION.pack(
+                timestamp=timestamp,
+                message_index=0,
+                event=EVENT["session"],
+                event_type=EVENT_TYPE["stop"],
+                sport=self._sport,
+                sub_sport=self._sub_sport,
+                total_calories=self._total_calories,
+                first_lap_index=0,
+                num_laps=len(self._laps),
+                **values
+            ))
+            self._chunks.append(ACTIVITY_MESSAGE.definition)
+            self._chunks.append(ACTIVITY_MESSAGE.pack(
+                timestamp=timestamp,
+                total_timer_time=values["total_timer_time"],
+                num_sessions=1,
+                type=ACTIVITY["manual"],
+                event=EVENT["activity"],
+                event_type=EVENT_TYPE["stop"]
+            ))
+            time_created = FitActivityEncoder.timestamp(self._laps[0].start_time * 1000)
+        else:
+            time_created = None
+
+        file_id = FILE_ID.pack(
+            type=FILE["activity"], manufacturer=MANUFACTURER["development"], time_created=time_created
+        )
+        data = self._chunks[0] + file_id + b"".join(self._chunks[1:])
+
+        header = pack("<BBHI", 14, 0x20, 2132, len(data)) + b".FIT"
+        header += pack("<H", Crc.calculate(header))
+        return header + data + pack("<H", Crc.calculate(data))
+
+    def _distances(self, latitudes, longitudes):
+        """Accumulated distances (m) of the points, continuing the section's ones."""
+        lat = np.radians(latitudes)
+        lon = np.radians(longitudes)
+        if self._last_position is not None:
+            lat = np.concatenate(([self._last_position[0]], lat))
+            lon = np.concatenate(([self._last_position[1]], lon))
+            start = 0
+        else:
+            start = 1
+        a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+        steps = 2 * FitActivityEncoder.EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        distances = np.empty(len(latitudes), dtype=np.float64)
+        if start:
+            distances[0] = self._distance
+        distances[start:] = self._distance + np.cumsum(steps)
+        self._lap.distance += distances[-1] - self._distance
+        self._distance = float(distances[-1])
+        self._last_position = (lat[-1], lon[-1])
+        return distances
+
+    @staticmethod
+    def _optional_column(values, base_type: str, scale: float = 1, offset: float = 0):
+        if values is None:
+            return None
+        return MessageDefinition.column(values, base_type, scale, offset)
+
+    @staticmethod
+    def _nanmax(values):
+        if values is None:
+            return None
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0 or np.isnan(values).all():
+            return None
+        return float(np.nanmax(values))
+
+    @staticmethod
+    def _nansum(values) -> float:
+        if values is None:
+            return 0
+        return float(np.nansum(np.asarray(values, dtype=np.float64)))
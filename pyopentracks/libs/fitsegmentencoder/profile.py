@@ -23,6 +23,8 @@ from functools import reduce
 from struct import pack
 from typing import List
 
+import numpy as np
+
 from .definitions import FIT_BASE_TYPES
 
 # According to the SDK date_time type is computed counting the seconds since this datetime: UTC 00:00 Dec 31 1989
@@ -112,9 +114,61 @@ class Crc(object):
         """Format CRC value to string."""
         return "0x%04X" % value
 
+    # Long inputs are split in blocks of BLOCK_SIZE bytes.
+    BLOCK_SIZE = 1024
+
+    _byte_table = None
+    _byte_list = None
+    _shift_tables = None
+
     @classmethod
     def calculate(cls, byte_arr, crc=0):
-        """Compute CRC for input bytes."""
+        """Compute CRC for input bytes.
+
+        The CRCs of all blocks of a long input are computed at the same
+        time with NumPy and then combined (the CRC is linear), so there
+        isn't a Python loop per byte.
+        """
+        if cls._byte_table is None:
+            cls._build_tables()
+        data = np.frombuffer(bytes(byte_arr), dtype=np.uint8)
+        num_blocks = len(data) // cls.BLOCK_SIZE
+        if num_blocks < 2:
+            return cls._calculate_bytes(data, crc)
+
+        table = cls._byte_table
+        blocks = np.ascontiguousarray(data[:num_blocks * cls.BLOCK_SIZE].reshape(num_blocks, -1).T)
+        crcs = np.zeros(num_blocks, dtype=np.uint32)
+        for column in blocks:
+            crcs = (crcs >> 8) ^ table[(crcs ^ column) & 0xFF]
+
+        shift_lo, shift_hi = cls._shift_tables
+        for block_crc in crcs.tolist():
+            crc = shift_lo[crc & 0xFF] ^ shift_hi[crc >> 8] ^ block_crc
+        return cls._calculate_bytes(data[num_blocks * cls.BLOCK_SIZE:], crc)
+
+    @classmethod
+    def _build_tables(cls):
+        byte_table = np.array([cls._calculate_nibbles([i]) for i in range(256)], dtype=np.uint32)
+        # CRC of BLOCK_SIZE zero bytes starting from every low/high byte value.
+        lo = np.arange(256, dtype=np.uint32)
+        hi = lo << 8
+        for _ in range(cls.BLOCK_SIZE):
+            lo = (lo >> 8) ^ byte_table[lo & 0xFF]
+            hi = (hi >> 8) ^ byte_table[hi & 0xFF]
+        cls._shift_tables = (lo.tolist(), hi.tolist())
+        cls._byte_list = byte_table.tolist()
+        cls._byte_table = byte_table
+
+    @classmethod
+    def _calculate_bytes(cls, data, crc):
+        table = cls._byte_list
+        for byte in data.tolist():
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        return crc
+
+    @classmethod
+    def _calculate_nibbles(cls, byte_arr, crc=0):
         for byte in bytearray(byte_arr):
             # Taken verbatim from FIT SDK docs
             tmp = cls.CRC_TABLE[crc & 0xF]
@@ -16,8 +16,10 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
+from bisect import bisect_right
+from collections.abc import Sequence
 from dataclasses import dataclass
-from itertools import chain
+from itertools import accumulate, chain, islice
 from typing import List
 
 from .model import Model
@@ -68,11 +70,58 @@ class MultiActivity:
             self.sequence.append(MultiActivity.Data(a))
 
 
+class TrackPointsView(Sequence):
+    """Read-only sequence of all track points of a list of sections.
+
+    It doesn't copy the track points: indexes are translated to the
+    section they belong to. Sections' lengths are checked on every
+    access (one len per section) so it's still right if the sections
+    get more track points.
+    """
+
+    __slots__ = ("_sections", "_lengths", "_offsets")
+
+    def __init__(self, sections: List[Section]):
+        self._sections = sections
+        self._lengths = None
+        self._offsets = [0]
+
+    def _update(self):
+        lengths = [len(section.track_points) for section in self._sections]
+        if lengths != self._lengths:
+            self._lengths = lengths
+            self._offsets = [0] + list(accumulate(lengths))
+        return self._offsets
+
+    def __len__(self):
+        return self._update()[-1]
+
+    def __getitem__(self, index):
+        offsets = self._update()
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(offsets[-1]))]
+        if index < 0:
+            index += offsets[-1]
+        if index < 0 or index >= offsets[-1]:
+            raise IndexError("track point index out of range")
+        section_idx = bisect_right(offsets, index) - 1
+        return self._sections[section_idx].track_points[index - offsets[section_idx]]
+
+    def __iter__(self):
+        return chain.from_iterable(section.track_points for section in self._sections)
+
+    def __reversed__(self):
+        return chain.from_iterable(reversed(section.track_points) for section in reversed(self._sections))
+
+    def __repr__(self):
+        return f"TrackPointsView({list(islice(self, 3))!r}..., len={len(self)})"
+
+
 class Activity(Model):
     __slots__ = (
         "_id", "_uuid", "_name", "_description", "_category", "_recorded_with",
         "_start_time_ms", "_stats_id", "_activity_id", "_stats", "_sections",
-        "_activities"
+        "_activities", "_all_track_points"
     )
 
     def __init__(self, *args):
@@ -90,6 +139,7 @@ class Activity(Model):
         self._stats: Stats = Stats(*args[9:]) if args and len(args) > 9 else None
         self._sections: List[Section] = []
         self._activities: List[Activity] = []
+        self._all_track_points = None
 
     def __repr__(self):
         return f"Activity(id={self._id!r}, uuid={self._uuid!r}, name={self._name!r}, " \
@@ -184,11 +234,14 @@ class Activity(Model):
         return self._sections
 
     @property
-    def all_track_points(self):
-        """Return a list of all track points from all sections"""
-        if not self.sections:
-            return []
-        return list(chain(*[ section.track_points for section in self.sections ]))
+    def all_track_points(self) -> TrackPointsView:
+        """Return a read-only sequence of all track points from all sections.
+
+        It's built once: it's a view over the sections' track points.
+        """
+        if self._all_track_points is None:
+            self._all_track_points = TrackPointsView(self._sections if self._sections is not None else [])
+        return self._all_track_points
 
     @property
     def activity_id(self):
@@ -221,6 +274,7 @@ class Activity(Model):
     @sections.setter
     def sections(self, sections):
         self._sections = sections
+        self._all_track_points = None
 
     @recorded_with.setter
     def recorded_with(self, recorded_with):
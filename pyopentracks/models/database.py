@@ -17,6 +17,7 @@ You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import hashlib
 import sqlite3
 from os import path
 from typing import List
@@ -34,6 +35,8 @@ from pyopentracks.models.aggregated_stats import AggregatedStats
 from pyopentracks.models.segment_track import SegmentTrack
 from pyopentracks.models.segment import Segment
 from pyopentracks.models.segment_point import SegmentPoint
+from pyopentracks.utils.fingerprint import ActivityFingerprint
+from pyopentracks.utils.footprint import Footprint
 
 
 config = {
@@ -220,6 +223,32 @@ class Database:
                 )
         return []
 
+    def get_activities_fingerprints(self):
+        """Get a fingerprint of every activity (not sub-activities).
+
+        The fingerprint changes when the activity's data or its stats
+        change (for example, after editing it or correcting its altitude).
+
+        Return:
+            dictionary activity's id -> fingerprint (hexadecimal string).
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                SELECT a._id, a.uuid, a.name, a.description, a.category, a.starttime, s.*
+                FROM activities a LEFT JOIN stats s ON s._id = a.statsid
+                WHERE a.activityid IS NULL
+                """
+                return {
+                    row[0]: hashlib.sha1(repr(row[1:]).encode("utf-8")).hexdigest()
+                    for row in conn.execute(query)
+                }
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return {}
+
     def get_points_near_point_start(self, bbox, activity_id=None):
         """Look for points inside trackpoints table that are inside the bounding box bbox.
 
@@ -304,16 +333,20 @@ class Database:
                 )
         return []
 
-    def get_existed_activities(self, uuid, start, end):
+    def get_existed_activities(self, uuid, start, end, fingerprint=None):
         """Look for a Activity from arguments.
 
-        Look for an activity that has the same uuid or has the same start and
-        end time.
+        Look for an activity that has the same uuid, has the same start and
+        end time or has the same fingerprint.
+
+        Every condition is a query of its own joined with UNION so every
+        one uses its index.
 
         Arguments:
-        uuid -- UUID that could be None.
-        start -- start time in milliseconds.
-        end -- end time in milliseconds.
+        uuid        -- UUID that could be None.
+        start       -- start time in milliseconds.
+        end         -- end time in milliseconds.
+        fingerprint -- (optional) ActivityFingerprint of the activity.
 
         Return:
         list of activities or None.
@@ -324,10 +357,18 @@ class Database:
         with sqlite3.connect(self._db_file) as conn:
             try:
                 query = """
-                SELECT activities.*, stats.* FROM activities, stats
-                WHERE stats._id=activities.statsid AND (activities.uuid=? OR (activities.starttime>=? and stats.stoptime<=?))
+                SELECT activities.*, stats.* FROM activities JOIN stats ON stats._id=activities.statsid
+                WHERE activities.uuid=?
+                UNION
+                SELECT activities.*, stats.* FROM activities JOIN stats ON stats._id=activities.statsid
+                WHERE activities.starttime>=? AND activities.starttime<=? AND stats.stoptime<=?
+                UNION
+                SELECT activities.*, stats.* FROM importfingerprints f
+                JOIN activities ON activities._id=f.activityid
+                JOIN stats ON stats._id=activities.statsid
+                WHERE f.fingerprint=?
                 """
-                tuple_result = conn.execute(query, (uuid, start, end)).fetchall()
+                tuple_result = conn.execute(query, (uuid, start, end, end, fingerprint)).fetchall()
                 if tuple_result:
                     return [Activity(*tuple) for tuple in tuple_result]
                 return None
@@ -337,6 +378,51 @@ class Database:
                 )
                 raise
 
+    def get_existed_activities_keys(self, keys):
+        """Look, in only one query, which activities already exist.
+
+        It's the batched version of get_existed_activities for importing a
+        lot of activities at once (a folder, for example).
+
+        Arguments:
+        keys -- list of tuples (uuid, start, end, fingerprint) with the same
+                meaning than get_existed_activities' arguments.
+
+        Return:
+        set with the positions in keys of the activities that already exist.
+
+        Raise:
+        raise the exception could be triggered.
+        """
+        if not keys:
+            return set()
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute("""
+                    CREATE TEMP TABLE importkeys (
+                        idx INTEGER PRIMARY KEY, uuid BLOB, starttime INTEGER, stoptime INTEGER, fingerprint TEXT
+                    )
+                """)
+                conn.executemany(
+                    "INSERT INTO importkeys VALUES (?, ?, ?, ?, ?)",
+                    ((idx, *key) for idx, key in enumerate(keys))
+                )
+                query = """
+                SELECT k.idx FROM importkeys k JOIN activities a ON a.uuid=k.uuid
+                UNION
+                SELECT k.idx FROM importkeys k
+                JOIN activities a ON a.starttime>=k.starttime AND a.starttime<=k.stoptime
+                JOIN stats s ON s._id=a.statsid AND s.stoptime<=k.stoptime
+                UNION
+                SELECT k.idx FROM importkeys k JOIN importfingerprints f ON f.fingerprint=k.fingerprint
+                """
+                return {row[0] for row in conn.execute(query)}
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+                raise
+
     def get_subactivities(self, id):
         """Get all subactivities from the activity identified by id.
 
@@ -546,6 +632,110 @@ class Database:
                 )
         return []
 
+    def iter_track_points_rows(self, activity_id, chunk_size=5000):
+        """Iterate over the trackpoints rows of the activity, section by section.
+
+        Rows are read from the cursor in chunks, so only chunk_size rows
+        are in memory at the same time.
+
+        Arguments:
+        activity_id -- Activity's id.
+        chunk_size  -- (optional) maximum number of rows per chunk.
+
+        Return:
+        A generator of tuples (section's id, list of rows). Every row is
+        a tuple with the columns of the trackpoints table. Chunks of the
+        same section are consecutive and rows are sorted by _id.
+
+        Raise:
+        The error of the query, after logging it, so the caller doesn't
+        take the rows read until then as the whole track.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                sections = [
+                    row[0] for row in
+                    conn.execute("SELECT _id FROM sections WHERE activityid=? ORDER BY _id ASC", (activity_id,))
+                ]
+                for section_id in sections:
+                    cursor = conn.execute("SELECT * FROM trackpoints WHERE sectionid=? ORDER BY _id ASC", (section_id,))
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield section_id, rows
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+                raise
+
+    def get_coordinates(self, activity_id, limit=None):
+        """Return a list of tuples (latitude, longitude) of the track points of the activity.
+
+        Arguments:
+        activity_id -- activity's id.
+        limit       -- (optional) maximum number of points (the first ones).
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT t.latitude, t.longitude
+                    FROM trackpoints t JOIN sections s ON s._id = t.sectionid
+                    WHERE s.activityid=?
+                    ORDER BY t._id ASC
+                    LIMIT ?
+                """
+                return conn.execute(query, (activity_id, -1 if limit is None else limit)).fetchall()
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def count_track_points(self, activities_ids, chunk_size=500):
+        """Return a dictionary activity's id -> number of track points, only for activities with track points.
+
+        Arguments:
+        activities_ids -- list of activities' ids.
+        chunk_size     -- (optional) number of activities counted by every query.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                counts = {}
+                for i in range(0, len(activities_ids), chunk_size):
+                    chunk = activities_ids[i:i + chunk_size]
+                    query = f"""
+                        SELECT s.activityid, COUNT(*)
+                        FROM trackpoints t JOIN sections s ON s._id = t.sectionid
+                        WHERE s.activityid IN ({", ".join("?" * len(chunk))})
+                        GROUP BY s.activityid
+                    """
+                    counts.update(conn.execute(query, chunk).fetchall())
+                return {activity_id: counts[activity_id] for activity_id in activities_ids if activity_id in counts}
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return {}
+
+    def get_track_points_locations(self, activity_id):
+        """Return a list of tuples (track point's id, time, latitude, longitude) of the activity, sorted by id."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT t._id, t.time, t.latitude, t.longitude
+                    FROM trackpoints t JOIN sections s ON s._id = t.sectionid
+                    WHERE s.activityid=?
+                    ORDER BY t._id ASC
+                """
+                return conn.execute(query, (activity_id,)).fetchall()
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
     def get_track_points(self, activity_id, from_trackpoint_id=None, to_trackpoint_id=None):
         """Get all track points from track identified by trackid.
 
@@ -675,6 +865,21 @@ class Database:
                             for track_point in section.track_points:
                                 cursor.execute(track_point.insert_query, track_point.bulk_insert_fields(sectionid))
 
+                fingerprint = ActivityFingerprint.from_activity(activity) if activity_id is not None else None
+                if fingerprint is not None:
+                    cursor.execute(
+                        "INSERT INTO importfingerprints (activityid, fingerprint) VALUES (?, ?)",
+                        (activity_id, fingerprint)
+                    )
+
+                footprint = None
+                if activity_id is not None and activity.sections:
+                    footprint = Footprint.of_coordinates(
+                        (tp.latitude, tp.longitude) for section in activity.sections for tp in section.track_points
+                    )
+                if footprint is not None:
+                    self._insert_activity_footprint(conn, activity_id, *footprint)
+
                 conn.commit()
 
                 return activity_id
@@ -812,6 +1017,88 @@ class Database:
                     f"Error: [SQL] Couldn't execute the query: {error}"
                 )
 
+    def delete_activities(self, activities_ids, on_progress=None, chunk_size=500):
+        """Delete activities (and their sub-activities) in only one transaction.
+
+        Rows are deleted with set-based deletes, table by table, from the
+        children to the parents: segment tracks, track points, sections,
+        derived tables (route signatures, heatmap tracks, heart rate zones
+        times...), sets, activities and stats.
+
+        Arguments:
+        activities_ids -- list of activities' ids.
+        on_progress    -- (optional) function called with (deleted, total)
+                          after every chunk of activities.
+        chunk_size     -- number of activities deleted by every statement.
+
+        Return:
+        The list of deleted activities' ids (sub-activities included) or
+        None if any error (nothing is deleted).
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute("PRAGMA foreign_keys = ON")
+                conn.execute("CREATE TEMP TABLE deleteids (activityid INTEGER PRIMARY KEY)")
+                conn.execute("CREATE TEMP TABLE deletechunk (activityid INTEGER PRIMARY KEY, statsid INTEGER)")
+                conn.executemany("INSERT OR IGNORE INTO deleteids VALUES (?)", ((i,) for i in activities_ids))
+                conn.execute("""
+                    INSERT OR IGNORE INTO deleteids
+                    SELECT _id FROM activities WHERE activityid IN (SELECT activityid FROM deleteids)
+                """)
+                # Sub-activities first: deleting a parent would cascade to them
+                # and their stats wouldn't be deleted.
+                ids = [row[0] for row in conn.execute("""
+                    SELECT a._id FROM deleteids d JOIN activities a ON a._id = d.activityid
+                    ORDER BY a.activityid IS NULL, a._id
+                """)]
+
+                in_chunk = "IN (SELECT activityid FROM deletechunk)"
+                queries = (
+                    f"DELETE FROM segmentracks WHERE activityid {in_chunk}",
+                    f"DELETE FROM trackpoints WHERE sectionid IN (SELECT _id FROM sections WHERE activityid {in_chunk})",
+                    f"DELETE FROM sections WHERE activityid {in_chunk}",
+                    f"DELETE FROM routecells WHERE activityid {in_chunk}",
+                    f"DELETE FROM routesignatures WHERE activityid {in_chunk}",
+                    f"DELETE FROM heatmaptracks WHERE activityid {in_chunk}",
+                    f"DELETE FROM hrzonetimes WHERE activityid {in_chunk}",
+                    f"DELETE FROM statsrecompute WHERE activityid {in_chunk}",
+                    f"DELETE FROM importfingerprints WHERE activityid {in_chunk}",
+                    f"DELETE FROM activitycells WHERE activityid {in_chunk}",
+                    f"DELETE FROM activityfootprints WHERE activityid {in_chunk}",
+                    "DELETE FROM sets WHERE statsid IN (SELECT statsid FROM deletechunk)",
+                    f"DELETE FROM activities WHERE _id {in_chunk}",
+                    "DELETE FROM stats WHERE _id IN (SELECT statsid FROM deletechunk)",
+                )
+                for i in range(0, len(ids), chunk_size):
+                    conn.execute("DELETE FROM deletechunk")
+                    conn.executemany(
+                        "INSERT INTO deletechunk SELECT _id, statsid FROM activities WHERE _id=?",
+                        ((j,) for j in ids[i:i + chunk_size])
+                    )
+                    for query in queries:
+                        conn.execute(query)
+                    if on_progress is not None:
+                        on_progress(min(i + chunk_size, len(ids)), len(ids))
+                conn.commit()
+                return ids
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return None
+
+    def incremental_vacuum(self):
+        """Return free pages to the file system (only if auto_vacuum is INCREMENTAL)."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                # executescript steps the pragma until all pages are released.
+                conn.executescript("PRAGMA incremental_vacuum")
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+
     def update(self, model):
         """Update the model in the database.
 
@@ -831,27 +1118,593 @@ class Database:
                     f"Error: [SQL] Couldn't execute the query: {error}"
                 )
 
-    def update_altitude(self, activity_id, data_list):
-        """Update all trackpoints altitude from activity_id.
+    def update_altitude(self, activity_id, trackpoints_data, stats_data):
+        """Update altitudes of the trackpoints and elevation stats of an activity.
+
+        Everything is written in only one transaction.
 
-        activity_id   - activity's id where trackpoints has to belong to.
-        data_list - list of data to update. Every item in the list has three keys: "latitude", "longitude", "elevation".
+        Arguments:
+        activity_id      -- activity's id.
+        trackpoints_data -- iterable of tuples (altitude, gain, loss, trackpoint's id).
+                            Gain and loss are kept when they are None.
+        stats_data       -- tuple (gain, loss, min elevation, max elevation).
+
+        Return:
+        True if everything was updated or False otherwise.
         """
         with sqlite3.connect(self._db_file) as conn:
             try:
-                cursor = conn.cursor()
-                for data in data_list:
-                    sql = """
-                        update trackpoints
-                        set altitude=?
-                        where activity_id=? and latitude=? and longitude=?
+                conn.executemany(
+                    "UPDATE trackpoints SET altitude=?, gain=COALESCE(?, gain), loss=COALESCE(?, loss) WHERE _id=?",
+                    trackpoints_data
+                )
+                conn.execute(
+                    """
+                    UPDATE stats SET elevationgain=?, elevationloss=?, minelevation=?, maxelevation=?
+                    WHERE _id=(SELECT statsid FROM activities WHERE _id=?)
+                    """,
+                    (*stats_data, activity_id)
+                )
+                conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def insert_route_signature(self, activity_id, cells):
+        """Insert (or replace) the route signature of the activity.
+
+        Arguments:
+        activity_id -- activity's id.
+        cells       -- list of geohash cells (integers) visited by the activity.
+
+        Return:
+        True if the signature was inserted or False otherwise.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute("DELETE FROM routecells WHERE activityid=?", (activity_id,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO routesignatures (activityid, numcells) VALUES (?, ?)",
+                    (activity_id, len(cells))
+                )
+                conn.executemany(
+                    "INSERT INTO routecells (cell, activityid) VALUES (?, ?)",
+                    ((cell, activity_id) for cell in cells)
+                )
+                conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def get_activities_without_route_signature(self):
+        """Return the ids of the activities with track points but without route signature."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT DISTINCT s.activityid
+                    FROM sections s LEFT JOIN routesignatures r ON r.activityid = s.activityid
+                    WHERE r.activityid IS NULL
+                    ORDER BY s.activityid
+                """
+                return [row[0] for row in conn.execute(query)]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def get_route_candidates(self, activity_id):
+        """Look for the activities that share route cells with the activity.
+
+        It uses the routecells inverted index: only the postings of the
+        activity's cells are read.
+
+        Return:
+        A tuple (number of cells of the activity, list of tuples (activity's
+        id, shared cells, number of cells of that activity)) or None if the
+        activity hasn't route signature.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                row = conn.execute(
+                    "SELECT numcells FROM routesignatures WHERE activityid=?", (activity_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                query = """
+                    SELECT other.activityid, COUNT(*), r.numcells
+                    FROM routecells own
+                    JOIN routecells other ON other.cell = own.cell AND other.activityid != own.activityid
+                    JOIN routesignatures r ON r.activityid = other.activityid
+                    WHERE own.activityid=?
+                    GROUP BY other.activityid
+                """
+                return row[0], conn.execute(query, (activity_id,)).fetchall()
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return None
+
+    def insert_heatmap_track(self, activity_id, bounds, points):
+        """Insert (or replace) the heatmap track of the activity.
+
+        Arguments:
+        activity_id -- activity's id.
+        bounds      -- tuple (min_latitude, min_longitude, max_latitude, max_longitude).
+        points      -- blob with the track's geometry (see HeatmapTrack).
+
+        Return:
+        True if the track was inserted or False otherwise.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute(
                     """
-                    cursor.execute(sql, (data["elevation"], activity_id, data["latitude"], data["longitude"]))
+                    INSERT OR REPLACE INTO heatmaptracks
+                    (activityid, minlatitude, minlongitude, maxlatitude, maxlongitude, points)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (activity_id, *bounds, points)
+                )
                 conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def get_heatmap_tracks(self, bounds=None):
+        """Return the blobs of the heatmap tracks that intersect bounds.
+
+        Arguments:
+        bounds -- (optional) tuple (min_latitude, min_longitude, max_latitude,
+                  max_longitude). By default, all tracks.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                if bounds is None:
+                    return [row[0] for row in conn.execute("SELECT points FROM heatmaptracks")]
+                min_lat, min_lon, max_lat, max_lon = bounds
+                query = """
+                    SELECT points
+                    FROM heatmaptracks
+                    WHERE minlatitude <= ? AND maxlatitude >= ?
+                    AND minlongitude <= ? AND maxlongitude >= ?
+                """
+                return [row[0] for row in conn.execute(query, (max_lat, min_lat, max_lon, min_lon))]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def get_heatmap_bounds(self, activity_id=None):
+        """Return the bounds of the activity's heatmap track or of all of them.
+
+        Return:
+        A tuple (min_latitude, min_longitude, max_latitude, max_longitude) or
+        None if there are not heatmap tracks.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT MIN(minlatitude), MIN(minlongitude), MAX(maxlatitude), MAX(maxlongitude)
+                    FROM heatmaptracks
+                """
+                if activity_id is None:
+                    row = conn.execute(query).fetchone()
+                else:
+                    row = conn.execute(query + " WHERE activityid=?", (activity_id,)).fetchone()
+                return tuple(row) if row is not None and row[0] is not None else None
             except Exception as error:
                 pyot_logging.get_logger(__name__).exception(
                     f"Error: [SQL] Couldn't execute the query: {error}"
                 )
+        return None
+
+    def get_heatmap_tracks_bounds(self, activities_ids):
+        """Return a list with the bounds of the heatmap tracks of the activities and their sub-activities."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute("CREATE TEMP TABLE boundsids (activityid INTEGER PRIMARY KEY)")
+                conn.executemany("INSERT OR IGNORE INTO boundsids VALUES (?)", ((i,) for i in activities_ids))
+                query = """
+                    SELECT minlatitude, minlongitude, maxlatitude, maxlongitude
+                    FROM heatmaptracks
+                    WHERE activityid IN (SELECT activityid FROM boundsids)
+                    OR activityid IN (SELECT _id FROM activities WHERE activityid IN (SELECT activityid FROM boundsids))
+                """
+                return conn.execute(query).fetchall()
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def get_activities_without_heatmap_track(self):
+        """Return the ids of the activities with track points but without heatmap track."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT DISTINCT s.activityid
+                    FROM sections s LEFT JOIN heatmaptracks h ON h.activityid = s.activityid
+                    WHERE h.activityid IS NULL
+                    ORDER BY s.activityid
+                """
+                return [row[0] for row in conn.execute(query)]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def get_heart_rates(self, activities_ids):
+        """Return the heart rate of the track points of the activities.
+
+        Arguments:
+        activities_ids -- list of activities' ids.
+
+        Return:
+        A list of tuples (activity's id, section's id, time, heart rate)
+        ordered by activity and track point or None if any error.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                placeholders = ",".join("?" * len(activities_ids))
+                query = f"""
+                    SELECT s.activityid, t.sectionid, t.time, t.heartrate
+                    FROM trackpoints t JOIN sections s ON s._id = t.sectionid
+                    WHERE s.activityid IN ({placeholders})
+                    ORDER BY s.activityid, t._id
+                """
+                return conn.execute(query, tuple(activities_ids)).fetchall()
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return None
+
+    def insert_hr_zone_times(self, activities_ids, rows):
+        """Replace the time in heart rate zones of the activities.
+
+        Arguments:
+        activities_ids -- list of activities' ids whose zones' times are replaced.
+        rows           -- list of tuples (activity's id, zone, time in ms).
+
+        Return:
+        True if the rows were inserted or False otherwise.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.executemany(
+                    "DELETE FROM hrzonetimes WHERE activityid=?", ((_id,) for _id in activities_ids)
+                )
+                conn.executemany("INSERT INTO hrzonetimes (activityid, zone, timems) VALUES (?, ?, ?)", rows)
+                conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def delete_hr_zone_times(self):
+        """Delete the time in heart rate zones of all activities."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute("DELETE FROM hrzonetimes")
+                conn.commit()
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+
+    def get_hr_zone_times(self, activity_id=None, date_from=None, date_to=None):
+        """Return the time in heart rate zones of an activity or of a range of dates.
+
+        Arguments:
+        activity_id -- (optional) activity's id.
+        date_from   -- (optional) activities from this date (milliseconds).
+        date_to     -- (optional) activities up to this date (milliseconds).
+
+        Return:
+        A dictionary zone -> time in milliseconds (summed for all activities
+        selected). Zone -1 is the time out of the zones.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                where, args = [], []
+                if activity_id is not None:
+                    where.append("h.activityid=?")
+                    args.append(activity_id)
+                if date_from is not None:
+                    where.append("a.starttime>=?")
+                    args.append(date_from)
+                if date_to is not None:
+                    where.append("a.starttime<=?")
+                    args.append(date_to)
+                query = f"""
+                    SELECT h.zone, SUM(h.timems)
+                    FROM hrzonetimes h JOIN activities a ON a._id = h.activityid
+                    {"WHERE " + " AND ".join(where) if where else ""}
+                    GROUP BY h.zone
+                    ORDER BY h.zone
+                """
+                return dict(conn.execute(query, args).fetchall())
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return {}
+
+    def get_activities_without_hr_zone_times(self):
+        """Return the ids of the activities with track points but without time in heart rate zones."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT DISTINCT s.activityid
+                    FROM sections s
+                    WHERE NOT EXISTS (SELECT 1 FROM hrzonetimes h WHERE h.activityid = s.activityid)
+                    ORDER BY s.activityid
+                """
+                return [row[0] for row in conn.execute(query)]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def insert_import_fingerprints(self, rows):
+        """Insert (or replace) the fingerprints of activities.
+
+        Arguments:
+        rows -- list of tuples (activity's id, fingerprint).
+
+        Return:
+        True if the fingerprints were inserted or False otherwise.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO importfingerprints (activityid, fingerprint) VALUES (?, ?)", rows
+                )
+                conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def get_activities_without_import_fingerprint(self):
+        """Return tuples (id, start time) of the activities with track points but without fingerprint."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT a._id, a.starttime
+                    FROM activities a
+                    WHERE EXISTS (SELECT 1 FROM sections s WHERE s.activityid = a._id)
+                    AND NOT EXISTS (SELECT 1 FROM importfingerprints f WHERE f.activityid = a._id)
+                    ORDER BY a._id
+                """
+                return conn.execute(query).fetchall()
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def _insert_activity_footprint(self, conn, activity_id, bounds, cells):
+        conn.execute("DELETE FROM activitycells WHERE activityid=?", (activity_id,))
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO activityfootprints
+            (activityid, minlatitude, minlongitude, maxlatitude, maxlongitude)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (activity_id, *bounds)
+        )
+        conn.executemany(
+            "INSERT INTO activitycells (cell, activityid) VALUES (?, ?)",
+            ((int(cell), activity_id) for cell in cells)
+        )
+
+    def insert_activity_footprint(self, activity_id, bounds, cells):
+        """Insert (or replace) the footprint of the activity.
+
+        Arguments:
+        activity_id -- activity's id.
+        bounds      -- tuple (min_latitude, min_longitude, max_latitude, max_longitude).
+        cells       -- list of coarse geohash cells (see Footprint).
+
+        Return:
+        True if the footprint was inserted or False otherwise.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                self._insert_activity_footprint(conn, activity_id, bounds, cells)
+                conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def insert_segment_footprint(self, segment_id, bounds, start_cells, end_cells):
+        """Insert (or replace) the footprint of the segment.
+
+        Arguments:
+        segment_id  -- segment's id.
+        bounds      -- tuple (min_latitude, min_longitude, max_latitude, max_longitude).
+        start_cells -- list of cells of the segment's start search box.
+        end_cells   -- list of cells of the segment's end search box.
+
+        Return:
+        True if the footprint was inserted or False otherwise.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute("DELETE FROM segmentcells WHERE segmentid=?", (segment_id,))
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO segmentfootprints
+                    (segmentid, minlatitude, minlongitude, maxlatitude, maxlongitude)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (segment_id, *bounds)
+                )
+                conn.executemany(
+                    "INSERT INTO segmentcells (segmentid, endpoint, cell) VALUES (?, ?, ?)",
+                    [(segment_id, 0, int(cell)) for cell in start_cells] +
+                    [(segment_id, 1, int(cell)) for cell in end_cells]
+                )
+                conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def get_activities_without_footprint(self):
+        """Return the ids of the activities with track points but without footprint."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT DISTINCT s.activityid
+                    FROM sections s LEFT JOIN activityfootprints f ON f.activityid = s.activityid
+                    WHERE f.activityid IS NULL
+                    ORDER BY s.activityid
+                """
+                return [row[0] for row in conn.execute(query)]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def get_segments_without_footprint(self):
+        """Return the ids of the segments without footprint."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = """
+                    SELECT s._id
+                    FROM segments s LEFT JOIN segmentfootprints f ON f.segmentid = s._id
+                    WHERE f.segmentid IS NULL
+                    ORDER BY s._id
+                """
+                return [row[0] for row in conn.execute(query)]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    # Footprints of an activity (a) and a segment (s) that can match: their
+    # bounds intersect and the activity has cells of both segment's endpoints.
+    _FOOTPRINTS_MATCH = """
+        s.minlatitude <= a.maxlatitude AND s.maxlatitude >= a.minlatitude
+        AND s.minlongitude <= a.maxlongitude AND s.maxlongitude >= a.minlongitude
+        AND EXISTS (
+            SELECT 1 FROM segmentcells c JOIN activitycells ac ON ac.cell = c.cell AND ac.activityid = a.activityid
+            WHERE c.segmentid = s.segmentid AND c.endpoint = 0
+        )
+        AND EXISTS (
+            SELECT 1 FROM segmentcells c JOIN activitycells ac ON ac.cell = c.cell AND ac.activityid = a.activityid
+            WHERE c.segmentid = s.segmentid AND c.endpoint = 1
+        )
+    """
+
+    def get_segments_candidates(self, activity_id):
+        """Return the ids of the segments whose footprint matches the activity's one (see Footprint)."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = f"""
+                    SELECT s.segmentid
+                    FROM activityfootprints a JOIN segmentfootprints s ON {Database._FOOTPRINTS_MATCH}
+                    WHERE a.activityid=?
+                    ORDER BY s.segmentid
+                """
+                return [row[0] for row in conn.execute(query, (activity_id,))]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def get_activities_candidates(self, segment_id):
+        """Return the ids of the activities whose footprint matches the segment's one (see Footprint)."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                query = f"""
+                    SELECT a.activityid
+                    FROM segmentfootprints s JOIN activityfootprints a ON {Database._FOOTPRINTS_MATCH}
+                    WHERE s.segmentid=?
+                    ORDER BY a.activityid DESC
+                """
+                return [row[0] for row in conn.execute(query, (segment_id,))]
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return []
+
+    def insert_segment_geometry(self, segment_id, spacing, points):
+        """Insert (or replace) the resampled geometry of the segment.
+
+        Arguments:
+        segment_id -- segment's id.
+        spacing    -- spacing (meters) used to resample the geometry.
+        points     -- blob with the geometry (see SegmentGeometry).
+
+        Return:
+        True if the geometry was inserted or False otherwise.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO segmentgeometries (segmentid, spacing, points) VALUES (?, ?, ?)",
+                    (segment_id, spacing, points)
+                )
+                conn.commit()
+                return True
+            except Exception as error:
+                conn.rollback()
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return False
+
+    def get_segment_geometry(self, segment_id, spacing):
+        """Return the blob of the segment's geometry resampled with spacing or None."""
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                row = conn.execute(
+                    "SELECT points FROM segmentgeometries WHERE segmentid=? AND spacing=?", (segment_id, spacing)
+                ).fetchone()
+                return row[0] if row is not None else None
+            except Exception as error:
+                pyot_logging.get_logger(__name__).exception(
+                    f"Error: [SQL] Couldn't execute the query: {error}"
+                )
+        return None
 
     def get_autoimport_by_activity_file(self, pathfile: str):
         """Return AutoImport object from activityfile.
@@ -16,16 +16,52 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
+import threading
 
+from pyopentracks.models.activity import Activity
 from pyopentracks.models.database import Database
 from pyopentracks.models.segment import Segment
 from pyopentracks.models.segment_point import SegmentPoint
-from pyopentracks.tasks.segment_search import SegmentSearch, SegmentTrackSearch
+from pyopentracks.stats.track_activity_stats import IntervalStatsCache
+from pyopentracks.tasks.activities_indexer import index_activities
+from pyopentracks.tasks.executor import Priority, TaskExecutor
+from pyopentracks.tasks.heatmap import HeatmapIndexer, render_tiles
+from pyopentracks.tasks.hr_zones import HrZonesIndexer
+from pyopentracks.tasks.import_fingerprint import ImportFingerprintIndexer
+from pyopentracks.tasks.route_search import RouteSearch, RouteSignatureIndexer
+from pyopentracks.tasks.segment_search import FootprintIndexer, SegmentSearch
+from pyopentracks.utils.chart_series import ChartSeriesCache
+from pyopentracks.utils.fingerprint import ActivityFingerprint
+from pyopentracks.utils.heatmap import HeatmapTileCache
+from pyopentracks.utils.polyline import PolylineLodCache
+from pyopentracks.utils.segment_geometry import SegmentGeometry
+from pyopentracks.utils.sections_cache import SectionsCache
 from pyopentracks.utils.utils import DateTimeUtils
 
 
 class DatabaseHelper:
 
+    # Background processes (searches and indexers) started by the helper.
+    _processes = []
+    _processes_lock = threading.Lock()
+    # Activities inserted and still to be indexed (see index_inserted).
+    _inserted = []
+
+    @staticmethod
+    def _start(process):
+        """Start the background process and keep it to know when the helper is idle."""
+        process.start()
+        with DatabaseHelper._processes_lock:
+            DatabaseHelper._processes = [p for p in DatabaseHelper._processes if p.is_alive()]
+            DatabaseHelper._processes.append(process)
+
+    @staticmethod
+    def is_busy() -> bool:
+        """Return True while some background process started by the helper is running."""
+        with DatabaseHelper._processes_lock:
+            DatabaseHelper._processes = [p for p in DatabaseHelper._processes if p.is_alive()]
+            return len(DatabaseHelper._processes) > 0
+
     @staticmethod
     def get_activity_by_id(id):
         db = Database()
@@ -36,10 +72,26 @@ class DatabaseHelper:
         db = Database()
         return db.get_activities()
 
+    @staticmethod
+    def get_activities_fingerprints():
+        db = Database()
+        return db.get_activities_fingerprints()
+
     @staticmethod
     def get_existed_activities(activity):
         db = Database()
-        return db.get_existed_activities(activity.uuid, activity.start_time_ms, activity.stats.end_time_ms)
+        return db.get_existed_activities(*DatabaseHelper._import_key(activity))
+
+    @staticmethod
+    def get_existed_activities_batch(activities):
+        """Return a set with the positions of the activities (list) that already exist."""
+        db = Database()
+        return db.get_existed_activities_keys([DatabaseHelper._import_key(a) for a in activities])
+
+    @staticmethod
+    def _import_key(activity):
+        end_time_ms = activity.stats.end_time_ms if activity.stats else None
+        return activity.uuid, activity.start_time_ms, end_time_ms, ActivityFingerprint.from_activity(activity)
 
     @staticmethod
     def get_subactivities(id):
@@ -48,8 +100,9 @@ class DatabaseHelper:
 
     @staticmethod
     def get_sections(activity_id):
+        """Return the sections (with track points) of the activity through the SectionsCache."""
         db = Database()
-        return db.get_sections(activity_id)
+        return SectionsCache.get(activity_id, lambda: db.get_sections(activity_id))
 
     @staticmethod
     def get_sets(stats_id):
@@ -61,6 +114,11 @@ class DatabaseHelper:
         db = Database()
         return db.get_track_points(activity_id, from_trackpoint_id, to_trackpoint_id)
 
+    @staticmethod
+    def iter_track_points_rows(activity_id, chunk_size=5000):
+        db = Database()
+        return db.iter_track_points_rows(activity_id, chunk_size)
+
     @staticmethod
     def get_aggregated_stats(date_from=None, date_to=None, order_by_categories=False):
         db = Database()
@@ -72,15 +130,20 @@ class DatabaseHelper:
         return db.get_years(order)
 
     @staticmethod
-    def create_segment(name: str, distance: float, gain: int, loss: int, points: list):
+    def create_segment(
+        name: str, distance: float, gain: int, loss: int, points: list, simplify_tolerance: float = None
+    ):
         """Creates a segment.
 
         Arguments:
-        name     -- segment's name.
-        distance -- segment's distance.
-        gain     -- segment's elevation gain.
-        loss     -- segment's elevation loss.
-        points   -- segment's TrackPoint list
+        name               -- segment's name.
+        distance           -- segment's distance.
+        gain               -- segment's elevation gain.
+        loss               -- segment's elevation loss.
+        points             -- segment's TrackPoint list
+        simplify_tolerance -- (optional) tolerance (meters) to simplify the
+                              points stored (SegmentGeometry.SIMPLIFY_TOLERANCE
+                              is a good one). All of them are stored by default.
 
         Return:
         Segment's object and the list of SegmentPoint's object.
@@ -88,10 +151,13 @@ class DatabaseHelper:
         db = Database()
         segment = Segment(None, name, distance, gain, loss)
         segment.id = db.insert(segment)
+        if simplify_tolerance is not None:
+            points = SegmentGeometry.simplify(points, simplify_tolerance)
         segment_points = [ SegmentPoint(None, segment.id, tp.latitude, tp.longitude, tp.altitude) for tp in points ]
         db.bulk_insert(segment_points, segment.id)
-        segment_search = SegmentSearch(segment, segment_points)
-        segment_search.start()
+        SegmentSearch.index_segment(segment.id, segment_points, db)
+        SegmentSearch.segment_geometry(segment.id, segment_points, db)
+        DatabaseHelper._start(SegmentSearch(segment, segment_points))
 
     @staticmethod
     def insert_track_activity(activity):
@@ -99,10 +165,91 @@ class DatabaseHelper:
         db = Database()
         activity_id = db.insert_track_activity(activity)
         if activity_id is not None:
-            segment_track_search = SegmentTrackSearch(activity_id)
-            segment_track_search.start()
+            with DatabaseHelper._processes_lock:
+                DatabaseHelper._inserted.append(activity_id)
         return activity_id
 
+    @staticmethod
+    def index_inserted():
+        """Index, in the background, the activities inserted since the last call.
+
+        Importers call it once per batch of files: all the activities are
+        indexed by only one task in the TaskExecutor's pool of processes
+        (see index_activities) and, then, the heatmap's tiles they go
+        through are pre-rendered in the same pool.
+        """
+        with DatabaseHelper._processes_lock:
+            activities_ids, DatabaseHelper._inserted = DatabaseHelper._inserted, []
+        if not activities_ids:
+            return
+        TaskExecutor.instance().submit(
+            index_activities, (activities_ids,),
+            callback=DatabaseHelper.prerender_heatmap, priority=Priority.BACKGROUND, process=True
+        )
+
+    @staticmethod
+    def prerender_heatmap(tiles):
+        """Render, in the TaskExecutor's pool of processes, the heatmap's tiles (tuples (zoom, x, y))."""
+        directory = HeatmapTileCache.default_directory()
+        for i in range(0, len(tiles), HeatmapIndexer.PRERENDER_CHUNK_SIZE):
+            TaskExecutor.instance().submit(
+                render_tiles, (directory, tiles[i:i + HeatmapIndexer.PRERENDER_CHUNK_SIZE]),
+                priority=Priority.BACKGROUND, process=True
+            )
+
+    @staticmethod
+    def index_routes():
+        """Compute, in the background, the route signature of the activities that haven't it."""
+        DatabaseHelper._start(RouteSignatureIndexer())
+
+    @staticmethod
+    def index_footprints():
+        """Compute, in the background, the footprint of the activities and segments that haven't it."""
+        DatabaseHelper._start(FootprintIndexer())
+
+    @staticmethod
+    def index_heatmap():
+        """Build, in the background, the heatmap tracks of the activities that haven't it."""
+        TaskExecutor.instance().submit(
+            HeatmapIndexer.index,
+            callback=DatabaseHelper.prerender_heatmap, priority=Priority.BACKGROUND, process=True
+        )
+
+    @staticmethod
+    def index_hr_zones():
+        """Compute, in the background, the time in heart rate zones of the activities that haven't it."""
+        DatabaseHelper._start(HrZonesIndexer())
+
+    @staticmethod
+    def index_import_fingerprints():
+        """Compute, in the background, the fingerprint of the activities that haven't it."""
+        DatabaseHelper._start(ImportFingerprintIndexer())
+
+    @staticmethod
+    def recompute_hr_zones():
+        """Compute again, in the background, the time in heart rate zones of all activities."""
+        DatabaseHelper._start(HrZonesIndexer(recompute=True))
+
+    @staticmethod
+    def get_hr_zone_times(activity_id=None, date_from=None, date_to=None):
+        db = Database()
+        return db.get_hr_zone_times(activity_id, date_from, date_to)
+
+    @staticmethod
+    def get_heatmap_bounds():
+        db = Database()
+        return db.get_heatmap_bounds()
+
+    @staticmethod
+    def get_similar_routes(activity_id):
+        """Return a list of tuples (Activity, similarity) with the same route than the activity."""
+        result = []
+        for other_id, similarity in RouteSearch.similar(activity_id):
+            activity = DatabaseHelper.get_activity_by_id(other_id)
+            if activity is not None:
+                result.append((activity, similarity))
+        return result
+
     @staticmethod
     def insert_set_activity(activity, sets):
         """Inserts a set activity and all its data"""
@@ -188,27 +335,20 @@ class DatabaseHelper:
         return db.get_segment_points(segmentid)
 
     @staticmethod
-    def update_altitude(activity_id, results):
-        """Update altitude for trackpoints that belong to the activity identified by activity_id with results dictionary.
+    def update_altitude(activity_id, trackpoints_data, stats_data):
+        """Update altitudes of the trackpoints and elevation stats of the activity identified by activity_id.
 
         Arguments:
         activity_id - activity's id.
-        results - list of dictionaries with keys: "latitude", "longitude" and "elevation".
+        trackpoints_data - iterable of tuples (altitude, gain, loss, trackpoint's id); None gain or loss are kept.
+        stats_data - tuple (gain, loss, min elevation, max elevation).
         """
         db = Database()
-        db.update_altitude(activity_id, results)
-
-    @staticmethod
-    def update_stats(activity_id, gain, loss, min_elevation=None, max_elevation=None):
-        db = Database()
-        activity = db.get_activity_by_id(activity_id)
-        activity.gain_elevation_m = gain
-        activity.loss_elevation_m = loss
-        if max_elevation is not None:
-            activity.max_elevation_m = max_elevation
-        if min_elevation is not None:
-            activity.min_elevation_m = min_elevation
-        db.update(activity)
+        result = db.update_altitude(activity_id, trackpoints_data, stats_data)
+        SectionsCache.invalidate(activity_id)
+        ChartSeriesCache.invalidate(("activity", activity_id))
+        IntervalStatsCache.invalidate(("activity", activity_id))
+        return result
 
     @staticmethod
     def update_activity(activity):
@@ -220,11 +360,55 @@ class DatabaseHelper:
     def update(model):
         db = Database()
         db.update(model)
+        if isinstance(model, Activity):
+            SectionsCache.invalidate(model.id)
+            IntervalStatsCache.invalidate(("activity", model.id))
 
     @staticmethod
     def delete(model):
         db = Database()
+        heatmap_bounds = db.get_heatmap_bounds(model.id) if isinstance(model, Activity) else None
         db.delete(model)
+        if isinstance(model, Activity):
+            for activity in [model] + list(model.activities):
+                SectionsCache.invalidate(activity.id)
+            PolylineLodCache.invalidate(("activity", model.id))
+            ChartSeriesCache.invalidate(("activity", model.id))
+            IntervalStatsCache.invalidate(("activity", model.id))
+            if heatmap_bounds is not None:
+                HeatmapTileCache().invalidate(heatmap_bounds)
+        elif isinstance(model, Segment):
+            PolylineLodCache.invalidate(("segment", model.id))
+
+    @staticmethod
+    def delete_activities(activities_ids, on_progress=None, vacuum=False):
+        """Delete activities (and their sub-activities) in only one transaction.
+
+        Arguments:
+        activities_ids -- list of activities' ids.
+        on_progress    -- (optional) function called with (deleted, total).
+        vacuum         -- if True, an incremental vacuum is run afterwards.
+
+        Return:
+        The number of deleted activities (sub-activities included) or None
+        if any error.
+        """
+        db = Database()
+        heatmap_bounds = db.get_heatmap_tracks_bounds(activities_ids)
+        deleted_ids = db.delete_activities(activities_ids, on_progress)
+        if deleted_ids is None:
+            return None
+        for activity_id in deleted_ids:
+            SectionsCache.invalidate(activity_id)
+            PolylineLodCache.invalidate(("activity", activity_id))
+            ChartSeriesCache.invalidate(("activity", activity_id))
+            IntervalStatsCache.invalidate(("activity", activity_id))
+        tile_cache = HeatmapTileCache()
+        for bounds in heatmap_bounds:
+            tile_cache.invalidate(bounds)
+        if vacuum:
+            db.incremental_vacuum()
+        return len(deleted_ids)
 
     @staticmethod
     def get_activities_in_day(y: int, m: int, d: int):
@@ -25,22 +25,25 @@ class Migration:
     1.- Add one to DB_VERSION.
     2.- Creates a new method with the query to be executed and call
         self._db.execute with that query.
-    3.- Add a new if in the migrate method that call the method
-        created in the step 2.
+    3.- Name that method _migrate_<DB_VERSION>: migrate calls, in order,
+        all methods from the database's version to DB_VERSION.
     """
-    DB_VERSION = 1
+    DB_VERSION = 8
 
     def __init__(self, db, db_version):
         self._db = db
         self._db_version = db_version
 
     def migrate(self):
-        if Migration.DB_VERSION != self._db_version:
-            if Migration.DB_VERSION == 1:
-                self._migrate_1()
+        for version in range((self._db_version or 0) + 1, Migration.DB_VERSION + 1):
+            getattr(self, f"_migrate_{version}")()
         return Migration.DB_VERSION
 
     def _migrate_1(self):
+        # auto_vacuum can only be changed without a full VACUUM before the
+        # first table is created.
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
         query = """
             CREATE TABLE stats (
                 _id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -212,3 +215,164 @@ class Migration:
         self._db.execute(query)
         query = "CREATE UNIQUE INDEX autoimport_activityfile_index ON autoimport (activityfile)"
         self._db.execute(query)
+
+    def _migrate_2(self):
+        # Route signatures: the geohash cells visited by every activity
+        # (see RouteSignature) stored as an inverted index cell -> activity.
+        query = """
+            CREATE TABLE routesignatures (
+                activityid INTEGER PRIMARY KEY,
+                numcells INTEGER NOT NULL,
+                FOREIGN KEY (activityid) REFERENCES activities (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """
+        self._db.execute(query)
+
+        query = """
+            CREATE TABLE routecells (
+                cell INTEGER NOT NULL,
+                activityid INTEGER NOT NULL,
+                PRIMARY KEY (cell, activityid),
+                FOREIGN KEY (activityid) REFERENCES routesignatures (activityid) ON UPDATE CASCADE ON DELETE CASCADE
+            ) WITHOUT ROWID;
+        """
+        self._db.execute(query)
+        query = "CREATE INDEX routecells_activityid_index ON routecells (activityid)"
+        self._db.execute(query)
+
+    def _migrate_3(self):
+        # Heatmap tracks: simplified geometry of every activity (see
+        # HeatmapTrack) and its bounds to look for the tracks of a tile.
+        query = """
+            CREATE TABLE heatmaptracks (
+                activityid INTEGER PRIMARY KEY,
+                minlatitude FLOAT NOT NULL,
+                minlongitude FLOAT NOT NULL,
+                maxlatitude FLOAT NOT NULL,
+                maxlongitude FLOAT NOT NULL,
+                points BLOB NOT NULL,
+                FOREIGN KEY (activityid) REFERENCES activities (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """
+        self._db.execute(query)
+        query = """
+            CREATE INDEX heatmaptracks_bounds_index
+            ON heatmaptracks (minlatitude, maxlatitude, minlongitude, maxlongitude)
+        """
+        self._db.execute(query)
+
+    def _migrate_4(self):
+        # Time (ms) in every heart rate zone of every activity, computed
+        # with the zones of the preferences. Zone -1 is the time out of
+        # the zones (without heart rate or under the first zone).
+        query = """
+            CREATE TABLE hrzonetimes (
+                activityid INTEGER NOT NULL,
+                zone INTEGER NOT NULL,
+                timems INTEGER NOT NULL,
+                PRIMARY KEY (activityid, zone),
+                FOREIGN KEY (activityid) REFERENCES activities (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            ) WITHOUT ROWID;
+        """
+        self._db.execute(query)
+
+    def _migrate_5(self):
+        # Checkpoint of the stats recomputation job (see StatsRecompute):
+        # activities whose stats are still to be recomputed.
+        query = """
+            CREATE TABLE statsrecompute (
+                activityid INTEGER PRIMARY KEY,
+                FOREIGN KEY (activityid) REFERENCES activities (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """
+        self._db.execute(query)
+
+    def _migrate_6(self):
+        # Indexes used to look for duplicated activities when importing
+        # (the uuid's index of the first migration was never created).
+        query = "CREATE INDEX IF NOT EXISTS activities_uuid_index ON activities (uuid)"
+        self._db.execute(query)
+        query = "CREATE INDEX activities_starttime_index ON activities (starttime)"
+        self._db.execute(query)
+
+        # Fingerprint of every activity with track points (see
+        # ActivityFingerprint) to detect the same activity with another uuid.
+        query = """
+            CREATE TABLE importfingerprints (
+                activityid INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                FOREIGN KEY (activityid) REFERENCES activities (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """
+        self._db.execute(query)
+        query = "CREATE INDEX importfingerprints_fingerprint_index ON importfingerprints (fingerprint)"
+        self._db.execute(query)
+
+    def _migrate_7(self):
+        # Footprints (see Footprint) used to discard activities and segments
+        # far away from each other before looking for segments' tracks.
+        query = """
+            CREATE TABLE activityfootprints (
+                activityid INTEGER PRIMARY KEY,
+                minlatitude FLOAT NOT NULL,
+                minlongitude FLOAT NOT NULL,
+                maxlatitude FLOAT NOT NULL,
+                maxlongitude FLOAT NOT NULL,
+                FOREIGN KEY (activityid) REFERENCES activities (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """
+        self._db.execute(query)
+        query = """
+            CREATE INDEX activityfootprints_bounds_index
+            ON activityfootprints (minlatitude, maxlatitude, minlongitude, maxlongitude)
+        """
+        self._db.execute(query)
+
+        query = """
+            CREATE TABLE activitycells (
+                cell INTEGER NOT NULL,
+                activityid INTEGER NOT NULL,
+                PRIMARY KEY (cell, activityid),
+                FOREIGN KEY (activityid) REFERENCES activityfootprints (activityid) ON UPDATE CASCADE ON DELETE CASCADE
+            ) WITHOUT ROWID;
+        """
+        self._db.execute(query)
+        query = "CREATE INDEX activitycells_activityid_index ON activitycells (activityid)"
+        self._db.execute(query)
+
+        query = """
+            CREATE TABLE segmentfootprints (
+                segmentid INTEGER PRIMARY KEY,
+                minlatitude FLOAT NOT NULL,
+                minlongitude FLOAT NOT NULL,
+                maxlatitude FLOAT NOT NULL,
+                maxlongitude FLOAT NOT NULL,
+                FOREIGN KEY (segmentid) REFERENCES segments (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """
+        self._db.execute(query)
+
+        # Endpoint is 0 for the cells of the segment's start and 1 for the end ones.
+        query = """
+            CREATE TABLE segmentcells (
+                segmentid INTEGER NOT NULL,
+                endpoint INTEGER NOT NULL,
+                cell INTEGER NOT NULL,
+                PRIMARY KEY (segmentid, endpoint, cell),
+                FOREIGN KEY (segmentid) REFERENCES segmentfootprints (segmentid) ON UPDATE CASCADE ON DELETE CASCADE
+            ) WITHOUT ROWID;
+        """
+        self._db.execute(query)
+
+    def _migrate_8(self):
+        # Resampled geometry of every segment (see SegmentGeometry) compared
+        # with Fréchet. Spacing is the SegmentGeometry.SPACING it was built with.
+        query = """
+            CREATE TABLE segmentgeometries (
+                segmentid INTEGER PRIMARY KEY,
+                spacing FLOAT NOT NULL,
+                points BLOB NOT NULL,
+                FOREIGN KEY (segmentid) REFERENCES segments (_id) ON UPDATE CASCADE ON DELETE CASCADE
+            );
+        """
+        self._db.execute(query)
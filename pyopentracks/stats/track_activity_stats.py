@@ -16,14 +16,19 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
-from abc import abstractmethod
+import threading
+
+from collections import OrderedDict
 from dateutil.parser import ParserError
 from typing import List
 
+import numpy as np
+
 from pyopentracks.models.section import Section
 from pyopentracks.models.track_point import TrackPoint
 
 from pyopentracks.utils import logging as pyot_logging
+from pyopentracks.utils.frechet import haversine
 from pyopentracks.utils.utils import (
     LocationUtils, TimeUtils, SensorUtils, ElevationUtils,
     DistanceUtils, SpeedUtils, TypeActivityUtils
@@ -305,23 +310,32 @@ class TrackActivityStats:
 
 
 class Interval:
+    """Stats of an interval (split) of an activity.
+
+    distance_m is the distance from the start of the activity to the
+    end of the interval.
+    """
 
-    def __init__(self, category: str):
+    def __init__(self, category: str, distance_m, time_ms, avg_speed, max_speed, max_altitude=None,
+                 min_altitude=None, gain_elevation=None, loss_elevation=None, avg_hr=None, max_hr=None,
+                 avg_cadence=None, max_cadence=None):
         self._category = category
 
-        self.distance_m = 0
-        self.time_ms = 0
+        self.distance_m = distance_m
+        self.time_ms = time_ms
 
-        self.avg_speed = 0
-        self.max_speed = MaxSpeedNormalization.from_category(category)
+        self.avg_speed = avg_speed
+        self.max_speed = max_speed
 
-        self.max_altitude = None
-        self.min_altitude = None
-        self.gain_elevation = None
-        self.loss_elevation = None
+        self.max_altitude = max_altitude
+        self.min_altitude = min_altitude
+        self.gain_elevation = gain_elevation
+        self.loss_elevation = loss_elevation
 
-        self.hr = SensorNormalization()
-        self.cadence = SensorNormalization()
+        self.avg_hr = avg_hr
+        self.max_hr = max_hr
+        self.avg_cadence = avg_cadence
+        self.max_cadence = max_cadence
 
     @property
     def distance_str(self):
@@ -337,7 +351,7 @@ class Interval:
 
     @property
     def max_speed_str(self):
-        return SpeedUtils.mps_to_category_rate(self.max_speed.value_mps, self._category)
+        return SpeedUtils.mps_to_category_rate(self.max_speed, self._category)
 
     @property
     def max_altitude_str(self):
@@ -357,22 +371,67 @@ class Interval:
 
     @property
     def avg_hr_str(self):
-        return SensorUtils.hr_to_str(self.hr.avg)
+        return SensorUtils.hr_to_str(self.avg_hr)
 
     @property
     def max_hr_str(self):
-        return SensorUtils.hr_to_str(self.hr.max)
+        return SensorUtils.hr_to_str(self.max_hr)
 
     @property
     def avg_cadence_str(self):
-        return SensorUtils.hr_to_str(self.cadence.avg)
+        return SensorUtils.hr_to_str(self.avg_cadence)
 
     @property
     def max_cadence_str(self):
-        return SensorUtils.hr_to_str(self.cadence.max)
+        return SensorUtils.hr_to_str(self.max_cadence)
+
+
+class IntervalSeries:
+    """NumPy arrays, one value per track point, to compute intervals.
+
+    distance is accumulated in meters. Missing heart rate and cadence
+    values are NaN.
+    """
+
+    def __init__(self, track_points):
+        n = len(track_points)
+
+        def column(getter):
+            return np.fromiter(
+                (v if v is not None else np.nan for v in map(getter, track_points)), dtype=np.float64, count=n
+            )
+
+        latitude = column(lambda tp: tp.latitude)
+        longitude = column(lambda tp: tp.longitude)
+        self.distance = np.zeros(n, dtype=np.float64)
+        if n > 1:
+            meters = haversine(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+            self.distance[1:] = np.cumsum(np.nan_to_num(meters))
+        self.time_ms = column(lambda tp: tp.time_ms)
+        self.altitude = column(lambda tp: tp.altitude)
+        self.gain = column(lambda tp: tp.elevation_gain)
+        self.loss = column(lambda tp: tp.elevation_loss)
+        self.hr = column(lambda tp: tp.heart_rate)
+        self.cadence = column(lambda tp: tp.cadence)
+
+    def __len__(self):
+        return len(self.distance)
 
 
 class IntervalStats:
+    """Split an activity in intervals of the same distance.
+
+    Split boundaries are interpolated on the cumulative distance (so
+    the time of every interval is the time between its boundaries) and
+    every track point belongs to the interval where it ends. Sums and
+    time-weighted averages of every interval are computed with
+    np.add.reduceat over the points of the intervals.
+    """
+
+    # A last interval shorter than this is discarded.
+    MIN_LAST_INTERVAL_M = 10
+    # Max pace of not speed activities is computed over this distance.
+    MAX_PACE_DISTANCE_M = 50
 
     def __init__(self, category: str, distance_interval: float):
         """Create the interval stats class using an interval of distance_interval meters."""
@@ -385,47 +444,187 @@ class IntervalStats:
         return self._intervals
 
     def compute(self, track_points):
-        interval = Interval(self._category)
-        last_tp = track_points[0]
-        for tp in track_points:
-            interval.distance_m += LocationUtils.distance_between(
-                last_tp.latitude, last_tp.longitude, tp.latitude, tp.longitude
-            )
-            interval.time_ms += (tp.time_ms - last_tp.time_ms)
-            interval.hr.add(tp.heart_rate, tp.time_ms)
-            interval.cadence.add(tp.cadence, tp.time_ms)
-            interval.max_speed.add(interval.distance_m, interval.time_ms)
-            interval.gain_elevation = interval.gain_elevation + tp.elevation_gain if \
-                interval.gain_elevation is not None else tp.elevation_gain
-            interval.loss_elevation = interval.loss_elevation + tp.elevation_loss if \
-                interval.loss_elevation is not None else tp.elevation_loss
-            last_tp = tp
+        """Compute the intervals of track points (list of TrackPoint or an IntervalSeries)."""
+        series = track_points if isinstance(track_points, IntervalSeries) else IntervalSeries(track_points)
+        self._intervals = []
+        if len(series) < 2:
+            return self._intervals
+
+        distance, time_ms = series.distance, series.time_ms
+        total_m = distance[-1]
+        ends = self._distance_interval_m * np.arange(1, int(total_m // self._distance_interval_m) + 1)
+        if total_m - (ends[-1] if len(ends) else 0) > IntervalStats.MIN_LAST_INTERVAL_M:
+            ends = np.append(ends, total_m)
+        if len(ends) == 0:
+            return self._intervals
+        starts = np.concatenate(([0.0], ends[:-1]))
+        times_ms = np.interp(ends, distance, time_ms) - np.interp(starts, distance, time_ms)
+
+        # Points in (start, end] belong to the interval, the first one to the first interval.
+        first = np.searchsorted(distance, starts, side="right")
+        first[0] = 0
+        stop = int(np.searchsorted(distance, ends[-1], side="right"))
+
+        elapsed_ms = np.diff(time_ms, prepend=time_ms[0])
+        elapsed_m = np.diff(distance, prepend=0.0)
+
+        max_altitude = self._reduce(np.fmax, series.altitude, first, stop)
+        min_altitude = self._reduce(np.fmin, series.altitude, first, stop)
+        gain = self._reduce(np.add, np.nan_to_num(series.gain), first, stop, 0)
+        loss = self._reduce(np.add, np.nan_to_num(series.loss), first, stop, 0)
+        avg_hr, max_hr = self._sensor(series.hr, elapsed_ms, first, stop)
+        avg_cadence, max_cadence = self._sensor(series.cadence, elapsed_ms, first, stop)
+        max_speed = self._max_speed(distance, elapsed_m, elapsed_ms, starts, first, stop)
+
+        for i in range(len(ends)):
+            self._intervals.append(Interval(
+                self._category,
+                float(ends[i]),
+                float(times_ms[i]),
+                float((ends[i] - starts[i]) / (times_ms[i] / 1000)) if times_ms[i] > 0 else 0,
+                float(max_speed[i]),
+                self._value_or_none(max_altitude[i]),
+                self._value_or_none(min_altitude[i]),
+                float(gain[i]),
+                float(loss[i]),
+                avg_hr[i], max_hr[i], avg_cadence[i], max_cadence[i]
+            ))
+        return self._intervals
+
+    @staticmethod
+    def _reduce(ufunc, values, first, stop, empty=np.nan):
+        """Reduce values[first[i]:first[i + 1]] (the last one up to stop) with ufunc.
+
+        Intervals without points (a long segment between two points can
+        go through several intervals) get the empty value.
+        """
+        counts = np.diff(np.append(first, stop))
+        result = np.full(len(first), empty, dtype=np.float64)
+        not_empty = counts > 0
+        if np.any(not_empty):
+            result[not_empty] = ufunc.reduceat(values[:stop], first[not_empty])
+        return result
+
+    def _sensor(self, values, elapsed_ms, first, stop):
+        """Time-weighted average and max of a sensor per interval.
+
+        Every value is weighted by the time elapsed since the previous
+        point, as long as both of them have a value.
+        """
+        valid = ~np.isnan(values)
+        weights = np.where(valid & np.roll(valid, 1), elapsed_ms, 0.0)
+        weights[0] = 0
+        weighted = self._reduce(np.add, np.where(valid, values, 0.0) * weights, first, stop, 0)
+        total_weights = self._reduce(np.add, weights, first, stop, 0)
+        maximums = self._reduce(np.fmax, values, first, stop)
+        avgs = [
+            round(w / t) if t > 0 else None for w, t in zip(weighted.tolist(), total_weights.tolist())
+        ]
+        maxs = [round(m) if not np.isnan(m) and m else None for m in maximums.tolist()]
+        return avgs, maxs
+
+    def _max_speed(self, distance, elapsed_m, elapsed_ms, starts, first, stop):
+        """Max speed of every interval.
+
+        For speed activities it's the max speed between two consecutive
+        points. For the rest, to avoid GPS noise, it's the max average
+        speed over MAX_PACE_DISTANCE_M windows.
+        """
+        split = np.repeat(np.arange(len(first)), np.diff(np.append(first, stop)))
+        elapsed_m = elapsed_m[:stop]
+        elapsed_ms = elapsed_ms[:stop]
+        if not TypeActivityUtils.is_speed(self._category):
+            # Points in the same interval and window are grouped.
+            window = np.floor(
+                (distance[:stop] - starts[split]) / IntervalStats.MAX_PACE_DISTANCE_M
+            ).astype(np.int64)
+            key = split * (int(window.max(initial=0)) + 1) + window
+            group_first = np.flatnonzero(np.diff(key, prepend=-1))
+            elapsed_m = np.add.reduceat(elapsed_m, group_first)
+            elapsed_ms = np.add.reduceat(elapsed_ms, group_first)
+            split = split[group_first]
+            complete = elapsed_m >= IntervalStats.MAX_PACE_DISTANCE_M
+            elapsed_m = np.where(complete, elapsed_m, 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speeds = np.where(elapsed_ms > 0, elapsed_m / (elapsed_ms / 1000), 0)
+        max_speed = np.zeros(len(first), dtype=np.float64)
+        np.maximum.at(max_speed, split, speeds)
+        return max_speed
+
+    @staticmethod
+    def _value_or_none(value):
+        return None if np.isnan(value) else float(value)
 
-            if interval.distance_m >= self._distance_interval_m:
-                adjust_factor = self._distance_interval_m / interval.distance_m
-                accum_distance_m = interval.distance_m - self._distance_interval_m
-                accum_time_ms = interval.time_ms - (interval.time_ms * adjust_factor)
 
-                interval.distance_m *= adjust_factor
-                interval.time_ms *= adjust_factor
+class IntervalStatsCache:
+    """Process-wide cache of intervals keyed by (("activity", id), category, interval in meters).
 
-                interval.avg_speed = interval.distance_m / (interval.time_ms / 1000)
+    The IntervalSeries of the activity is cached too, so computing the
+    intervals for another distance doesn't read the track points again.
+    """
 
-                interval.distance_m = (len(self._intervals) + 1) * interval.distance_m
+    MAX_ENTRIES = 16
 
-                self._intervals.append(interval)
+    _series = OrderedDict()
+    _intervals = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(key, category: str, distance_interval: float, track_points) -> List[Interval]:
+        """Return the intervals of the activity, computing them if needed.
+
+        Arguments:
+        key               -- cache's key or None to compute them without caching.
+        category          -- activity's category.
+        distance_interval -- interval's distance in meters.
+        track_points      -- list of TrackPoint.
+        """
+        if key is None:
+            interval_stats = IntervalStats(category, distance_interval)
+            return interval_stats.compute(track_points)
+
+        with IntervalStatsCache._lock:
+            intervals = IntervalStatsCache._intervals.get((key, category, distance_interval))
+            series = IntervalStatsCache._series.get(key)
+            if series is not None and len(series) != len(track_points):
+                series = intervals = None
+            if intervals is not None:
+                IntervalStatsCache._intervals.move_to_end((key, category, distance_interval))
+                return intervals
+
+        if series is None:
+            series = IntervalSeries(track_points)
+        interval_stats = IntervalStats(category, distance_interval)
+        intervals = interval_stats.compute(series)
+        with IntervalStatsCache._lock:
+            IntervalStatsCache._put(IntervalStatsCache._series, key, series)
+            IntervalStatsCache._put(IntervalStatsCache._intervals, (key, category, distance_interval), intervals)
+        return intervals
 
-                interval = Interval(self._category)
-                interval.distance_m = accum_distance_m
-                interval.time_ms = accum_time_ms
+    @staticmethod
+    def _put(cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > IntervalStatsCache.MAX_ENTRIES:
+            cache.popitem(last=False)
 
-        if interval.distance_m > 10:
-            interval.avg_speed = interval.distance_m / (interval.time_ms / 1000)
-            interval.distance_m = len(self._intervals) * self._distance_interval_m + interval.distance_m
-            self._intervals.append(interval)
+    @staticmethod
+    def invalidate(key) -> None:
+        with IntervalStatsCache._lock:
+            IntervalStatsCache._series.pop(key, None)
+            for cache_key in [k for k in IntervalStatsCache._intervals if k[0] == key]:
+                IntervalStatsCache._intervals.pop(cache_key)
 
 
 class HrZonesStats:
+    """Time in heart rate zones.
+
+    The time between two consecutive track points belongs to the zone
+    of the first one. Zones are looked up with np.searchsorted, so the
+    time in zones of many activities can be computed in one pass over
+    their track points (see zone_times).
+    """
 
     def __init__(self, zones: List[int]):
         """Class to compute stats on heart rate zones.
@@ -439,20 +638,94 @@ class HrZonesStats:
         for i, zone in enumerate(self._zones):
             self._stats[i] = 0
 
+    @staticmethod
+    def bpm_zones(hr_max: int, percentages: List[int]) -> List[int]:
+        """Return the lower limits, in bpm, of the zones from the preferences.
+
+        Arguments:
+        hr_max      -- max heart rate (AppPreferences.HEART_RATE_MAX).
+        percentages -- zones' percentages (AppPreferences.HEART_RATE_ZONES);
+                       the last one is the top of the last zone.
+        """
+        return [SensorUtils.round_to_int(percentage / 100 * hr_max) for percentage in percentages[0:-1]]
+
+    @staticmethod
+    def zone_times(zones: List[int], time_ms, hr, starts, groups=None, num_groups: int = 1):
+        """Compute the time in every zone of groups of track points.
+
+        Arguments:
+        zones      -- list of integers with heart rate zones.
+        time_ms    -- numpy array with the time of every track point.
+        hr         -- numpy array with the heart rate of every track
+                      point (NaN if there is not).
+        starts     -- numpy array of booleans, True on the first track
+                      point of every section.
+        groups     -- (optional) numpy array with the group (for example,
+                      the activity's index) of every track point. All
+                      points are in group 0 by default.
+        num_groups -- number of groups.
+
+        Return:
+        A tuple (zones' times, total times) of numpy arrays: zones' times
+        with shape (num_groups, len(zones)) and total times with shape
+        (num_groups,). Times are in milliseconds.
+        """
+        num_zones = len(zones)
+        if groups is None:
+            groups = np.zeros(len(time_ms), dtype=np.int64)
+        elapsed_ms = np.diff(time_ms, prepend=time_ms[:1]).astype(np.float64)
+        elapsed_ms[np.asarray(starts, dtype=bool)] = 0
+
+        hr = np.nan_to_num(np.asarray(hr, dtype=np.float64), nan=0)
+        zone = np.searchsorted(np.asarray(zones, dtype=np.float64), hr, side="right") - 1
+        zone[hr <= 0] = -1
+        previous_zone = np.roll(zone, 1)
+        if len(previous_zone):
+            previous_zone[0] = -1
+
+        in_zone = previous_zone >= 0
+        zones_times = np.bincount(
+            groups[in_zone] * num_zones + previous_zone[in_zone],
+            weights=elapsed_ms[in_zone],
+            minlength=num_groups * num_zones
+        ).reshape(num_groups, num_zones)
+        total_times = np.bincount(groups, weights=elapsed_ms, minlength=num_groups)
+        return zones_times, total_times
+
     def compute(self, sections: List[Section]):
         if sections is None or len(sections) == 0:
             return
 
-        last_zone = -1
-        for section in sections:
-            last_tp = section.track_points[0]
-            for tp in section.track_points:
-                if last_zone > -1:
-                    self._stats[last_zone] += (tp.time_ms - last_tp.time_ms)
-                self._total_time += (tp.time_ms - last_tp.time_ms)
-                last_tp = tp
-                last_zone = self._get_zone_idx(last_tp.heart_rate)
+        track_points = [tp for section in sections for tp in section.track_points]
+        n = len(track_points)
+        time_ms = np.fromiter((tp.time_ms for tp in track_points), dtype=np.float64, count=n)
+        hr = np.fromiter(
+            (tp.heart_rate if tp.heart_rate is not None else np.nan for tp in track_points),
+            dtype=np.float64, count=n
+        )
+        offsets = np.cumsum([0] + [len(section.track_points) for section in sections[:-1]])
+        starts = np.zeros(n, dtype=bool)
+        starts[offsets[offsets < n]] = True
+
+        zones_times, total_times = HrZonesStats.zone_times(self._zones, time_ms, hr, starts)
+        for i, value in enumerate(zones_times[0].tolist()):
+            self._stats[i] = value
+        self._total_time = float(total_times[0])
+        return self._stats
+
+    def load(self, zone_times: dict):
+        """Set the stats from the stored time in zones (see Database.get_hr_zone_times).
 
+        Arguments:
+        zone_times -- dictionary zone -> time in milliseconds. Zone -1 is
+                      the time out of the zones.
+
+        Return:
+        The same dictionary than compute.
+        """
+        for i in self._stats:
+            self._stats[i] = zone_times.get(i, 0)
+        self._total_time = float(sum(zone_times.values()))
         return self._stats
 
     @property
@@ -462,74 +735,7 @@ class HrZonesStats:
     def _get_zone_idx(self, hr):
         if not hr:
             return -1
-        idx = -1
-        for value in self._zones:
-            if hr < value:
-                return idx
-            idx += 1
-        return idx
-
-class MaxSpeedNormalization:
-
-    def __init__(self):
-        self.value_mps = 0
-
-    @abstractmethod
-    def add(self, distance_m, time_ms):
-        pass
-
-    @staticmethod
-    def from_category(category: str):
-        if TypeActivityUtils.is_speed(category):
-            return MaxSpeedNormalizationNoFilter()
-        else:
-            return MaxSpeedNormalizationWithMinDistance()
-
-
-class MaxSpeedNormalizationNoFilter(MaxSpeedNormalization):
-
-    def __init__(self):
-        super().__init__()
-        self._last_distance_m = 0
-        self._last_time_ms = 0
-
-    def add(self, distance_m, time_ms):
-        d = distance_m - self._last_distance_m
-        t = time_ms - self._last_time_ms
-        if t > 0:
-            speed_mps = d / (t / 1000)
-
-            self._last_distance_m = distance_m
-            self._last_time_ms = time_ms
-
-            if speed_mps > self.value_mps:
-                self.value_mps = speed_mps
-
-
-class MaxSpeedNormalizationWithMinDistance(MaxSpeedNormalization):
-
-    MIN_DISTANCE_M = 50
-
-    def __init__(self):
-        super().__init__()
-        self._last_distance_m = 0
-        self._last_time_ms = 0
-        self._accum_distance_m = 0
-        self._accum_time_ms = 0
-
-    def add(self, distance_m, time_ms):
-        self._accum_distance_m += (distance_m - self._last_distance_m)
-        self._accum_time_ms += (time_ms - self._last_time_ms)
-
-        self._last_distance_m = distance_m
-        self._last_time_ms = time_ms
-
-        if self._accum_distance_m >= MaxSpeedNormalizationWithMinDistance.MIN_DISTANCE_M:
-            avg_speed_mps = self._accum_distance_m / (self._accum_time_ms / 1000)
-            if avg_speed_mps > self.value_mps:
-                self.value_mps = avg_speed_mps
-            self._accum_distance_m = 0
-            self._accum_time_ms = 0
+        return int(np.searchsorted(self._zones, hr, side="right")) - 1
 
 
 class SensorNormalization:
@@ -602,4 +808,3 @@ class SensorNormalization:
             return new_value
         else:
             return self._max
-
@@ -0,0 +1,43 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from pyopentracks.tasks.heatmap import HeatmapIndexer
+from pyopentracks.tasks.hr_zones import HrZonesIndexer
+from pyopentracks.tasks.route_search import RouteSignatureIndexer
+from pyopentracks.tasks.segment_search import SegmentTrackSearch
+
+
+def index_activities(activities_ids) -> list:
+    """Index new activities (for process pools).
+
+    It looks for the segments in the activities and computes and stores
+    their route signatures, time in heart rate zones and heatmap tracks,
+    one after the other in the same process.
+
+    Arguments:
+    activities_ids -- list of activities' ids.
+
+    Return:
+    The list of heatmap tiles, tuples (zoom, x, y), to pre-render (see
+    HeatmapIndexer.index).
+    """
+    SegmentTrackSearch(activities_ids).run()
+    RouteSignatureIndexer(activities_ids).run()
+    HrZonesIndexer(activities_ids=activities_ids).run()
+    return HeatmapIndexer.index(activities_ids)
@@ -17,103 +17,124 @@ You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
 
-import urllib.request
-import json
-import math
 import collections
+import math
+
+import numpy as np
 
+from pyopentracks.io.elevation.provider import ElevationProvider, OpenElevationProvider
+from pyopentracks.models.location import Location
 from pyopentracks.utils import logging as pyot_logging
 from pyopentracks.models.database_helper import DatabaseHelper
-from pyopentracks.utils.utils import LocationUtils
 
 
 class AltitudeCorrection:
     """
-    It uses Open Elevation API to correct track points altitudes and compute
-    gain, loss, min and max altitudes.
+    It uses an ElevationProvider (Open Elevation API by default or local
+    DEM tiles) to correct track points altitudes and compute gain, loss,
+    min and max altitudes.
 
-    It also updates data in the database (activities and trackpoints).
+    It also updates data in the database (trackpoints and stats) in only
+    one transaction.
     """
 
-    BULK_NUM = 500
-    API_BASE_URL = "https://api.open-elevation.com/api/v1/lookup"
     GAIN_LOSS_THRESHOLD = 5
     DISTANCE_THRESHOLD = 50
     CIRCULAR_BUFFER_LEN = 20
 
-    def __init__(self, activity_id):
+    def __init__(self, activity_id, provider: ElevationProvider = None):
         super().__init__()
         self._activity_id = activity_id
-        self._max = None
-        self._min = None
-        self._gain = 0
-        self._loss = 0
-        self._trackpoints = DatabaseHelper.get_track_points(self._activity_id)
-        self._buffer = collections.deque(maxlen=AltitudeCorrection.CIRCULAR_BUFFER_LEN)
-        self._altitudes = []
+        self._provider = provider if provider is not None else OpenElevationProvider.instance()
+        trackpoints = DatabaseHelper.get_track_points(self._activity_id)
+        n = len(trackpoints)
+        self._ids = [tp.id for tp in trackpoints]
+        self._latitudes = np.fromiter((tp.latitude for tp in trackpoints), dtype=np.float64, count=n)
+        self._longitudes = np.fromiter((tp.longitude for tp in trackpoints), dtype=np.float64, count=n)
+        self._altitudes = np.fromiter((tp.altitude for tp in trackpoints), dtype=np.float64, count=n)
 
     def run(self):
-        if not self._trackpoints:
+        if not self._ids:
             return None
-        self._init_buffer()
         try:
-            self._update_track_points()
+            elevations = self._provider.elevations(self._latitudes, self._longitudes)
         except Exception as e:
             pyot_logging.get_logger(__name__).exception(str(e))
             return None
-        self._compute_gain_and_loss()
-        self._update_track_stats()
+        altitudes = np.where(np.isnan(elevations), self._altitudes, elevations)
+        gains, losses = AltitudeCorrection.compute_gain_and_loss(self._latitudes, self._longitudes, altitudes)
+        DatabaseHelper.update_altitude(
+            self._activity_id,
+            zip(
+                altitudes.tolist(),
+                AltitudeCorrection._nan_to_none(gains),
+                AltitudeCorrection._nan_to_none(losses),
+                self._ids
+            ),
+            (float(np.nansum(gains)), float(np.nansum(losses)), float(altitudes.min()), float(altitudes.max()))
+        )
         return DatabaseHelper.get_activity_by_id(self._activity_id)
 
-    def _init_buffer(self):
-        n = 20 if len(self._trackpoints) >= 20 else len(self._trackpoints)
+    @staticmethod
+    def compute_gain_and_loss(latitudes, longitudes, altitudes):
+        """Compute the gain and loss of every track point.
+
+        Only altitudes from track points separated DISTANCE_THRESHOLD meters
+        from the last valid one, and GAIN_LOSS_THRESHOLD meters over or under
+        the mean of the last CIRCULAR_BUFFER_LEN valid altitudes, are taken
+        into account. As it always did, the mean is divided by
+        CIRCULAR_BUFFER_LEN (even when the buffer has fewer altitudes) and
+        rounded to two decimals.
+
+        The filter depends on the last valid track point so it can't be
+        fully vectorized: haversine terms are precomputed for all the points
+        and distances are compared through the haversine's "a" value, so the
+        loop only does a few float operations per point.
+
+        Return:
+        A tuple of two numpy arrays: gains and losses of every track point.
+        They are NaN for the track points whose gain (or loss) isn't
+        computed, that keep the values they have.
+        """
+        n = len(altitudes)
+        gains = np.full(n, np.nan, dtype=np.float64)
+        losses = np.full(n, np.nan, dtype=np.float64)
+        if n == 0:
+            return gains, losses
+
+        lat = np.radians(latitudes)
+        half_lat = (lat / 2).tolist()
+        half_lon = (np.radians(longitudes) / 2).tolist()
+        cos_lat = np.cos(lat).tolist()
+        alts = altitudes.tolist()
+        # distance >= DISTANCE_THRESHOLD <=> a >= sin(DISTANCE_THRESHOLD / 2R)^2
+        a_threshold = math.sin(AltitudeCorrection.DISTANCE_THRESHOLD / (2 * Location.EARTH_RADIUS)) ** 2
+        threshold = AltitudeCorrection.GAIN_LOSS_THRESHOLD
+        buffer_len = AltitudeCorrection.CIRCULAR_BUFFER_LEN
+        sin = math.sin
+
+        buffer = collections.deque(alts[:buffer_len], maxlen=buffer_len)
+        last_valid_altitude = round(sum(buffer) / buffer_len, 2)
+        last = 0
         for i in range(n):
-            self._buffer.append(self._trackpoints[i].altitude)
-
-    def _update_track_points(self):
-        for i in range(math.ceil(len(self._trackpoints) / AltitudeCorrection.BULK_NUM)):
-            locations = []
-            for tp in self._trackpoints[
-                      i * AltitudeCorrection.BULK_NUM:i * AltitudeCorrection.BULK_NUM + AltitudeCorrection.BULK_NUM]:
-                locations.append({"latitude": tp.latitude, "longitude": tp.longitude})
-            json_data = json.dumps({"locations": locations}, skipkeys=int).encode("utf-8")
-            request = urllib.request.Request(
-                AltitudeCorrection.API_BASE_URL, json_data, method="POST", headers={"Content-Type": "application/json"}
+            a = (
+                sin(half_lat[i] - half_lat[last]) ** 2 +
+                cos_lat[last] * cos_lat[i] * sin(half_lon[i] - half_lon[last]) ** 2
             )
-            response = urllib.request.urlopen(request)
-            res_byte = response.read()
-            res_str = res_byte.decode("utf8")
-            js_str = json.loads(res_str)
-            response.close()
-
-            DatabaseHelper.update_altitude(self._activity_id, js_str["results"])
-        self._trackpoints = DatabaseHelper.get_track_points(self._activity_id)
-
-    def _compute_gain_and_loss(self):
-        last_valid_tp = self._trackpoints[0]
-        last_valid_altitude = round(sum(self._buffer) / AltitudeCorrection.CIRCULAR_BUFFER_LEN, 2)
-        for tp in self._trackpoints:
-            if LocationUtils.distance_between(last_valid_tp.latitude, last_valid_tp.longitude, tp.latitude, tp.longitude) >= AltitudeCorrection.DISTANCE_THRESHOLD:
-                if tp.altitude >= last_valid_altitude + AltitudeCorrection.GAIN_LOSS_THRESHOLD:
-                    diff = tp.altitude - last_valid_tp.altitude
-                    self._gain = self._gain + diff
-                    last_valid_tp = tp
-                    self._buffer.append(tp.altitude)
-                    last_valid_altitude = round(sum(self._buffer) / AltitudeCorrection.CIRCULAR_BUFFER_LEN, 2)
-                    last_valid_tp.elevation_gain = diff
-                    DatabaseHelper.update(last_valid_tp)
-                elif tp.altitude <= last_valid_altitude - AltitudeCorrection.GAIN_LOSS_THRESHOLD:
-                    diff = last_valid_tp.altitude - tp.altitude
-                    self._loss = self._loss + diff
-                    last_valid_tp = tp
-                    self._buffer.append(tp.altitude)
-                    last_valid_altitude = round(sum(self._buffer) / AltitudeCorrection.CIRCULAR_BUFFER_LEN, 2)
-                    last_valid_tp.elevation_loss = diff
-                    DatabaseHelper.update(last_valid_tp)
-            if not self._min or self._min > tp.altitude:
-                self._min = tp.altitude
-            if not self._max or self._max < tp.altitude:
-                self._max = tp.altitude
-
-    def _update_track_stats(self):
-        DatabaseHelper.update_stats(self._activity_id, self._gain, self._loss, self._min, self._max)
+            if a < a_threshold:
+                continue
+            altitude = alts[i]
+            if altitude >= last_valid_altitude + threshold:
+                gains[i] = altitude - alts[last]
+            elif altitude <= last_valid_altitude - threshold:
+                losses[i] = alts[last] - altitude
+            else:
+                continue
+            last = i
+            buffer.append(altitude)
+            last_valid_altitude = round(sum(buffer) / buffer_len, 2)
+        return gains, losses
+
+    @staticmethod
+    def _nan_to_none(values):
+        return [None if math.isnan(v) else v for v in values.tolist()]
@@ -0,0 +1,252 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import sqlite3
+import time
+
+from dataclasses import dataclass
+
+
+@dataclass
+class ObjectSize:
+    """Size of a table or an index of the database."""
+    name: str
+    type: str
+    table: str
+    rows: int
+    # Bytes used by the object or None if the SQLite library hasn't the
+    # dbstat virtual table.
+    size: int = None
+
+
+class DatabaseMaintenance:
+    """Maintenance of the database.
+
+    - optimize() updates the statistics used by the query planner. The
+      app runs it on shutdown.
+    - idle_step() returns a bounded number of free pages to the file
+      system (see vacuum_step). The app runs it from time to time while
+      it's idle. New databases are created with auto_vacuum INCREMENTAL;
+      the old ones are only changed on user's request (see main and
+      enable_incremental_vacuum) because that needs a full VACUUM.
+    - report() returns the size and the number of rows of every table
+      and index.
+    - timings() measures some key queries of the app.
+    """
+
+    VACUUM_PAGES = 256
+    # Number of rows per index read by ANALYZE (see SQLite's analysis_limit).
+    ANALYSIS_LIMIT = 1000
+
+    # Key queries of the app with their parameters.
+    QUERIES = {
+        "activities list": ("SELECT * FROM activities WHERE activityid IS NULL ORDER BY starttime DESC", ()),
+        "activities in a year": (
+            "SELECT * FROM activities WHERE starttime >= ? AND starttime <= ?", (1577836800000, 1609459199000)
+        ),
+        "aggregated stats": (
+            """
+            SELECT category, COUNT(*), SUM(stats.totaldistance), SUM(stats.movingtime)
+            FROM stats, activities WHERE stats._id=activities.statsid GROUP BY category
+            """, ()
+        ),
+        "track points of an activity": (
+            """
+            SELECT t.* FROM trackpoints t JOIN sections s ON s._id = t.sectionid
+            WHERE s.activityid=(SELECT MAX(_id) FROM activities) ORDER BY t._id
+            """, ()
+        ),
+        "segment tracks of a segment": (
+            "SELECT * FROM segmentracks WHERE segmentid=(SELECT MAX(_id) FROM segments) ORDER BY time", ()
+        ),
+        "duplicated activity by uuid": ("SELECT _id FROM activities WHERE uuid=?", ("",)),
+    }
+
+    def __init__(self, db_file: str = None):
+        """
+        Arguments:
+        db_file -- (optional) sqlite3 database file. By default, the app's one.
+        """
+        if db_file is None:
+            from pyopentracks.models.database import Database
+            db_file = Database()._db_file
+        self._db_file = db_file
+
+    def optimize(self) -> None:
+        """Update the query planner's statistics if needed.
+
+        Tables that were never analyzed are analyzed (with a bounded number
+        of rows per index) because PRAGMA optimize only updates existing
+        statistics.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute(f"PRAGMA analysis_limit = {DatabaseMaintenance.ANALYSIS_LIMIT}")
+            analyzed = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+            ).fetchone()[0]
+            if not analyzed:
+                conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+            conn.commit()
+
+    def incremental_vacuum_enabled(self) -> bool:
+        with sqlite3.connect(self._db_file) as conn:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def enable_incremental_vacuum(self) -> None:
+        """Change auto_vacuum to INCREMENTAL.
+
+        It runs a full VACUUM that locks the database until it ends, so it's
+        only done on user's request.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            # Both statements have to run in the same connection.
+            conn.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+
+    def idle_step(self) -> int:
+        """Do a bounded step of maintenance.
+
+        It never runs a full VACUUM: if auto_vacuum isn't INCREMENTAL then
+        it does nothing.
+
+        Return:
+        The number of pages released.
+        """
+        return self.vacuum_step()
+
+    def free_pages(self) -> int:
+        """Return the number of free pages of the database file."""
+        with sqlite3.connect(self._db_file) as conn:
+            return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def vacuum_step(self, pages: int = VACUUM_PAGES) -> int:
+        """Return, at most, pages free pages to the file system.
+
+        Return:
+        The number of pages released.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if before == 0:
+                return 0
+            # executescript steps the pragma until it's done: execute only
+            # steps it once (one page).
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def vacuum(self, pages: int = VACUUM_PAGES) -> int:
+        """Release all free pages, in steps of pages pages.
+
+        Return:
+        The number of pages released.
+        """
+        released = 0
+        while True:
+            step = self.vacuum_step(pages)
+            if step == 0:
+                return released
+            released += step
+
+    def report(self) -> list:
+        """Return a list of ObjectSize with all tables and indexes, from the biggest one."""
+        with sqlite3.connect(self._db_file) as conn:
+            objects = conn.execute("""
+                SELECT name, type, tbl_name FROM sqlite_master
+                WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'
+            """).fetchall()
+            rows = {
+                table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                for name, type_, table in objects if type_ == "table"
+            }
+            try:
+                sizes = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+            except sqlite3.Error:
+                sizes = {}
+        result = [
+            ObjectSize(name, type_, table, rows.get(table, 0), sizes.get(name))
+            for name, type_, table in objects
+        ]
+        return sorted(result, key=lambda o: (o.size or 0, o.rows), reverse=True)
+
+    def timings(self, repeat: int = 3) -> dict:
+        """Measure the key queries (QUERIES).
+
+        Return:
+        A dictionary query's name -> best time in seconds of repeat runs.
+        """
+        result = {}
+        with sqlite3.connect(self._db_file) as conn:
+            for name, (query, params) in DatabaseMaintenance.QUERIES.items():
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    conn.execute(query, params).fetchall()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                result[name] = best
+        return result
+
+
+def _human_size(size):
+    if size is None:
+        return "?"
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance of a PyOpenTracks database")
+    parser.add_argument("-d", "--database-file", required=True, help="sqlite3 database file")
+    parser.add_argument("-r", "--report", action="store_true", help="only show the size of tables and indexes")
+    args = parser.parse_args()
+
+    maintenance = DatabaseMaintenance(args.database_file)
+    print(f"{'Name':<45} {'Type':<6} {'Rows':>10} {'Size':>10}")
+    for obj in maintenance.report():
+        print(f"{obj.name:<45} {obj.type:<6} {obj.rows:>10} {_human_size(obj.size):>10}")
+    if args.report:
+        return 0
+
+    before = maintenance.timings()
+    start = time.perf_counter()
+    if not maintenance.incremental_vacuum_enabled():
+        maintenance.enable_incremental_vacuum()
+        print(f"\nIncremental vacuum enabled in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    maintenance.optimize()
+    print(f"\nOptimized in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    pages = maintenance.vacuum()
+    print(f"Released {pages} pages in {time.perf_counter() - start:.2f} s")
+    after = maintenance.timings()
+
+    print(f"\n{'Query':<35} {'Before (ms)':>12} {'After (ms)':>12}")
+    for name in before:
+        print(f"{name:<35} {before[name] * 1000:>12.2f} {after[name] * 1000:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,261 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import itertools
+import os
+import queue
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from enum import IntEnum
+
+from pyopentracks.utils import logging as pyot_logging
+
+
+class Priority(IntEnum):
+    """Lanes of the executor: lower values are served first."""
+    VISIBLE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class CancellationToken:
+    """Flag shared between who submits a task and the task itself."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class Task:
+    """A task submitted to the TaskExecutor (see TaskExecutor.submit)."""
+
+    def __init__(self, func, args, callback, key, priority, process):
+        self.func = func
+        self.args = args or ()
+        self.callback = callback
+        self.key = key
+        self.priority = Priority(priority)
+        self.process = process
+        self.token = CancellationToken()
+        self.submitted = time.monotonic()
+
+    def cancel(self):
+        """Cancel the task: it won't run if it's queued and its callback won't be called."""
+        self.token.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+
+class TaskExecutor:
+    """Application-wide executor for the asynchronous jobs of the views.
+
+    Tasks are run by a bounded pool of threads that serve the queued
+    tasks by priority (see Priority) and, inside the same priority, in
+    submission order. Tasks whose function and arguments can be pickled
+    can be run in a bounded pool of processes, too (the thread waits
+    for the result so priorities and bounds still apply).
+
+    A task can be submitted with a key (a widget, for example): a new
+    task with the same key supersedes the previous one, that is
+    cancelled, so stale results never reach the widget.
+    """
+
+    MAX_THREADS = min(4, os.cpu_count() or 1)
+    MAX_PROCESSES = min(4, os.cpu_count() or 1)
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_threads: int = None, max_processes: int = None):
+        self._max_threads = max_threads or TaskExecutor.MAX_THREADS
+        self._max_processes = max_processes or TaskExecutor.MAX_PROCESSES
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._process_pool = None
+        self._keys = {}
+        self._shutdown = False
+
+        self._queued = {p: 0 for p in Priority}
+        self._running = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "superseded": 0}
+        self._wait = {p: [0, 0.0, 0.0] for p in Priority}
+        self._run = {p: [0, 0.0, 0.0] for p in Priority}
+
+    @staticmethod
+    def instance():
+        """Return the application-wide TaskExecutor."""
+        with TaskExecutor._instance_lock:
+            if TaskExecutor._instance is None:
+                TaskExecutor._instance = TaskExecutor()
+            return TaskExecutor._instance
+
+    def submit(self, func, args=None, callback=None, key=None, priority=Priority.NORMAL, process=False) -> Task:
+        """Submit a task.
+
+        Arguments:
+        func     -- function to be executed.
+        args     -- (optional) tuple with the arguments of func.
+        callback -- (optional) function called, from the worker thread,
+                    with the result of func unless the task is cancelled.
+        key      -- (optional) hashable: the queued or running task with
+                    the same key is cancelled (superseded by this one).
+        priority -- Priority's lane.
+        process  -- if True, func runs in the pool of processes.
+
+        Return:
+        The Task submitted.
+        """
+        task = Task(func, args, callback, key, priority, process)
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("The executor has been shut down")
+            if key is not None:
+                previous = self._keys.get(key)
+                if previous is not None and not previous.cancelled:
+                    previous.cancel()
+                    self._counters["superseded"] += 1
+                self._keys[key] = task
+            self._counters["submitted"] += 1
+            self._queued[task.priority] += 1
+            self._start_threads()
+        self._queue.put((task.priority, next(self._sequence), task))
+        return task
+
+    def cancel(self, key) -> None:
+        """Cancel the task submitted with key, if any."""
+        with self._lock:
+            task = self._keys.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def metrics(self) -> dict:
+        """Return a dictionary with the executor's metrics.
+
+        Keys:
+        queued   -- dictionary priority's name -> number of queued tasks.
+        running  -- number of running tasks.
+        wait_ms  -- dictionary priority's name -> (average, max) time in the queue.
+        run_ms   -- dictionary priority's name -> (average, max) running time.
+        and the counters submitted, completed, failed, cancelled and superseded.
+        """
+        def latencies(values):
+            return {
+                p.name: (total / count * 1000 if count else 0.0, maximum * 1000)
+                for p, (count, total, maximum) in values.items()
+            }
+
+        with self._lock:
+            return {
+                "queued": {p.name: n for p, n in self._queued.items()},
+                "running": self._running,
+                "wait_ms": latencies(self._wait),
+                "run_ms": latencies(self._run),
+                **self._counters
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Cancel all queued tasks and stop the pools."""
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+            keys = list(self._keys.values())
+            self._keys.clear()
+        for task in keys:
+            task.cancel()
+        for _ in threads:
+            self._queue.put((len(Priority), next(self._sequence), None))
+        if wait:
+            for thread in threads:
+                thread.join()
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _start_threads(self):
+        # Called with the lock held.
+        while len(self._threads) < self._max_threads:
+            thread = threading.Thread(target=self._worker, name=f"TaskExecutor-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _processes(self):
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self._max_processes)
+            return self._process_pool
+
+    def _worker(self):
+        while True:
+            _priority, _seq, task = self._queue.get()
+            if task is None:
+                return
+            started = time.monotonic()
+            with self._lock:
+                self._queued[task.priority] -= 1
+                if task.cancelled:
+                    self._counters["cancelled"] += 1
+                    self._release(task)
+                    continue
+                self._running += 1
+                TaskExecutor._add(self._wait[task.priority], started - task.submitted)
+
+            failed = False
+            try:
+                if task.process:
+                    result = self._processes().submit(task.func, *task.args).result()
+                else:
+                    result = task.func(*task.args)
+                if task.callback is not None and not task.cancelled:
+                    task.callback(result)
+            except Exception as error:
+                failed = True
+                pyot_logging.get_logger(__name__).exception(f"Error running the task {task.func}: {error}")
+
+            with self._lock:
+                self._running -= 1
+                TaskExecutor._add(self._run[task.priority], time.monotonic() - started)
+                if failed:
+                    self._counters["failed"] += 1
+                elif task.cancelled:
+                    self._counters["cancelled"] += 1
+                else:
+                    self._counters["completed"] += 1
+                self._release(task)
+
+    def _release(self, task):
+        # Called with the lock held.
+        if task.key is not None and self._keys.get(task.key) is task:
+            del self._keys[task.key]
+
+    @staticmethod
+    def _add(values, seconds):
+        values[0] += 1
+        values[1] += seconds
+        values[2] = max(values[2], seconds)
@@ -0,0 +1,123 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from pyopentracks.models.database import Database
+from pyopentracks.utils import logging as pyot_logging
+from pyopentracks.utils.heatmap import HeatmapTile, HeatmapTileCache, HeatmapTrack
+
+
+class HeatmapRenderer:
+    """Render heatmap tiles from the heatmap tracks, through the tile cache."""
+
+    def __init__(self, cache: HeatmapTileCache = None, db: Database = None):
+        self._cache = cache or HeatmapTileCache()
+        self._db = db
+
+    def tile(self, zoom: int, x: int, y: int) -> bytes:
+        """Return the PNG image of the tile, rendering and caching it if needed."""
+        png = self._cache.get(zoom, x, y)
+        if png is not None:
+            return png
+        db = self._db or Database()
+        # Pixels on the tile's border can be touched by tracks just outside it.
+        min_lat, min_lon, max_lat, max_lon = HeatmapTile.bounds(zoom, x, y)
+        margin_lat = (max_lat - min_lat) / HeatmapTile.TILE_SIZE
+        margin_lon = (max_lon - min_lon) / HeatmapTile.TILE_SIZE
+        blobs = db.get_heatmap_tracks(
+            (min_lat - margin_lat, min_lon - margin_lon, max_lat + margin_lat, max_lon + margin_lon)
+        )
+        png = HeatmapTile.render([HeatmapTrack.decode(blob) for blob in blobs], zoom, x, y)
+        self._cache.put(zoom, x, y, png)
+        return png
+
+
+def render_tiles(directory: str, tiles) -> None:
+    """Render the tiles, tuples (zoom, x, y), into the cache in directory (for process pools)."""
+    renderer = HeatmapRenderer(HeatmapTileCache(directory))
+    for zoom, x, y in tiles:
+        try:
+            renderer.tile(zoom, x, y)
+        except Exception as error:
+            pyot_logging.get_logger(__name__).exception(f"Error rendering the heatmap tile {zoom}/{x}/{y}: {error}")
+
+
+class HeatmapIndexer:
+    """Builds the heatmap tracks of activities.
+
+    For every activity it stores its heatmap track and invalidates the
+    cached tiles it goes through. The tiles of the low zoom levels can,
+    then, be pre-rendered with render_tiles in a pool of processes (see
+    DatabaseHelper.prerender_heatmap).
+    """
+
+    PRERENDER_MAX_ZOOM = 12
+    # Tiles rendered by every pre-rendering task.
+    PRERENDER_CHUNK_SIZE = 64
+
+    @staticmethod
+    def index(activities_ids=None, directory: str = None, db: Database = None) -> list:
+        """Build and store the heatmap tracks of the activities.
+
+        Arguments:
+        activities_ids -- (optional) list of activities' ids. By default,
+                          all activities without heatmap track.
+        directory      -- (optional) tile cache's directory.
+        db             -- (optional) Database's object.
+
+        Return:
+        The list of tiles, tuples (zoom, x, y), to pre-render (see tiles).
+        """
+        db = db or Database()
+        cache = HeatmapTileCache(directory or HeatmapTileCache.default_directory())
+        if activities_ids is None:
+            activities_ids = db.get_activities_without_heatmap_track()
+
+        tracks = []
+        for activity_id in activities_ids:
+            track = HeatmapTrack.from_coordinates(db.get_coordinates(activity_id))
+            if track is None:
+                continue
+            bounds, points = track
+            if db.insert_heatmap_track(activity_id, bounds, points):
+                cache.invalidate(bounds)
+                tracks.append(HeatmapTrack.decode(points))
+        return HeatmapIndexer.tiles(tracks)
+
+    @staticmethod
+    def tiles(tracks) -> list:
+        """Return the tiles, up to PRERENDER_MAX_ZOOM, with track points of tracks.
+
+        Arguments:
+        tracks -- list of tuples (latitudes, longitudes) of NumPy arrays.
+        """
+        if not tracks:
+            return []
+        tiles = []
+        for zoom in range(HeatmapTile.MIN_ZOOM, HeatmapIndexer.PRERENDER_MAX_ZOOM + 1):
+            keys = []
+            for latitudes, longitudes in tracks:
+                x, y = HeatmapTile.world_pixels(latitudes, longitudes, zoom)
+                tile_x = (x // HeatmapTile.TILE_SIZE).astype(np.int64)
+                tile_y = (y // HeatmapTile.TILE_SIZE).astype(np.int64)
+                keys.append(tile_x << 32 | tile_y)
+            for key in np.unique(np.concatenate(keys)).tolist():
+                tiles.append((zoom, key >> 32, key & 0xFFFFFFFF))
+        return tiles
@@ -0,0 +1,104 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import multiprocessing as mp
+
+import numpy as np
+
+from pyopentracks.app_preferences import AppPreferences
+from pyopentracks.models.database import Database
+from pyopentracks.stats.track_activity_stats import HrZonesStats
+
+
+class HrZonesIndexer(mp.Process):
+    """This Process subclass computes and stores the time in heart rate zones of activities.
+
+    Activities are processed in batches: the heart rates of all
+    activities of a batch are read with only one query and their times
+    in zones are computed in one pass (see HrZonesStats.zone_times).
+    """
+
+    BATCH_SIZE = 200
+
+    def __init__(self, zones=None, activities_ids=None, recompute=False):
+        """
+        Arguments:
+        zones          -- (optional) list of integers with heart rate zones
+                          (bpm). By default, the zones of the preferences.
+        activities_ids -- (optional) list of activities' ids. By default,
+                          all activities without times in zones.
+        recompute      -- if True, the times of all activities are deleted
+                          and computed again (zones changed).
+        """
+        super().__init__()
+        self._zones = zones
+        self._activities_ids = activities_ids
+        self._recompute = recompute
+
+    @staticmethod
+    def preferences_zones():
+        preferences = AppPreferences()
+        return HrZonesStats.bpm_zones(
+            preferences.get_pref(AppPreferences.HEART_RATE_MAX),
+            preferences.get_pref(AppPreferences.HEART_RATE_ZONES)
+        )
+
+    def run(self):
+        db = Database()
+        zones = self._zones if self._zones is not None else HrZonesIndexer.preferences_zones()
+        if self._recompute:
+            db.delete_hr_zone_times()
+        if not zones or not any(zone > 0 for zone in zones):
+            return
+
+        activities_ids = self._activities_ids
+        if activities_ids is None:
+            activities_ids = db.get_activities_without_hr_zone_times()
+        for i in range(0, len(activities_ids), HrZonesIndexer.BATCH_SIZE):
+            HrZonesIndexer.index(zones, activities_ids[i:i + HrZonesIndexer.BATCH_SIZE], db)
+
+    @staticmethod
+    def index(zones, activities_ids, db: Database = None) -> bool:
+        """Compute and store the time in zones of the activities.
+
+        Return:
+        True if the times were stored or False otherwise (the heart rates
+        couldn't be read, so the activities are left to be computed again).
+        """
+        db = db or Database()
+        rows = db.get_heart_rates(activities_ids)
+        if rows is None:
+            return False
+        data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        ids, groups = np.unique(data[:, 0], return_inverse=True)
+        starts = np.diff(data[:, 1], prepend=np.nan) != 0
+        zones_times, total_times = HrZonesStats.zone_times(
+            zones, data[:, 2], data[:, 3], starts, groups.reshape(-1), len(ids)
+        )
+
+        computed = {}
+        for activity_id, times, total in zip(ids.astype(np.int64).tolist(), zones_times, total_times):
+            computed[activity_id] = [(activity_id, -1, int(round(total - times.sum())))] + [
+                (activity_id, zone, int(round(time))) for zone, time in enumerate(times.tolist()) if time > 0
+            ]
+        result = []
+        for activity_id in activities_ids:
+            # Activities without track points are stored too, so they're not computed again.
+            result.extend(computed.get(activity_id, [(activity_id, -1, 0)]))
+        return db.insert_hr_zone_times(activities_ids, result)
@@ -0,0 +1,57 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import multiprocessing as mp
+
+from pyopentracks.models.database import Database
+from pyopentracks.utils.fingerprint import ActivityFingerprint
+
+
+class ImportFingerprintIndexer(mp.Process):
+    """This Process subclass computes the fingerprint of the activities that haven't it.
+
+    New activities get their fingerprint when they're inserted, so this
+    is only needed for the activities imported before fingerprints existed.
+    """
+
+    BATCH_SIZE = 200
+
+    def run(self):
+        db = Database()
+        activities = db.get_activities_without_import_fingerprint()
+        for i in range(0, len(activities), ImportFingerprintIndexer.BATCH_SIZE):
+            ImportFingerprintIndexer.index(activities[i:i + ImportFingerprintIndexer.BATCH_SIZE], db)
+
+    @staticmethod
+    def index(activities, db: Database = None) -> bool:
+        """Compute and store the fingerprints of the activities.
+
+        Arguments:
+        activities -- list of tuples (activity's id, start time in milliseconds).
+        db         -- (optional) Database object.
+        """
+        db = db or Database()
+        rows = []
+        for activity_id, start_time_ms in activities:
+            fingerprint = ActivityFingerprint.compute(
+                start_time_ms, db.get_coordinates(activity_id, ActivityFingerprint.NUM_POINTS)
+            )
+            if fingerprint is not None:
+                rows.append((activity_id, fingerprint))
+        return db.insert_import_fingerprints(rows)
@@ -0,0 +1,94 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import multiprocessing as mp
+
+import numpy as np
+
+from pyopentracks.models.database import Database
+from pyopentracks.utils.route_signature import RouteSignature
+
+
+class RouteSearch:
+    """Index and search activities with the same route.
+
+    See RouteSignature for the signature and the similarity.
+    """
+
+    @staticmethod
+    def index(activity_id, db: Database = None) -> bool:
+        """Compute and store the route signature of the activity."""
+        db = db or Database()
+        coordinates = np.array(db.get_coordinates(activity_id), dtype=np.float64).reshape(-1, 2)
+        if len(coordinates) == 0:
+            return False
+        cells = RouteSignature.cells(coordinates[:, 0], coordinates[:, 1])
+        return db.insert_route_signature(activity_id, cells.tolist())
+
+    @staticmethod
+    def similar(activity_id, db: Database = None) -> list:
+        """Look for the activities with the same route than the activity.
+
+        Return:
+        A list of tuples (activity's id, similarity), from the most similar
+        one, where similarity is the Jaccard index of the routes' cells.
+        """
+        db = db or Database()
+        candidates = db.get_route_candidates(activity_id)
+        if candidates is None:
+            if not RouteSearch.index(activity_id, db):
+                return []
+            candidates = db.get_route_candidates(activity_id)
+        num_cells, rows = candidates
+
+        result = []
+        coordinates = None
+        for other_id, shared, other_num_cells in rows:
+            similarity = RouteSignature.jaccard(num_cells, other_num_cells, shared)
+            if similarity < RouteSignature.MIN_SIMILARITY:
+                continue
+            if similarity < RouteSignature.SURE_SIMILARITY:
+                if coordinates is None:
+                    coordinates = np.array(db.get_coordinates(activity_id), dtype=np.float64)
+                other_coordinates = np.array(db.get_coordinates(other_id), dtype=np.float64)
+                if not RouteSignature.same_route(coordinates, other_coordinates):
+                    continue
+            result.append((other_id, similarity))
+        return sorted(result, key=lambda item: item[1], reverse=True)
+
+
+class RouteSignatureIndexer(mp.Process):
+    """This Process subclass computes the route signature of activities."""
+
+    def __init__(self, activities_ids=None):
+        """
+        Arguments:
+        activities_ids -- (optional) list of activities' ids. By default,
+                          all activities without route signature.
+        """
+        super().__init__()
+        self._activities_ids = activities_ids
+
+    def run(self):
+        db = Database()
+        activities_ids = self._activities_ids
+        if activities_ids is None:
+            activities_ids = db.get_activities_without_route_signature()
+        for activity_id in activities_ids:
+            RouteSearch.index(activity_id, db)
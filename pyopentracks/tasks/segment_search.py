@@ -17,25 +17,137 @@ You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
 
-from functools import reduce
-
 import multiprocessing as mp
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
-from pyopentracks.utils.utils import LocationUtils
+from pyopentracks.utils.frechet import discrete_frechet
 from pyopentracks.models.database import Database
+from pyopentracks.tasks.shared_tracks import SharedTrackArrays
 from pyopentracks.models.segment_track import SegmentTrack
 from pyopentracks.stats.track_activity_stats import TrackActivityStats
 from pyopentracks.models.location import Location
+from pyopentracks.utils.footprint import Footprint
+from pyopentracks.utils.segment_geometry import SegmentGeometry
+from pyopentracks.utils.segment_matcher import SegmentMatcher
+
+
+def _match_activity(shared, activity_id, matcher, geometries):
+    result = []
+    _, times, latitudes, longitudes = shared.arrays(activity_id)
+    for segment_id, start, end in matcher.match(latitudes, longitudes, times):
+        frechet = discrete_frechet(
+            geometries[segment_id],
+            SegmentGeometry.resample(np.column_stack((latitudes[start:end + 1], longitudes[start:end + 1])))
+        )
+        if frechet < SegmentSearchAbstract.FRECHET_THRESHOLD:
+            result.append((segment_id, activity_id, start, end))
+    return result
+
+
+def match_segments(handle, activities_ids, segments):
+    """Look for segments in activities of a SharedTrackArrays block (for process pools).
+
+    Arguments:
+    handle         -- handle of the SharedTrackArrays block.
+    activities_ids -- list of activities' ids.
+    segments       -- list of tuples (segment's id, start's search BoundingBox,
+                      end's search BoundingBox, resampled geometry).
+
+    Return:
+    A list of tuples (segment's id, activity's id, start index, end index)
+    with the segment tracks found (verified with Fréchet).
+    """
+    matcher = SegmentMatcher()
+    geometries = {}
+    for segment_id, start_bbox, end_bbox, geometry in segments:
+        matcher.add(segment_id, start_bbox, end_bbox)
+        geometries[segment_id] = geometry
+
+    # Both curves are resampled (see SegmentGeometry) so Fréchet's cost
+    # doesn't depend on the recording rate.
+    shared = SharedTrackArrays.attach(handle)
+    try:
+        result = []
+        for activity_id in activities_ids:
+            result += _match_activity(shared, activity_id, matcher, geometries)
+        return result
+    finally:
+        shared.close()
 
 
 class SegmentSearchAbstract(mp.Process):
     SEARCH_RADIO = 10.0
     FRECHET_THRESHOLD = 50.0
+    WORKERS = os.cpu_count() or 1
+    # Below this number of track points per job the search isn't split.
+    MIN_POINTS_PER_JOB = 100000
 
     def __init__(self):
         super().__init__()
 
+    @staticmethod
+    def search_bbox(point):
+        """Return the BoundingBox where track points near point (a segment's endpoint) are looked for."""
+        return Location(point.latitude, point.longitude).bounding_box(1.1 * SegmentSearchAbstract.SEARCH_RADIO)
+
+    @staticmethod
+    def index_activity(activity_id, db: Database = None) -> bool:
+        """Compute and store the footprint of the activity."""
+        db = db or Database()
+        footprint = Footprint.of_coordinates(db.get_coordinates(activity_id))
+        if footprint is None:
+            return False
+        return db.insert_activity_footprint(activity_id, *footprint)
+
+    @staticmethod
+    def index_segment(segment_id, points, db: Database = None) -> bool:
+        """Compute and store the footprint of the segment.
+
+        Arguments:
+        segment_id -- segment's id.
+        points     -- list of segment's points (objects with latitude and longitude).
+        """
+        if not points:
+            return False
+        db = db or Database()
+        footprint = Footprint.of_segment(
+            [(p.latitude, p.longitude) for p in points],
+            SegmentSearchAbstract.search_bbox(points[0]),
+            SegmentSearchAbstract.search_bbox(points[-1])
+        )
+        return db.insert_segment_footprint(segment_id, *footprint)
+
+    @staticmethod
+    def segment_geometry(segment_id, points, db: Database = None) -> np.ndarray:
+        """Return the resampled geometry of the segment (see SegmentGeometry).
+
+        It's read from the database or, the first time, computed and stored.
+
+        Arguments:
+        segment_id -- segment's id.
+        points     -- list of segment's points (objects with latitude and longitude).
+        """
+        db = db or Database()
+        blob = db.get_segment_geometry(segment_id, SegmentGeometry.SPACING)
+        if blob is not None:
+            return SegmentGeometry.decode(blob)
+        geometry = SegmentGeometry.resample([(p.latitude, p.longitude) for p in points])
+        db.insert_segment_geometry(segment_id, SegmentGeometry.SPACING, SegmentGeometry.encode(geometry))
+        return geometry
+
+    @staticmethod
+    def index_missing(db: Database = None) -> None:
+        """Compute the footprint of the activities and segments that haven't it."""
+        db = db or Database()
+        for activity_id in db.get_activities_without_footprint():
+            SegmentSearchAbstract.index_activity(activity_id, db)
+        for segment_id in db.get_segments_without_footprint():
+            SegmentSearchAbstract.index_segment(segment_id, db.get_segment_points(segment_id), db)
+
     def _create_segment_track(self, segment, track_points, from_point, to_point):
         """Creates a segmentrack register into the database and returns the new SegmentTrack's id.
 
@@ -56,94 +168,96 @@ class SegmentSearchAbstract(mp.Process):
         db = Database()
         return db.get_track_points_between(tp1_id, tp2_id)
 
-    def _get_points_near_point_start(self, bbox, activity_id=None):
-        # Gets all points inside the bounding box
-        db = Database()
-        points = db.get_points_near_point_start(bbox, activity_id)
-
-        # Filters points: it gets only one inside the same minute of time
-        filtered_points = []
-        nearly_points = []
-        for point in points:
-            if len(nearly_points) == 0:
-                nearly_points.append(point)
-            elif abs(nearly_points[0].timestamp - point.timestamp) <= 1 * 60 * 1000:
-                nearly_points.append(point)
-            else:
-                filtered_points.append(reduce(lambda a, b: a if a.timestamp > b.timestamp else b, nearly_points))
-                nearly_points = []
-
-        # If there are nearly_points then filter them
-        if len(nearly_points) > 0:
-            filtered_points.append(reduce(lambda a, b: a if a.timestamp > b.timestamp else b, nearly_points))
+    def _search(self, db, activities_ids, segments):
+        """Look for the segments in the activities and add the segment tracks found.
 
-        return filtered_points
+        The track points of the activities are read only once, one activity
+        at a time, into a SharedTrackArrays block sized from their count.
+        Workers (a pool of processes if there are enough points) match and
+        verify the segments over views of that block and only return the
+        segment tracks found, that are stored here.
 
-    def _get_points_near_point_end(self, bbox, activity_id, trackpoint_id_from):
-        db = Database()
-        return db.get_points_near_point_end(bbox, activity_id, trackpoint_id_from)
+        Arguments:
+        db             -- Database's object.
+        activities_ids -- list of activities' ids.
+        segments       -- list of tuples (Segment, list of SegmentPoint).
+        """
+        counts = db.count_track_points(activities_ids) if segments else {}
+        if not counts:
+            return
+        by_id = {segment.id: segment for segment, _ in segments}
+        jobs_segments = [
+            (
+                segment.id,
+                self.search_bbox(segment_points[0]),
+                self.search_bbox(segment_points[-1]),
+                self.segment_geometry(segment.id, segment_points, db)
+            )
+            for segment, segment_points in segments
+        ]
+
+        with SharedTrackArrays.allocate(counts) as shared:
+            # Activities are read and copied into the block one by one.
+            for activity_id in counts:
+                shared.write(activity_id, db.get_track_points_locations(activity_id))
+            jobs = SegmentSearchAbstract._jobs(list(counts.keys()), jobs_segments, len(shared))
+            if len(jobs) == 1:
+                results = [match_segments(shared.handle, *jobs[0])]
+            else:
+                with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+                    results = list(executor.map(match_segments, [shared.handle] * len(jobs), *zip(*jobs)))
 
-    def _linear_frechet(self, p: np.ndarray, q: np.ndarray) -> float:
-        """Calculates the Fréchet distance between two curves: p and q."""
-        n_p = p.shape[0]
-        n_q = q.shape[0]
-        ca = np.zeros((n_p, n_q), dtype=np.float64)
+            for segment_id, activity_id, start, end in (match for result in results for match in result):
+                start_p, end_p = (
+                    SegmentTrack.Point(activity_id, *shared.row(activity_id, index)) for index in (start, end)
+                )
+                track_points = self._get_track_points_between(start_p.trackpoint_id, end_p.trackpoint_id)
+                self._create_segment_track(by_id[segment_id], track_points, start_p, end_p)
 
-        for i in range(n_p):
-            for j in range(n_q):
-                d = LocationUtils.distance_between(p[i, 0], p[i, 1], q[j, 0], q[j, 1])
+    @staticmethod
+    def _jobs(activities_ids, segments, num_points):
+        """Split the work in jobs (activities' ids, segments) for the workers.
 
-                if i > 0 and j > 0:
-                    ca[i, j] = max(min(ca[i - 1, j], ca[i - 1, j - 1], ca[i, j - 1]), d)
-                elif i > 0 and j == 0:
-                    ca[i, j] = max(ca[i - 1, 0], d)
-                elif i == 0 and j > 0:
-                    ca[i, j] = max(ca[0, j - 1], d)
-                else:
-                    ca[i, j] = d
-        return ca[n_p - 1, n_q - 1]
+        Activities are split among the workers or, if there is only one,
+        the segments. Small works are done in only one job.
+        """
+        num_jobs = min(SegmentSearchAbstract.WORKERS, num_points // SegmentSearchAbstract.MIN_POINTS_PER_JOB)
+        if num_jobs <= 1:
+            return [(activities_ids, segments)]
+        if len(activities_ids) > 1:
+            chunks = [activities_ids[i::num_jobs] for i in range(num_jobs)]
+            return [(chunk, segments) for chunk in chunks if chunk]
+        chunks = [segments[i::num_jobs] for i in range(num_jobs)]
+        return [(activities_ids, chunk) for chunk in chunks if chunk]
 
 
 class SegmentTrackSearch(SegmentSearchAbstract):
-    """This Process subclass look for segments in a track's activity and add them into segmentracks database table."""
+    """This Process subclass look for segments in tracks' activities and add them into segmentracks database table."""
 
-    def __init__(self, activity_id):
+    def __init__(self, activities_ids):
         """
         Arguments:
-        activity_id -- Activity's id where the Process will look for segments to add them into segmentracks database table.
+        activities_ids -- list of Activities' ids where the Process will look for segments to add them into
+                          segmentracks database table.
         """
         super().__init__()
-        self._activity_id = activity_id
+        self._activities_ids = activities_ids
 
     def run(self):
         db = Database()
-        segments = db.get_segments()
-        if not segments:
-            return
-        track_points = db.get_track_points(self._activity_id)
-        if not track_points:
-            return
-
-        for segment in segments:
-            segment_points = db.get_segment_points(segment.id)
-            if not segment_points:
-                continue
+        self.index_missing(db)
 
-            bbox = Location(segment_points[0].latitude, segment_points[0].longitude).bounding_box(1.1 * SegmentSearchAbstract.SEARCH_RADIO)
-            start_points = self._get_points_near_point_start(bbox, self._activity_id)
-            for start_p in start_points:
-                bbox = Location(segment_points[-1].latitude, segment_points[-1].longitude).bounding_box(1.1 * SegmentSearchAbstract.SEARCH_RADIO)
-                end_p = self._get_points_near_point_end(bbox, start_p.activity_id, start_p.trackpoint_id)
-                if end_p:
-                    track_points = self._get_track_points_between(start_p.trackpoint_id, end_p.trackpoint_id)
-
-                    frechet = self._linear_frechet(
-                        np.array(list(map(lambda sp: [sp.latitude, sp.longitude], segment_points))),
-                        np.array(list(map(lambda tp: [tp.latitude, tp.longitude], track_points)))
-                    )
-
-                    if frechet < SegmentSearchAbstract.FRECHET_THRESHOLD:
-                        self._create_segment_track(segment, track_points, start_p, end_p)
+        # Only segments whose footprint matches some activity's one can be in them.
+        segments_ids = sorted({
+            segment_id for activity_id in self._activities_ids for segment_id in db.get_segments_candidates(activity_id)
+        })
+        segments = []
+        for segment_id in segments_ids:
+            segment = db.get_segment_by_id(segment_id)
+            segment_points = db.get_segment_points(segment_id)
+            if segment is not None and segment_points:
+                segments.append((segment, segment_points))
+        self._search(db, list(self._activities_ids), segments)
 
 
 class SegmentSearch(SegmentSearchAbstract):
@@ -163,18 +277,15 @@ class SegmentSearch(SegmentSearchAbstract):
         self._points = points
 
     def run(self):
-        bbox = Location(self._points[0].latitude, self._points[0].longitude).bounding_box(1.1 * SegmentSearchAbstract.SEARCH_RADIO)
-        start_points = self._get_points_near_point_start(bbox)
-        for start_p in start_points:
-            bbox = Location(self._points[-1].latitude, self._points[-1].longitude).bounding_box(1.1 * SegmentSearchAbstract.SEARCH_RADIO)
-            end_p = self._get_points_near_point_end(bbox, start_p.activity_id, start_p.trackpoint_id)
-            if end_p:
-                track_points = self._get_track_points_between(start_p.trackpoint_id, end_p.trackpoint_id)
+        db = Database()
+        self.index_missing(db)
+
+        # Only activities whose footprint matches the segment's one can have it.
+        self._search(db, db.get_activities_candidates(self._segment.id), [(self._segment, self._points)])
 
-                frechet = self._linear_frechet(
-                        np.array(list(map(lambda sp: [sp.latitude, sp.longitude], self._points))),
-                        np.array(list(map(lambda tp: [tp.latitude, tp.longitude], track_points)))
-                )
 
-                if frechet < SegmentSearchAbstract.FRECHET_THRESHOLD:
-                    self._create_segment_track(self._segment, track_points, start_p, end_p)
+class FootprintIndexer(mp.Process):
+    """This Process subclass computes the footprints of activities and segments that haven't it."""
+
+    def run(self):
+        SegmentSearchAbstract.index_missing(Database())
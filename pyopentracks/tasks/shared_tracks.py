@@ -0,0 +1,141 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedTrackArrays:
+    """Track points' columns of activities in a shared memory block.
+
+    The parent process creates the block with the track points of the
+    activities and hands its (small) handle to the workers, that attach
+    to it and get NumPy views of the columns without copies. The block
+    can be allocated from the number of points of every activity and
+    filled one activity at a time, so only one activity's rows are in
+    Python objects at a time.
+
+    The block has four columns of n 8 bytes values, one after another:
+    track points' ids, times, latitudes and longitudes. The points of
+    every activity are consecutive and sorted by id.
+    """
+
+    COLUMNS = (("ids", np.int64), ("times", np.int64), ("latitudes", np.float64), ("longitudes", np.float64))
+
+    def __init__(self, shm: shared_memory.SharedMemory, size: int, offsets: dict, owner: bool):
+        self._shm = shm
+        self._size = size
+        self._offsets = offsets
+        self._owner = owner
+        self._columns = {
+            name: np.ndarray((size,), dtype=dtype, buffer=shm.buf, offset=i * 8 * size)
+            for i, (name, dtype) in enumerate(SharedTrackArrays.COLUMNS)
+        }
+
+    @staticmethod
+    def allocate(counts: dict):
+        """Create an empty shared memory block to be filled with write.
+
+        Arguments:
+        counts -- dictionary activity's id -> number of track points.
+        """
+        offsets = {}
+        size = 0
+        for activity_id, count in counts.items():
+            offsets[activity_id] = (size, size + count)
+            size += count
+        shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * len(SharedTrackArrays.COLUMNS) * size))
+        return SharedTrackArrays(shm, size, offsets, True)
+
+    @staticmethod
+    def create(tracks: dict):
+        """Create the shared memory block with the tracks.
+
+        Arguments:
+        tracks -- dictionary activity's id -> list of tuples (track point's
+                  id, time, latitude, longitude) sorted by id.
+        """
+        arrays = SharedTrackArrays.allocate({activity_id: len(rows) for activity_id, rows in tracks.items()})
+        for activity_id, rows in tracks.items():
+            arrays.write(activity_id, rows)
+        return arrays
+
+    def write(self, activity_id, rows) -> None:
+        """Copy the activity's track points into its slice of the block.
+
+        If there are fewer rows than the ones allocated (the activity
+        changed after it was counted), the activity's slice is shortened;
+        if there are more, the last ones are left out.
+
+        Arguments:
+        activity_id -- activity's id.
+        rows        -- list of tuples (track point's id, time, latitude,
+                       longitude) sorted by id.
+        """
+        start, end = self._offsets[activity_id]
+        rows = rows[:end - start]
+        self._offsets[activity_id] = (start, start + len(rows))
+        if not rows:
+            return
+        for (name, dtype), column in zip(SharedTrackArrays.COLUMNS, zip(*rows)):
+            self._columns[name][start:start + len(rows)] = np.array(column, dtype=dtype)
+
+    @staticmethod
+    def attach(handle):
+        """Attach to the block of handle (see handle property) from a worker."""
+        name, size, offsets = handle
+        return SharedTrackArrays(shared_memory.SharedMemory(name=name), size, offsets, False)
+
+    @property
+    def handle(self):
+        """Picklable handle of the block for the workers."""
+        return self._shm.name, self._size, self._offsets
+
+    def __len__(self):
+        return self._size
+
+    def activities_ids(self):
+        return list(self._offsets.keys())
+
+    def arrays(self, activity_id):
+        """Return a tuple (ids, times, latitudes, longitudes) of numpy views of the activity's columns."""
+        start, end = self._offsets[activity_id]
+        return tuple(self._columns[name][start:end] for name, _ in SharedTrackArrays.COLUMNS)
+
+    def row(self, activity_id, index):
+        """Return a tuple (id, time, latitude, longitude) of the activity's point index."""
+        start, _ = self._offsets[activity_id]
+        return tuple(self._columns[name][start + index].item() for name, _ in SharedTrackArrays.COLUMNS)
+
+    def close(self) -> None:
+        """Close the block (the creator unlinks it too).
+
+        Views returned by arrays must be released before closing it.
+        """
+        self._columns = {}
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
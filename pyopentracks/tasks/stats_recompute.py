@@ -0,0 +1,239 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import sqlite3
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pyopentracks.models.section import Section
+from pyopentracks.models.track_point import TrackPoint
+from pyopentracks.stats.track_activity_stats import IntervalStatsCache, TrackActivityStats
+from pyopentracks.utils.chart_series import ChartSeriesCache
+from pyopentracks.utils.sections_cache import SectionsCache
+
+
+class StatsRecompute:
+    """Resumable job that recomputes the stats of all track activities.
+
+    When the stats' algorithms change, the stored stats rows are stale.
+    This job computes them again from the stored track points:
+
+    - start() fills the statsrecompute table (the checkpoint) with the
+      ids of the activities to recompute.
+    - run() computes chunks of activities in a pool of processes and
+      writes every chunk's stats, and removes its ids from the
+      checkpoint, in only one transaction.
+
+    If a run is interrupted, the next one resumes from the activities
+    left in the checkpoint table.
+    """
+
+    CHUNK_SIZE = 50
+    # Stats columns computed from the track points.
+    COLUMNS = (
+        "starttime", "stoptime", "totaldistance", "totaltime", "movingtime",
+        "avgspeed", "avgmovingspeed", "maxspeed", "minelevation", "maxelevation",
+        "elevationgain", "elevationloss", "maxhr", "avghr", "maxcadence", "avgcadence"
+    )
+
+    def __init__(self, db_file: str = None, chunk_size: int = CHUNK_SIZE, workers: int = None,
+                 gain_loss: bool = False):
+        """
+        Arguments:
+        db_file    -- (optional) sqlite3 database file. By default, the app's one.
+        chunk_size -- (optional) number of activities per chunk (and transaction).
+        workers    -- (optional) number of processes. By default, one per CPU.
+        gain_loss  -- (optional) if True, the track points' gain and loss are
+                      computed again from their altitudes (GainLossManager)
+                      before computing the stats.
+        """
+        if db_file is None:
+            from pyopentracks.models.database import Database
+            db_file = Database()._db_file
+        self._db_file = db_file
+        self._chunk_size = chunk_size
+        self._workers = workers
+        self._gain_loss = gain_loss
+        self._stop = False
+
+    def pending(self) -> int:
+        """Return the number of activities left in the checkpoint."""
+        with sqlite3.connect(self._db_file) as conn:
+            return conn.execute("SELECT COUNT(*) FROM statsrecompute").fetchone()[0]
+
+    def start(self, restart: bool = False) -> int:
+        """Fill the checkpoint with all track activities if there isn't a run to resume.
+
+        Arguments:
+        restart -- if True, the run to resume (if any) is discarded.
+
+        Return:
+        The number of activities to recompute.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            if restart:
+                conn.execute("DELETE FROM statsrecompute")
+            if conn.execute("SELECT COUNT(*) FROM statsrecompute").fetchone()[0] == 0:
+                conn.execute("""
+                    INSERT INTO statsrecompute (activityid)
+                    SELECT DISTINCT a._id
+                    FROM activities a JOIN sections s ON s.activityid = a._id
+                    WHERE a.statsid IS NOT NULL
+                """)
+            conn.commit()
+        return self.pending()
+
+    def stop(self) -> None:
+        """Ask the running job to stop after the chunks being computed."""
+        self._stop = True
+
+    def run(self, on_progress=None) -> int:
+        """Recompute the stats of the activities in the checkpoint.
+
+        Arguments:
+        on_progress -- (optional) callable receiving (done, total) after
+                       every chunk.
+
+        Return:
+        The number of activities whose stats were recomputed.
+        """
+        with sqlite3.connect(self._db_file) as conn:
+            ids = [row[0] for row in conn.execute("SELECT activityid FROM statsrecompute ORDER BY activityid")]
+        chunks = [ids[i:i + self._chunk_size] for i in range(0, len(ids), self._chunk_size)]
+        done = 0
+        if not chunks:
+            return done
+
+        with ProcessPoolExecutor(max_workers=self._workers) as executor:
+            futures = [
+                executor.submit(compute_stats, self._db_file, chunk, self._gain_loss) for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                if self._stop:
+                    for f in futures:
+                        f.cancel()
+                    break
+                chunk, results = future.result()
+                self._write(chunk, results)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(done, len(ids))
+        return done
+
+    def _write(self, chunk, results) -> None:
+        """Write the chunk's results and remove it from the checkpoint in one transaction."""
+        columns = ", ".join(f"{column}=?" for column in StatsRecompute.COLUMNS)
+        with sqlite3.connect(self._db_file) as conn:
+            try:
+                conn.executemany(
+                    f"UPDATE stats SET {columns} WHERE _id=(SELECT statsid FROM activities WHERE _id=?)",
+                    (values + (activity_id,) for activity_id, values, _ in results)
+                )
+                for activity_id, _, points in results:
+                    if points:
+                        conn.executemany("UPDATE trackpoints SET gain=?, loss=? WHERE _id=?", points)
+                conn.executemany(
+                    "DELETE FROM statsrecompute WHERE activityid=?", ((activity_id,) for activity_id in chunk)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        for activity_id, _, points in results:
+            if points:
+                SectionsCache.invalidate(activity_id)
+                ChartSeriesCache.invalidate(("activity", activity_id))
+                IntervalStatsCache.invalidate(("activity", activity_id))
+
+
+def compute_stats(db_file: str, activities_ids, gain_loss: bool = False):
+    """Compute the stats of the activities (run in the pool's processes).
+
+    Return:
+    A tuple (activities_ids, results) where results is a list of tuples
+    (activity's id, stats' values in StatsRecompute.COLUMNS order, list
+    of (gain, loss, track point's id) or None).
+    """
+    results = []
+    with sqlite3.connect(f"file:{db_file}?mode=ro", uri=True) as conn:
+        for activity_id in activities_ids:
+            sections = []
+            for row in conn.execute("SELECT * FROM sections WHERE activityid=? ORDER BY _id", (activity_id,)):
+                section = Section(*row)
+                section.track_points.extend(
+                    TrackPoint(*tp) for tp in conn.execute(
+                        "SELECT * FROM trackpoints WHERE sectionid=? ORDER BY _id", (section.id,)
+                    )
+                )
+                sections.append(section)
+
+            points = _gain_loss(sections) if gain_loss else None
+            stats = TrackActivityStats()
+            stats.compute(sections)
+            results.append((activity_id, (
+                stats.start_time, stats.end_time, stats.total_distance, stats.total_time,
+                stats.moving_time, stats.avg_speed, stats.avg_moving_speed, stats.max_speed,
+                stats.min_elevation, stats.max_elevation, stats.gain_elevation, stats.loss_elevation,
+                stats.max_hr, stats.avg_hr, stats.max_cadence, stats.avg_cadence
+            ), points))
+    return activities_ids, results
+
+
+def _gain_loss(sections):
+    """Compute again, with a GainLossManager, the gain and loss of the track points."""
+    from pyopentracks.io.parser.fit.gain_loss_manager import GainLossManager
+
+    manager = GainLossManager()
+    points = []
+    for section in sections:
+        for tp in section.track_points:
+            # TrackPoint.altitude is 0 when there isn't altitude.
+            manager.add(tp.altitude if tp.altitude else None)
+            gain, loss = manager.get_and_reset()
+            tp.elevation_gain, tp.elevation_loss = gain, loss
+            points.append((gain, loss, tp.id))
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the stats of all activities of a PyOpenTracks database")
+    parser.add_argument("-d", "--database-file", required=True, help="sqlite3 database file")
+    parser.add_argument("-r", "--restart", action="store_true", help="discard an interrupted run and start again")
+    parser.add_argument("-w", "--workers", type=int, help="number of processes")
+    parser.add_argument(
+        "-g", "--gain-loss", action="store_true",
+        help="compute track points' gain and loss again from their altitudes"
+    )
+    args = parser.parse_args()
+
+    job = StatsRecompute(args.database_file, workers=args.workers, gain_loss=args.gain_loss)
+    total = job.start(args.restart)
+    print(f"Activities to recompute: {total}")
+    try:
+        job.run(lambda done, total: print(f"\r{done} / {total}", end="", flush=True))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted: {job.pending()} activities left, run it again to resume")
+        return 1
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,211 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from pyopentracks.models.location import Location
+
+
+def lttb(x, y, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Arguments:
+    x         -- numpy array with the x values (sorted).
+    y         -- numpy array with the y values.
+    threshold -- number of points to keep.
+
+    Return:
+    A numpy array with the indices of the points kept (first and last
+    points are always kept).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    # Bucket edges for the n - 2 points between the first and the last ones.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        ax, ay = x[selected], y[selected]
+        areas = np.abs(
+            (ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay)
+        )
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+
+class ChartSeries:
+    """NumPy series of an activity to be plotted.
+
+    All series have the same length: one value per track point. The
+    distance is accumulated in kilometers and missing sensor values
+    are zeros.
+    """
+
+    def __init__(self, distance, elevation, hr, speed, cadence, latitude, longitude):
+        self._distance = distance
+        self._elevation = elevation
+        self._hr = hr
+        self._speed = speed
+        self._cadence = cadence
+        self._latitude = latitude
+        self._longitude = longitude
+
+    @staticmethod
+    def from_track_points(track_points):
+        """Build the ChartSeries from a list of TrackPoint."""
+        n = len(track_points)
+
+        def column(getter):
+            return np.fromiter(
+                (v if v is not None else 0 for v in map(getter, track_points)), dtype=np.float64, count=n
+            )
+
+        latitude = column(lambda tp: tp.latitude)
+        longitude = column(lambda tp: tp.longitude)
+
+        distance = np.zeros(n, dtype=np.float64)
+        if n > 1:
+            lat = np.radians(latitude)
+            lon = np.radians(longitude)
+            a = (
+                np.sin(np.diff(lat) / 2) ** 2 +
+                np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+            )
+            meters = 2 * Location.EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+            distance[1:] = np.cumsum(meters) / 1000
+
+        return ChartSeries(
+            distance,
+            column(lambda tp: tp.altitude),
+            column(lambda tp: tp.heart_rate),
+            column(lambda tp: tp.speed),
+            column(lambda tp: tp.cadence),
+            latitude,
+            longitude
+        )
+
+    def __len__(self):
+        return len(self._distance)
+
+    @property
+    def distance(self):
+        return self._distance
+
+    @property
+    def elevation(self):
+        return self._elevation
+
+    @property
+    def hr(self):
+        return self._hr
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @property
+    def cadence(self):
+        return self._cadence
+
+    @property
+    def has_hr(self) -> bool:
+        return bool(np.any(self._hr > 0))
+
+    def downsample(self, series: np.ndarray, width: int):
+        """Downsample series (one of the properties) to width points.
+
+        Return:
+        A tuple (x, y) of numpy arrays with the distances and the values.
+        """
+        indices = lttb(self._distance, series, width)
+        return self._distance[indices], series[indices]
+
+    def index_at(self, distance_km: float) -> int:
+        """Return the index of the nearest point to distance_km or None."""
+        if distance_km is None or len(self._distance) == 0:
+            return None
+        i = int(np.searchsorted(self._distance, distance_km))
+        if i >= len(self._distance):
+            return len(self._distance) - 1
+        if i > 0 and distance_km - self._distance[i - 1] < self._distance[i] - distance_km:
+            return i - 1
+        return i
+
+    def location_at(self, distance_km: float) -> Location:
+        """Return the Location of the nearest point to distance_km or None."""
+        i = self.index_at(distance_km)
+        if i is None:
+            return None
+        return Location(float(self._latitude[i]), float(self._longitude[i]))
+
+
+class ChartSeriesCache:
+    """Process-wide cache of ChartSeries keyed by ("activity", id)."""
+
+    MAX_ENTRIES = 16
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(key, track_points) -> ChartSeries:
+        """Return the ChartSeries for key, building it if needed.
+
+        Arguments:
+        key          -- cache's key or None to build it without caching.
+        track_points -- list of TrackPoint.
+        """
+        if key is None:
+            return ChartSeries.from_track_points(track_points)
+
+        with ChartSeriesCache._lock:
+            series = ChartSeriesCache._cache.get(key)
+            if series is not None and len(series) == len(track_points):
+                ChartSeriesCache._cache.move_to_end(key)
+                return series
+
+        series = ChartSeries.from_track_points(track_points)
+        with ChartSeriesCache._lock:
+            ChartSeriesCache._cache[key] = series
+            while len(ChartSeriesCache._cache) > ChartSeriesCache.MAX_ENTRIES:
+                ChartSeriesCache._cache.popitem(last=False)
+        return series
+
+    @staticmethod
+    def invalidate(key) -> None:
+        with ChartSeriesCache._lock:
+            ChartSeriesCache._cache.pop(key, None)
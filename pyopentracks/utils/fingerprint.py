@@ -0,0 +1,70 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+
+from itertools import chain, islice
+
+
+class ActivityFingerprint:
+    """Fingerprint of an activity to detect duplicated imports.
+
+    The same activity exported by different apps or devices could have
+    different (or no) UUID, so the fingerprint is built from the data
+    itself: the start time rounded to TIME_ROUNDING_MS and the first
+    NUM_POINTS coordinates rounded to COORDINATE_DECIMALS (about 1 m).
+    """
+
+    NUM_POINTS = 32
+    TIME_ROUNDING_MS = 1000
+    COORDINATE_DECIMALS = 5
+
+    @staticmethod
+    def compute(start_time_ms, coordinates):
+        """Compute the fingerprint.
+
+        Arguments:
+        start_time_ms -- start time in milliseconds.
+        coordinates   -- iterable of (latitude, longitude); only the first
+                         NUM_POINTS are used.
+
+        Return:
+        The fingerprint (hexadecimal string) or None if there isn't start
+        time or coordinates.
+        """
+        if start_time_ms is None:
+            return None
+        digest = hashlib.sha1(str(round(start_time_ms / ActivityFingerprint.TIME_ROUNDING_MS)).encode("ascii"))
+        num_points = 0
+        for latitude, longitude in islice(coordinates, ActivityFingerprint.NUM_POINTS):
+            digest.update(
+                f";{latitude:.{ActivityFingerprint.COORDINATE_DECIMALS}f}"
+                f",{longitude:.{ActivityFingerprint.COORDINATE_DECIMALS}f}".encode("ascii")
+            )
+            num_points += 1
+        return digest.hexdigest() if num_points else None
+
+    @staticmethod
+    def from_activity(activity):
+        """Compute the fingerprint of an Activity with its sections' track points."""
+        track_points = chain.from_iterable(section.track_points for section in activity.sections or [])
+        return ActivityFingerprint.compute(
+            activity.start_time_ms,
+            ((float(tp.latitude), float(tp.longitude)) for tp in track_points)
+        )
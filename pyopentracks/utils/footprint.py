@@ -0,0 +1,111 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from pyopentracks.models.location import BoundingBox
+from pyopentracks.utils.route_signature import RouteSignature
+
+
+class Footprint:
+    """Coarse geographic footprint of activities and segments.
+
+    The footprint of an activity is its bounding box and the set of
+    coarse geohash cells (GEOHASH_BITS bits, about 5 x 5 km) its track
+    points are in. The footprint of a segment is the bounding box of its
+    points and of the search boxes of its endpoints, and the cells of
+    the corners of these two search boxes.
+
+    Segment matching looks for track points inside the search boxes of
+    the segment's endpoints. A search box is much smaller than a cell,
+    so a point inside it is in the cell of one of its corners: if an
+    activity doesn't share any cell with the start (or end) box of a
+    segment, the activity can't match the segment.
+    """
+
+    GEOHASH_BITS = 25
+
+    @staticmethod
+    def bounds(latitudes, longitudes):
+        """Return (min_latitude, min_longitude, max_latitude, max_longitude)."""
+        return (
+            float(np.min(latitudes)), float(np.min(longitudes)),
+            float(np.max(latitudes)), float(np.max(longitudes))
+        )
+
+    @staticmethod
+    def intersects(bounds1, bounds2) -> bool:
+        """Return True if both bounds (see bounds method) intersect."""
+        return (
+            bounds1[0] <= bounds2[2] and bounds1[2] >= bounds2[0] and
+            bounds1[1] <= bounds2[3] and bounds1[3] >= bounds2[1]
+        )
+
+    @staticmethod
+    def cells(latitudes, longitudes) -> np.ndarray:
+        """Return the sorted coarse geohash cells of the points."""
+        return np.unique(RouteSignature.geohash(latitudes, longitudes, Footprint.GEOHASH_BITS))
+
+    @staticmethod
+    def box_cells(bbox: BoundingBox) -> np.ndarray:
+        """Return the cells of the corners of the bounding box."""
+        latitudes = [bbox.south.latitude, bbox.south.latitude, bbox.north.latitude, bbox.north.latitude]
+        longitudes = [bbox.west.longitude, bbox.east.longitude, bbox.west.longitude, bbox.east.longitude]
+        return Footprint.cells(latitudes, longitudes)
+
+    @staticmethod
+    def of_coordinates(coordinates):
+        """Compute the footprint of an activity.
+
+        Arguments:
+        coordinates -- iterable of (latitude, longitude).
+
+        Return:
+        A tuple (bounds, cells) or None if there aren't coordinates.
+        """
+        coordinates = np.array(
+            [c for c in coordinates if c[0] is not None and c[1] is not None], dtype=np.float64
+        ).reshape(-1, 2)
+        if len(coordinates) == 0:
+            return None
+        latitudes, longitudes = coordinates[:, 0], coordinates[:, 1]
+        return Footprint.bounds(latitudes, longitudes), Footprint.cells(latitudes, longitudes)
+
+    @staticmethod
+    def of_segment(coordinates, start_bbox: BoundingBox, end_bbox: BoundingBox):
+        """Compute the footprint of a segment.
+
+        Arguments:
+        coordinates -- list of (latitude, longitude) of the segment's points.
+        start_bbox  -- search box (BoundingBox) of the segment's start.
+        end_bbox    -- search box (BoundingBox) of the segment's end.
+
+        Return:
+        A tuple (bounds, start cells, end cells).
+        """
+        latitudes = [c[0] for c in coordinates]
+        longitudes = [c[1] for c in coordinates]
+        for bbox in (start_bbox, end_bbox):
+            latitudes += [bbox.south.latitude, bbox.north.latitude]
+            longitudes += [bbox.west.longitude, bbox.east.longitude]
+        return (
+            Footprint.bounds(latitudes, longitudes),
+            Footprint.box_cells(start_bbox),
+            Footprint.box_cells(end_bbox)
+        )
@@ -0,0 +1,59 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from pyopentracks.models.location import Location
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Haversine distance in meters between (lat1, lon1) and (lat2, lon2).
+
+    Arguments are numpy arrays (or floats) in decimal degrees and they
+    are broadcast, so it can compute a whole matrix of distances.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * Location.EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def discrete_frechet(p: np.ndarray, q: np.ndarray) -> float:
+    """Calculates the discrete Fréchet distance (meters) between two curves.
+
+    The coupling matrix is filled by anti-diagonals: every cell of an
+    anti-diagonal only depends on the two previous ones, so each of them
+    is computed at once with NumPy.
+
+    Arguments:
+    p -- numpy array of shape (n, 2) with latitudes and longitudes.
+    q -- numpy array of shape (m, 2) with latitudes and longitudes.
+    """
+    p = np.asarray(p, dtype=np.float64)
+    q = np.asarray(q, dtype=np.float64)
+    n_p, n_q = p.shape[0], q.shape[0]
+    d = haversine(p[:, 0][:, None], p[:, 1][:, None], q[:, 0][None, :], q[:, 1][None, :])
+
+    ca = np.empty((n_p, n_q), dtype=np.float64)
+    ca[0, :] = np.maximum.accumulate(d[0, :])
+    ca[:, 0] = np.maximum.accumulate(d[:, 0])
+    for k in range(2, n_p + n_q - 1):
+        i = np.arange(max(1, k - n_q + 1), min(n_p - 1, k - 1) + 1)
+        j = k - i
+        ca[i, j] = np.maximum(np.minimum(np.minimum(ca[i - 1, j], ca[i - 1, j - 1]), ca[i, j - 1]), d[i, j])
+    return float(ca[n_p - 1, n_q - 1])
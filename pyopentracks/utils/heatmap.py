@@ -0,0 +1,292 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+import os
+import shutil
+import struct
+import zlib
+
+import numpy as np
+
+from pyopentracks.utils.polyline import PolylineLod, PolylineSimplifier
+
+
+class HeatmapTile:
+    """XYZ (slippy map) tiles math and rasterization of heatmap tiles.
+
+    A heatmap tile's pixel value is the number of different activities
+    that pass through it. Tracks are rasterized as polylines: every
+    segment is clipped to the tile and sampled once per pixel.
+    """
+
+    TILE_SIZE = 256
+    MIN_ZOOM = 0
+    MAX_ZOOM = 17
+    # Number of activities over the same pixel that saturate the color.
+    SATURATION = 25
+    # Color ramp from a pixel visited once to a saturated one.
+    COLOR_STOPS = np.array([0.0, 0.5, 1.0])
+    COLORS = np.array([
+        [200, 30, 0],
+        [255, 170, 0],
+        [255, 255, 220],
+    ], dtype=np.float64)
+
+    @staticmethod
+    def world_pixels(latitudes, longitudes, zoom: int):
+        """Project latitudes and longitudes to pixels of the zoom's world map."""
+        scale = HeatmapTile.TILE_SIZE * 2 ** zoom
+        lat = np.radians(np.clip(latitudes, -85.05112878, 85.05112878))
+        x = (np.asarray(longitudes, dtype=np.float64) + 180.0) / 360.0 * scale
+        y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * scale
+        return x, y
+
+    @staticmethod
+    def bounds(zoom: int, x: int, y: int):
+        """Return (min_latitude, min_longitude, max_latitude, max_longitude) of the tile."""
+        n = 2 ** zoom
+
+        def latitude(tile_y):
+            return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+        return latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0
+
+    @staticmethod
+    def tiles_range(bounds, zoom: int, margin: float = 1.0):
+        """Return the tiles (min_x, min_y, max_x, max_y) that cover bounds on zoom.
+
+        Arguments:
+        bounds -- tuple (min_latitude, min_longitude, max_latitude, max_longitude).
+        zoom   -- zoom level.
+        margin -- pixels added around the bounds.
+        """
+        min_lat, min_lon, max_lat, max_lon = bounds
+        xs, ys = HeatmapTile.world_pixels(
+            np.array([max_lat, min_lat]), np.array([min_lon, max_lon]), zoom
+        )
+        last = 2 ** zoom - 1
+        to_tile = lambda pixel: min(max(int(pixel // HeatmapTile.TILE_SIZE), 0), last)
+        return (
+            to_tile(xs[0] - margin), to_tile(ys[0] - margin),
+            to_tile(xs[1] + margin), to_tile(ys[1] + margin)
+        )
+
+    @staticmethod
+    def rasterize(tracks, zoom: int, x: int, y: int) -> np.ndarray:
+        """Count the tracks that go through every pixel of the tile.
+
+        Arguments:
+        tracks -- list of tuples (latitudes, longitudes) of numpy arrays.
+                  NaN coordinates split a track in several polylines.
+        zoom, x, y -- the tile.
+
+        Return:
+        A (TILE_SIZE, TILE_SIZE) numpy array of integers.
+        """
+        size = HeatmapTile.TILE_SIZE
+        pixels = []
+        for latitudes, longitudes in tracks:
+            px, py = HeatmapTile.world_pixels(latitudes, longitudes, zoom)
+            px = px - x * size
+            py = py - y * size
+            if len(px) == 1:
+                px, py = np.repeat(px, 2), np.repeat(py, 2)
+            x0, y0 = px[:-1], py[:-1]
+            dx, dy = px[1:] - x0, py[1:] - y0
+            t0, t1, keep = HeatmapTile._clip(x0, y0, dx, dy, 0.0, float(size))
+            if not np.any(keep):
+                continue
+            x0, y0, dx, dy, t0, t1 = x0[keep], y0[keep], dx[keep], dy[keep], t0[keep], t1[keep]
+            x0, y0 = x0 + t0 * dx, y0 + t0 * dy
+            dx, dy = dx * (t1 - t0), dy * (t1 - t0)
+
+            # One sample per pixel crossed by every (clipped) segment.
+            steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.int64) + 1
+            segment = np.repeat(np.arange(len(steps)), steps)
+            offsets = np.arange(int(steps.sum())) - np.repeat(np.cumsum(steps) - steps, steps)
+            t = offsets / np.maximum(steps - 1, 1)[segment]
+            sx = np.floor(x0[segment] + t * dx[segment]).astype(np.int64)
+            sy = np.floor(y0[segment] + t * dy[segment]).astype(np.int64)
+            inside = (sx >= 0) & (sx < size) & (sy >= 0) & (sy < size)
+            # Every activity counts only once per pixel.
+            pixels.append(np.unique(sy[inside] * size + sx[inside]))
+
+        if not pixels:
+            return np.zeros((size, size), dtype=np.int64)
+        return np.bincount(np.concatenate(pixels), minlength=size * size).reshape(size, size)
+
+    @staticmethod
+    def _clip(x0, y0, dx, dy, low, high):
+        """Liang-Barsky clipping of segments (x0, y0) + t * (dx, dy) to a square.
+
+        Return:
+        A tuple (t0, t1, keep) where keep are the segments inside the square
+        and [t0, t1] the part of every segment inside it.
+        """
+        t0 = np.zeros(len(x0))
+        t1 = np.ones(len(x0))
+        outside = np.isnan(x0) | np.isnan(y0) | np.isnan(dx) | np.isnan(dy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for p, q in ((-dx, x0 - low), (dx, high - x0), (-dy, y0 - low), (dy, high - y0)):
+                r = q / p
+                outside |= (p == 0) & (q < 0)
+                t0 = np.where(p < 0, np.maximum(t0, r), t0)
+                t1 = np.where(p > 0, np.minimum(t1, r), t1)
+        return t0, t1, ~outside & (t0 <= t1)
+
+    @staticmethod
+    def colorize(counts) -> np.ndarray:
+        """Map counts to a (height, width, 4) RGBA array, log scaled."""
+        value = np.clip(np.log1p(counts) / math.log1p(HeatmapTile.SATURATION), 0, 1)
+        rgba = np.zeros(counts.shape + (4,), dtype=np.uint8)
+        for channel in range(3):
+            rgba[..., channel] = np.interp(value, HeatmapTile.COLOR_STOPS, HeatmapTile.COLORS[:, channel])
+        rgba[..., 3] = np.where(counts > 0, 150 + 105 * value, 0)
+        return rgba
+
+    @staticmethod
+    def to_png(rgba) -> bytes:
+        """Encode a (height, width, 4) uint8 array as a PNG image."""
+        height, width, _ = rgba.shape
+        raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+        raw[:, 1:] = rgba.reshape(height, width * 4)
+
+        def chunk(tag, data):
+            return (
+                struct.pack(">I", len(data)) + tag + data +
+                struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+            )
+
+        return (
+            b"\x89PNG\r\n\x1a\n" +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) +
+            chunk(b"IEND", b"")
+        )
+
+    @staticmethod
+    def render(tracks, zoom: int, x: int, y: int) -> bytes:
+        """Return the PNG image of the tile for tracks (see rasterize)."""
+        return HeatmapTile.to_png(HeatmapTile.colorize(HeatmapTile.rasterize(tracks, zoom, x, y)))
+
+
+class HeatmapTrack:
+    """The geometry of an activity stored to render heatmap tiles.
+
+    Tracks are simplified with the tolerance of the heatmap's maximum
+    zoom and stored as a blob of float32 latitudes and longitudes.
+    """
+
+    @staticmethod
+    def from_coordinates(coordinates):
+        """Build the geometry from a list of (latitude, longitude).
+
+        Return:
+        A tuple (bounds, blob) or None if there are not coordinates, where
+        bounds is (min_latitude, min_longitude, max_latitude, max_longitude).
+        """
+        coordinates = np.array(coordinates, dtype=np.float64).reshape(-1, 2)
+        coordinates = coordinates[~np.isnan(coordinates).any(axis=1)]
+        if len(coordinates) == 0:
+            return None
+        latitudes, longitudes = coordinates[:, 0], coordinates[:, 1]
+        x, y = PolylineLod.project(latitudes, longitudes)
+        indices = PolylineSimplifier.simplify(x, y, PolylineLod.tolerance(HeatmapTile.MAX_ZOOM))
+        bounds = (
+            float(latitudes.min()), float(longitudes.min()),
+            float(latitudes.max()), float(longitudes.max())
+        )
+        return bounds, coordinates[indices].astype("<f4").tobytes()
+
+    @staticmethod
+    def decode(blob):
+        """Return a tuple (latitudes, longitudes) of numpy arrays from the blob."""
+        coordinates = np.frombuffer(blob, dtype="<f4").reshape(-1, 2).astype(np.float64)
+        return coordinates[:, 0], coordinates[:, 1]
+
+
+class HeatmapTileCache:
+    """Disk cache of rendered heatmap tiles: {directory}/{z}/{x}/{y}.png"""
+
+    def __init__(self, directory: str = None):
+        self._directory = directory or HeatmapTileCache.default_directory()
+
+    @staticmethod
+    def default_directory() -> str:
+        from pyopentracks.settings import xdg_data_home
+        return os.path.join(xdg_data_home(), "heatmap")
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def path(self, zoom: int, x: int, y: int) -> str:
+        return os.path.join(self._directory, str(zoom), str(x), f"{y}.png")
+
+    def get(self, zoom: int, x: int, y: int):
+        """Return the PNG bytes of the tile or None if it's not cached."""
+        try:
+            with open(self.path(zoom, x, y), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, zoom: int, x: int, y: int, png: bytes) -> None:
+        filename = self.path(zoom, x, y)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Write and rename so readers never see a half written tile.
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(png)
+        os.replace(tmp, filename)
+
+    def invalidate(self, bounds) -> int:
+        """Remove the cached tiles, of all zoom levels, that intersect bounds.
+
+        Only the cached tiles are visited, not all tiles in bounds.
+
+        Arguments:
+        bounds -- tuple (min_latitude, min_longitude, max_latitude, max_longitude).
+
+        Return:
+        The number of tiles removed.
+        """
+        removed = 0
+        for zoom in range(HeatmapTile.MIN_ZOOM, HeatmapTile.MAX_ZOOM + 1):
+            zoom_dir = os.path.join(self._directory, str(zoom))
+            if not os.path.isdir(zoom_dir):
+                continue
+            min_x, min_y, max_x, max_y = HeatmapTile.tiles_range(bounds, zoom)
+            for x_name in os.listdir(zoom_dir):
+                if not x_name.isdigit() or not min_x <= int(x_name) <= max_x:
+                    continue
+                x_dir = os.path.join(zoom_dir, x_name)
+                for y_name in os.listdir(x_dir):
+                    y_value = y_name[:-len(".png")]
+                    if y_name.endswith(".png") and y_value.isdigit() and min_y <= int(y_value) <= max_y:
+                        try:
+                            os.remove(os.path.join(x_dir, y_name))
+                            removed += 1
+                        except OSError:
+                            pass
+        return removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self._directory, ignore_errors=True)
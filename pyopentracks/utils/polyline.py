@@ -0,0 +1,212 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PolylineSimplifier:
+    """Douglas-Peucker simplification of polylines.
+
+    Instead of simplifying a polyline once per tolerance, the algorithm
+    is run only one time to compute the significance of every vertex:
+    the largest tolerance that still keeps it. Simplifying for a given
+    tolerance is then a simple comparison over that array.
+    """
+
+    @staticmethod
+    def significance(x, y) -> np.ndarray:
+        """Compute the Douglas-Peucker significance of every vertex.
+
+        Arguments:
+        x -- numpy array with the x coordinates (projected, in meters).
+        y -- numpy array with the y coordinates (projected, in meters).
+
+        Return:
+        A numpy array with the significance of every vertex. First and
+        last vertices have infinite significance so they are always kept.
+        """
+        n = len(x)
+        sig = np.zeros(n, dtype=np.float64)
+        if n == 0:
+            return sig
+        sig[0] = sig[-1] = np.inf
+        if n < 3:
+            return sig
+
+        stack = [(0, n - 1, np.inf)]
+        while stack:
+            first, last, parent_sig = stack.pop()
+            if last - first < 2:
+                continue
+            dx = x[last] - x[first]
+            dy = y[last] - y[first]
+            px = x[first + 1:last] - x[first]
+            py = y[first + 1:last] - y[first]
+            length = math.hypot(dx, dy)
+            if length == 0:
+                distances = np.hypot(px, py)
+            else:
+                distances = np.abs(px * dy - py * dx) / length
+            idx = int(np.argmax(distances))
+            # A vertex can't be more significant than the one that split
+            # its range, otherwise thresholding wouldn't match Douglas-Peucker.
+            value = min(float(distances[idx]), parent_sig)
+            split = first + 1 + idx
+            sig[split] = value
+            stack.append((first, split, value))
+            stack.append((split, last, value))
+        return sig
+
+    @staticmethod
+    def simplify(x, y, tolerance: float) -> np.ndarray:
+        """Return the indices of the vertices kept for the tolerance."""
+        return np.flatnonzero(PolylineSimplifier.significance(x, y) > tolerance)
+
+
+class PolylineLod:
+    """Level of detail geometries of a polyline for every zoom level.
+
+    The polyline is projected to Web Mercator so the tolerance used
+    for every zoom level is the size (in meters) of a pixel on that zoom.
+    """
+
+    EARTH_RADIUS = 6378137.0
+    TILE_SIZE = 256
+    MIN_ZOOM = 0
+    MAX_ZOOM = 20
+    # Tolerance in pixels: vertices closer than this to the simplified
+    # line can't be distinguished on screen.
+    PIXEL_TOLERANCE = 0.5
+
+    def __init__(self, latitudes, longitudes):
+        self._latitudes = np.asarray(latitudes, dtype=np.float64)
+        self._longitudes = np.asarray(longitudes, dtype=np.float64)
+        x, y = PolylineLod.project(self._latitudes, self._longitudes)
+        significance = PolylineSimplifier.significance(x, y)
+        self._levels = {}
+        previous = None
+        for zoom in range(PolylineLod.MIN_ZOOM, PolylineLod.MAX_ZOOM + 1):
+            indices = np.flatnonzero(significance > PolylineLod.tolerance(zoom))
+            if previous is not None and len(previous) == len(indices):
+                # Same geometry than the previous zoom: share it.
+                indices = previous
+            self._levels[zoom] = indices
+            previous = indices
+
+    @staticmethod
+    def from_points(points):
+        """Build a PolylineLod from objects with latitude and longitude."""
+        latitudes = np.fromiter((p.latitude for p in points), dtype=np.float64, count=len(points))
+        longitudes = np.fromiter((p.longitude for p in points), dtype=np.float64, count=len(points))
+        return PolylineLod(latitudes, longitudes)
+
+    @staticmethod
+    def project(latitudes, longitudes):
+        """Project latitudes and longitudes to Web Mercator meters."""
+        lat = np.radians(np.clip(latitudes, -85.05112878, 85.05112878))
+        x = PolylineLod.EARTH_RADIUS * np.radians(longitudes)
+        y = PolylineLod.EARTH_RADIUS * np.log(np.tan(math.pi / 4 + lat / 2))
+        return x, y
+
+    @staticmethod
+    def tolerance(zoom: int) -> float:
+        """Return the tolerance in meters (Web Mercator) for the zoom level."""
+        meters_per_pixel = 2 * math.pi * PolylineLod.EARTH_RADIUS / (PolylineLod.TILE_SIZE * 2 ** zoom)
+        return meters_per_pixel * PolylineLod.PIXEL_TOLERANCE
+
+    def __len__(self):
+        return len(self._latitudes)
+
+    @property
+    def latitudes(self):
+        return self._latitudes
+
+    @property
+    def longitudes(self):
+        return self._longitudes
+
+    def indices(self, zoom: float) -> np.ndarray:
+        """Return the indices of the vertices to be drawn on zoom level."""
+        zoom = min(max(int(math.ceil(zoom)), PolylineLod.MIN_ZOOM), PolylineLod.MAX_ZOOM)
+        return self._levels[zoom]
+
+    def coordinates(self, zoom: float):
+        """Return a list of (latitude, longitude) to be drawn on zoom level."""
+        indices = self.indices(zoom)
+        return list(zip(self._latitudes[indices].tolist(), self._longitudes[indices].tolist()))
+
+    def bounds(self):
+        """Return (min_latitude, min_longitude, max_latitude, max_longitude)."""
+        return (
+            float(self._latitudes.min()), float(self._longitudes.min()),
+            float(self._latitudes.max()), float(self._longitudes.max())
+        )
+
+
+class PolylineLodCache:
+    """Process-wide cache of PolylineLod objects.
+
+    Keys are tuples like ("activity", activity_id) or ("segment", segment_id)
+    so the geometries are computed only once while the app is running.
+    """
+
+    MAX_ENTRIES = 32
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(key, points) -> PolylineLod:
+        """Return the PolylineLod for key, building it from points if needed.
+
+        Arguments:
+        key    -- cache's key or None to build the geometries without caching.
+        points -- list of objects with latitude and longitude properties.
+        """
+        if key is None:
+            return PolylineLod.from_points(points)
+
+        with PolylineLodCache._lock:
+            lod = PolylineLodCache._cache.get(key)
+            if lod is not None and len(lod) == len(points):
+                PolylineLodCache._cache.move_to_end(key)
+                return lod
+
+        lod = PolylineLod.from_points(points)
+        with PolylineLodCache._lock:
+            PolylineLodCache._cache[key] = lod
+            PolylineLodCache._cache.move_to_end(key)
+            while len(PolylineLodCache._cache) > PolylineLodCache.MAX_ENTRIES:
+                PolylineLodCache._cache.popitem(last=False)
+        return lod
+
+    @staticmethod
+    def invalidate(key) -> None:
+        with PolylineLodCache._lock:
+            PolylineLodCache._cache.pop(key, None)
+
+    @staticmethod
+    def clear() -> None:
+        with PolylineLodCache._lock:
+            PolylineLodCache._cache.clear()
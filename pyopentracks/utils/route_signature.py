@@ -0,0 +1,127 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from pyopentracks.utils.frechet import haversine, discrete_frechet
+
+
+class RouteSignature:
+    """Compact signature of the route of an activity.
+
+    The signature is the set of geohash cells visited by the route: the
+    route is resampled every SPACING meters (so fast activities don't
+    skip cells) and every point is encoded as an integer geohash of
+    GEOHASH_BITS bits (35 bits are 7 geohash characters, cells of about
+    150 x 150 meters).
+
+    Two routes are similar when the Jaccard index of their cells is
+    high. As it doesn't take into account the order of the points, the
+    candidates that aren't clearly the same route are verified with the
+    Fréchet distance of their resampled polylines.
+    """
+
+    SPACING = 50
+    GEOHASH_BITS = 35
+
+    # Candidates with a Jaccard index lower than MIN_SIMILARITY are discarded
+    # and the ones with SURE_SIMILARITY or more don't need to be verified.
+    MIN_SIMILARITY = 0.5
+    SURE_SIMILARITY = 0.85
+    # Number of points of the polylines compared with Fréchet.
+    FRECHET_POINTS = 150
+    FRECHET_THRESHOLD = 250.0
+
+    @staticmethod
+    def resample(latitudes, longitudes, spacing: float = SPACING):
+        """Resample the polyline every spacing meters.
+
+        Return:
+        A tuple of numpy arrays (latitudes, longitudes).
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if len(latitudes) < 2:
+            return latitudes, longitudes
+        distances = np.zeros(len(latitudes), dtype=np.float64)
+        distances[1:] = np.cumsum(haversine(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:]))
+        num = max(2, int(np.ceil(distances[-1] / spacing)) + 1)
+        stations = np.linspace(0, distances[-1], num)
+        return np.interp(stations, distances, latitudes), np.interp(stations, distances, longitudes)
+
+    @staticmethod
+    def geohash(latitudes, longitudes, bits: int = GEOHASH_BITS) -> np.ndarray:
+        """Integer geohashes of the points.
+
+        Longitude and latitude bits are interleaved like in a geohash
+        (longitude first), so the integer written in base 32 is the
+        geohash string.
+        """
+        lon_bits = (bits + 1) // 2
+        lat_bits = bits // 2
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        lat_q = np.clip(((lat + 90) / 180 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+        lon_q = np.clip(((lon + 180) / 360 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+
+        # The last bit is always a longitude's one.
+        lon_shift = 0 if bits % 2 else 1
+        code = np.zeros(len(lat), dtype=np.int64)
+        for k in range(lon_bits):
+            code |= ((lon_q >> k) & 1) << (2 * k + lon_shift)
+        for k in range(lat_bits):
+            code |= ((lat_q >> k) & 1) << (2 * k + 1 - lon_shift)
+        return code
+
+    @staticmethod
+    def cells(latitudes, longitudes) -> np.ndarray:
+        """Return the sorted geohash cells visited by the route."""
+        if len(latitudes) == 0:
+            return np.empty(0, dtype=np.int64)
+        latitudes, longitudes = RouteSignature.resample(latitudes, longitudes)
+        return np.unique(RouteSignature.geohash(latitudes, longitudes))
+
+    @staticmethod
+    def jaccard(num_cells1: int, num_cells2: int, shared: int) -> float:
+        union = num_cells1 + num_cells2 - shared
+        return shared / union if union > 0 else 0.0
+
+    @staticmethod
+    def same_route(coordinates1, coordinates2) -> bool:
+        """Verify with Fréchet that two routes are the same.
+
+        Arguments:
+        coordinates1 -- numpy array of shape (n, 2) with latitudes and longitudes.
+        coordinates2 -- numpy array of shape (m, 2) with latitudes and longitudes.
+        """
+        p = RouteSignature._polyline(coordinates1)
+        q = RouteSignature._polyline(coordinates2)
+        if len(p) == 0 or len(q) == 0:
+            return False
+        return discrete_frechet(p, q) < RouteSignature.FRECHET_THRESHOLD
+
+    @staticmethod
+    def _polyline(coordinates):
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(coordinates) < 2:
+            return coordinates
+        latitudes, longitudes = RouteSignature.resample(coordinates[:, 0], coordinates[:, 1])
+        indices = np.linspace(0, len(latitudes) - 1, min(len(latitudes), RouteSignature.FRECHET_POINTS))
+        indices = np.round(indices).astype(np.int64)
+        return np.column_stack((latitudes[indices], longitudes[indices]))
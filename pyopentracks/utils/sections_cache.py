@@ -0,0 +1,96 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import threading
+
+from collections import OrderedDict
+
+
+class SectionsCache:
+    """Process-wide cache of the sections (with their track points) of activities.
+
+    Keys are activities' ids. Every screen showing an activity gets the
+    same Section objects so an activity is read from the database only
+    once while it's in the cache. The memory is bounded by the number of
+    track points kept (MAX_TRACK_POINTS): least recently used activities
+    are evicted first.
+    """
+
+    MAX_TRACK_POINTS = 500000
+    MAX_ENTRIES = 64
+
+    _cache = OrderedDict()
+    _num_track_points = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(activity_id, loader) -> list:
+        """Return the list of sections of the activity, loading them if needed.
+
+        Arguments:
+        activity_id -- activity's id or None to load them without caching.
+        loader      -- function without arguments that returns the list of
+                       sections of the activity.
+        """
+        if activity_id is None:
+            return loader()
+
+        with SectionsCache._lock:
+            entry = SectionsCache._cache.get(activity_id)
+            if entry is not None:
+                SectionsCache._cache.move_to_end(activity_id)
+                return list(entry[0])
+
+        sections = loader()
+        num_track_points = sum(len(section.track_points) for section in sections)
+        if num_track_points > SectionsCache.MAX_TRACK_POINTS:
+            return sections
+
+        with SectionsCache._lock:
+            previous = SectionsCache._cache.pop(activity_id, None)
+            if previous is not None:
+                SectionsCache._num_track_points -= previous[1]
+            SectionsCache._cache[activity_id] = (sections, num_track_points)
+            SectionsCache._num_track_points += num_track_points
+            while (
+                SectionsCache._num_track_points > SectionsCache.MAX_TRACK_POINTS or
+                len(SectionsCache._cache) > SectionsCache.MAX_ENTRIES
+            ):
+                _, (_, evicted) = SectionsCache._cache.popitem(last=False)
+                SectionsCache._num_track_points -= evicted
+        return list(sections)
+
+    @staticmethod
+    def invalidate(activity_id) -> None:
+        with SectionsCache._lock:
+            entry = SectionsCache._cache.pop(activity_id, None)
+            if entry is not None:
+                SectionsCache._num_track_points -= entry[1]
+
+    @staticmethod
+    def clear() -> None:
+        with SectionsCache._lock:
+            SectionsCache._cache.clear()
+            SectionsCache._num_track_points = 0
+
+    @staticmethod
+    def num_track_points() -> int:
+        """Return the number of track points in the cache."""
+        with SectionsCache._lock:
+            return SectionsCache._num_track_points
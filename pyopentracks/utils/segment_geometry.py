@@ -0,0 +1,101 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+
+import numpy as np
+
+from pyopentracks.utils.frechet import haversine
+from pyopentracks.utils.polyline import PolylineLod, PolylineSimplifier
+from pyopentracks.utils.route_signature import RouteSignature
+
+
+class SegmentGeometry:
+    """Geometry of segments and tracks compared with Fréchet.
+
+    Both curves are resampled every SPACING meters along their distance,
+    so the cost of the Fréchet distance depends on the length of the
+    segment and not on the recording rate of the activities. Very long
+    segments use a bigger spacing: they never have more than MAX_POINTS.
+
+    Segments' points can also be simplified (Douglas-Peucker) with a
+    SIMPLIFY_TOLERANCE meters tolerance before storing them if the caller
+    asks for it.
+    """
+
+    SPACING = 10.0
+    MAX_POINTS = 1000
+    SIMPLIFY_TOLERANCE = 1.0
+
+    @staticmethod
+    def spacing(coordinates) -> float:
+        """Return the spacing (meters) used to resample the curve."""
+        if len(coordinates) < 2:
+            return SegmentGeometry.SPACING
+        length = float(np.sum(haversine(
+            coordinates[:-1, 0], coordinates[:-1, 1], coordinates[1:, 0], coordinates[1:, 1]
+        )))
+        # Resampling rounds the number of intervals up: MAX_POINTS - 2 leaves room for it.
+        return max(SegmentGeometry.SPACING, length / (SegmentGeometry.MAX_POINTS - 2))
+
+    @staticmethod
+    def resample(coordinates) -> np.ndarray:
+        """Resample the curve along its distance.
+
+        Arguments:
+        coordinates -- numpy array of shape (n, 2) with latitudes and longitudes.
+
+        Return:
+        A numpy array of shape (m, 2) with the resampled curve.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(coordinates) < 2:
+            return coordinates
+        latitudes, longitudes = RouteSignature.resample(
+            coordinates[:, 0], coordinates[:, 1], SegmentGeometry.spacing(coordinates)
+        )
+        return np.column_stack((latitudes, longitudes))
+
+    @staticmethod
+    def simplify(points, tolerance: float = SIMPLIFY_TOLERANCE) -> list:
+        """Simplify a polyline.
+
+        Arguments:
+        points    -- list of objects with latitude and longitude.
+        tolerance -- tolerance in meters.
+
+        Return:
+        The list of points kept (first and last ones are always kept).
+        """
+        if len(points) < 3:
+            return list(points)
+        latitudes = np.fromiter((p.latitude for p in points), dtype=np.float64, count=len(points))
+        longitudes = np.fromiter((p.longitude for p in points), dtype=np.float64, count=len(points))
+        x, y = PolylineLod.project(latitudes, longitudes)
+        # Web Mercator meters are 1 / cos(latitude) bigger than the real ones.
+        scale = 1 / max(math.cos(math.radians(float(np.mean(latitudes)))), 1e-6)
+        return [points[i] for i in PolylineSimplifier.simplify(x, y, tolerance * scale).tolist()]
+
+    @staticmethod
+    def encode(coordinates) -> bytes:
+        return np.asarray(coordinates, dtype="<f8").tobytes()
+
+    @staticmethod
+    def decode(blob) -> np.ndarray:
+        return np.frombuffer(blob, dtype="<f8").reshape(-1, 2)
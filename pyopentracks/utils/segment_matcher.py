@@ -0,0 +1,165 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import math
+
+import numpy as np
+
+from pyopentracks.models.location import BoundingBox
+
+
+class SegmentMatcher:
+    """Find, in one pass over the track points of an activity, where segments start and end.
+
+    The search boxes of the segments' endpoints are indexed in a grid of
+    CELL_SIZE degrees. Every track point is looked up only in the cell
+    it's in, and the points that fall inside a search box (strictly, as
+    the old SQL lookups did) are grouped by box.
+
+    For every segment, the start candidates are the points inside its
+    start box, only one every START_WINDOW_MS (the last one of every
+    group of points) so a stop near the start doesn't give dozens of
+    candidates. The end candidate of a start is the first point after
+    it inside the end box.
+    """
+
+    CELL_SIZE = 0.001
+    START_WINDOW_MS = 60 * 1000
+
+    def __init__(self):
+        self._keys = []
+        self._boxes = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, start_bbox: BoundingBox, end_bbox: BoundingBox) -> None:
+        """Add a segment to the matcher.
+
+        Arguments:
+        key        -- segment's key returned by match (any object).
+        start_bbox -- search box (BoundingBox) of the segment's start.
+        end_bbox   -- search box (BoundingBox) of the segment's end.
+        """
+        self._keys.append(key)
+        for bbox in (start_bbox, end_bbox):
+            self._boxes.append(
+                (bbox.south.latitude, bbox.west.longitude, bbox.north.latitude, bbox.east.longitude)
+            )
+
+    @staticmethod
+    def _cell_keys(latitudes, longitudes) -> np.ndarray:
+        rows = np.floor((np.asarray(latitudes) + 90) / SegmentMatcher.CELL_SIZE).astype(np.int64)
+        columns = np.floor((np.asarray(longitudes) + 180) / SegmentMatcher.CELL_SIZE).astype(np.int64)
+        return rows << 32 | columns
+
+    def _grid(self):
+        """Return the grid as sorted cells' keys, offsets and boxes' indices (CSR format)."""
+        cells = {}
+        for i, (south, west, north, east) in enumerate(self._boxes):
+            rows = range(
+                math.floor((south + 90) / SegmentMatcher.CELL_SIZE), math.floor((north + 90) / SegmentMatcher.CELL_SIZE) + 1
+            )
+            columns = range(
+                math.floor((west + 180) / SegmentMatcher.CELL_SIZE), math.floor((east + 180) / SegmentMatcher.CELL_SIZE) + 1
+            )
+            for row in rows:
+                for column in columns:
+                    cells.setdefault(row << 32 | column, []).append(i)
+        keys = np.array(sorted(cells), dtype=np.int64)
+        counts = np.array([len(cells[k]) for k in keys.tolist()], dtype=np.int64)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        boxes = np.array([i for k in keys.tolist() for i in cells[k]], dtype=np.int64)
+        return keys, offsets, boxes
+
+    def _hits(self, latitudes, longitudes):
+        """Return a list with the sorted indices of the points inside every box."""
+        hits = [np.empty(0, dtype=np.int64)] * len(self._boxes)
+        if not self._boxes or len(latitudes) == 0:
+            return hits
+        keys, offsets, boxes = self._grid()
+        point_keys = SegmentMatcher._cell_keys(latitudes, longitudes)
+        pos = np.minimum(np.searchsorted(keys, point_keys), len(keys) - 1)
+        points = np.flatnonzero(keys[pos] == point_keys)
+        if len(points) == 0:
+            return hits
+
+        # Every (point, box) pair of the cells the points are in.
+        first = offsets[pos[points]]
+        counts = offsets[pos[points] + 1] - first
+        pair_points = np.repeat(points, counts)
+        pair_boxes = boxes[np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+
+        bounds = np.array(self._boxes, dtype=np.float64)[pair_boxes]
+        lat = latitudes[pair_points]
+        lon = longitudes[pair_points]
+        inside = (lat > bounds[:, 0]) & (lat < bounds[:, 2]) & (lon > bounds[:, 1]) & (lon < bounds[:, 3])
+        pair_points, pair_boxes = pair_points[inside], pair_boxes[inside]
+
+        order = np.lexsort((pair_points, pair_boxes))
+        pair_points, pair_boxes = pair_points[order], pair_boxes[order]
+        splits = np.searchsorted(pair_boxes, np.arange(len(self._boxes) + 1))
+        return [pair_points[splits[i]:splits[i + 1]] for i in range(len(self._boxes))]
+
+    @staticmethod
+    def filter_starts(indices, times) -> list:
+        """Keep the last start candidate of every group of START_WINDOW_MS.
+
+        Arguments:
+        indices -- sorted indices of the points inside a start box.
+        times   -- numpy array with the time (ms) of all points.
+        """
+        result = []
+        group_time = None
+        for i in indices.tolist():
+            if group_time is not None and abs(times[i] - group_time) > SegmentMatcher.START_WINDOW_MS:
+                group_time = None
+            if group_time is None:
+                group_time = times[i]
+                result.append(i)
+            else:
+                result[-1] = i
+        return result
+
+    def match(self, latitudes, longitudes, times) -> list:
+        """Look for the segments in the track points of an activity.
+
+        Arguments:
+        latitudes  -- numpy array with the latitudes of the track points (sorted).
+        longitudes -- numpy array with the longitudes of the track points.
+        times      -- numpy array with the time (ms) of the track points.
+
+        Return:
+        A list of tuples (segment's key, start index, end index) with the
+        candidates to be verified (with Fréchet, for example).
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        hits = self._hits(latitudes, longitudes)
+        result = []
+        for k, key in enumerate(self._keys):
+            starts, ends = hits[2 * k], hits[2 * k + 1]
+            if len(starts) == 0 or len(ends) == 0:
+                continue
+            for start in SegmentMatcher.filter_starts(starts, times):
+                j = np.searchsorted(ends, start, side="right")
+                if j < len(ends):
+                    result.append((key, start, int(ends[j])))
+        return result
@@ -17,8 +17,11 @@ You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
 import os.path
+import re
 import time
 
+import numpy as np
+
 from gi.repository import GdkPixbuf
 
 from collections import namedtuple
@@ -175,6 +178,14 @@ class TimeUtils:
     def ms_to_inline_shorten_str(time_ms: float) -> str:
         return TimeUtils.ms_to_str(time_ms, True, True)
 
+    # Layouts written by GPX writers: YYYY-MM-DDTHH:MM:SS(.ffffff) with Z or
+    # +-hh:mm (or +-hhmm) offset. Other strings are parsed by isoparse.
+    ISO_FAST_RE = re.compile(
+        r"(((?!0000)\d{4})-(\d{2})-(\d{2})T([01]\d|2[0-3]):([0-5]\d):([0-5]\d)(?:\.(\d{1,6}))?)"
+        r"(?:Z|([+-])([01]\d|2[0-3]):?([0-5]\d))"
+    )
+    _EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
     @staticmethod
     def iso_to_ms(date_time: str) -> float:
         """From ISO 8601 string date to milliseconds.
@@ -185,7 +196,66 @@ class TimeUtils:
         Returns:
         date_time's milliseconds.
         """
-        return isoparse(date_time).timestamp() * 1000
+        match = TimeUtils.ISO_FAST_RE.fullmatch(date_time)
+        if match is None:
+            return isoparse(date_time).timestamp() * 1000
+        _, year, month, day, hour, minute, second, fraction, sign, offset_hours, offset_minutes = match.groups()
+        try:
+            days = date(int(year), int(month), int(day)).toordinal() - TimeUtils._EPOCH_ORDINAL
+        except ValueError:
+            return isoparse(date_time).timestamp() * 1000
+        seconds = days * 86400 + int(hour) * 3600 + int(minute) * 60 + int(second)
+        seconds -= TimeUtils._offset_seconds(sign, offset_hours, offset_minutes)
+        microseconds = seconds * 10**6 + (int(fraction.ljust(6, "0")) if fraction else 0)
+        # The same operations than datetime.timestamp so results are identical.
+        return microseconds / 10**6 * 1000
+
+    @staticmethod
+    def isos_to_ms(dates_times: List[str]) -> List[float]:
+        """From a list of ISO 8601 string dates to milliseconds.
+
+        The strings with the layouts written by GPX writers are converted at
+        once with numpy.datetime64. The others are converted one by one by
+        iso_to_ms.
+
+        Arguments:
+        dates_times -- list of ISO 8601 date time strings.
+
+        Returns:
+        list with the milliseconds of every date time.
+        """
+        indices, bases, offsets = [], [], []
+        for i, date_time in enumerate(dates_times):
+            match = TimeUtils.ISO_FAST_RE.fullmatch(date_time)
+            if match is not None:
+                indices.append(i)
+                bases.append(match.group(1))
+                offsets.append(TimeUtils._offset_seconds(*match.group(9, 10, 11)))
+
+        result = [None] * len(dates_times)
+        if indices:
+            try:
+                microseconds = np.array(bases, dtype="datetime64[us]").astype(np.int64)
+            except ValueError:
+                # Some date doesn't exist (for example, February 30).
+                indices = []
+            else:
+                microseconds -= np.array(offsets, dtype=np.int64) * 10**6
+                for i, value in zip(indices, (microseconds / 10**6 * 1000).tolist()):
+                    result[i] = value
+        converted = set(indices)
+        for i, date_time in enumerate(dates_times):
+            if i not in converted:
+                result[i] = TimeUtils.iso_to_ms(date_time)
+        return result
+
+    @staticmethod
+    def _offset_seconds(sign, hours, minutes) -> int:
+        """Return the seconds of the +-hh:mm offset (0 if there is not sign, i.e. Z)."""
+        if sign is None:
+            return 0
+        seconds = int(hours) * 3600 + int(minutes) * 60
+        return seconds if sign == "+" else -seconds
 
     @staticmethod
     def ms_to_iso(millis: int) -> str:
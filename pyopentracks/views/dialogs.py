@@ -23,6 +23,8 @@ from gi.repository import Gtk, GLib
 from pyopentracks.io.import_handler import ImportHandler
 from pyopentracks.io.export_handler import ExportAllHandler
 from pyopentracks.io.importer.importer import ImportResult
+from pyopentracks.tasks.stats_recompute import StatsRecompute
+from pyopentracks.utils import logging as pyot_logging
 from pyopentracks.utils.utils import TypeActivityUtils as TAU
 from pyopentracks.models.database_helper import DatabaseHelper
 
@@ -231,19 +233,26 @@ class ImportResultDialog(ImportExportResultDialog):
 
 
 class ExportResultDialog(ImportExportResultDialog):
-    def __init__(self, parent, folder, on_response_cb=None):
+    def __init__(self, parent, folder, on_response_cb=None, archive=False, incremental=False):
         self._total = 0
         self._exported = 0
         self._errors = []
+        self._archive = archive
+        self._incremental = incremental
         super().__init__(parent, folder, _("Exporting..."), _("Exporting files to folder:"), on_response_cb)
 
     def _start(self):
-        handler = ExportAllHandler(self._folder, self._export_all_ended)
-        handler.run()
+        handler = ExportAllHandler(self._folder, self._export_all_ended, self._archive, self._incremental)
         handler.connect("total-activities-to-export", self._total_activities_cb)
+        handler.run()
 
     def _total_activities_cb(self, handler: ExportAllHandler, total_activities):
         self._total = total_activities
+        if self._total == 0:
+            self._progress.set_fraction(1)
+            self._label.set_text(_("There are not activities to export"))
+            self._button.show()
+            return
         self._label.set_text(f"{self._exported} / {self._total}")
 
     def _export_all_ended(self, result):
@@ -525,24 +534,27 @@ class ActivitiesRemoveDialog(Gtk.Window):
         threading.Thread(target=self._delete_in_thread, daemon=True).start()
 
     def _delete_in_thread(self):
-        done = 0
-        total = len(self._activities_ids)
-        for id in self._activities_ids:
-            try:
-                activity = DatabaseHelper.get_activity_by_id(id)
-                DatabaseHelper.delete(activity)
-                done += 1
-                self._label.set_text(f"{done} / {total}")
-                self._progress.set_fraction(done/total)
-            except ValueError:
-                pyot_logging.get_logger(__name__).exception(
-                    f"Error: deleting activity {id}"
-                )
-        GLib.idle_add(self._deletion_done)
-
-    def _deletion_done(self):
-        self._title_lbl.set_text(_(f"Activities deleted: {len(self._activities_ids)}"))
+        deleted = DatabaseHelper.delete_activities(
+            self._activities_ids,
+            on_progress=lambda done, total: GLib.idle_add(self._on_progress, done, total),
+            vacuum=True
+        )
+        if deleted is None:
+            pyot_logging.get_logger(__name__).error(f"Error: deleting activities {self._activities_ids}")
+        GLib.idle_add(self._deletion_done, deleted)
+
+    def _on_progress(self, done, total):
+        self._label.set_text(f"{done} / {total}")
+        self._progress.set_fraction(done / total)
+        return False
+
+    def _deletion_done(self, deleted):
+        if deleted is None:
+            self._title_lbl.set_text(_("Activities could not be deleted"))
+        else:
+            self._title_lbl.set_text(_(f"Activities deleted: {len(self._activities_ids)}"))
         self._button.show()
+        return False
 
     def _on_destroy(self, window):
         self._on_response_cb(Gtk.ResponseType.ACCEPT)
@@ -552,3 +564,96 @@ class ActivitiesRemoveDialog(Gtk.Window):
         self._on_response_cb(Gtk.ResponseType.ACCEPT)
         self.destroy()
 
+
+class StatsRecomputeDialog(Gtk.Window):
+    """Modal Gtk.Window to recompute the stats of all activities on background.
+
+    Closing the window stops the job: the next run resumes it.
+    """
+
+    def __init__(self, parent, on_response_cb):
+        super().__init__()
+
+        # General properties
+        self._on_response_cb = on_response_cb
+        self._job = StatsRecompute()
+        self._running = False
+
+        self.connect("close-request", self._on_destroy)
+
+        # Header bar with the Ok button
+        header_bar = Gtk.HeaderBar()
+        self._button = Gtk.Button.new_with_label(_("Ok"))
+        self._button.connect("clicked", self._on_button_clicked)
+        self._button.hide()
+        header_bar.pack_start(self._button)
+
+        # The title
+        self._title_lbl = Gtk.Label.new(_("Recomputing stats..."))
+        self._title_lbl.get_style_context().add_class("pyot-h3")
+        self._title_lbl.set_margin_top(10)
+
+        # The progress bar
+        self._progress = Gtk.ProgressBar()
+
+        # Message
+        self._label = Gtk.Label.new("")
+        self._label.set_margin_top(10)
+        self._label.set_margin_bottom(10)
+        self._label.set_margin_start(10)
+        self._label.set_margin_end(10)
+        self._label.get_style_context().add_class("pyot-p-medium")
+
+        # Main box inside a scrolled window with all the contents
+        scrolled_window = Gtk.ScrolledWindow()
+        self._box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=20)
+        self._box.set_margin_top(20)
+        self._box.set_margin_bottom(20)
+        self._box.set_margin_start(20)
+        self._box.set_margin_end(20)
+        scrolled_window.set_child(self._box)
+
+        self._box.append(self._title_lbl)
+        self._box.append(self._progress)
+        self._box.append(self._label)
+
+        # Properties of the window with the content
+        self.set_transient_for(parent)
+        self.set_modal(True)
+        self.set_default_size(600, 400)
+        self.set_titlebar(header_bar)
+        self.set_child(scrolled_window)
+
+    def show_and_run(self):
+        self.show()
+        self._running = True
+        threading.Thread(target=self._recompute_in_thread, daemon=True).start()
+
+    def _recompute_in_thread(self):
+        done = 0
+        try:
+            total = self._job.start()
+            GLib.idle_add(self._on_progress, 0, total)
+            done = self._job.run(lambda d, t: GLib.idle_add(self._on_progress, d, t))
+        except Exception as error:
+            pyot_logging.get_logger(__name__).exception(f"Error: recomputing stats: {error}")
+        GLib.idle_add(self._recompute_done, done)
+
+    def _on_progress(self, done, total):
+        self._label.set_text(f"{done} / {total}")
+        self._progress.set_fraction(done / total if total else 1)
+
+    def _recompute_done(self, done):
+        self._running = False
+        self._title_lbl.set_text(_("Activities recomputed: ") + str(done))
+        self._button.show()
+
+    def _on_destroy(self, window):
+        if self._running:
+            self._job.stop()
+        self._on_response_cb(Gtk.ResponseType.ACCEPT)
+        self.destroy()
+
+    def _on_button_clicked(self, button):
+        self._on_response_cb(Gtk.ResponseType.ACCEPT)
+        self.destroy()
@@ -79,8 +79,15 @@ class ImportFileChooserDialog(CustomFileChooserDialog):
         filter_gpx_fit.set_name(_("GPX and FIT files"))
         filter_gpx_fit.add_mime_type("application/gpx+xml")
         filter_gpx_fit.add_pattern("*.fit")
+        filter_gpx_fit.add_pattern("*.gpx.gz")
+        filter_gpx_fit.add_pattern("*.fit.gz")
         self.add_filter(filter_gpx_fit)
 
+        filter_archives = Gtk.FileFilter()
+        filter_archives.set_name(_("Zip archives"))
+        filter_archives.add_pattern("*.zip")
+        self.add_filter(filter_archives)
+
         filter_only_gpx = Gtk.FileFilter()
         filter_only_gpx.set_name(_("GPX files"))
         filter_only_gpx.add_mime_type("application/gpx+xml")
@@ -139,6 +146,8 @@ class FileChooserWindow(CustomFileChooserDialog):
         filter_gpx_fit.set_name(_("GPX and FIT files"))
         filter_gpx_fit.add_mime_type("application/gpx+xml")
         filter_gpx_fit.add_pattern("*.fit")
+        filter_gpx_fit.add_pattern("*.gpx.gz")
+        filter_gpx_fit.add_pattern("*.fit.gz")
         self.add_filter(filter_gpx_fit)
 
         filter_only_gpx = Gtk.FileFilter()
@@ -19,10 +19,14 @@ along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 
 import numpy as np
 
+from bisect import bisect_left
+
 from matplotlib.backends.backend_gtk4agg import (
     FigureCanvasGTK4Agg as FigureCanvas)
 from matplotlib.figure import Figure
 
+from pyopentracks.utils.chart_series import ChartSeries
+
 
 class BarsChart:
     def __init__(self, results, orientation="horizontal", width_ratio=1, height_ratio=2.5, min_height=400, colors=None, cb_annotate=None):
@@ -302,12 +306,15 @@ class StackedBarsChart:
 
 class LinePlot:
     EVENT_X_CURSOR_POS = 1
+    # Number of points plotted for every series: about one per pixel.
+    DEFAULT_WIDTH = 1000
 
     def __init__(self):
         self._figure = Figure()
         self._figure.subplots()
         self._canvas = FigureCanvas(self._figure)
         self._canvas.set_size_request(400, 200)
+        self._series = None
 
     def add_values(self, values):
         """Add values to the LinePlot object.
@@ -326,23 +333,47 @@ class LinePlot:
         self._yvalues = [item["elevation"] for item in values]
         self._locations = [item["location"] for item in values]
 
+        self._setup_axes()
+        self._axes.fill_between(self._xvalues, 0, self._yvalues, facecolor="green", alpha=0.5)
+
+        # Second axes with different top and bottom scales for heart rate.
+        yheart_rates = [item["hr"] for item in values]
+        if sum(yheart_rates) > 0:
+            self._setup_hr_axes().plot(self._xvalues, yheart_rates, color="red")
+
+    def add_series(self, series: ChartSeries, width: int = DEFAULT_WIDTH):
+        """Add the elevation and heart rate of the ChartSeries.
+
+        Every series is downsampled to width points with LTTB.
+
+        Arguments:
+        series -- ChartSeries object.
+        width  -- (optional) number of points to be plotted per series.
+        """
+        self._series = series
+
+        self._setup_axes()
+        x, y = series.downsample(series.elevation, width)
+        self._axes.fill_between(x, 0, y, facecolor="green", alpha=0.5)
+
+        if series.has_hr:
+            x, y = series.downsample(series.hr, width)
+            self._setup_hr_axes().plot(x, y, color="red")
+
+    def _setup_axes(self):
         self._axes = self._figure.axes[0]
         self._axes.spines["left"].set_visible(True)
         self._axes.spines["right"].set_visible(False)
         self._axes.spines["bottom"].set_visible(True)
         self._axes.spines["top"].set_visible(False)
-        #self._axes.plot([0, 200],[50, 50],'--g',label='min: '+str(50)+' m')
-        self._axes.fill_between(self._xvalues, 0, self._yvalues, facecolor="green", alpha=0.5)
 
-        # Second axes with different top and bottom scales for heart rate.
-        yheart_rates = [item["hr"] for item in values]
-        if sum(yheart_rates) > 0:
-            ax2 = self._axes.twinx()
-            ax2.spines["left"].set_visible(False)
-            ax2.spines["right"].set_visible(True)
-            ax2.spines["bottom"].set_visible(True)
-            ax2.spines["top"].set_visible(False)
-            ax2.plot(self._xvalues, yheart_rates, color="red")
+    def _setup_hr_axes(self):
+        ax2 = self._axes.twinx()
+        ax2.spines["left"].set_visible(False)
+        ax2.spines["right"].set_visible(True)
+        ax2.spines["bottom"].set_visible(True)
+        ax2.spines["top"].set_visible(False)
+        return ax2
 
     def get_canvas(self):
         return self._canvas
@@ -355,6 +386,16 @@ class LinePlot:
     def connect(self, event, cb):
         if event == self.EVENT_X_CURSOR_POS:
             # e.xdata contains the km.
-            # x is the self._xvalues index for that km.
-            # z is the same that e.xdata (the km).
-            self._canvas.mpl_connect("motion_notify_event", lambda e: cb(e.xdata, [ self._locations[x] for x, z in enumerate(self._xvalues) if e.xdata and z == round(e.xdata, 2) ]))
+            self._canvas.mpl_connect("motion_notify_event", lambda e: cb(e.xdata, self._locations_at(e.xdata)))
+
+    def _locations_at(self, distance):
+        """Return a list with the location at distance (km) or an empty list."""
+        if distance is None:
+            return []
+        if self._series is not None:
+            location = self._series.location_at(distance)
+            return [location] if location is not None else []
+        i = bisect_left(self._xvalues, round(distance, 2))
+        if i < len(self._xvalues) and self._xvalues[i] == round(distance, 2):
+            return [self._locations[i]]
+        return []
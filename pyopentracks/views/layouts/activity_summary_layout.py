@@ -22,7 +22,8 @@ from pyopentracks.models.set import Set
 
 from pyopentracks.models.stats import Stats
 from pyopentracks.models.activity import Activity, MultiActivity
-from pyopentracks.utils.utils import TypeActivityUtils, TrackPointUtils, DistanceUtils, TimeUtils
+from pyopentracks.utils.chart_series import ChartSeriesCache
+from pyopentracks.utils.utils import TypeActivityUtils, DistanceUtils, TimeUtils
 from pyopentracks.views.graphs import LinePlot
 from pyopentracks.views.layouts.layout import Layout
 from pyopentracks.views.layouts.track_map_layout import TrackMapLayout
@@ -177,9 +178,9 @@ class TrackActivitySummaryLayout(Gtk.ScrolledWindow, Layout):
 
     def _load_map_and_plot(self, track_points):
         """Load map and plot."""
-        self._map_layout.add_polyline_from_points(TrackPointUtils.to_locations(track_points))
+        self._map_layout.add_polyline_from_points(track_points, ("activity", self._activity.id))
 
-        self._plot.add_values(TrackPointUtils.extract_dict_values(track_points, 10))
+        self._plot.add_series(ChartSeriesCache.get(("activity", self._activity.id), track_points))
         self._plot.connect(LinePlot.EVENT_X_CURSOR_POS, self._on_position_in_plot)
 
         self._add_item_to_bottom_box(self._plot.get_canvas())
@@ -28,10 +28,13 @@ from pyopentracks.utils.utils import DistanceUtils as distu
 from pyopentracks.utils.utils import StatsUtils as su
 from pyopentracks.utils.utils import TimeUtils as tu
 from pyopentracks.utils.utils import TypeActivityUtils as tau
+from pyopentracks.utils.utils import ZonesUtils as zu
 from pyopentracks.views.graphs import BarsChart
 from pyopentracks.views.layouts.calendar_layout import CalendarLayout
 from pyopentracks.views.layouts.layout_builder import LayoutBuilder
+from pyopentracks.tasks.executor import Priority
 from pyopentracks.views.layouts.process_view import ProcessView
+from pyopentracks.views.layouts.track_map_layout import TrackMapLayout
 from pyopentracks.views.widgets.graphs_widget import (
     YearlyAggregatedStatsChartBuilder,
     AllTimesAggregatedStatsChartBuilder
@@ -110,6 +113,20 @@ class AggregatedStats(Gtk.Box):
         return notebook
 
 
+class Heatmap(Gtk.Box):
+    """Gtk.VBox with the map of all activities' tracks as a heatmap."""
+
+    def __init__(self):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        self.get_style_context().add_class("pyot-bg")
+        self._map = TrackMapLayout()
+        self._map.set_vexpand(True)
+        self._map.set_hexpand(True)
+        self._map.set_heatmap_visible(True)
+        self.append(self._map)
+        ProcessView(self._map.center_on_bounds, DatabaseHelper.get_heatmap_bounds, None).start()
+
+
 class AggregatedStatsMonth(Gtk.Box):
     """Gtk.Box with years combo.
 
@@ -167,7 +184,8 @@ class AnalyticMonthsStack(Gtk.Box):
 
     It loads the following data by month (depending the selected month):
     - a calendar with activities per day and total time per week,
-    - total distance chart by activity and
+    - total distance chart by activity,
+    - time in heart rate zones chart and
     - SummaryMovingSport or SummaryTimeSport layout by activity.
     """
 
@@ -175,6 +193,7 @@ class AnalyticMonthsStack(Gtk.Box):
     class MonthStats:
         month: int
         stats: List[AggregatedStats]
+        hr_zone_times: dict
 
         @property
         def month_name(self):
@@ -211,8 +230,10 @@ class AnalyticMonthsStack(Gtk.Box):
         self.append(self._stack_switcher)
         self.append(self._stack)
 
+        # Only one year is shown at a time: a new one supersedes the previous.
         ProcessView(
-            self._on_stack_data_ready, self._data_loading, (year,)
+            self._on_stack_data_ready, self._data_loading, (year,),
+            key=AnalyticMonthsStack, priority=Priority.VISIBLE
         ).start()
 
     def _data_loading(self, year):
@@ -224,7 +245,8 @@ class AnalyticMonthsStack(Gtk.Box):
                 month,
                 DatabaseHelper.get_aggregated_stats(
                     date_from=date_from, date_to=date_to
-                )
+                ),
+                DatabaseHelper.get_hr_zone_times(date_from=date_from, date_to=date_to)
             )
         return data
 
@@ -299,6 +321,32 @@ class AnalyticMonthsStack(Gtk.Box):
                 box.append(chart_box_time)
                 chart_time.draw_and_show()
 
+            # Percentage of time in heart rate zones (the stored ones, see HrZonesIndexer).
+            total_time = sum(ms.hr_zone_times.values())
+            zones_times = {
+                "Z" + str(zone + 1): time for zone, time in ms.hr_zone_times.items() if zone >= 0 and time > 0
+            }
+            if total_time > 0 and len(zones_times) > 0:
+                title_zones = Gtk.Label.new(_("Heart Rate Zones"))
+                title_zones.get_style_context().add_class("pyot-h3")
+                title_zones.get_style_context().add_class("pyot-stats-bg-color")
+                box.append(title_zones)
+
+                chart_zones = BarsChart(
+                    results={zc: round(time / total_time * 100) for zc, time in zones_times.items()},
+                    colors=[zu.get_color(zc) for zc in zones_times],
+                    cb_annotate=lambda value: str(value) + "%"
+                )
+
+                chart_box_zones = Gtk.Box()
+                chart_box_zones.set_margin_start(10)
+                chart_box_zones.set_margin_end(10)
+                chart_box_zones.get_style_context().add_class("pyot-stats-bg-color")
+                chart_box_zones.append(chart_zones.get_canvas())
+
+                box.append(chart_box_zones)
+                chart_zones.draw_and_show()
+
             # Aggregated stats for every category.
             for a in ms.stats:
                 LayoutBuilder(lambda layout: box.append(layout))\
@@ -387,7 +435,9 @@ class AnalyticTotalsYear(Gtk.Box):
         ProcessView(
             self._ready,
             DatabaseHelper.get_aggregated_stats,
-            (dtu.first_day_ms(int(year), 1), dtu.last_day_ms(int(year), 12))
+            (dtu.first_day_ms(int(year), 1), dtu.last_day_ms(int(year), 12)),
+            key=AnalyticTotalsYear,
+            priority=Priority.VISIBLE
         ).start()
 
     def _ready(self, aggregated_list):
@@ -24,6 +24,7 @@ from pyopentracks.utils.utils import TypeActivityUtils as tau
 from pyopentracks.utils.utils import TimeUtils as tu
 from pyopentracks.views.graphs import StackedBarsChart
 from pyopentracks.tasks.calendar_stats import CalendarStats
+from pyopentracks.tasks.executor import Priority
 from pyopentracks.views.layouts.process_view import ProcessView
 
 
@@ -58,7 +59,9 @@ class CalendarLayout(Gtk.Box):
 
         self._add_header_to_grid()
 
-        ProcessView(self._calendar_ready, CalendarStats.run, (month, year)).start()
+        ProcessView(
+            self._calendar_ready, CalendarStats.run, (month, year), priority=Priority.VISIBLE, process=True
+        ).start()
 
     def _calendar_ready(self, calendar_stats):
         for day in calendar_stats.days:
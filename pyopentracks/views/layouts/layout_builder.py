@@ -40,6 +40,7 @@ from pyopentracks.views.layouts.summary_sport_layout import SummaryMovingSport,
 from pyopentracks.views.layouts.track_activity_data_analytic_layout import TrackActivityDataAnalyticLayout
 from pyopentracks.views.layouts.track_map_analytic_layout import TrackMapAnalyticLayout
 from pyopentracks.views.layouts.track_segments_layout import TrackSegmentsLayout
+from pyopentracks.views.layouts.track_similar_routes_layout import TrackSimilarRoutesLayout
 
 
 class LayoutBuilder:
@@ -162,10 +163,12 @@ class ActivityAnalyticLayoutBuilder:
             data_analytic_layout = TrackActivityDataAnalyticLayout(self._activity, self._preferences)
             segments_layout = TrackSegmentsLayout(self._activity)
             map_analytic_layout = TrackMapAnalyticLayout(self._activity)
+            similar_routes_layout = TrackSimilarRoutesLayout(self._activity)
             layout.append(summary_layout, _("Summary"))
             layout.append(data_analytic_layout, _("Data Analytic"))
             layout.append(segments_layout, _("Segments"))
             layout.append(map_analytic_layout, _("Map Analytic"))
+            layout.append(similar_routes_layout, _("Similar Routes"))
             return layout
         elif self._activity.stats and len(self._activity.stats.sets) > 0:
             summary_layout = SetActivitySummaryLayout(self._activity)\
@@ -17,10 +17,10 @@ You should have received a copy of the GNU General Public License
 along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 """
 
-import threading
-
 from gi.repository import GLib
 
+from pyopentracks.tasks.executor import Priority, TaskExecutor
+
 
 class ProcessView:
     """Utility class for layouts to do async tasks.
@@ -28,61 +28,81 @@ class ProcessView:
     The requirements are the following:
     - It needs a callback that receives an argument.
     - It needs a function and arguments in a tuple.
+
+    The function is run by the application-wide TaskExecutor. Views
+    that can ask for data again before the previous one is ready (for
+    example, when the user changes the selected item) should pass a key:
+    the previous task is cancelled and its result is dropped.
     """
 
-    def __init__(self, cb, func, tuple_args):
+    def __init__(self, cb, func, tuple_args, key=None, priority=Priority.NORMAL, process=False):
         """Init.
 
         Arguments:
         cb         -- callback that will receive an argument.
-        func       -- the function that will be execute async (in a multiprocessing.Process).
+        func       -- the function that will be execute async.
         tuple_args -- tuple with all arguments that func receives.
+        key        -- (optional) key of the task (see TaskExecutor.submit).
+        priority   -- Priority's lane of the task.
+        process    -- if True, func (and its arguments) have to be picklable
+                      and it's executed in a process.
         """
         self._cb = cb
         self._func = func
         self._args = tuple_args
+        self._key = key
+        self._priority = priority
+        self._process = process
+        self._task = None
 
     def start(self):
         """Start process."""
-        thread = threading.Thread(target=self._run)
-        thread.start()
+        self._task = TaskExecutor.instance().submit(
+            self._func, self._args, self._on_result, self._key, self._priority, self._process
+        )
 
-    def _run(self):
-        if self._args:
-            result = self._func(*self._args)
-        else:
-            result = self._func()
-        GLib.idle_add(self._cb, result)
+    def cancel(self):
+        """Cancel the task: the callback won't be called."""
+        if self._task is not None:
+            self._task.cancel()
+
+    def _on_result(self, result):
+        GLib.idle_add(self._deliver, result)
 
+    def _deliver(self, result):
+        # The task could be cancelled after its result was queued to the main loop.
+        if not self._task.cancelled:
+            self._cb(result)
+        return False
 
-class QueuedProcessesView:
+
+class QueuedProcessesView(ProcessView):
     """Utility class for layouts to do a set of async tasks in order."""
 
-    def __init__(self, cb, funcs):
+    def __init__(self, cb, funcs, key=None, priority=Priority.NORMAL):
         """Init.
 
         Arguments:
-        cb    -- callback that will receive an argument (list with results for
-                 every function).
-        funcs -- list of dictionaries with functions to be executed in the
-                 order they are listed. Every dictionary item has to have the
-                 following keys:
-                 - "func": function that will be executed.
-                 - "args": tuple with arguments for that function.
+        cb       -- callback that will receive an argument (list with results for
+                    every function).
+        funcs    -- list of dictionaries with functions to be executed in the
+                    order they are listed. Every dictionary item has to have the
+                    following keys:
+                    - "func": function that will be executed.
+                    - "args": tuple with arguments for that function.
+        key      -- (optional) key of the task (see TaskExecutor.submit).
+        priority -- Priority's lane of the task.
         """
-        self._cb = cb
+        super().__init__(cb, self._run, None, key, priority)
         self._funcs = funcs
 
-    def start(self):
-        """Start process."""
-        thread = threading.Thread(target=self._run)
-        thread.start()
-
     def _run(self):
         results = []
         for func_dict in self._funcs:
+            if self._task is not None and self._task.cancelled:
+                break
             if func_dict["args"]:
                 results.append(func_dict["func"](*func_dict["args"]))
             else:
                 results.append(func_dict["func"]())
-        GLib.idle_add(self._cb, results)
+        return results
@@ -23,10 +23,7 @@ from dataclasses import dataclass
 from typing import List
 
 from pyopentracks.tasks.fit_segment import FitSegment
-from pyopentracks.utils.utils import (
-    SanitizeFile,
-    SegmentPointUtils
-)
+from pyopentracks.utils.utils import SanitizeFile
 from pyopentracks.views.dialogs import (
     PyotDialog,
     SegmentEditDialog
@@ -35,6 +32,7 @@ from pyopentracks.models.database_helper import DatabaseHelper
 from pyopentracks.models.segment_track import SegmentTrack
 from pyopentracks.models.segment import Segment
 from pyopentracks.views.file_chooser import ExportSegmentChooserDialog
+from pyopentracks.tasks.executor import Priority
 from pyopentracks.views.layouts.process_view import ProcessView
 from pyopentracks.views.layouts.track_map_layout import TrackMapLayout
 
@@ -120,7 +118,10 @@ class SegmentsListLayout(Gtk.Box):
         if iter_item is not None:
             segmentid = self._segments_list_store[iter_item][0]
             self._title_label.set_text(_("Loading segments..."))
-            ProcessView(self._on_data_ready, self._data_changing, (segmentid,)).start()
+            # A new segment supersedes the one that could be still loading.
+            ProcessView(
+                self._on_data_ready, self._data_changing, (segmentid,), key=self, priority=Priority.VISIBLE
+            ).start()
 
     def _data_loading(self):
         segments = DatabaseHelper.get_segments()
@@ -213,7 +214,7 @@ class SegmentsListLayout(Gtk.Box):
         self._box_segment_detail.append(grid)
 
         map_layout = TrackMapLayout()
-        map_layout.add_polyline_from_points(SegmentPointUtils.to_locations(DatabaseHelper.get_segment_points(data.segment.id)))
+        map_layout.add_polyline_from_points(DatabaseHelper.get_segment_points(data.segment.id), ("segment", data.segment.id))
         map_layout.set_vexpand(True)
         self._box_map.append(map_layout)
 
@@ -22,11 +22,13 @@ from typing import List
 from gi.repository import Gtk
 
 from pyopentracks.app_preferences import AppPreferences
+from pyopentracks.models.database_helper import DatabaseHelper
 from pyopentracks.models.section import Section
-from pyopentracks.stats.track_activity_stats import IntervalStats, HrZonesStats
+from pyopentracks.stats.track_activity_stats import IntervalStatsCache, HrZonesStats
 from pyopentracks.utils.utils import TypeActivityUtils, SensorUtils, TimeUtils, ZonesUtils
 from pyopentracks.views.graphs import BarsChart
 from pyopentracks.views.layouts.layout import Layout
+from pyopentracks.tasks.executor import Priority
 from pyopentracks.views.layouts.process_view import ProcessView
 from pyopentracks.models.activity import Activity
 
@@ -54,22 +56,26 @@ class TrackActivityDataAnalyticLayout(Gtk.Box, Layout):
         self._preferences = preferences
 
     def build(self):
-        self.append(TrackActivityIntervalsLayout(self._activity.category, self._activity.sections))
+        self.append(
+            TrackActivityIntervalsLayout(self._activity.category, self._activity.sections, self._activity.id)
+        )
         self.append(
             TrackActivityZonesLayout(
                 self._activity.sections,
                 self._preferences.get_pref(self._preferences.HEART_RATE_MAX),
-                self._preferences.get_pref(self._preferences.HEART_RATE_ZONES)
+                self._preferences.get_pref(self._preferences.HEART_RATE_ZONES),
+                self._activity.id
             )
         )
 
 
 class TrackActivityIntervalsLayout(Gtk.Box):
 
-    def __init__(self, category, sections: List[Section]):
+    def __init__(self, category, sections: List[Section], activity_id=None):
         super().__init__(orientation=Gtk.Orientation.VERTICAL)
 
         self._category = category
+        self._key = ("activity", activity_id) if activity_id is not None else None
         self._track_points = list(chain(*[ section.track_points for section in sections ]))
         self._is_speed_activity = TypeActivityUtils.is_speed(self._category)
 
@@ -143,12 +149,10 @@ class TrackActivityIntervalsLayout(Gtk.Box):
             return
         interval_m = self._intervals_list_store[iter_item][0]
 
-        ProcessView(self._on_data_ready, self._data_loading, (interval_m,)).start()
+        ProcessView(self._on_data_ready, self._data_loading, (interval_m,), key=self, priority=Priority.VISIBLE).start()
 
     def _data_loading(self, interval_m):
-        interval_stats = IntervalStats(self._category, interval_m)
-        interval_stats.compute(self._track_points)
-        return interval_stats.intervals
+        return IntervalStatsCache.get(self._key, self._category, interval_m, self._track_points)
 
     def _on_data_ready(self, intervals):
         row = 1
@@ -170,19 +174,15 @@ class TrackActivityZonesLayout(Gtk.Box):
     _hr_max_info_label: Gtk.Label = Gtk.Template.Child()
     _zones_grid: Gtk.Grid = Gtk.Template.Child()
 
-    def __init__(self, sections: List[Section], hr_max: int, hr_zones: List[int]):
+    def __init__(self, sections: List[Section], hr_max: int, hr_zones: List[int], activity_id=None):
         super().__init__(orientation=Gtk.Orientation.VERTICAL)
 
         self._sections: List[Section] = sections
+        self._activity_id = activity_id
         self._hr_max = hr_max
         self._hr_percentage_zones: List[int] = hr_zones
 
-        self._hr_bpm_zones: List[int] = list(
-            map(
-                lambda percentage:
-                SensorUtils.round_to_int(percentage / 100 * self._hr_max), self._hr_percentage_zones[0:-1]
-            )
-        )
+        self._hr_bpm_zones: List[int] = HrZonesStats.bpm_zones(self._hr_max, self._hr_percentage_zones)
 
         self._title_label = Gtk.Label.new(_("Heart Rate Zones"))
         self._title_label.get_style_context().add_class("pyot-h3")
@@ -211,7 +211,12 @@ class TrackActivityZonesLayout(Gtk.Box):
 
     def _data_loading(self):
         hr_zones_stats = HrZonesStats(self._hr_bpm_zones)
-        stats = hr_zones_stats.compute(self._sections)
+        # Times stored by HrZonesIndexer or, if the activity isn't indexed yet, computed from its sections.
+        zone_times = DatabaseHelper.get_hr_zone_times(self._activity_id) if self._activity_id is not None else None
+        if zone_times:
+            stats = hr_zones_stats.load(zone_times)
+        else:
+            stats = hr_zones_stats.compute(self._sections)
         total_time = hr_zones_stats.total_time
 
         return stats, total_time
@@ -29,7 +29,7 @@ from pyopentracks.utils import logging as pyot_logging
 from pyopentracks.models.database_helper import DatabaseHelper
 from pyopentracks.models.activity import Activity
 from pyopentracks.stats.track_activity_stats import TrackActivityStats
-from pyopentracks.utils.utils import TrackPointUtils
+from pyopentracks.utils.chart_series import ChartSeries
 from pyopentracks.views.graphs import LinePlot
 from pyopentracks.views.layouts.track_map_layout import TrackInteractiveMapLayout
 from pyopentracks.views.layouts.create_segment_layout import CreateSegmentLayout
@@ -85,7 +85,7 @@ class TrackMapAnalyticLayout(Gtk.Box, Layout):
         self._new_segment_created_cb = cb
 
     def build(self):
-        self._map_layout = TrackInteractiveMapLayout(self._activity.all_track_points)
+        self._map_layout = TrackInteractiveMapLayout(self._activity.all_track_points, ("activity", self._activity.id))
         self._map_layout.set_vexpand(True)
         self._map_layout.connect("segment-selected", self._segment_selected)
         self._content_box.append(self._map_layout)
@@ -147,7 +147,7 @@ class TrackMapAnalyticLayout(Gtk.Box, Layout):
         self._track_points = map_layout.get_selected_track_points()
 
         plot = LinePlot()
-        plot.add_values(TrackPointUtils.extract_dict_values(self._track_points, 1))
+        plot.add_series(ChartSeries.from_track_points(self._track_points))
         plot.draw_and_show()
 
         self._content_box.append(plot.get_canvas())
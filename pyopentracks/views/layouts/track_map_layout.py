@@ -20,10 +20,45 @@ import math
 
 from typing import List
 
-from gi.repository import Gtk, Gdk, GObject, Shumate
+from gi.repository import Gtk, Gdk, GLib, GObject, Shumate
 
 from pyopentracks.models.location import Location
-from pyopentracks.utils.utils import TrackPointUtils
+from pyopentracks.tasks.executor import Priority, TaskExecutor
+from pyopentracks.tasks.heatmap import HeatmapRenderer
+from pyopentracks.utils import logging as pyot_logging
+from pyopentracks.utils.heatmap import HeatmapTile
+from pyopentracks.utils.polyline import PolylineLod, PolylineLodCache
+
+
+class HeatmapDataSource(Shumate.DataSource):
+    """A Shumate.DataSource that serves the heatmap tiles.
+
+    Tiles are read from the heatmap tile cache or rendered, by the
+    application's TaskExecutor, when they aren't cached yet.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._renderer = HeatmapRenderer()
+
+    def do_start_request(self, x, y, zoom_level, cancellable):
+        request = Shumate.DataSourceRequest.new(x, y, zoom_level)
+        TaskExecutor.instance().submit(self._load, (request, x, y, zoom_level, cancellable), priority=Priority.VISIBLE)
+        return request
+
+    def _load(self, request, x, y, zoom_level, cancellable):
+        if cancellable is not None and cancellable.is_cancelled():
+            return
+        try:
+            png = self._renderer.tile(zoom_level, x, y)
+        except Exception as error:
+            pyot_logging.get_logger(__name__).exception(f"Error rendering heatmap tile: {error}")
+            GLib.idle_add(
+                request.emit_error,
+                GLib.Error.new_literal(GLib.io_error_quark(), str(error), GLib.IOErrorEnum.FAILED)
+            )
+            return
+        GLib.idle_add(request.emit_data, GLib.Bytes.new(png), True)
 
 
 class TrackMapLayout(Shumate.SimpleMap):
@@ -34,6 +69,12 @@ class TrackMapLayout(Shumate.SimpleMap):
     - A Shumate.Marker with a generic location.
     - A Shumate.Marker with the initial point.
     - A Shumate.Marker with the end point.
+
+    Polylines are drawn from a PolylineLod so only the vertices that
+    can be seen on the current zoom level are added to the path layers.
+
+    The heatmap of all activities can be shown under the polylines
+    (see set_heatmap_visible).
     """
 
     def __init__(self):
@@ -60,17 +101,84 @@ class TrackMapLayout(Shumate.SimpleMap):
         self._hightlight_layer.set_stroke_width(5)
         self.add_overlay_layer(self._hightlight_layer)
 
-    def add_polyline_from_points(self, points: List[Location]) -> None:
+        self._heatmap_layer = None
+
+        self._path_lod = None
+        self._path_indices = None
+        self._hightlight_lod = None
+        self._hightlight_indices = None
+        self.get_viewport().connect("notify::zoom-level", self._on_zoom_level_changed)
+
+    def add_polyline_from_points(self, points: List[Location], key=None) -> None:
+        """Draw the polyline of points.
+
+        Arguments:
+        points -- list of objects with latitude and longitude (Location,
+                  TrackPoint, SegmentPoint...).
+        key    -- (optional) key for the PolylineLodCache, for example
+                  ("activity", activity_id).
+        """
         if points is None or len(points) == 0:
             return
-        self._path_layer.remove_all()
-        for point in points:
+        self._path_lod = PolylineLodCache.get(key, points)
+        self._path_indices = None
+        first, last = points[0], points[-1]
+        self.set_start_marker(Location(first.latitude, first.longitude))
+        self.set_end_marker(Location(last.latitude, last.longitude))
+        self._set_center_and_zoom(self._path_lod.bounds())
+        self._draw_path()
+
+    def set_heatmap_visible(self, visible: bool) -> None:
+        """Show or hide the heatmap layer of all activities."""
+        if visible and self._heatmap_layer is None:
+            renderer = Shumate.RasterRenderer.new(HeatmapDataSource())
+            renderer.set_id("pyopentracks-heatmap")
+            renderer.set_tile_size(HeatmapTile.TILE_SIZE)
+            renderer.set_min_zoom_level(HeatmapTile.MIN_ZOOM)
+            renderer.set_max_zoom_level(HeatmapTile.MAX_ZOOM)
+            renderer.set_projection(Shumate.MapProjection.MERCATOR)
+            self._heatmap_layer = Shumate.MapLayer.new(renderer, self.get_viewport())
+            # Over the map source but under the markers and polylines: the
+            # start marker's layer was the first overlay layer added.
+            self.get_map().insert_layer_behind(self._heatmap_layer, self._start_marker.get_parent())
+        elif not visible and self._heatmap_layer is not None:
+            self.get_map().remove_layer(self._heatmap_layer)
+            self._heatmap_layer = None
+
+    def center_on_bounds(self, bounds) -> None:
+        """Center the map on bounds (min_lat, min_lon, max_lat, max_lon)."""
+        if bounds is not None:
+            self._set_center_and_zoom(bounds)
+
+    def _on_zoom_level_changed(self, viewport, pspec):
+        self._draw_path()
+        self._draw_hightlight()
+
+    def _draw_path(self):
+        self._path_indices = self._draw_lod(self._path_layer, self._path_lod, self._path_indices)
+
+    def _draw_hightlight(self):
+        self._hightlight_indices = self._draw_lod(
+            self._hightlight_layer, self._hightlight_lod, self._hightlight_indices
+        )
+
+    def _draw_lod(self, layer: Shumate.PathLayer, lod: PolylineLod, drawn_indices):
+        """Fill the layer with the lod's geometry for the current zoom.
+
+        Return the indices drawn. The layer is not touched if the
+        geometry for the current zoom is the same that the drawn one.
+        """
+        if lod is None:
+            return None
+        indices = lod.indices(self.get_viewport().get_zoom_level())
+        if indices is drawn_indices:
+            return drawn_indices
+        layer.remove_all()
+        for latitude, longitude in zip(lod.latitudes[indices].tolist(), lod.longitudes[indices].tolist()):
             shumate_location = Shumate.Point.new()
-            shumate_location.set_location(point.latitude, point.longitude)
-            self._path_layer.add_node(shumate_location)
-        self.set_start_marker(points[0])
-        self.set_end_marker(points[-1])
-        self._set_center_and_zoom(points)
+            shumate_location.set_location(latitude, longitude)
+            layer.add_node(shumate_location)
+        return indices
 
     def _add_marker_from_icon_name(self, icon_name: str, location: Location = None) -> Shumate.Marker:
         marker = Shumate.Marker.new()
@@ -85,7 +193,7 @@ class TrackMapLayout(Shumate.SimpleMap):
 
         return marker
 
-    def _set_center_and_zoom(self, points: List[Location]) -> None:
+    def _set_center_and_zoom(self, bounds) -> None:
         """Set map center and zoom based on the path layer bounds.
 
         Link: https://wiki.openstreetmap.org/wiki/Slippy_map_tilenames
@@ -100,11 +208,7 @@ class TrackMapLayout(Shumate.SimpleMap):
             radians = math.atan(math.sinh(latitude_derivation * 2 * math.pi))
             return math.degrees(radians)
 
-        x_coordinates, y_coordinates = zip(*[(point.latitude, point.longitude) for point in points])
-        min_latitude = min(x_coordinates)
-        min_longitude = min(y_coordinates)
-        max_latitude = max(x_coordinates)
-        max_longitude = max(y_coordinates)
+        min_latitude, min_longitude, max_latitude, max_longitude = bounds
 
         min_latitude_derivation = get_latitude_derivation(min_latitude)
         max_latitude_derivation = get_latitude_derivation(max_latitude)
@@ -131,14 +235,13 @@ class TrackMapLayout(Shumate.SimpleMap):
     def add_polyline_from_activity_id(self, activity_id):
         print("The method add_plyline_from_activity_id in track_segments_layout.py is not implemented")
 
-    def highlight(self, points: List[Location]):
+    def highlight(self, points: List[Location], key=None):
+        """Draw the points over the polyline (see add_polyline_from_points)."""
         if points is None or len(points) == 0:
             return
-        self._hightlight_layer.remove_all()
-        for point in points:
-            shumate_location = Shumate.Point.new()
-            shumate_location.set_location(point.latitude, point.longitude)
-            self._hightlight_layer.add_node(shumate_location)
+        self._hightlight_lod = PolylineLodCache.get(key, points)
+        self._hightlight_indices = None
+        self._draw_hightlight()
 
     def set_start_marker(self, location: Location):
         self._start_marker.set_location(location.latitude, location.longitude)
@@ -159,14 +262,14 @@ class TrackInteractiveMapLayout(Gtk.Box, GObject.GObject):
         "segment-selected": (GObject.SIGNAL_RUN_FIRST, None, (int, int))
     }
 
-    def __init__(self, track_points):
+    def __init__(self, track_points, key=None):
         super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=20)
         GObject.GObject.__init__(self)
 
         self._track_points = track_points
 
         self._map_layout = TrackMapLayout()
-        self._map_layout.add_polyline_from_points(TrackPointUtils.to_locations(track_points))
+        self._map_layout.add_polyline_from_points(track_points, key)
         self._map_layout.set_vexpand(True)
 
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=20)
@@ -20,12 +20,10 @@ along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
 from gi.repository import Gtk
 
 from pyopentracks.models.database_helper import DatabaseHelper
-from pyopentracks.models.location import Location
 from pyopentracks.observers.data_update_observer import DataUpdateObserver
 from pyopentracks.views.layouts.layout import Layout
 from pyopentracks.views.layouts.segments_track_layout import SegmentsTrackLayout
 from pyopentracks.views.layouts.track_map_layout import TrackMapLayout
-from pyopentracks.utils.utils import TrackPointUtils
 
 
 class TrackSegmentsLayout(Gtk.Box, DataUpdateObserver, Layout):
@@ -79,7 +77,7 @@ class TrackSegmentsLayout(Gtk.Box, DataUpdateObserver, Layout):
         self._scrolled_window.set_child(self._segments_layout)
         self._content_box.append(self._map_layout)
         if self._activity.all_track_points:
-            self._map_layout.add_polyline_from_points(TrackPointUtils.to_locations(self._activity.all_track_points))
+            self._map_layout.add_polyline_from_points(self._activity.all_track_points, ("activity", self._activity.id))
         else:
             self._map_layout.add_polyline_from_activity_id(self._activity.id)
 
@@ -101,7 +99,5 @@ class TrackSegmentsLayout(Gtk.Box, DataUpdateObserver, Layout):
             self._scrolled_window.set_child(self._segments_layout)
 
     def _segment_track_selected(self, widget, segment_id, segment_track_id):
-        self._map_layout.highlight(
-            [Location(sp.latitude, sp.longitude) for sp in DatabaseHelper.get_segment_points(segment_id)]
-        )
+        self._map_layout.highlight(DatabaseHelper.get_segment_points(segment_id), ("segment", segment_id))
 
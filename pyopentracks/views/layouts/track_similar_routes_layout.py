@@ -0,0 +1,96 @@
+"""
+Copyright (C) 2020 Román Ginés Martínez Ferrández <rgmf@riseup.net>.
+
+This file is part of PyOpenTracks.
+
+PyOpenTracks is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+any later version.
+
+PyOpenTracks is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyOpenTracks. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from gi.repository import Gtk
+
+from pyopentracks.models.activity import Activity
+from pyopentracks.models.database_helper import DatabaseHelper
+from pyopentracks.views.layouts.layout import Layout
+from pyopentracks.views.layouts.process_view import ProcessView
+
+
+class TrackSimilarRoutesLayout(Gtk.Box, Layout):
+    """The activities with the same route than the activity (see RouteSearch)."""
+
+    def __init__(self, activity: Activity):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        Layout.__init__(self)
+
+        self.get_style_context().add_class("pyot-bg")
+        self.set_margin_top(20)
+        self.set_margin_bottom(20)
+        self.set_margin_start(20)
+        self.set_margin_end(20)
+
+        self._title_label = Gtk.Label.new(_("Similar Routes"))
+        self._title_label.set_wrap(True)
+        self._title_label.set_margin_bottom(20)
+        self._title_label.get_style_context().add_class("pyot-h2")
+
+        self._grid = Gtk.Grid()
+        self._grid.set_row_spacing(10)
+        self._grid.set_column_spacing(10)
+
+        self.append(self._title_label)
+        self.append(self._grid)
+
+        self._activity: Activity = activity
+
+    def build(self):
+        self._grid.attach(Gtk.Label.new(_("Looking for activities with the same route...")), 0, 0, 1, 1)
+        ProcessView(self._on_data_ready, DatabaseHelper.get_similar_routes, (self._activity.id,)).start()
+
+    def _on_data_ready(self, similar_routes):
+        child = self._grid.get_first_child()
+        while child is not None:
+            self._grid.remove(child)
+            child = self._grid.get_first_child()
+
+        if not similar_routes:
+            self._grid.attach(Gtk.Label.new(_("There are not activities with the same route")), 0, 0, 1, 1)
+            return
+
+        self._grid.attach(self._build_header_label(_("Date")), 0, 0, 1, 1)
+        self._grid.attach(self._build_header_label(_("Name")), 1, 0, 1, 1)
+        self._grid.attach(self._build_header_label(_("Distance")), 2, 0, 1, 1)
+        self._grid.attach(self._build_header_label(_("Moving Time")), 3, 0, 1, 1)
+        self._grid.attach(self._build_header_label(_("Similarity")), 4, 0, 1, 1)
+
+        for i, (activity, similarity) in enumerate(similar_routes):
+            stats = activity.stats
+            self._grid.attach(self._build_box(activity.start_time), 0, i + 1, 1, 1)
+            self._grid.attach(self._build_box(activity.name), 1, i + 1, 1, 1)
+            self._grid.attach(self._build_box(stats.total_distance if stats else "-"), 2, i + 1, 1, 1)
+            self._grid.attach(self._build_box(stats.moving_time if stats else "-"), 3, i + 1, 1, 1)
+            self._grid.attach(self._build_box(f"{round(similarity * 100)}%"), 4, i + 1, 1, 1)
+
+    def _build_header_label(self, value):
+        lbl = Gtk.Label.new(value)
+        lbl.get_style_context().add_class("pyot-stats-small-header")
+        return lbl
+
+    def _build_box(self, value):
+        box = Gtk.Box(spacing=10, orientation=Gtk.Orientation.VERTICAL)
+        box.get_style_context().add_class("pyot-stats-bg-color")
+        label = Gtk.Label.new(str(value))
+        label.set_xalign(0.0)
+        label.set_margin_start(10)
+        label.set_margin_end(10)
+        box.append(label)
+        return box
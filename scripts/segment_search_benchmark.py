@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the segments' search.
+
+It builds a database with an activity and hundreds of segments in every
+region and, for every activity, measures the time looking for the
+segments' starts and ends: with SQL lookups for every segment, with SQL
+lookups for the candidates of the footprint prefilter only and with the
+SegmentMatcher (one pass over the track points) for these candidates.
+
+Usage: python scripts/segment_search_benchmark.py [-s SEGMENTS_PER_REGION]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from pyopentracks.models.database import Database, config
+from pyopentracks.models.migrations import Migration
+from pyopentracks.tasks.segment_search import SegmentSearchAbstract
+from pyopentracks.utils.segment_matcher import SegmentMatcher
+
+
+REGIONS = [
+    (38.5, -0.5), (40.4, -3.7), (48.8, 2.3), (51.5, -0.1), (52.5, 13.4),
+    (-33.9, 151.2), (35.7, 139.7), (40.7, -74.0), (-23.5, -46.6), (19.4, -99.1)
+]
+TRACK_POINTS = 5000
+
+
+def build_database(database_file: str, segments_per_region: int):
+    config["database"] = database_file
+    Migration(Database(), 0).migrate()
+    rng = np.random.default_rng(0)
+    tracks = []
+    with sqlite3.connect(database_file) as conn:
+        for activity_id, (lat, lon) in enumerate(REGIONS, 1):
+            conn.execute("INSERT INTO stats (_id, starttime) VALUES (?, 0)", (activity_id,))
+            conn.execute(
+                "INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (?, 'a', 'running', 0, ?)",
+                (activity_id, activity_id)
+            )
+            conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (?, 's', ?)", (activity_id, activity_id))
+            latitudes = lat + np.cumsum(rng.normal(0, 0.00005, TRACK_POINTS))
+            longitudes = lon + np.cumsum(rng.normal(0, 0.00005, TRACK_POINTS))
+            tracks.append(list(zip(latitudes.tolist(), longitudes.tolist())))
+            conn.executemany(
+                "INSERT INTO trackpoints (sectionid, latitude, longitude, time) VALUES (?, ?, ?, ?)",
+                [(activity_id, la, lo, 1000 * i) for i, (la, lo) in enumerate(tracks[-1])]
+            )
+
+        # Half of the segments are parts of the activity of the region.
+        segment_id = 0
+        for track, (lat, lon) in zip(tracks, REGIONS):
+            for k in range(segments_per_region):
+                segment_id += 1
+                conn.execute("INSERT INTO segments VALUES (?, 's', 0, 0, 0)", (segment_id,))
+                if k % 2:
+                    start = int(rng.integers(0, TRACK_POINTS - 100))
+                    points = track[start:start + 100]
+                else:
+                    start_lat, start_lon = lat + rng.uniform(-0.2, 0.2), lon + rng.uniform(-0.2, 0.2)
+                    points = [(start_lat + 0.0001 * i, start_lon) for i in range(50)]
+                conn.executemany(
+                    "INSERT INTO segmentpoints (segmentid, latitude, longitude) VALUES (?, ?, ?)",
+                    [(segment_id, la, lo) for la, lo in points]
+                )
+    SegmentSearchAbstract.index_missing()
+
+
+def sql_lookups(db, activity_id, segments_ids):
+    """Old search: SQL lookups of the start and the end of every segment."""
+    for segment_id in segments_ids:
+        points = db.get_segment_points(segment_id)
+        for start in db.get_points_near_point_start(SegmentSearchAbstract.search_bbox(points[0]), activity_id):
+            db.get_points_near_point_end(SegmentSearchAbstract.search_bbox(points[-1]), activity_id, start.trackpoint_id)
+
+
+def all_segments(db, activity_id):
+    sql_lookups(db, activity_id, [segment.id for segment in db.get_segments()])
+
+
+def candidates(db, activity_id):
+    sql_lookups(db, activity_id, db.get_segments_candidates(activity_id))
+
+
+def matcher(db, activity_id):
+    rows = db.get_track_points_locations(activity_id)
+    _, times, latitudes, longitudes = (np.array(column) for column in zip(*rows))
+    segment_matcher = SegmentMatcher()
+    for segment_id in db.get_segments_candidates(activity_id):
+        points = db.get_segment_points(segment_id)
+        segment_matcher.add(
+            segment_id, SegmentSearchAbstract.search_bbox(points[0]), SegmentSearchAbstract.search_bbox(points[-1])
+        )
+    segment_matcher.match(latitudes, longitudes, times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the segments' search")
+    parser.add_argument("-s", "--segments", type=int, default=50, help="number of segments per region")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_database(os.path.join(directory, "database.db"), args.segments)
+        db = Database()
+        print(f"{len(REGIONS)} activities, {len(REGIONS) * args.segments} segments")
+        for name, func in (
+            ("SQL lookups, all segments", all_segments),
+            ("SQL lookups, footprint candidates", candidates),
+            ("matcher, footprint candidates", matcher)
+        ):
+            start = time.perf_counter()
+            for activity_id in range(1, len(REGIONS) + 1):
+                func(db, activity_id)
+            print(f"{name}: {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from pyopentracks.models.database import Database, config
+from pyopentracks.models.migrations import Migration
+
+
+class TempDB(unittest.TestCase):
+    """Class for tests that need a database of their own.
+
+    Every test method gets a new database, with all the migrations, in
+    a temporary directory (self._tmp) that is removed after the test.
+    The database's file is self._db_file and config points to it while
+    the test runs.
+    """
+
+    def setUp(self):
+        """Create and migrate the database."""
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self._db_file = os.path.join(self._tmp.name, "database.db")
+        self._config = patch.dict(config, {"database": self._db_file})
+        self._config.start()
+        self.addCleanup(self._config.stop)
+        Migration(Database(), 0).migrate()
@@ -0,0 +1,125 @@
+import collections
+import sqlite3
+import unittest
+
+import numpy as np
+
+from temp_db import TempDB
+
+from pyopentracks.io.elevation.provider import ElevationProvider
+from pyopentracks.tasks.altitude_correction import AltitudeCorrection
+from pyopentracks.utils.utils import LocationUtils
+
+
+def baseline(latitudes, longitudes, altitudes):
+    """The gain/loss filter as it was written before it used NumPy.
+
+    Return:
+    A dictionary track point's index -> (gain, loss), only for the
+    track points whose gain or loss was set.
+    """
+    buffer = collections.deque(altitudes[:20], maxlen=20)
+    result = {}
+    last = 0
+    last_valid_altitude = round(sum(buffer) / 20, 2)
+    for i in range(len(altitudes)):
+        distance = LocationUtils.distance_between(latitudes[last], longitudes[last], latitudes[i], longitudes[i])
+        if distance >= 50:
+            if altitudes[i] >= last_valid_altitude + 5:
+                result[i] = (altitudes[i] - altitudes[last], None)
+            elif altitudes[i] <= last_valid_altitude - 5:
+                result[i] = (None, altitudes[last] - altitudes[i])
+            else:
+                continue
+            last = i
+            buffer.append(altitudes[i])
+            last_valid_altitude = round(sum(buffer) / 20, 2)
+    return result
+
+
+def profile(n):
+    """A hilly track with a point every 20 meters, more or less."""
+    rng = np.random.default_rng(3)
+    latitudes = 38.5 + np.arange(n) * 0.00018
+    longitudes = np.full(n, -0.5)
+    altitudes = 300 + 80 * np.sin(np.arange(n) / 40) + rng.normal(0, 3, n)
+    return latitudes, longitudes, np.round(altitudes, 1)
+
+
+class FixedProvider(ElevationProvider):
+
+    def __init__(self, elevations):
+        self._elevations = np.asarray(elevations, dtype=np.float64)
+
+    def elevations(self, latitudes, longitudes):
+        return self._elevations
+
+
+class TestGainAndLoss(unittest.TestCase):
+
+    def _assert_baseline(self, latitudes, longitudes, altitudes):
+        gains, losses = AltitudeCorrection.compute_gain_and_loss(latitudes, longitudes, altitudes)
+        expected = baseline(latitudes.tolist(), longitudes.tolist(), altitudes.tolist())
+        computed = {
+            i: (None if np.isnan(g) else g, None if np.isnan(l) else l)
+            for i, (g, l) in enumerate(zip(gains.tolist(), losses.tolist()))
+            if not (np.isnan(g) and np.isnan(l))
+        }
+        self.assertEqual(computed, expected)
+        return expected
+
+    def test_same_than_baseline(self):
+        expected = self._assert_baseline(*profile(1000))
+        self.assertGreater(len(expected), 20)
+
+    def test_short_track(self):
+        # The buffer's mean is divided by 20 even with fewer altitudes.
+        latitudes, longitudes, _ = profile(10)
+        altitudes = np.array([200.0] * 5 + [205.0, 198.0, 300.0, 120.0, 121.0])
+        self.assertTrue(self._assert_baseline(latitudes, longitudes, altitudes))
+
+    def test_empty(self):
+        gains, losses = AltitudeCorrection.compute_gain_and_loss(np.array([]), np.array([]), np.array([]))
+        self.assertEqual((len(gains), len(losses)), (0, 0))
+
+
+class TestUpdateAltitude(TempDB):
+
+    def setUp(self):
+        super().setUp()
+
+        self._latitudes, self._longitudes, self._altitudes = profile(300)
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("INSERT INTO stats (_id) VALUES (1)")
+            conn.execute(
+                "INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (1, 'a', 'running', 0, 1)"
+            )
+            conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (1, 's', 1)")
+            conn.executemany(
+                "INSERT INTO trackpoints (sectionid, latitude, longitude, altitude, time, gain, loss) "
+                "VALUES (1, ?, ?, 0, ?, 0.5, 0.25)",
+                [(lat, lon, i * 1000) for i, (lat, lon) in enumerate(zip(self._latitudes, self._longitudes))]
+            )
+
+    def test_run(self):
+        AltitudeCorrection(1, FixedProvider(self._altitudes)).run()
+        expected = baseline(self._latitudes.tolist(), self._longitudes.tolist(), self._altitudes.tolist())
+        with sqlite3.connect(self._db_file) as conn:
+            rows = conn.execute("SELECT altitude, gain, loss FROM trackpoints ORDER BY _id").fetchall()
+            stats = conn.execute(
+                "SELECT elevationgain, elevationloss, minelevation, maxelevation FROM stats WHERE _id=1"
+            ).fetchone()
+
+        self.assertEqual([row[0] for row in rows], self._altitudes.tolist())
+        for i, (_altitude, gain, loss) in enumerate(rows):
+            expected_gain, expected_loss = expected.get(i, (None, None))
+            # Track points without gain (or loss) keep the values they had.
+            self.assertEqual(gain, 0.5 if expected_gain is None else expected_gain)
+            self.assertEqual(loss, 0.25 if expected_loss is None else expected_loss)
+        self.assertAlmostEqual(stats[0], sum(g for g, _l in expected.values() if g is not None))
+        self.assertAlmostEqual(stats[1], sum(l for _g, l in expected.values() if l is not None))
+        self.assertEqual(stats[2:], (self._altitudes.min(), self._altitudes.max()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import builtins
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from unittest.mock import patch
+
+from temp_db import TempDB
+
+from pyopentracks.io.importer.archive import ArchiveReader
+from pyopentracks.io.importer.factory import ImporterFactory
+from pyopentracks.io.importer.importer import ArchiveImporter, FileImporter, FolderImporter
+from pyopentracks.io.parser.exceptions import ParserExtensionUnknownException
+from pyopentracks.io.parser.factory import ParserFactory
+from pyopentracks.io.parser.fit.fit import FitTrackActivity
+from pyopentracks.io.parser.gpx.gpx import GpxOpenTracks
+
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+
+def asset(name):
+    with open(os.path.join(ASSETS, name), "rb") as file:
+        return file.read()
+
+
+def points(parser):
+    return [(p.latitude, p.longitude, p.time) for s in parser.parse().segments for p in s.points]
+
+
+class TestCompressedParser(unittest.TestCase):
+
+    def test_extensions(self):
+        for name in ("a.gpx", "a.fit", "a.GPX", "a.gpx.gz", "dir/a.FIT.GZ"):
+            self.assertTrue(ParserFactory.is_supported(name), name)
+        for name in ("a.gz", "a.zip", "gpx", "a.csv.gz", "a.gpx.zip"):
+            self.assertFalse(ParserFactory.is_supported(name), name)
+        with self.assertRaises(ParserExtensionUnknownException):
+            ParserFactory.make("a.csv.gz", io.BytesIO(gzip.compress(b"")))
+
+    def test_gzip(self):
+        expected = points(ParserFactory.make(os.path.join(ASSETS, "opentracks_with_trkseg.gpx")))
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "a.gpx.gz")
+            with gzip.open(filename, "wb") as file:
+                file.write(asset("opentracks_with_trkseg.gpx"))
+            parser = ParserFactory.make(filename)
+            self.assertIsInstance(parser, GpxOpenTracks)
+            self.assertEqual(points(parser), expected)
+
+        stream = io.BytesIO(gzip.compress(asset("fit/activity.fit")))
+        self.assertIsInstance(ParserFactory.make("activity.fit.gz", stream), FitTrackActivity)
+
+    def test_stream(self):
+        expected = points(ParserFactory.make(os.path.join(ASSETS, "opentracks_with_trkseg.gpx")))
+        self.assertEqual(points(ParserFactory.make("a.gpx", io.BytesIO(asset("opentracks_with_trkseg.gpx")))), expected)
+
+
+class TestArchiveImport(TempDB):
+
+    def setUp(self):
+        super().setUp()
+
+        self._folder = os.path.join(self._tmp.name, "folder")
+        os.mkdir(self._folder)
+        self._archive = os.path.join(self._folder, "export.zip")
+        with zipfile.ZipFile(self._archive, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("activities/", b"")
+            archive.writestr("activities/a.gpx", asset("opentracks_with_trkseg.gpx"))
+            archive.writestr("activities/b.fit.gz", gzip.compress(asset("fit/activity.fit")))
+            archive.writestr("activities/c.gpx.gz", gzip.compress(asset("opentracks_with_trkseg.gpx")))
+            archive.writestr("activities/d.gpx", b"<gpx><trk>")
+            archive.writestr("activities/photo.jpg", b"")
+
+    def _run(self, importer):
+        with patch.object(builtins, "_", lambda s: s, create=True), \
+                patch("pyopentracks.models.database_helper.TaskExecutor"):
+            return list(importer.run())
+
+    def test_reader(self):
+        reader = ArchiveReader(self._archive)
+        members = ["activities/a.gpx", "activities/b.fit.gz", "activities/c.gpx.gz", "activities/d.gpx"]
+        self.assertEqual(reader.members(), members)
+        opened = [(name, member, len(stream.read())) for name, member, stream in reader.open()]
+        self.assertEqual([m for _n, m, _l in opened], members)
+        self.assertEqual(opened[0][0], os.path.join(self._archive, "activities/a.gpx"))
+        self.assertEqual(opened[0][2], len(asset("opentracks_with_trkseg.gpx")))
+
+    def test_archive_importer(self):
+        importer = ImporterFactory.make(self._archive)
+        self.assertIsInstance(importer, ArchiveImporter)
+        self.assertEqual(importer.files_to_import(), 4)
+        results = self._run(importer)
+        # One result per member.
+        self.assertEqual(len(results), 4)
+        self.assertTrue(results[-1].is_done)
+        self.assertEqual((results[-1].imported, len(results[-1].errors)), (2, 2))
+        errors = "\n".join(results[-1].errors)
+        self.assertIn(os.path.join(self._archive, "activities/d.gpx"), errors)
+        self.assertIn("already exists", errors)
+
+    def test_folder_importer(self):
+        shutil.copy(os.path.join(ASSETS, "standard_simple_file.gpx"), os.path.join(self._folder, "e.gpx"))
+        with gzip.open(os.path.join(self._folder, "f.gpx.gz"), "wb") as file:
+            file.write(asset("opentracks_with_several_points_stopped.gpx"))
+        with open(os.path.join(self._folder, "broken.zip"), "wb") as file:
+            file.write(b"not a zip")
+
+        importer = FolderImporter(self._folder)
+        self.assertEqual(importer.files_to_import(), 2 + 4 + 1)
+        with patch.object(FolderImporter, "BATCH_SIZE", 2):
+            results = self._run(importer)
+        self.assertEqual(len(results), 7)
+        self.assertTrue(results[-1].is_done)
+        # The archive's GPX files start when e.gpx does: they already exist.
+        self.assertEqual((results[-1].imported, len(results[-1].errors)), (3, 4))
+        self.assertIn("broken.zip", results[-1].errors[0])
+
+    def test_file_importer_gzip(self):
+        filename = os.path.join(self._folder, "a.gpx.gz")
+        with gzip.open(filename, "wb") as file:
+            file.write(asset("opentracks_with_trkseg.gpx"))
+        importer = ImporterFactory.make(filename)
+        self.assertIsInstance(importer, FileImporter)
+        self.assertEqual(self._run(importer)[-1].imported, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
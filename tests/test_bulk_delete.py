@@ -0,0 +1,93 @@
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+
+from temp_db import TempDB
+
+from pyopentracks.models.database import Database
+from pyopentracks.models.database_helper import DatabaseHelper
+
+
+class TestBulkDelete(TempDB):
+
+    def setUp(self):
+        super().setUp()
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("INSERT INTO segments (_id, name, distance, gain, loss) VALUES (1, 'seg', 1, 0, 0)")
+            for i in range(1, 8):
+                conn.execute("INSERT INTO stats (_id, starttime) VALUES (?, 0)", (i,))
+                # Activities 6 and 7 are sub-activities of activity 5.
+                parent = 5 if i > 5 else None
+                conn.execute(
+                    "INSERT INTO activities (_id, name, category, starttime, statsid, activityid) "
+                    "VALUES (?, 'a', 'running', 0, ?, ?)", (i, i, parent)
+                )
+                if i == 5:
+                    continue
+                conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (?, 's', ?)", (i, i))
+                conn.executemany(
+                    "INSERT INTO trackpoints (_id, sectionid, longitude, latitude, time) VALUES (?, ?, 0, 0, 0)",
+                    [(i * 100 + p, i) for p in range(10)]
+                )
+                conn.execute(
+                    "INSERT INTO segmentracks (segmentid, activityid, trackpointid_start, trackpointid_end, time) "
+                    "VALUES (1, ?, ?, ?, 1)", (i, i * 100, i * 100 + 9)
+                )
+                conn.execute("INSERT INTO routesignatures (activityid, numcells) VALUES (?, 1)", (i,))
+                conn.execute("INSERT INTO routecells (cell, activityid) VALUES (1, ?)", (i,))
+                conn.execute("INSERT INTO heatmaptracks VALUES (?, 0, 0, 1, 1, x'00')", (i,))
+                conn.execute("INSERT INTO hrzonetimes VALUES (?, -1, 10)", (i,))
+                conn.execute("INSERT INTO importfingerprints VALUES (?, ?)", (i, str(i)))
+            conn.execute("INSERT INTO sets (_id, statsid) VALUES (1, 2)")
+            conn.execute("INSERT INTO statsrecompute VALUES (3)")
+
+    def _count(self, table, column, ids):
+        with sqlite3.connect(self._db_file) as conn:
+            marks = ",".join("?" * len(ids))
+            return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IN ({marks})", ids).fetchone()[0]
+
+    def test_delete_activities(self):
+        progress = []
+        with patch("pyopentracks.models.database_helper.HeatmapTileCache") as tile_cache:
+            deleted = DatabaseHelper.delete_activities(
+                [2, 3, 5], on_progress=lambda done, total: progress.append((done, total)), vacuum=True
+            )
+        self.assertEqual(deleted, 5)
+        self.assertEqual(tile_cache.return_value.invalidate.call_count, 4)
+        self.assertEqual(progress, [(5, 5)])
+
+        deleted_ids = [2, 3, 5, 6, 7]
+        for table, column in (
+            ("activities", "_id"), ("stats", "_id"), ("sections", "activityid"), ("segmentracks", "activityid"),
+            ("routesignatures", "activityid"), ("routecells", "activityid"), ("heatmaptracks", "activityid"),
+            ("hrzonetimes", "activityid"), ("importfingerprints", "activityid"), ("statsrecompute", "activityid"),
+            ("sets", "statsid")
+        ):
+            self.assertEqual(self._count(table, column, deleted_ids), 0, table)
+        self.assertEqual(self._count("trackpoints", "sectionid", deleted_ids), 0)
+
+        kept_ids = [1, 4]
+        self.assertEqual(self._count("activities", "_id", kept_ids), 2)
+        self.assertEqual(self._count("stats", "_id", kept_ids), 2)
+        self.assertEqual(self._count("trackpoints", "sectionid", kept_ids), 20)
+        self.assertEqual(self._count("segmentracks", "activityid", kept_ids), 2)
+
+    def test_chunks_and_rollback(self):
+        progress = []
+        self.assertEqual(
+            Database().delete_activities([1, 2, 3], lambda done, total: progress.append((done, total)), chunk_size=2),
+            [1, 2, 3]
+        )
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+
+        def fail(done, total):
+            raise ValueError("Cancelled")
+
+        self.assertIsNone(Database().delete_activities([4, 5], fail, chunk_size=1))
+        self.assertEqual(self._count("activities", "_id", [4, 5, 6, 7]), 4)
+        self.assertEqual(self._count("trackpoints", "sectionid", [4, 6, 7]), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from pyopentracks.models.track_point import TrackPoint
+from pyopentracks.utils.chart_series import lttb, ChartSeries
+
+
+class TestLttb(unittest.TestCase):
+
+    def test_less_points_than_threshold(self):
+        x = np.arange(10, dtype=np.float64)
+        self.assertEqual(list(lttb(x, x, 20)), list(range(10)))
+
+    def test_threshold(self):
+        rng = np.random.default_rng(3)
+        x = np.arange(10000, dtype=np.float64)
+        y = rng.normal(size=10000)
+        indices = lttb(x, y, 500)
+        self.assertEqual(len(indices), 500)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 9999)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_keeps_peaks(self):
+        x = np.arange(1000, dtype=np.float64)
+        y = np.zeros(1000)
+        y[321] = 100
+        y[777] = -50
+        indices = lttb(x, y, 20)
+        self.assertIn(321, indices)
+        self.assertIn(777, indices)
+
+
+class TestChartSeries(unittest.TestCase):
+
+    def _track_points(self):
+        # id, sectionid, longitude, latitude, time, speed, altitude, gain, loss, hr, cadence, power, temp
+        return [
+            TrackPoint(1, 1, -73.96592, 40.78395, 0, 1, 10, 0, 0, None, None, None, None),
+            TrackPoint(2, 1, -73.96537, 40.78378, 10000, 2, 20, 0, 0, 120, 80, None, None),
+            TrackPoint(3, 1, -73.96592, 40.78395, 20000, 3, 15, 0, 0, 130, 85, None, None),
+        ]
+
+    def test_from_track_points(self):
+        series = ChartSeries.from_track_points(self._track_points())
+        self.assertEqual(len(series), 3)
+        self.assertAlmostEqual(series.distance[1], 0.05, 3)
+        self.assertAlmostEqual(series.distance[2], 0.1, 3)
+        self.assertEqual(list(series.elevation), [10, 20, 15])
+        self.assertEqual(list(series.hr), [0, 120, 130])
+        self.assertEqual(list(series.cadence), [0, 80, 85])
+        self.assertEqual(list(series.speed), [1, 2, 3])
+        self.assertTrue(series.has_hr)
+
+    def test_location_at(self):
+        series = ChartSeries.from_track_points(self._track_points())
+        self.assertIsNone(series.location_at(None))
+        self.assertEqual(series.index_at(0.01), 0)
+        self.assertEqual(series.index_at(0.04), 1)
+        self.assertEqual(series.index_at(5), 2)
+        location = series.location_at(0.06)
+        self.assertAlmostEqual(location.latitude, 40.78378)
+        self.assertAlmostEqual(location.longitude, -73.96537)
+
+    def test_empty(self):
+        series = ChartSeries.from_track_points([])
+        self.assertEqual(len(series), 0)
+        self.assertIsNone(series.index_at(1))
+        self.assertFalse(series.has_hr)
+
+
+if __name__ == "__main__":
+    unittest.main()
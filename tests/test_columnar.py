@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from pyopentracks.io.columnar import (
+    ColumnarExporter, ColumnarImporter, ColumnarFormat, ColumnarException
+)
+from pyopentracks.models.migrations import Migration
+
+
+class SqliteDb:
+    """Minimal Database's replacement to run the migrations."""
+
+    def __init__(self, filename):
+        self._filename = filename
+
+    def execute(self, query):
+        with sqlite3.connect(self._filename) as conn:
+            conn.execute(query)
+
+
+def create_database(filename):
+    Migration(SqliteDb(filename), 0).migrate()
+
+
+def fill_database(filename):
+    with sqlite3.connect(filename) as conn:
+        for i in range(1, 4):
+            conn.execute(
+                "INSERT INTO stats (_id, starttime, stoptime, totaldistance, totaltime, maxhr, totalcalories) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (i, 1000 * i, 1000 * i + 500, 12.5 * i, 500, None if i == 2 else 150.0, 300)
+            )
+            conn.execute(
+                "INSERT INTO activities (_id, uuid, name, description, category, recorded_with, starttime, statsid) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (i, f"uuid-{i}", f"Activity, \"{i}\"", "", "running", 1, 1000 * i, i)
+            )
+            for s in range(2):
+                section_id = i * 10 + s
+                conn.execute(
+                    "INSERT INTO sections (_id, name, activityid) VALUES (?, ?, ?)", (section_id, f"S{s}", i)
+                )
+                conn.executemany(
+                    "INSERT INTO trackpoints (sectionid, longitude, latitude, time, speed, altitude, heartrate) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (section_id, -0.5 + p * 1e-5, 38.5 + p * 1e-5, 1000 * i + p, 2.5, 100.25 + p, None)
+                        for p in range(25)
+                    ]
+                )
+        conn.execute("INSERT INTO segments (_id, name, distance, gain, loss) VALUES (7, 'Hill', 1200, 30, 2)")
+        conn.executemany(
+            "INSERT INTO segmentpoints (segmentid, latitude, longitude, altitude) VALUES (7, ?, ?, ?)",
+            [(38.5, -0.5, 100.0), (38.6, -0.4, None)]
+        )
+        # A segment without efforts.
+        conn.execute("INSERT INTO segments (_id, name, distance, gain, loss) VALUES (9, 'Flat', 800, 0, 0)")
+        conn.execute("INSERT INTO segmentpoints (segmentid, latitude, longitude, altitude) VALUES (9, 38.7, -0.3, 5.0)")
+        conn.execute(
+            "INSERT INTO segmentracks (segmentid, activityid, trackpointid_start, trackpointid_end, time, avghr) "
+            "VALUES (7, 2, 3, 20, 600, 140.5)"
+        )
+
+
+def dump(filename):
+    with sqlite3.connect(filename) as conn:
+        return {
+            table: conn.execute(f"SELECT * FROM {table} ORDER BY _id").fetchall()
+            for table in ("stats", "activities", "sections", "trackpoints", "segments", "segmentpoints", "segmentracks")
+        }
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._source = os.path.join(self._tmp.name, "source.db")
+        create_database(self._source)
+        fill_database(self._source)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _round_trip(self, fmt):
+        folder = os.path.join(self._tmp.name, fmt)
+        progress = {}
+        exporter = ColumnarExporter(self._source, folder, fmt, row_group_size=20)
+        filenames = exporter.export(lambda name, rows: progress.__setitem__(name, rows))
+        self.assertEqual(progress["trackpoints"], 150)
+        self.assertEqual(progress["activities"], 3)
+        self.assertEqual(progress["segment_efforts"], 1)
+        self.assertTrue(all(os.path.isfile(f) for f in filenames.values()))
+
+        target = os.path.join(self._tmp.name, f"{fmt}.db")
+        create_database(target)
+        counts = ColumnarImporter(target, folder, batch_size=7).import_all()
+        self.assertEqual(counts["trackpoints"], 150)
+        self.assertEqual(counts["segments"], 2)
+        self.assertEqual(counts["segment_points"], 3)
+        return dump(target)
+
+    def test_csv_round_trip(self):
+        expected = dump(self._source)
+        imported = self._round_trip(ColumnarFormat.CSV)
+        # CSV can't tell apart empty strings from NULL values.
+        expected["activities"] = [row[:3] + (None,) + row[4:] for row in expected["activities"]]
+        self.assertEqual(imported, expected)
+
+    @unittest.skipUnless(ColumnarFormat.PARQUET in ColumnarFormat.available(), "pyarrow is not installed")
+    def test_parquet_round_trip(self):
+        self.assertEqual(self._round_trip(ColumnarFormat.PARQUET), dump(self._source))
+
+    @unittest.skipUnless(ColumnarFormat.ARROW in ColumnarFormat.available(), "pyarrow is not installed")
+    def test_arrow_round_trip(self):
+        self.assertEqual(self._round_trip(ColumnarFormat.ARROW), dump(self._source))
+
+    def test_import_into_not_empty_database(self):
+        folder = os.path.join(self._tmp.name, "csv")
+        ColumnarExporter(self._source, folder, ColumnarFormat.CSV).export()
+        with self.assertRaises(ColumnarException):
+            ColumnarImporter(self._source, folder).import_all()
+        self.assertEqual(dump(self._source)["trackpoints"][-1][0], 150)
+
+    def test_nothing_to_import(self):
+        with self.assertRaises(ColumnarException):
+            ColumnarImporter(self._source, self._tmp.name).import_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
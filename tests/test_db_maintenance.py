@@ -0,0 +1,96 @@
+import multiprocessing as mp
+import os
+import sqlite3
+import time
+import unittest
+
+from unittest.mock import patch
+
+from temp_db import TempDB
+
+from pyopentracks.models.database_helper import DatabaseHelper
+from pyopentracks.tasks.db_maintenance import DatabaseMaintenance
+
+
+class TestDatabaseMaintenance(TempDB):
+
+    def setUp(self):
+        super().setUp()
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("INSERT INTO stats (_id) VALUES (1)")
+            conn.execute("INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (1, 'a', 'running', 0, 1)")
+            conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (1, 's', 1)")
+            conn.executemany(
+                "INSERT INTO trackpoints (sectionid, longitude, latitude, time) VALUES (1, ?, 0, ?)",
+                [(i, i) for i in range(60000)]
+            )
+        self._maintenance = DatabaseMaintenance()
+
+    def test_old_database(self):
+        """Databases without incremental vacuum are only changed on request, never in idle steps."""
+        db_file = os.path.join(self._tmp.name, "old.db")
+        with sqlite3.connect(db_file) as conn:
+            conn.execute("CREATE TABLE t (a)")
+            conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(20000)])
+            conn.execute("DELETE FROM t")
+        maintenance = DatabaseMaintenance(db_file)
+        self.assertFalse(maintenance.incremental_vacuum_enabled())
+        self.assertEqual(maintenance.idle_step(), 0)
+        self.assertFalse(maintenance.incremental_vacuum_enabled())
+        maintenance.enable_incremental_vacuum()
+        self.assertTrue(maintenance.incremental_vacuum_enabled())
+        self.assertEqual(maintenance.free_pages(), 0)
+
+    def test_incremental_vacuum(self):
+        # New databases are created with incremental vacuum.
+        self.assertTrue(self._maintenance.incremental_vacuum_enabled())
+        self.assertEqual(self._maintenance.vacuum_step(), 0)
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("DELETE FROM trackpoints")
+        free_pages = self._maintenance.free_pages()
+        self.assertGreater(free_pages, 20)
+        size = os.path.getsize(self._db_file)
+
+        self.assertEqual(self._maintenance.idle_step(), min(free_pages, DatabaseMaintenance.VACUUM_PAGES))
+        free_pages = self._maintenance.free_pages()
+        self.assertGreater(free_pages, 20)
+        self.assertEqual(self._maintenance.vacuum_step(10), 10)
+        self.assertEqual(self._maintenance.free_pages(), free_pages - 10)
+        self.assertEqual(self._maintenance.vacuum(7), free_pages - 10)
+        self.assertEqual(self._maintenance.free_pages(), 0)
+        self.assertEqual(self._maintenance.vacuum_step(), 0)
+        self.assertLess(os.path.getsize(self._db_file), size)
+
+    @patch.object(DatabaseHelper, "_processes", [])
+    def test_helper_is_busy(self):
+        self.assertFalse(DatabaseHelper.is_busy())
+        process = mp.Process(target=time.sleep, args=(0.5,))
+        DatabaseHelper._start(process)
+        self.assertTrue(DatabaseHelper.is_busy())
+        process.join()
+        self.assertFalse(DatabaseHelper.is_busy())
+
+    def test_optimize(self):
+        self._maintenance.optimize()
+        with sqlite3.connect(self._db_file) as conn:
+            tables = [row[0] for row in conn.execute("SELECT DISTINCT tbl FROM sqlite_stat1")]
+        self.assertIn("trackpoints", tables)
+        # Already analyzed.
+        self._maintenance.optimize()
+
+    def test_report_and_timings(self):
+        report = {obj.name: obj for obj in self._maintenance.report()}
+        self.assertEqual(report["trackpoints"].rows, 60000)
+        self.assertEqual(report["trackpoints"].type, "table")
+        self.assertEqual(report["trackpoints_sectionid_index"].type, "index")
+        self.assertEqual(report["trackpoints_sectionid_index"].table, "trackpoints")
+        if report["trackpoints"].size is not None:
+            self.assertEqual(self._maintenance.report()[0].name, "trackpoints")
+
+        timings = self._maintenance.timings(repeat=1)
+        self.assertEqual(set(timings), set(DatabaseMaintenance.QUERIES))
+        self.assertTrue(all(t >= 0 for t in timings.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from pyopentracks.io.elevation.dem import (
+    DemTile, DemTileCache, DemElevationProvider, DemTileException
+)
+
+
+def write_hgt(directory, name, size, func):
+    """Write a synthetic SRTM tile whose elevations are func(lat, lon)."""
+    bounds = DemTile.hgt_bounds(name)
+    south, west = bounds[0], bounds[1]
+    lats = south + 1 - np.arange(size) / (size - 1)
+    lons = west + np.arange(size) / (size - 1)
+    grid = func(lats[:, None], lons[None, :]).astype(">i2")
+    filename = os.path.join(directory, name)
+    grid.tofile(filename)
+    return filename
+
+
+def write_geotiff(filename, data, west, north, step, raster_type=2, nodata=None):
+    """Write a little-endian, uncompressed, one strip float32 GeoTIFF."""
+    data = np.asarray(data, dtype="<f4")
+    height, width = data.shape
+    entries = []
+    extra = b""
+    # Extra data starts after the header (8), the IFD count (2), the
+    # entries (12 each) and the next IFD offset (4).
+    num_entries = 11 + (1 if nodata is not None else 0)
+    extra_offset = 8 + 2 + num_entries * 12 + 4
+
+    def add(tag, typ, count, payload):
+        nonlocal extra
+        if len(payload) <= 4:
+            entries.append(struct.pack("<HHI", tag, typ, count) + payload.ljust(4, b"\x00"))
+        else:
+            entries.append(struct.pack("<HHII", tag, typ, count, extra_offset + len(extra)))
+            extra += payload
+
+    add(256, 3, 1, struct.pack("<H", width))
+    add(257, 3, 1, struct.pack("<H", height))
+    add(258, 3, 1, struct.pack("<H", 32))
+    add(259, 3, 1, struct.pack("<H", 1))
+    add(273, 4, 1, struct.pack("<I", 0))
+    add(277, 3, 1, struct.pack("<H", 1))
+    add(279, 4, 1, struct.pack("<I", data.nbytes))
+    add(339, 3, 1, struct.pack("<H", 3))
+    add(33550, 12, 3, struct.pack("<3d", step, step, 0))
+    add(33922, 12, 6, struct.pack("<6d", 0, 0, 0, west, north, 0))
+    add(34735, 3, 8, struct.pack("<8H", 1, 1, 0, 1, 1025, 0, 1, raster_type))
+    if nodata is not None:
+        add(42113, 2, len(str(nodata)) + 1, str(nodata).encode("ascii") + b"\x00")
+
+    image_offset = extra_offset + len(extra)
+    # StripOffsets (the fifth entry) points to the image data.
+    entries[4] = struct.pack("<HHII", 273, 4, 1, image_offset)
+    with open(filename, "wb") as f:
+        f.write(b"II" + struct.pack("<HI", 42, 8))
+        f.write(struct.pack("<H", len(entries)))
+        f.write(b"".join(entries))
+        f.write(struct.pack("<I", 0))
+        f.write(extra)
+        f.write(data.tobytes())
+    return filename
+
+
+class TestDemTile(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_hgt_bilinear(self):
+        # A plane is interpolated exactly by bilinear interpolation.
+        filename = write_hgt(
+            self._dir, "N38W001.hgt", 121, lambda lat, lon: 1000 * (lat - 38) + 500 * (lon + 1)
+        )
+        tile = DemTile.from_file(filename)
+        self.assertEqual(tile.bounds, (38, -1, 39, 0))
+        lats = np.array([38.0, 38.5, 38.123, 38.999, 39.0])
+        lons = np.array([-1.0, -0.5, -0.777, -0.001, 0.0])
+        expected = 1000 * (lats - 38) + 500 * (lons + 1)
+        np.testing.assert_allclose(tile.sample(lats, lons), expected, atol=1)
+
+    def test_hgt_voids(self):
+        filename = write_hgt(self._dir, "S01E010.hgt", 3, lambda lat, lon: np.full(np.broadcast(lat, lon).shape, 100))
+        data = np.fromfile(filename, dtype=">i2").reshape(3, 3)
+        data[0, 0] = DemTile.HGT_VOID
+        data.tofile(filename)
+        tile = DemTile.from_file(filename)
+        self.assertEqual(tile.bounds, (-1, 10, 0, 11))
+        # Surrounded by the void sample and three 100 m samples.
+        self.assertAlmostEqual(tile.sample([-0.25], [10.25])[0], 100)
+        # Just over the void sample.
+        self.assertAlmostEqual(tile.sample([0.0], [10.0])[0], 100)
+
+    def test_wrong_files(self):
+        filename = os.path.join(self._dir, "N38W001.hgt")
+        with open(filename, "wb") as f:
+            f.write(b"\x00" * 7)
+        with self.assertRaises(DemTileException):
+            DemTile.from_file(filename)
+        with self.assertRaises(DemTileException):
+            DemTile.from_file(os.path.join(self._dir, "tile.png"))
+
+    def test_geotiff_pixel_is_point(self):
+        lats = 40 - np.arange(11) * 0.1
+        lons = 2 + np.arange(21) * 0.1
+        grid = 10 * lats[:, None] + lons[None, :]
+        filename = write_geotiff(os.path.join(self._dir, "dem.tif"), grid, 2, 40, 0.1)
+        tile = DemTile.from_file(filename)
+        np.testing.assert_allclose(tile.bounds, (39, 2, 40, 4))
+        qlat = np.array([39.55, 39.0, 39.91])
+        qlon = np.array([3.33, 4.0, 2.05])
+        np.testing.assert_allclose(tile.sample(qlat, qlon), 10 * qlat + qlon, rtol=1e-5)
+
+    def test_geotiff_pixel_is_area_and_nodata(self):
+        grid = np.array([[1, 2], [3, -9999]], dtype=np.float32)
+        filename = write_geotiff(os.path.join(self._dir, "area.tif"), grid, 0, 2, 1, raster_type=1, nodata=-9999)
+        tile = DemTile.from_file(filename)
+        self.assertEqual(tile.bounds, (0, 0, 2, 2))
+        # Pixel centres are at 0.5 and 1.5.
+        self.assertAlmostEqual(tile.sample([1.5], [0.5])[0], 1)
+        self.assertAlmostEqual(tile.sample([1.5], [1.0])[0], 1.5)
+        self.assertAlmostEqual(tile.sample([1.0], [1.0])[0], 2)
+
+
+class TestDemElevationProvider(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_elevations_across_tiles(self):
+        for name in ("N38W001.hgt", "N38E000.hgt"):
+            write_hgt(self._dir, name, 61, lambda lat, lon: 100 * lat + 10 * lon)
+        provider = DemElevationProvider(DemTileCache(self._dir))
+        lats = np.array([38.2, 38.7, 38.5, 40.5])
+        lons = np.array([-0.5, 0.5, -0.0001, 0.5])
+        elevations = provider.elevations(lats, lons)
+        np.testing.assert_allclose(elevations[:3], 100 * lats[:3] + 10 * lons[:3], atol=1)
+        self.assertTrue(np.isnan(elevations[3]))
+        self.assertEqual(provider.tile_cache.missing_tiles(lats, lons), ["N40E000"])
+
+    def test_elevations_non_aligned_geotiff(self):
+        # 38.1-38.4 N x 0.1-0.4 E and 38.9-39.2 N x -0.2-0.1 E: none of
+        # them covers the center of a 1 degree cell.
+        for name, west, north in (("a.tif", 0.1, 38.4), ("b.tif", -0.2, 39.2)):
+            lats = north - np.arange(4) * 0.1
+            lons = west + np.arange(4) * 0.1
+            write_geotiff(
+                os.path.join(self._dir, name), 100 * lats[:, None] + 10 * lons[None, :], west, north, 0.1
+            )
+        provider = DemElevationProvider(DemTileCache(self._dir))
+        lats = np.array([38.2, 38.35, 39.1, 38.95, 38.5])
+        lons = np.array([0.2, 0.15, -0.1, 0.05, 0.5])
+        elevations = provider.elevations(lats, lons)
+        np.testing.assert_allclose(elevations[:4], 100 * lats[:4] + 10 * lons[:4], atol=0.01)
+        self.assertTrue(np.isnan(elevations[4]))
+        self.assertEqual(provider.tile_cache.missing_tiles(lats, lons), ["N38E000"])
+
+    def test_add_tile(self):
+        source = tempfile.TemporaryDirectory()
+        filename = write_hgt(source.name, "N10E010.hgt", 5, lambda lat, lon: lat * 0 + lon * 0 + 7)
+        cache = DemTileCache(self._dir)
+        self.assertIsNone(cache.tile(10.5, 10.5))
+        cache.add(filename)
+        source.cleanup()
+        self.assertTrue(os.path.exists(os.path.join(self._dir, "N10E010.hgt")))
+        provider = DemElevationProvider(cache)
+        self.assertEqual(provider.elevations(np.array([10.5]), np.array([10.5]))[0], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+import numpy as np
+
+from pyopentracks.io.elevation.client import ElevationCache, OpenElevationClient, ElevationClientException
+from pyopentracks.io.elevation.provider import OpenElevationProvider
+from pyopentracks.io.elevation.server import OpenElevationServer
+
+
+class TestOpenElevationClient(unittest.TestCase):
+
+    def setUp(self):
+        self._server = OpenElevationServer().start()
+        self._tmp = tempfile.TemporaryDirectory()
+        self._latitudes = 38.5 + np.arange(1234) * 0.0001
+        self._longitudes = -0.5 + np.arange(1234) * 0.0001
+
+    def tearDown(self):
+        self._server.stop()
+        self._tmp.cleanup()
+
+    def test_lookup_in_batches(self):
+        client = OpenElevationClient(self._server.url, bulk_num=100, max_workers=3)
+        elevations = client.lookup(self._latitudes, self._longitudes)
+        client.close()
+        np.testing.assert_allclose(elevations, OpenElevationServer.synthetic(self._latitudes, self._longitudes))
+        self.assertEqual(self._server.requests, 13)
+        self.assertEqual(self._server.locations, 1234)
+
+    def test_retry(self):
+        self._server.fail_next(2)
+        client = OpenElevationClient(self._server.url, bulk_num=1000, max_workers=1, backoff=0.01)
+        elevations = client.lookup(self._latitudes[:10], self._longitudes[:10])
+        client.close()
+        self.assertEqual(len(elevations), 10)
+        self.assertFalse(np.any(np.isnan(elevations)))
+
+    def test_retries_exhausted(self):
+        self._server.fail_next(10)
+        client = OpenElevationClient(self._server.url, retries=2, backoff=0.01)
+        with self.assertRaises(ElevationClientException):
+            client.lookup(self._latitudes[:10], self._longitudes[:10])
+        client.close()
+
+    def test_client_error_is_not_retried(self):
+        self._server.fail_next(1, status=400)
+        client = OpenElevationClient(self._server.url, retries=3, backoff=0.01)
+        with self.assertRaises(ElevationClientException):
+            client.lookup(self._latitudes[:10], self._longitudes[:10])
+        client.close()
+        self.assertEqual(self._server.requests, 0)
+
+    def test_provider_uses_cache(self):
+        cache = ElevationCache(os.path.join(self._tmp.name, "cache.db"))
+        provider = OpenElevationProvider(self._server.url, cache, bulk_num=500)
+        # Repeated locations are requested only once.
+        latitudes = np.concatenate([self._latitudes, self._latitudes])
+        longitudes = np.concatenate([self._longitudes, self._longitudes])
+        first = provider.elevations(latitudes, longitudes)
+        self.assertEqual(self._server.locations, 1234)
+        self.assertEqual(self._server.requests, 3)
+
+        second = OpenElevationProvider(self._server.url, cache).elevations(self._latitudes, self._longitudes)
+        self.assertEqual(self._server.requests, 3)
+        np.testing.assert_allclose(first[:1234], second)
+        np.testing.assert_allclose(first[1234:], second)
+
+    def test_provider_keeps_connections(self):
+        cache = ElevationCache(os.path.join(self._tmp.name, "cache.db"))
+        with OpenElevationProvider(self._server.url, cache, max_workers=1) as provider:
+            provider.elevations(self._latitudes[:10], self._longitudes[:10])
+            executor = provider._client._executor
+            connection = executor.submit(provider._client._connection).result()
+            provider.elevations(self._latitudes[10:20], self._longitudes[10:20])
+            # The same worker thread and connection are used in both lookups.
+            self.assertIs(provider._client._executor, executor)
+            self.assertIs(executor.submit(provider._client._connection).result(), connection)
+        self.assertIsNone(provider._client._executor)
+        self.assertEqual(self._server.requests, 2)
+
+    def test_provider_instance(self):
+        default_filename = os.path.join(self._tmp.name, "default.db")
+        with patch.object(ElevationCache, "default_filename", return_value=default_filename):
+            self._check_instance()
+
+    def _check_instance(self):
+        provider = OpenElevationProvider.instance()
+        self.assertIs(OpenElevationProvider.instance(), provider)
+        OpenElevationProvider.close_instance()
+        self.assertIsNot(OpenElevationProvider.instance(), provider)
+        OpenElevationProvider.close_instance()
+
+
+class TestElevationCache(unittest.TestCase):
+
+    def test_get_and_put(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ElevationCache(os.path.join(tmp, "cache.db"))
+            lat_keys, lon_keys = ElevationCache.keys([38.123456, 38.1], [-0.5, 1.000004])
+            self.assertEqual(lat_keys.tolist(), [3812346, 3810000])
+            self.assertEqual(lon_keys.tolist(), [-50000, 100000])
+            cache.put(lat_keys, lon_keys, [10.5, np.nan])
+            self.assertEqual(cache.get(lat_keys, lon_keys), {(3812346, -50000): 10.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
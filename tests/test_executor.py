@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+
+from pyopentracks.tasks.executor import Priority, TaskExecutor
+
+
+def square(value):
+    return value * value
+
+
+class TestTaskExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self._executor = TaskExecutor(max_threads=1, max_processes=1)
+
+    def tearDown(self):
+        self._executor.shutdown(wait=True)
+
+    def _block(self):
+        """Keep the only worker busy until the returned event is set."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+
+        self._executor.submit(blocking)
+        started.wait(5)
+        return release
+
+    def _wait(self, done, expected):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            metrics = self._executor.metrics()
+            if metrics["completed"] + metrics["cancelled"] + metrics["failed"] >= expected:
+                return metrics
+            time.sleep(0.01)
+        self.fail("Tasks didn't finish")
+
+    def test_priorities(self):
+        release = self._block()
+        order = []
+        self._executor.submit(lambda: "background", callback=order.append, priority=Priority.BACKGROUND)
+        self._executor.submit(lambda: "normal", callback=order.append)
+        self._executor.submit(lambda: "visible", callback=order.append, priority=Priority.VISIBLE)
+        self._executor.submit(lambda: "visible2", callback=order.append, priority=Priority.VISIBLE)
+        self.assertEqual(self._executor.metrics()["queued"], {"VISIBLE": 2, "NORMAL": 1, "BACKGROUND": 1})
+        release.set()
+        metrics = self._wait(None, 5)
+        self.assertEqual(order, ["visible", "visible2", "normal", "background"])
+        self.assertEqual(metrics["queued"], {"VISIBLE": 0, "NORMAL": 0, "BACKGROUND": 0})
+        self.assertEqual(metrics["submitted"], 5)
+        self.assertGreater(metrics["wait_ms"]["BACKGROUND"][1], 0)
+
+    def test_superseded_tasks_are_dropped(self):
+        release = self._block()
+        results = []
+        widget = object()
+        for segment in (1, 2, 3):
+            self._executor.submit(square, (segment,), results.append, key=widget)
+        release.set()
+        metrics = self._wait(None, 4)
+        self.assertEqual(results, [9])
+        self.assertEqual(metrics["superseded"], 2)
+        self.assertEqual(metrics["cancelled"], 2)
+
+    def test_cancel_running_task(self):
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def job():
+            started.set()
+            release.wait(5)
+            return 1
+
+        task = self._executor.submit(job, callback=results.append, key="widget")
+        started.wait(5)
+        self._executor.cancel("widget")
+        self.assertTrue(task.cancelled)
+        release.set()
+        self._wait(None, 1)
+        self.assertEqual(results, [])
+
+    def test_errors_and_processes(self):
+        results = []
+        self._executor.submit(lambda: 1 / 0, callback=results.append)
+        self._executor.submit(square, (7,), results.append, process=True)
+        metrics = self._wait(None, 2)
+        self.assertEqual(results, [49])
+        self.assertEqual(metrics["failed"], 1)
+        self.assertEqual(metrics["completed"], 1)
+
+    def test_shutdown(self):
+        self._executor.shutdown(wait=True)
+        with self.assertRaises(RuntimeError):
+            self._executor.submit(square, (1,))
+
+
+if __name__ == "__main__":
+    unittest.main()
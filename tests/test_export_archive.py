@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from pyopentracks.io.exporter.archive import ArchiveExporter, ExportManifest
+
+
+def render(activity_id):
+    if activity_id == 13:
+        raise ValueError("Unlucky activity")
+    return f"{activity_id}.gpx", (f"<gpx id=\"{activity_id}\">" + "x" * 100000 + "</gpx>").encode("utf-8")
+
+
+class TestArchiveExporter(unittest.TestCase):
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "export.zip")
+            results = []
+            exporter = ArchiveExporter(filename, render, max_workers=2)
+            exported = exporter.export(list(range(1, 21)), lambda *args: results.append(args))
+
+            self.assertEqual(exported, [i for i in range(1, 21) if i != 13])
+            self.assertEqual(len(results), 20)
+            self.assertEqual([r for r in results if r[2] is not None], [(13, None, "Unlucky activity")])
+            with zipfile.ZipFile(filename) as archive:
+                self.assertIsNone(archive.testzip())
+                names = archive.namelist()
+                self.assertEqual(len(names), 19)
+                self.assertEqual(archive.read("7.gpx"), render(7)[1])
+                info = archive.getinfo("7.gpx")
+                self.assertLess(info.compress_size, info.file_size)
+
+
+class TestExportManifest(unittest.TestCase):
+
+    def test_changed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = ExportManifest(tmp)
+            self.assertEqual(manifest.changed({1: "a", 2: "b"}), [1, 2])
+            manifest.update({1: "a", 2: "b"})
+            manifest.save()
+
+            manifest = ExportManifest(tmp)
+            self.assertEqual(manifest.changed({1: "a", 2: "c", 3: "d"}), [2, 3])
+
+    def test_corrupted_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, ExportManifest.FILENAME), "w") as f:
+                f.write("{not json")
+            self.assertEqual(ExportManifest(tmp).changed({1: "a"}), [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from pyopentracks.io.exporter.fit import FitWriter
+from pyopentracks.io.parser.factory import ParserFactory
+from pyopentracks.io.parser.fit.fit import FitTrackActivity
+from pyopentracks.libs.fitsegmentencoder.definitions import SPORT, SUB_SPORT
+from pyopentracks.libs.fitsegmentencoder.profile import Crc
+
+
+class FakeStats:
+    total_calories_value = 420
+
+
+class FakeActivity:
+    name = "Evening ride"
+    category = "road biking"
+    stats = FakeStats()
+
+
+def rows(section_id, first_id, n, start_ms):
+    # _id, sectionid, longitude, latitude, time, speed, altitude, gain, loss, hr, cadence, power, temperature
+    return [
+        (
+            first_id + i, section_id, -0.5 + i * 0.0001, 38.5 + i * 0.0001, start_ms + i * 1000,
+            5.5, 100.0 + i, 1.0, None, 120 + i if i % 3 else None, 80.5, 200 + i, 21.0
+        )
+        for i in range(n)
+    ]
+
+
+class TestFitWriter(unittest.TestCase):
+
+    def test_sport(self):
+        self.assertEqual(FitWriter.sport("Mountain biking"), (SPORT["cycling"], SUB_SPORT["mountain"]))
+        self.assertEqual(FitWriter.sport(None), (SPORT["generic"], SUB_SPORT["generic"]))
+
+    def test_crc(self):
+        data = os.urandom(5000)
+        self.assertEqual(Crc.calculate(data, 0x1234), Crc._calculate_nibbles(data, 0x1234))
+
+    def test_round_trip(self):
+        first = rows(1, 1, 10, 1609459200000) + rows(1, 11, 10, 1609459210000)
+        second = rows(2, 21, 8, 1609459300000)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "activity.fit")
+            total = FitWriter(filename).write(
+                FakeActivity(), [(1, first[:10]), (1, first[10:]), (2, second)]
+            )
+            self.assertEqual(total, 28)
+
+            parser = ParserFactory.make(filename)
+            self.assertIsInstance(parser, FitTrackActivity)
+            record = parser.parse()
+
+        self.assertEqual(record.name, FakeActivity.name)
+        self.assertEqual(record.category, "cycling")
+        self.assertEqual(record.total_calories, 420)
+        self.assertEqual([len(s.points) for s in record.segments], [20, 8])
+        for row, point in zip(first + second, [p for s in record.segments for p in s.points]):
+            self.assertAlmostEqual(point.latitude, row[3], places=6)
+            self.assertAlmostEqual(point.longitude, row[2], places=6)
+            self.assertEqual(point.time, row[4])
+            self.assertAlmostEqual(point.speed, row[5])
+            self.assertAlmostEqual(point.altitude, row[6], places=1)
+            self.assertEqual(point.heart_rate, row[9])
+            self.assertAlmostEqual(point.cadence, row[10])
+            self.assertEqual(point.power, row[11])
+            self.assertEqual(point.temperature, row[12])
+
+
+if __name__ == "__main__":
+    unittest.main()
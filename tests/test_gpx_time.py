@@ -0,0 +1,79 @@
+import glob
+import os
+import unittest
+
+from xml.etree import ElementTree
+
+from dateutil.parser import isoparse
+
+from pyopentracks.io.parser.gpx.gpx import PreParser
+from pyopentracks.utils.utils import TimeUtils
+
+
+ASSETS = os.path.join(os.path.dirname(os.path.realpath(__file__)), "assets")
+
+
+def local_name(element):
+    return element.tag.rpartition("}")[2]
+
+
+def reference(date_time):
+    return isoparse(date_time).timestamp() * 1000
+
+
+class TestIsoTimes(unittest.TestCase):
+
+    def test_assets_conformance(self):
+        """The fast path gives exactly what isoparse gives for the GPX files' times."""
+        for filename in glob.glob(os.path.join(ASSETS, "*.gpx")):
+            elements = list(ElementTree.parse(filename).iter())
+            times = [e.text for e in elements if local_name(e) == "time"]
+            expected = [reference(t) for t in times]
+            self.assertEqual(TimeUtils.isos_to_ms(times), expected, filename)
+            self.assertEqual([TimeUtils.iso_to_ms(t) for t in times], expected, filename)
+
+            # Points get the time of their trkpt.
+            trkpts_times = [
+                int(reference(c.text)) for e in elements if local_name(e) == "trkpt"
+                for c in e if local_name(c) == "time"
+            ]
+            points_times = [
+                p.time for s in PreParser(filename).parse().segments for p in s.points if p.time is not None
+            ]
+            self.assertEqual(points_times, trkpts_times, filename)
+
+    def test_layouts(self):
+        times = [
+            "2022-01-01T08:30:50Z",
+            "2022-01-01T08:30:50.1Z",
+            "2022-01-01T08:30:50.123Z",
+            "2022-01-01T08:30:50.123456Z",
+            "2022-01-01T08:30:50.999999+05:45",
+            "2022-01-01T00:30:50.5-01:30",
+            "2022-01-01T23:59:59+0200",
+            "2020-02-29T12:00:00Z",
+            "1969-12-31T23:59:59.9Z",
+            # Irregular ones.
+            "2022-01-01T08:30:50",
+            "2022-01-01",
+            "2022-01-01T08:30:50.1234567Z",
+            "2022-01-01T08:30:50,5Z",
+            "2022-01-01T08:30:50+01",
+            "2022-01-01T24:00:00Z",
+            "20220101T083050Z",
+        ]
+        expected = [reference(t) for t in times]
+        self.assertEqual(TimeUtils.isos_to_ms(times), expected)
+        self.assertEqual([TimeUtils.iso_to_ms(t) for t in times], expected)
+        self.assertEqual(TimeUtils.isos_to_ms([]), [])
+
+    def test_invalid(self):
+        for date_time in ("2022-02-30T08:30:50Z", "2022-01-01T08:30:50+24:00", "0000-01-01T00:00:00Z", ""):
+            with self.assertRaises(ValueError):
+                TimeUtils.iso_to_ms(date_time)
+            with self.assertRaises(ValueError):
+                TimeUtils.isos_to_ms(["2022-01-01T08:30:50Z", date_time])
+
+
+if __name__ == "__main__":
+    unittest.main()
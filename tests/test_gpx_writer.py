@@ -0,0 +1,112 @@
+import builtins
+import io
+import os
+import tempfile
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+from xml.etree import ElementTree
+
+from pyopentracks.io.export_handler import ExportActivity
+from pyopentracks.io.exporter.gpx import GpxWriter
+from pyopentracks.io.parser.result import ResultCode
+from pyopentracks.models.database import Database, config
+from pyopentracks.io.parser.gpx.gpx import PreParser
+
+
+class FakeActivity:
+    name = "Ride <with> \"special\" & chars"
+    description = "A & B"
+    category = "road biking"
+    start_time_ms = 1609459200000
+    uuid = "123e4567-e89b-12d3-a456-426614174000"
+
+
+def rows(section_id, first_id, n, start_ms):
+    # _id, sectionid, longitude, latitude, time, speed, altitude, gain, loss, hr, cadence, power, temperature
+    return [
+        (
+            first_id + i, section_id, -0.5 + i * 0.0001, 38.5 + i * 0.0001, start_ms + i * 1000,
+            5.5, 100.0 + i, 1.0 if i % 2 else None, None, 120 + i if i % 3 else None, None, None, None
+        )
+        for i in range(n)
+    ]
+
+
+class TestGpxWriter(unittest.TestCase):
+
+    def test_iso_times(self):
+        self.assertEqual(
+            GpxWriter.iso_times([1609459200000, 1609459201500.4]),
+            ["2021-01-01T00:00:00.000Z", "2021-01-01T00:00:01.500Z"]
+        )
+
+    def test_sections_and_escaping(self):
+        output = io.StringIO()
+        chunks = [
+            (1, rows(1, 1, 3, 1609459200000)),
+            (1, rows(1, 4, 2, 1609459203000)),
+            (2, rows(2, 6, 4, 1609459300000)),
+        ]
+        total = GpxWriter(output).write(FakeActivity(), iter(chunks))
+        self.assertEqual(total, 9)
+
+        ns = {"gpx": "http://www.topografix.com/GPX/1/1"}
+        root = ElementTree.fromstring(output.getvalue().encode("utf-8"))
+        self.assertEqual(root.find("gpx:metadata/gpx:name", ns).text, FakeActivity.name)
+        self.assertEqual(root.find("gpx:metadata/gpx:desc", ns).text, "A & B")
+        segments = root.findall("gpx:trk/gpx:trkseg", ns)
+        self.assertEqual([len(s.findall("gpx:trkpt", ns)) for s in segments], [5, 4])
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "activity.gpx")
+            GpxWriter(filename).write(
+                FakeActivity(), [(1, rows(1, 1, 5, 1609459200000)), (2, rows(2, 6, 5, 1609459300000))]
+            )
+            record = PreParser(filename).parse()
+
+        self.assertEqual(record.name, FakeActivity.name)
+        self.assertEqual(record.uuid, FakeActivity.uuid)
+        self.assertEqual(len(record.segments), 2)
+        point = record.segments[1].points[1]
+        self.assertEqual(point.time, 1609459301000)
+        self.assertAlmostEqual(point.latitude, 38.5001)
+        self.assertAlmostEqual(point.altitude, 101.0)
+        self.assertAlmostEqual(point.heart_rate, 121)
+        self.assertAlmostEqual(point.speed, 5.5)
+
+    def test_export_fails_if_reading_fails(self):
+        def chunks(activity_id):
+            yield 1, rows(1, 1, 5, 1609459200000)
+            raise sqlite3.OperationalError("disk I/O error")
+
+        activity = FakeActivity()
+        activity.id = 1
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.object(builtins, "_", lambda s: s, create=True), \
+                patch("pyopentracks.io.export_handler.DatabaseHelper") as helper:
+            helper.get_activity_by_id.return_value = activity
+            helper.iter_track_points_rows.side_effect = chunks
+            exporter = ExportActivity(1, tmp)
+            result = exporter.run()
+
+            self.assertEqual(result.code, ResultCode.ERROR)
+            self.assertIn("disk I/O error", result.message)
+            self.assertFalse(os.path.exists(exporter.filename))
+
+    def test_iter_track_points_rows_raises(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = os.path.join(tmp, "database.db")
+            with sqlite3.connect(db_file) as conn:
+                conn.execute("CREATE TABLE sections (_id INTEGER PRIMARY KEY, activityid INTEGER)")
+                conn.execute("INSERT INTO sections VALUES (1, 1)")
+            conn.close()
+            with patch.dict(config, {"database": db_file}):
+                with self.assertRaises(sqlite3.OperationalError):
+                    list(Database().iter_track_points_rows(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+from pyopentracks.utils.heatmap import HeatmapTile, HeatmapTileCache, HeatmapTrack
+
+
+def decode_png(png):
+    """Decode a PNG written by HeatmapTile.to_png (RGBA, filter 0)."""
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    offset, chunks = 8, {}
+    while offset < len(png):
+        length, = struct.unpack(">I", png[offset:offset + 4])
+        tag = png[offset + 4:offset + 8]
+        data = png[offset + 8:offset + 8 + length]
+        crc, = struct.unpack(">I", png[offset + 8 + length:offset + 12 + length])
+        assert crc == zlib.crc32(tag + data) & 0xFFFFFFFF
+        chunks[tag] = data
+        offset += 12 + length
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    raw = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, width * 4 + 1)
+    return raw[:, 1:].reshape(height, width, 4)
+
+
+class TestHeatmapTile(unittest.TestCase):
+
+    def test_bounds_and_range(self):
+        self.assertEqual(HeatmapTile.bounds(0, 0, 0)[1::2], (-180.0, 180.0))
+        bounds = HeatmapTile.bounds(12, 2040, 1580)
+        # The tile's bounds without margin are covered only by the tile.
+        inner = (bounds[0] + 1e-6, bounds[1] + 1e-6, bounds[2] - 1e-6, bounds[3] - 1e-6)
+        self.assertEqual(HeatmapTile.tiles_range(inner, 12, margin=0), (2040, 1580, 2040, 1580))
+        # With a pixel of margin the neighbours are covered too.
+        self.assertEqual(HeatmapTile.tiles_range(inner, 12), (2039, 1579, 2041, 1581))
+        self.assertEqual(HeatmapTile.tiles_range((-90, -180, 90, 180), 2), (0, 0, 3, 3))
+
+    def test_rasterize_counts_activities_once(self):
+        zoom, x, y = 10, 510, 392
+        min_lat, min_lon, max_lat, max_lon = HeatmapTile.bounds(zoom, x, y)
+        lat = (min_lat + max_lat) / 2
+        # An horizontal line through the tile and back: the same pixels twice.
+        there_and_back = (np.array([lat, lat, lat]), np.array([min_lon - 1, max_lon + 1, min_lon - 1]))
+        # A vertical line that crosses the horizontal one.
+        lon = (min_lon + max_lon) / 2
+        vertical = (np.array([min_lat, max_lat]), np.array([lon, lon]))
+        counts = HeatmapTile.rasterize([there_and_back, vertical], zoom, x, y)
+        self.assertEqual(counts.shape, (256, 256))
+        self.assertEqual(counts.max(), 2)
+        self.assertEqual(np.count_nonzero(counts == 2), 1)
+        # Every pixel of the row and the column, without holes.
+        self.assertEqual(np.count_nonzero(counts), 256 + 256 - 1)
+
+    def test_rasterize_outside_and_breaks(self):
+        zoom, x, y = 10, 510, 392
+        min_lat, min_lon, max_lat, max_lon = HeatmapTile.bounds(zoom, x, y)
+        outside = (np.array([max_lat + 1, max_lat + 2]), np.array([min_lon, max_lon]))
+        broken = (
+            np.array([min_lat, max_lat, np.nan, min_lat, max_lat]),
+            np.array([min_lon + 0.0001, min_lon + 0.0001, np.nan, max_lon - 0.0001, max_lon - 0.0001])
+        )
+        counts = HeatmapTile.rasterize([outside, broken], zoom, x, y)
+        self.assertEqual(np.count_nonzero(counts), 2 * 256)
+
+    def test_png(self):
+        counts = np.zeros((256, 256), dtype=np.int64)
+        counts[10, 20] = 1
+        counts[30, 40] = 1000
+        image = decode_png(HeatmapTile.to_png(HeatmapTile.colorize(counts)))
+        self.assertEqual(image.shape, (256, 256, 4))
+        self.assertEqual(image[0, 0, 3], 0)
+        self.assertGreater(image[10, 20, 3], 0)
+        self.assertEqual(tuple(image[30, 40]), (255, 255, 220, 255))
+
+
+class TestHeatmapTrack(unittest.TestCase):
+
+    def test_simplified_geometry(self):
+        latitudes = np.linspace(38.0, 38.1, 1000)
+        longitudes = np.full(1000, -0.5)
+        coordinates = list(zip(latitudes, longitudes)) + [(None, None)]
+        bounds, blob = HeatmapTrack.from_coordinates(coordinates)
+        np.testing.assert_allclose(bounds, (38.0, -0.5, 38.1, -0.5))
+        lats, lons = HeatmapTrack.decode(blob)
+        np.testing.assert_allclose(lats, [38.0, 38.1], rtol=1e-6)
+        self.assertIsNone(HeatmapTrack.from_coordinates([]))
+
+
+class TestHeatmapTileCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cache = HeatmapTileCache(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_put_and_get(self):
+        self.assertIsNone(self._cache.get(3, 1, 2))
+        self._cache.put(3, 1, 2, b"png")
+        self.assertEqual(self._cache.get(3, 1, 2), b"png")
+        self.assertTrue(os.path.exists(os.path.join(self._tmp.name, "3", "1", "2.png")))
+
+    def test_invalidate_only_affected_tiles(self):
+        bounds = HeatmapTile.bounds(12, 2040, 1580)
+        inner = (bounds[0] + 0.001, bounds[1] + 0.001, bounds[2] - 0.001, bounds[3] - 0.001)
+        affected = [(12, 2040, 1580), (11, 1020, 790), (0, 0, 0)]
+        others = [(12, 2042, 1580), (12, 2040, 1590), (11, 1000, 790)]
+        for tile in affected + others:
+            self._cache.put(*tile, b"png")
+        self.assertEqual(self._cache.invalidate(inner), len(affected))
+        for tile in affected:
+            self.assertIsNone(self._cache.get(*tile))
+        for tile in others:
+            self.assertEqual(self._cache.get(*tile), b"png")
+
+
+if __name__ == "__main__":
+    unittest.main()
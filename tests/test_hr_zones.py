@@ -0,0 +1,134 @@
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+
+import numpy as np
+
+from temp_db import TempDB
+
+from pyopentracks.models.database import Database
+from pyopentracks.stats.track_activity_stats import HrZonesStats
+from pyopentracks.tasks.hr_zones import HrZonesIndexer
+
+
+class TrackPoint:
+    def __init__(self, ms, hr):
+        self.time_ms = ms
+        self.heart_rate = hr
+
+
+class Section:
+    def __init__(self, track_points):
+        self.track_points = track_points
+
+
+def zones_loop(zones, sections):
+    """Point by point reference: the time to the next point belongs to the point's zone."""
+    stats = [0] * len(zones)
+    for section in sections:
+        for tp, next_tp in zip(section.track_points, section.track_points[1:]):
+            if tp.heart_rate:
+                idx = sum(1 for zone in zones if tp.heart_rate >= zone) - 1
+                if idx >= 0:
+                    stats[idx] += next_tp.time_ms - tp.time_ms
+    return stats
+
+
+class TestHrZonesStats(unittest.TestCase):
+
+    ZONES = [100, 120, 140, 160, 180]
+
+    def test_bpm_zones(self):
+        self.assertEqual(HrZonesStats.bpm_zones(200, [50, 60, 70, 80, 90, 100]), [100, 120, 140, 160, 180])
+
+    def test_zone_idx(self):
+        obj = HrZonesStats(self.ZONES)
+        self.assertEqual(obj._get_zone_idx(None), -1)
+        self.assertEqual(obj._get_zone_idx(99), -1)
+        self.assertEqual(obj._get_zone_idx(100), 0)
+        self.assertEqual(obj._get_zone_idx(159), 2)
+        self.assertEqual(obj._get_zone_idx(200), 4)
+
+    def test_compute_same_than_loop(self):
+        rng = np.random.default_rng(2)
+        sections = []
+        time_ms = 0
+        for _ in range(3):
+            points = []
+            for _ in range(500):
+                time_ms += int(rng.integers(500, 3000))
+                hr = None if rng.random() < 0.1 else float(rng.integers(80, 200))
+                points.append(TrackPoint(time_ms, hr))
+            sections.append(Section(points))
+            # Paused between sections.
+            time_ms += 60000
+        obj = HrZonesStats(self.ZONES)
+        stats = obj.compute(sections)
+        self.assertEqual([stats[i] for i in range(5)], zones_loop(self.ZONES, sections))
+        self.assertEqual(
+            obj.total_time,
+            sum(s.track_points[-1].time_ms - s.track_points[0].time_ms for s in sections)
+        )
+
+    def test_zone_times_of_groups(self):
+        time_ms = np.array([0, 10, 20, 0, 5, 15], dtype=np.float64)
+        hr = np.array([110, 150, np.nan, 190, 190, 190])
+        starts = np.array([True, False, False, True, False, False])
+        groups = np.array([0, 0, 0, 1, 1, 1])
+        zones_times, total_times = HrZonesStats.zone_times(self.ZONES, time_ms, hr, starts, groups, 2)
+        np.testing.assert_array_equal(zones_times, [[10, 0, 10, 0, 0], [0, 0, 0, 0, 15]])
+        np.testing.assert_array_equal(total_times, [20, 15])
+
+    def test_load(self):
+        obj = HrZonesStats(self.ZONES)
+        self.assertEqual(obj.load({-1: 5000, 0: 10000, 3: 5000}), {0: 10000, 1: 0, 2: 0, 3: 5000, 4: 0})
+        self.assertEqual(obj.total_time, 20000)
+
+
+class TestHrZonesIndexer(TempDB):
+
+    ZONES = [100, 120, 140, 160, 180]
+
+    def setUp(self):
+        super().setUp()
+        with sqlite3.connect(self._db_file) as conn:
+            for activity_id, hr in ((1, 110), (2, None), (3, 170)):
+                conn.execute(
+                    "INSERT INTO activities (_id, name, category, starttime) VALUES (?, 'a', 'running', ?)",
+                    (activity_id, activity_id * 1000)
+                )
+                conn.execute(
+                    "INSERT INTO sections (_id, name, activityid) VALUES (?, 's', ?)", (activity_id, activity_id)
+                )
+                conn.executemany(
+                    "INSERT INTO trackpoints (sectionid, longitude, latitude, time, heartrate) VALUES (?, 0, 0, ?, ?)",
+                    [(activity_id, t * 1000, hr) for t in range(11)]
+                )
+            conn.execute("INSERT INTO activities (_id, name, category, starttime) VALUES (4, 'b', 'running', 4000)")
+            conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (4, 's', 4)")
+
+    def test_index_and_recompute(self):
+        db = Database()
+        self.assertEqual(db.get_activities_without_hr_zone_times(), [1, 2, 3, 4])
+        HrZonesIndexer(self.ZONES, activities_ids=None).run()
+        self.assertEqual(db.get_activities_without_hr_zone_times(), [])
+        self.assertEqual(db.get_hr_zone_times(1), {-1: 0, 0: 10000})
+        self.assertEqual(db.get_hr_zone_times(2), {-1: 10000})
+        self.assertEqual(db.get_hr_zone_times(3), {-1: 0, 3: 10000})
+        self.assertEqual(db.get_hr_zone_times(4), {-1: 0})
+        self.assertEqual(db.get_hr_zone_times(date_from=2000, date_to=3000), {-1: 10000, 3: 10000})
+
+        HrZonesIndexer([150, 160, 170, 180, 190], recompute=True).run()
+        self.assertEqual(db.get_hr_zone_times(1), {-1: 10000})
+        self.assertEqual(db.get_hr_zone_times(3), {-1: 0, 2: 10000})
+
+    def test_index_read_error(self):
+        db = Database()
+        with patch.object(Database, "get_heart_rates", return_value=None):
+            self.assertFalse(HrZonesIndexer.index(self.ZONES, [1, 2], db))
+        self.assertEqual(db.get_activities_without_hr_zone_times(), [1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import builtins
+import os
+import shutil
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+
+from temp_db import TempDB
+
+from pyopentracks.io.importer.importer import FileImporter, FolderImporter
+from pyopentracks.models.activity import Activity
+from pyopentracks.models.database import Database
+from pyopentracks.models.section import Section
+from pyopentracks.models.stats import Stats
+from pyopentracks.models.track_point import TrackPoint
+from pyopentracks.tasks.activities_indexer import index_activities
+from pyopentracks.tasks.import_fingerprint import ImportFingerprintIndexer
+from pyopentracks.utils.fingerprint import ActivityFingerprint
+
+
+def make_activity(uuid, start, num_points=40, longitude=-0.5):
+    activity = Activity(None, uuid, "a", "", "running", None, start, None, None)
+    activity.stats = Stats(None, start, start + 1000 * num_points, *[None] * 21)
+    section = Section(None, "s", None)
+    section.track_points.extend(
+        TrackPoint(None, None, longitude + i * 0.0001, 38.0, start + 1000 * i, *[None] * 8)
+        for i in range(num_points)
+    )
+    activity.sections = [section]
+    return activity
+
+
+def key(activity):
+    return activity.uuid, activity.start_time_ms, activity.stats.end_time_ms, ActivityFingerprint.from_activity(activity)
+
+
+class TestActivityFingerprint(unittest.TestCase):
+
+    def test_fingerprint(self):
+        a = make_activity("a", 1000000)
+        self.assertEqual(ActivityFingerprint.from_activity(a), ActivityFingerprint.from_activity(make_activity("b", 1000200)))
+        self.assertNotEqual(ActivityFingerprint.from_activity(a), ActivityFingerprint.from_activity(make_activity("a", 1002000)))
+        self.assertNotEqual(
+            ActivityFingerprint.from_activity(a),
+            ActivityFingerprint.from_activity(make_activity("a", 1000000, longitude=-0.6))
+        )
+        # Only the first points are used.
+        self.assertEqual(
+            ActivityFingerprint.from_activity(a), ActivityFingerprint.from_activity(make_activity("a", 1000000, 100))
+        )
+        self.assertIsNone(ActivityFingerprint.from_activity(make_activity("a", 1000000, 0)))
+        self.assertIsNone(ActivityFingerprint.compute(None, [(38.0, -0.5)]))
+
+
+class TestImportDedupe(TempDB):
+
+    def setUp(self):
+        super().setUp()
+        self._db = Database()
+
+    def test_get_existed_activities(self):
+        activity_id = self._db.insert_track_activity(make_activity("uuid1", 10 ** 9))
+        self.assertIsNotNone(activity_id)
+
+        # Same uuid.
+        found = self._db.get_existed_activities(*key(make_activity("uuid1", 5 * 10 ** 9, longitude=1)))
+        self.assertEqual([a.id for a in found], [activity_id])
+        # Inside the time range.
+        found = self._db.get_existed_activities("other", 10 ** 9 - 10, 10 ** 9 + 10 ** 6, None)
+        self.assertEqual([a.id for a in found], [activity_id])
+        # Same fingerprint, another uuid and a bit different times.
+        found = self._db.get_existed_activities(*key(make_activity("other", 10 ** 9 + 100, 50)))
+        self.assertEqual([a.id for a in found], [activity_id])
+        # Nothing in common.
+        self.assertIsNone(self._db.get_existed_activities(*key(make_activity("other", 2 * 10 ** 9))))
+
+    def test_get_existed_activities_keys(self):
+        self._db.insert_track_activity(make_activity("uuid1", 10 ** 9))
+        self._db.insert_track_activity(make_activity("uuid2", 3 * 10 ** 9))
+        keys = [
+            key(make_activity("uuid2", 7 * 10 ** 9, longitude=1)),
+            key(make_activity(None, 5 * 10 ** 9)),
+            key(make_activity(None, 10 ** 9 + 100, 50)),
+            ("x", 3 * 10 ** 9 - 1, 3 * 10 ** 9 + 10 ** 6, None),
+            key(make_activity("uuid3", 8 * 10 ** 9)),
+        ]
+        self.assertEqual(self._db.get_existed_activities_keys(keys), {0, 2, 3})
+        self.assertEqual(self._db.get_existed_activities_keys([]), set())
+
+    def test_indexes_are_used(self):
+        with sqlite3.connect(self._db_file) as conn:
+            plan = " ".join(
+                str(row) for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT _id FROM activities WHERE uuid=? "
+                    "UNION SELECT _id FROM activities WHERE starttime>=? AND starttime<=?", ("u", 0, 1)
+                )
+            )
+        self.assertIn("activities_uuid_index", plan)
+        self.assertIn("activities_starttime_index", plan)
+
+    def test_fingerprint_indexer(self):
+        activity_id = self._db.insert_track_activity(make_activity("uuid1", 10 ** 9))
+        with sqlite3.connect(self._db_file) as conn:
+            fingerprint = conn.execute("SELECT fingerprint FROM importfingerprints").fetchone()[0]
+            conn.execute("DELETE FROM importfingerprints")
+        self.assertEqual(self._db.get_activities_without_import_fingerprint(), [(activity_id, 10 ** 9)])
+        ImportFingerprintIndexer().run()
+        self.assertEqual(self._db.get_activities_without_import_fingerprint(), [])
+        with sqlite3.connect(self._db_file) as conn:
+            self.assertEqual(conn.execute("SELECT fingerprint FROM importfingerprints").fetchone()[0], fingerprint)
+
+    def test_folder_importer(self):
+        folder = os.path.join(self._tmp.name, "folder")
+        os.mkdir(folder)
+        assets = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+        shutil.copy(os.path.join(assets, "opentracks_with_trkseg.gpx"), os.path.join(folder, "a.gpx"))
+        shutil.copy(os.path.join(assets, "opentracks_with_trkseg.gpx"), os.path.join(folder, "b.gpx"))
+        shutil.copy(os.path.join(assets, "standard_simple_file.gpx"), os.path.join(folder, "c.gpx"))
+        with patch.object(builtins, "_", lambda s: s, create=True), \
+                patch("pyopentracks.models.database_helper.TaskExecutor"):
+            results = list(FolderImporter(folder).run())
+            self.assertEqual(len(results), 3)
+            self.assertEqual((results[-1].imported, len(results[-1].errors)), (2, 1))
+            self.assertIn("already exists", results[-1].errors[0])
+
+            # Everything exists the second time.
+            results = list(FolderImporter(folder).run())
+            self.assertEqual((results[-1].imported, len(results[-1].errors)), (0, 3))
+
+    def _index_calls(self, batch_size):
+        """Import two files in batches of batch_size and return the activities' ids of every indexing task."""
+        folder = os.path.join(self._tmp.name, "folder")
+        os.mkdir(folder)
+        assets = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+        shutil.copy(os.path.join(assets, "opentracks_with_trkseg.gpx"), os.path.join(folder, "a.gpx"))
+        shutil.copy(os.path.join(assets, "standard_simple_file.gpx"), os.path.join(folder, "b.gpx"))
+        with patch.object(builtins, "_", lambda s: s, create=True), \
+                patch.object(FolderImporter, "BATCH_SIZE", batch_size), \
+                patch("pyopentracks.models.database_helper.TaskExecutor") as executor:
+            results = list(FolderImporter(folder).run())
+        self.assertEqual(results[-1].imported, 2)
+        return [
+            sorted(c.args[1][0]) for c in executor.instance.return_value.submit.call_args_list
+            if c.args[0] is index_activities
+        ]
+
+    def test_folder_importer_indexes_once_per_batch(self):
+        self.assertEqual(self._index_calls(FolderImporter.BATCH_SIZE), [[1, 2]])
+
+    def test_folder_importer_indexes_every_batch(self):
+        self.assertEqual(self._index_calls(1), [[1], [2]])
+
+    def test_folder_importer_same_time_span(self):
+        """Two files without uuid, with the same start and end times, in the same import."""
+        folder = os.path.join(self._tmp.name, "folder")
+        os.mkdir(folder)
+        assets = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+        with open(os.path.join(assets, "standard_simple_file.gpx"), encoding="utf-8") as f:
+            content = f.read()
+        with open(os.path.join(folder, "a.gpx"), "w", encoding="utf-8") as f:
+            f.write(content)
+        # Other locations: the fingerprint is not the same.
+        with open(os.path.join(folder, "b.gpx"), "w", encoding="utf-8") as f:
+            f.write(content.replace('lat="41.', 'lat="42.'))
+        with patch.object(builtins, "_", lambda s: s, create=True), \
+                patch("pyopentracks.models.database_helper.TaskExecutor"):
+            results = list(FolderImporter(folder).run())
+        self.assertEqual((results[-1].imported, len(results[-1].errors)), (1, 1))
+        self.assertIn("already exists", results[-1].errors[0])
+
+    def test_folder_importer_errors(self):
+        """A failing lookup or insert doesn't stop the import of the other files."""
+        folder = os.path.join(self._tmp.name, "folder")
+        os.mkdir(folder)
+        assets = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+        shutil.copy(os.path.join(assets, "opentracks_with_trkseg.gpx"), os.path.join(folder, "a.gpx"))
+        shutil.copy(os.path.join(assets, "standard_simple_file.gpx"), os.path.join(folder, "b.gpx"))
+        insert = FileImporter._insert
+
+        def failing_insert(importer, record, activity):
+            if importer._filename.endswith("a.gpx"):
+                raise sqlite3.OperationalError("database is locked")
+            return insert(importer, record, activity)
+
+        with patch.object(builtins, "_", lambda s: s, create=True), \
+                patch("pyopentracks.models.database_helper.TaskExecutor"), \
+                patch(
+                    "pyopentracks.models.database_helper.DatabaseHelper.get_existed_activities_batch",
+                    side_effect=sqlite3.OperationalError("database is locked")
+                ), \
+                patch.object(FileImporter, "_insert", failing_insert):
+            results = list(FolderImporter(folder).run())
+        self.assertEqual(len(results), 2)
+        self.assertEqual((results[-1].imported, len(results[-1].errors)), (1, 1))
+        self.assertIn("database is locked", results[-1].errors[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
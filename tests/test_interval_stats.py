@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from pyopentracks.models.location import Location
+from pyopentracks.models.track_point import TrackPoint
+from pyopentracks.stats.track_activity_stats import IntervalStats, IntervalStatsCache
+
+
+def track_points(n, step_m=10, step_ms=1000, hr=None, gain=0):
+    """Track to the north with a point every step_m meters and step_ms milliseconds."""
+    step_degrees = np.degrees(step_m / Location.EARTH_RADIUS)
+    return [
+        # id, sectionid, longitude, latitude, time, speed, altitude, gain, loss, hr, cadence, power, temp
+        TrackPoint(
+            i, 1, -0.5, 38.0 + i * step_degrees, i * step_ms, None, 100 + i, gain, 0,
+            hr(i) if hr else None, None, None, None
+        )
+        for i in range(n)
+    ]
+
+
+class TestIntervalStats(unittest.TestCase):
+
+    def test_splits(self):
+        intervals = IntervalStats("running", 1000).compute(track_points(251, hr=lambda i: 150, gain=1))
+        self.assertEqual(len(intervals), 3)
+        np.testing.assert_allclose([i.distance_m for i in intervals], [1000, 2000, 2500])
+        np.testing.assert_allclose([i.time_ms for i in intervals], [100000, 100000, 50000])
+        np.testing.assert_allclose([i.avg_speed for i in intervals], [10, 10, 10])
+        np.testing.assert_allclose([i.max_speed for i in intervals], [10, 10, 10])
+        # Every point's gain is counted once, the first one in the first interval.
+        self.assertEqual(sum(i.gain_elevation for i in intervals), 251)
+        np.testing.assert_allclose([i.gain_elevation for i in intervals], [101, 100, 50], atol=1)
+        self.assertEqual([i.avg_hr for i in intervals], [150, 150, 150])
+        np.testing.assert_allclose([i.max_altitude for i in intervals], [200, 300, 350], atol=1)
+        self.assertIsNone(intervals[0].avg_cadence)
+
+    def test_interpolated_boundaries(self):
+        # Points every 30 m: boundaries fall between points.
+        intervals = IntervalStats("cycling", 100).compute(track_points(11, step_m=30, step_ms=3000))
+        self.assertEqual(len(intervals), 3)
+        np.testing.assert_allclose([i.time_ms for i in intervals], [10000, 10000, 10000])
+        np.testing.assert_allclose([i.max_speed for i in intervals], [10, 10, 10])
+
+    def test_short_last_interval_discarded(self):
+        intervals = IntervalStats("running", 1000).compute(track_points(101, step_m=10.05))
+        self.assertEqual(len(intervals), 1)
+        self.assertEqual(IntervalStats("running", 1000).compute(track_points(1)), [])
+
+    def test_time_weighted_hr(self):
+        # 60 s at 100 bpm and 30 s at 160 bpm, with a gap without heart rate.
+        hr = lambda i: 100 if i <= 6 else (None if i == 7 else 160)
+        intervals = IntervalStats("running", 1000).compute(track_points(11, step_m=50, step_ms=10000, hr=hr))
+        self.assertEqual(len(intervals), 1)
+        self.assertEqual(intervals[0].avg_hr, round((100 * 60 + 160 * 20) / 80))
+        self.assertEqual(intervals[0].max_hr, 160)
+
+    def test_intervals_without_points(self):
+        points = track_points(3, step_m=10)
+        points.append(TrackPoint(4, 1, -0.5, 38.03, 100000, None, 0, 0, 0, None, None, None, None))
+        intervals = IntervalStats("running", 1000).compute(points)
+        self.assertEqual(len(intervals), 4)
+        self.assertAlmostEqual(sum(i.time_ms for i in intervals), 100000)
+        self.assertEqual(intervals[1].gain_elevation, 0)
+        self.assertIsNone(intervals[1].max_altitude)
+
+    def test_cache(self):
+        points = track_points(251)
+        key = ("activity", 1)
+        intervals = IntervalStatsCache.get(key, "running", 1000, points)
+        self.assertIs(IntervalStatsCache.get(key, "running", 1000, points), intervals)
+        self.assertEqual(len(IntervalStatsCache.get(key, "running", 500, points)), 5)
+        IntervalStatsCache.invalidate(key)
+        self.assertIsNot(IntervalStatsCache.get(key, "running", 1000, points), intervals)
+        self.assertIsNot(IntervalStatsCache.get(None, "running", 1000, points), intervals)
+
+    def test_cache_category(self):
+        points = track_points(251)
+        key = ("activity", 2)
+        running = IntervalStatsCache.get(key, "running", 1000, points)
+        cycling = IntervalStatsCache.get(key, "cycling", 1000, points)
+        self.assertIsNot(cycling, running)
+        self.assertIs(IntervalStatsCache.get(key, "running", 1000, points), running)
+
+
+if __name__ == "__main__":
+    unittest.main()
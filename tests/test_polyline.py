@@ -0,0 +1,95 @@
+import unittest
+
+import numpy as np
+
+from pyopentracks.utils.polyline import PolylineSimplifier, PolylineLod, PolylineLodCache
+
+
+class Point:
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+def douglas_peucker(x, y, tolerance, first, last, keep):
+    if last - first < 2:
+        return
+    dx, dy = x[last] - x[first], y[last] - y[first]
+    length = np.hypot(dx, dy)
+    best, best_idx = -1, None
+    for i in range(first + 1, last):
+        d = abs((x[i] - x[first]) * dy - (y[i] - y[first]) * dx) / length
+        if d > best:
+            best, best_idx = d, i
+    if best > tolerance:
+        keep.add(best_idx)
+        douglas_peucker(x, y, tolerance, first, best_idx, keep)
+        douglas_peucker(x, y, tolerance, best_idx, last, keep)
+
+
+class TestPolylineSimplifier(unittest.TestCase):
+
+    def test_straight_line(self):
+        x = np.arange(100, dtype=np.float64)
+        y = np.zeros(100)
+        self.assertEqual(list(PolylineSimplifier.simplify(x, y, 0.1)), [0, 99])
+
+    def test_keeps_corner(self):
+        x = np.array([0, 1, 2, 3, 3, 3, 3], dtype=np.float64)
+        y = np.array([0, 0, 0, 0, 1, 2, 3], dtype=np.float64)
+        self.assertEqual(list(PolylineSimplifier.simplify(x, y, 0.1)), [0, 3, 6])
+
+    def test_same_result_than_recursive_douglas_peucker(self):
+        rng = np.random.default_rng(1)
+        x = np.cumsum(rng.normal(size=500))
+        y = np.cumsum(rng.normal(size=500))
+        for tolerance in (0.1, 1, 5, 20):
+            keep = {0, 499}
+            douglas_peucker(x, y, tolerance, 0, 499, keep)
+            self.assertEqual(list(PolylineSimplifier.simplify(x, y, tolerance)), sorted(keep))
+
+    def test_short_polylines(self):
+        self.assertEqual(len(PolylineSimplifier.significance(np.array([]), np.array([]))), 0)
+        self.assertEqual(list(PolylineSimplifier.simplify(np.array([1.0]), np.array([1.0]), 1)), [0])
+        self.assertEqual(list(PolylineSimplifier.simplify(np.zeros(2), np.zeros(2), 1)), [0, 1])
+
+
+class TestPolylineLod(unittest.TestCase):
+
+    def _points(self, n=2000):
+        t = np.linspace(0, 4 * np.pi, n)
+        return [Point(38.5 + 0.01 * np.sin(a), -0.5 + 0.001 * a) for a in t]
+
+    def test_more_detail_with_more_zoom(self):
+        lod = PolylineLod.from_points(self._points())
+        sizes = [len(lod.indices(zoom)) for zoom in range(PolylineLod.MIN_ZOOM, PolylineLod.MAX_ZOOM + 1)]
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertLess(sizes[0], 10)
+        self.assertLess(sizes[12], 2000)
+        for zoom in (0, 10, 20):
+            indices = lod.indices(zoom)
+            self.assertEqual(indices[0], 0)
+            self.assertEqual(indices[-1], 1999)
+
+    def test_zoom_out_of_range(self):
+        lod = PolylineLod.from_points(self._points(50))
+        self.assertIs(lod.indices(-3), lod.indices(0))
+        self.assertIs(lod.indices(30), lod.indices(PolylineLod.MAX_ZOOM))
+        self.assertEqual(len(lod.coordinates(5)), len(lod.indices(5)))
+
+    def test_bounds(self):
+        lod = PolylineLod.from_points([Point(1, 2), Point(3, -4), Point(2, 0)])
+        self.assertEqual(lod.bounds(), (1, -4, 3, 2))
+
+    def test_cache(self):
+        PolylineLodCache.clear()
+        points = self._points(100)
+        lod = PolylineLodCache.get(("activity", 1), points)
+        self.assertIs(PolylineLodCache.get(("activity", 1), points), lod)
+        self.assertIsNot(PolylineLodCache.get(None, points), lod)
+        PolylineLodCache.invalidate(("activity", 1))
+        self.assertIsNot(PolylineLodCache.get(("activity", 1), points), lod)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import sqlite3
+import unittest
+
+import numpy as np
+
+from temp_db import TempDB
+
+from pyopentracks.models.database_helper import DatabaseHelper
+from pyopentracks.tasks.route_search import RouteSignatureIndexer
+from pyopentracks.utils.frechet import discrete_frechet, haversine
+from pyopentracks.utils.route_signature import RouteSignature
+
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_string(code, bits):
+    return "".join(GEOHASH_BASE32[(code >> (5 * i)) & 31] for i in reversed(range(bits // 5)))
+
+
+def route(n=400, lat0=38.5, lon0=-0.5, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 2 * np.pi, n)
+    lat = lat0 + 0.02 * np.sin(t) + rng.normal(0, noise, n)
+    lon = lon0 + 0.03 * t + rng.normal(0, noise, n)
+    return lat, lon
+
+
+class TestRouteSignature(unittest.TestCase):
+
+    def test_geohash(self):
+        self.assertEqual(geohash_string(int(RouteSignature.geohash([57.64911], [10.40744])[0]), 35), "u4pruyd")
+        self.assertEqual(geohash_string(int(RouteSignature.geohash([42.6], [-5.6], bits=25)[0]), 25), "ezs42")
+
+    def test_resample(self):
+        lat = np.array([38.0, 38.0, 38.01])
+        lon = np.array([-0.5, -0.49, -0.49])
+        rlat, rlon = RouteSignature.resample(lat, lon, 50)
+        steps = haversine(rlat[:-1], rlon[:-1], rlat[1:], rlon[1:])
+        self.assertLess(steps.max(), 50.5)
+        self.assertEqual((rlat[-1], rlon[-1]), (38.01, -0.49))
+
+    def test_same_route_is_similar(self):
+        cells1 = RouteSignature.cells(*route())
+        cells2 = RouteSignature.cells(*route(n=900, noise=0.00003, seed=1))
+        shared = len(np.intersect1d(cells1, cells2))
+        self.assertGreater(RouteSignature.jaccard(len(cells1), len(cells2), shared), RouteSignature.MIN_SIMILARITY)
+
+        other = RouteSignature.cells(*route(lat0=38.6))
+        self.assertEqual(len(np.intersect1d(cells1, other)), 0)
+
+    def test_same_route_verification(self):
+        lat, lon = route()
+        coordinates = np.column_stack((lat, lon))
+        noisy = np.column_stack(route(n=700, noise=0.00003, seed=2))
+        self.assertTrue(RouteSignature.same_route(coordinates, noisy))
+        # Same cells but the other way round.
+        self.assertFalse(RouteSignature.same_route(coordinates, coordinates[::-1]))
+
+
+class TestSimilarRoutes(TempDB):
+
+    def setUp(self):
+        super().setUp()
+        routes = {1: route(seed=1, noise=0.00002), 2: route(seed=2, noise=0.00002), 3: route(lat0=39.5)}
+        with sqlite3.connect(self._db_file) as conn:
+            for activity_id, (lat, lon) in routes.items():
+                conn.execute("INSERT INTO stats (_id) VALUES (?)", (activity_id,))
+                conn.execute(
+                    "INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (?, ?, 'running', 0, ?)",
+                    (activity_id, f"Activity {activity_id}", activity_id)
+                )
+                conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (?, 's', ?)", (activity_id, activity_id))
+                conn.executemany(
+                    "INSERT INTO trackpoints (sectionid, longitude, latitude, time) VALUES (?, ?, ?, ?)",
+                    [(activity_id, lo, la, i * 1000) for i, (la, lo) in enumerate(zip(lat.tolist(), lon.tolist()))]
+                )
+
+    def test_get_similar_routes(self):
+        RouteSignatureIndexer().run()
+        similar = DatabaseHelper.get_similar_routes(1)
+        self.assertEqual([activity.id for activity, _similarity in similar], [2])
+        self.assertEqual(similar[0][0].name, "Activity 2")
+        self.assertGreater(similar[0][1], 0.5)
+        self.assertEqual(DatabaseHelper.get_similar_routes(3), [])
+
+
+class TestDiscreteFrechet(unittest.TestCase):
+
+    def test_same_than_recursive_definition(self):
+        rng = np.random.default_rng(3)
+        p = 38 + rng.random((30, 2)) * 0.01
+        q = 38 + rng.random((17, 2)) * 0.01
+        d = haversine(p[:, 0][:, None], p[:, 1][:, None], q[:, 0][None, :], q[:, 1][None, :])
+        ca = np.zeros_like(d)
+        for i in range(len(p)):
+            for j in range(len(q)):
+                if i and j:
+                    ca[i, j] = max(min(ca[i - 1, j], ca[i - 1, j - 1], ca[i, j - 1]), d[i, j])
+                elif i:
+                    ca[i, j] = max(ca[i - 1, 0], d[i, j])
+                elif j:
+                    ca[i, j] = max(ca[0, j - 1], d[i, j])
+                else:
+                    ca[i, j] = d[i, j]
+        self.assertAlmostEqual(discrete_frechet(p, q), ca[-1, -1])
+        self.assertAlmostEqual(discrete_frechet(p[:1], q[:1]), d[0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
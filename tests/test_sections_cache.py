@@ -0,0 +1,121 @@
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+
+from temp_db import TempDB
+
+from pyopentracks.models.activity import Activity
+from pyopentracks.models.database_helper import DatabaseHelper
+from pyopentracks.models.section import Section
+from pyopentracks.utils.sections_cache import SectionsCache
+
+
+def make_section(*track_points):
+    section = Section(None, "s", None)
+    section.track_points.extend(track_points)
+    return section
+
+
+class TestTrackPointsView(unittest.TestCase):
+
+    def test_view(self):
+        activity = Activity()
+        self.assertFalse(activity.all_track_points)
+        self.assertEqual(len(activity.all_track_points), 0)
+
+        activity.sections = [make_section(1, 2, 3), make_section(), make_section(4, 5)]
+        points = activity.all_track_points
+        self.assertIs(activity.all_track_points, points)
+        self.assertEqual(len(points), 5)
+        self.assertEqual(list(points), [1, 2, 3, 4, 5])
+        self.assertEqual([points[i] for i in range(5)], [1, 2, 3, 4, 5])
+        self.assertEqual((points[-1], points[-5]), (5, 1))
+        self.assertEqual(points[1:4], [2, 3, 4])
+        self.assertEqual(list(reversed(points)), [5, 4, 3, 2, 1])
+        self.assertIn(4, points)
+        with self.assertRaises(IndexError):
+            points[5]
+
+        # Track points added later are seen.
+        activity.sections[1].track_points.append(10)
+        self.assertEqual(list(points), [1, 2, 3, 10, 4, 5])
+        self.assertEqual(points[3], 10)
+
+        activity.sections = [make_section(7)]
+        self.assertEqual(list(activity.all_track_points), [7])
+
+
+class TestSectionsCache(unittest.TestCase):
+
+    def setUp(self):
+        SectionsCache.clear()
+
+    def tearDown(self):
+        SectionsCache.clear()
+
+    def test_bounded_by_track_points(self):
+        loads = []
+
+        def loader(activity_id, n):
+            def load():
+                loads.append(activity_id)
+                return [make_section(*range(n))]
+            return load
+
+        with patch.object(SectionsCache, "MAX_TRACK_POINTS", 10):
+            first = SectionsCache.get(1, loader(1, 4))
+            self.assertEqual(SectionsCache.get(1, loader(1, 4))[0], first[0])
+            SectionsCache.get(2, loader(2, 4))
+            SectionsCache.get(1, loader(1, 4))
+            # Activity 2 is the least recently used one.
+            SectionsCache.get(3, loader(3, 4))
+            self.assertEqual(SectionsCache.num_track_points(), 8)
+            SectionsCache.get(1, loader(1, 4))
+            SectionsCache.get(2, loader(2, 4))
+            # Too big to be cached.
+            SectionsCache.get(4, loader(4, 11))
+            SectionsCache.get(4, loader(4, 11))
+            SectionsCache.get(None, loader(None, 1))
+        self.assertEqual(loads, [1, 2, 3, 2, 4, 4, None])
+
+    def test_invalidate(self):
+        SectionsCache.get(1, lambda: [make_section(1, 2)])
+        SectionsCache.invalidate(1)
+        SectionsCache.invalidate(2)
+        self.assertEqual(SectionsCache.num_track_points(), 0)
+        self.assertEqual(SectionsCache.get(1, lambda: [make_section(3)])[0].track_points, [3])
+
+
+class TestDatabaseHelperSections(TempDB):
+
+    def setUp(self):
+        SectionsCache.clear()
+        super().setUp()
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("INSERT INTO stats (_id) VALUES (1)")
+            conn.execute("INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (1, 'a', 'running', 0, 1)")
+            conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (1, 's', 1)")
+            conn.executemany(
+                "INSERT INTO trackpoints (_id, sectionid, longitude, latitude, time, altitude) VALUES (?, 1, 0, 38, ?, 100)",
+                [(i, i * 1000) for i in range(1, 11)]
+            )
+
+    def tearDown(self):
+        SectionsCache.clear()
+
+    def test_shared_and_invalidated(self):
+        sections = DatabaseHelper.get_sections(1)
+        self.assertEqual(len(sections[0].track_points), 10)
+        self.assertIs(DatabaseHelper.get_sections(1)[0], sections[0])
+
+        DatabaseHelper.update_altitude(1, [(200, 0, 0, 1)], (0, 0, 100, 200))
+        sections = DatabaseHelper.get_sections(1)
+        self.assertEqual(sections[0].track_points[0].altitude, 200)
+
+        DatabaseHelper.update(DatabaseHelper.get_activity_by_id(1))
+        self.assertIsNot(DatabaseHelper.get_sections(1)[0], sections[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
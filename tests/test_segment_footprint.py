@@ -0,0 +1,167 @@
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+
+import numpy as np
+
+from temp_db import TempDB
+
+from pyopentracks.models.database import Database
+from pyopentracks.models.database_helper import DatabaseHelper
+from pyopentracks.models.location import Location
+from pyopentracks.models.segment_point import SegmentPoint
+from pyopentracks.tasks.segment_search import SegmentSearch, SegmentSearchAbstract, SegmentTrackSearch
+from pyopentracks.utils.footprint import Footprint
+from pyopentracks.utils.segment_matcher import SegmentMatcher
+from pyopentracks.utils.route_signature import RouteSignature
+
+
+def line(lat0, lon0, n=200, step=0.00005):
+    """A straight track to the north of n points (about 5.5 m apart)."""
+    return [(lat0 + i * step, lon0) for i in range(n)]
+
+
+class TestFootprint(unittest.TestCase):
+
+    def test_box_cells(self):
+        rng = np.random.default_rng(4)
+        # Points around cell's borders included.
+        centers = np.column_stack((rng.uniform(-60, 60, 200), rng.uniform(-170, 170, 200)))
+        cell_lat = 180 / 2 ** (Footprint.GEOHASH_BITS // 2)
+        centers[:100, 0] = np.round(centers[:100, 0] / cell_lat) * cell_lat
+        for lat, lon in centers:
+            bbox = Location(lat, lon).bounding_box(11)
+            cells = Footprint.box_cells(bbox)
+            lats = rng.uniform(bbox.south.latitude, bbox.north.latitude, 20)
+            lons = rng.uniform(bbox.west.longitude, bbox.east.longitude, 20)
+            inside = RouteSignature.geohash(lats, lons, Footprint.GEOHASH_BITS)
+            self.assertTrue(np.isin(inside, cells).all())
+
+    def test_of_segment(self):
+        coordinates = line(38.5, -0.5, 20)
+        start = Location(*coordinates[0]).bounding_box(11)
+        end = Location(*coordinates[-1]).bounding_box(11)
+        bounds, start_cells, end_cells = Footprint.of_segment(coordinates, start, end)
+        self.assertLess(bounds[0], coordinates[0][0])
+        self.assertGreater(bounds[2], coordinates[-1][0])
+        self.assertTrue(Footprint.intersects(bounds, (38.5, -0.5, 38.5, -0.5)))
+        self.assertFalse(Footprint.intersects(bounds, (39, -0.5, 40, 0)))
+        self.assertEqual(len(start_cells), 1)
+        self.assertEqual(list(end_cells), list(Footprint.cells([coordinates[-1][0]], [coordinates[-1][1]])))
+
+    def test_of_coordinates(self):
+        self.assertIsNone(Footprint.of_coordinates([]))
+        bounds, cells = Footprint.of_coordinates([(1, 2), (3, -4), (None, 0)])
+        self.assertEqual(bounds, (1, -4, 3, 2))
+        self.assertEqual(len(cells), 2)
+
+
+class TestSegmentSearchPrefilter(TempDB):
+
+    # Regions far away from each other and the number of segments in them.
+    REGIONS = [(38.5, -0.5), (40.4, -3.7), (48.8, 2.3), (-33.9, 151.2), (35.7, 139.7), (40.7, -74.0)]
+    SEGMENTS_PER_REGION = 60
+
+    def setUp(self):
+        super().setUp()
+
+        self._track = line(*TestSegmentSearchPrefilter.REGIONS[0])
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("INSERT INTO stats (_id, starttime) VALUES (1, 0)")
+            conn.execute(
+                "INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (1, 'a', 'running', 0, 1)"
+            )
+            conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (1, 's', 1)")
+            conn.executemany(
+                "INSERT INTO trackpoints (sectionid, latitude, longitude, time, speed) VALUES (1, ?, ?, ?, 5)",
+                [(lat, lon, 1000 * i) for i, (lat, lon) in enumerate(self._track)]
+            )
+
+            # Segment 1 is a part of the track, the other ones are spread
+            # over the regions (the same region and cells of the track too).
+            rng = np.random.default_rng(5)
+            segments = [self._track[50:150]]
+            for lat, lon in TestSegmentSearchPrefilter.REGIONS:
+                for _ in range(TestSegmentSearchPrefilter.SEGMENTS_PER_REGION):
+                    segments.append(line(lat + rng.uniform(-0.5, 0.5), lon + rng.uniform(-0.5, 0.5), 30))
+            # It crosses the track: same bounds and cells but it isn't in the track.
+            segments.append([(38.505, -0.505 + 0.0001 * i) for i in range(100)])
+            for segment_id, points in enumerate(segments, 1):
+                conn.execute(
+                    "INSERT INTO segments (_id, name, distance, gain, loss) VALUES (?, 's', 0, 0, 0)", (segment_id,)
+                )
+                conn.executemany(
+                    "INSERT INTO segmentpoints (segmentid, latitude, longitude) VALUES (?, ?, ?)",
+                    [(segment_id, lat, lon) for lat, lon in points]
+                )
+        self._num_segments = len(segments)
+
+    def _segment_tracks(self):
+        with sqlite3.connect(self._db_file) as conn:
+            return conn.execute("SELECT segmentid, activityid FROM segmentracks ORDER BY segmentid").fetchall()
+
+    def test_index_missing(self):
+        db = Database()
+        self.assertEqual(db.get_activities_without_footprint(), [1])
+        self.assertEqual(len(db.get_segments_without_footprint()), self._num_segments)
+        SegmentSearchAbstract.index_missing(db)
+        self.assertEqual(db.get_activities_without_footprint(), [])
+        self.assertEqual(db.get_segments_without_footprint(), [])
+
+    def test_segment_track_search(self):
+        db = Database()
+        SegmentSearchAbstract.index_missing(db)
+        candidates = db.get_segments_candidates(1)
+        self.assertIn(1, candidates)
+        self.assertIn(self._num_segments, candidates)
+        # Hundreds of segments but only a few of them reach the matcher.
+        self.assertLess(len(candidates), 10)
+
+        search = SegmentTrackSearch([1])
+        with patch.object(SegmentMatcher, "add", autospec=True, side_effect=SegmentMatcher.add) as add:
+            search.run()
+        self.assertEqual(add.call_count, len(candidates))
+        self.assertEqual(self._segment_tracks(), [(1, 1)])
+
+    def test_count_track_points(self):
+        db = Database()
+        self.assertEqual(db.count_track_points([2, 1]), {1: len(self._track)})
+        self.assertEqual(db.count_track_points([1, 1, 1], chunk_size=1), {1: len(self._track)})
+        self.assertEqual(db.count_track_points([]), {})
+
+    def test_segment_track_search_workers(self):
+        with patch.object(SegmentSearchAbstract, "WORKERS", 2), \
+                patch.object(SegmentSearchAbstract, "MIN_POINTS_PER_JOB", 10):
+            SegmentTrackSearch([1]).run()
+        self.assertEqual(self._segment_tracks(), [(1, 1)])
+
+    def test_segment_search(self):
+        db = Database()
+        self.assertEqual(db.get_activities_candidates(1), [])
+        segment = db.get_segment_by_id(1)
+        SegmentSearch(segment, db.get_segment_points(1)).run()
+        self.assertEqual(db.get_activities_candidates(1), [1])
+        self.assertEqual(db.get_activities_candidates(2), [])
+        self.assertEqual(self._segment_tracks(), [(1, 1)])
+
+    def test_create_segment(self):
+        points = [SegmentPoint(None, None, lat, lon, 100) for lat, lon in self._track[:20]]
+        with patch.object(DatabaseHelper, "_start"):
+            DatabaseHelper.create_segment("all", 100, 0, 0, points)
+            DatabaseHelper.create_segment("simplified", 100, 0, 0, points, simplify_tolerance=1.0)
+        db = Database()
+        self.assertEqual(len(db.get_segment_points(self._num_segments + 1)), 20)
+        # A straight line only keeps the first and last points.
+        self.assertEqual(len(db.get_segment_points(self._num_segments + 2)), 2)
+
+    def test_delete(self):
+        SegmentSearchAbstract.index_missing()
+        Database().delete_activities([1])
+        with sqlite3.connect(self._db_file) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM activitycells").fetchone()[0], 0)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM activityfootprints").fetchone()[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
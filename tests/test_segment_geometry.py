@@ -0,0 +1,76 @@
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+
+import numpy as np
+
+from temp_db import TempDB
+
+from pyopentracks.models.database import Database
+from pyopentracks.models.segment_point import SegmentPoint
+from pyopentracks.tasks.segment_search import SegmentSearchAbstract
+from pyopentracks.utils.frechet import discrete_frechet, haversine
+from pyopentracks.utils.segment_geometry import SegmentGeometry
+
+
+def climb(num_points):
+    """A 2 km zigzag climb recorded with num_points points."""
+    t = np.linspace(0, 1, num_points)
+    return np.column_stack((38.5 + 0.018 * t, -0.5 + 0.002 * np.sin(8 * np.pi * t)))
+
+
+class TestSegmentGeometry(unittest.TestCase):
+
+    def test_resample_doesnt_depend_on_recording_rate(self):
+        slow = SegmentGeometry.resample(climb(5000))
+        fast = SegmentGeometry.resample(climb(800))
+        self.assertLess(abs(len(slow) - len(fast)), 3)
+        steps = haversine(slow[:-1, 0], slow[:-1, 1], slow[1:, 0], slow[1:, 1])
+        self.assertLessEqual(steps.max(), SegmentGeometry.SPACING + 0.01)
+        np.testing.assert_allclose(slow[[0, -1]], climb(5000)[[0, -1]])
+        self.assertLess(discrete_frechet(slow, fast), 10)
+
+    def test_max_points(self):
+        long_segment = np.column_stack((np.linspace(38, 39, 100), np.full(100, -0.5)))
+        self.assertLessEqual(len(SegmentGeometry.resample(long_segment)), SegmentGeometry.MAX_POINTS)
+        self.assertGreater(len(SegmentGeometry.resample(long_segment)), SegmentGeometry.MAX_POINTS - 3)
+
+    def test_short(self):
+        self.assertEqual(len(SegmentGeometry.resample(np.empty((0, 2)))), 0)
+        self.assertEqual(len(SegmentGeometry.resample([[38.0, -0.5]])), 1)
+
+    def test_encode(self):
+        geometry = SegmentGeometry.resample(climb(100))
+        np.testing.assert_array_equal(SegmentGeometry.decode(SegmentGeometry.encode(geometry)), geometry)
+
+    def test_simplify(self):
+        points = [SegmentPoint(None, 1, lat, -0.5, 0) for lat in np.linspace(38, 38.01, 100)]
+        points.append(SegmentPoint(None, 1, 38.01, -0.49, 0))
+        simplified = SegmentGeometry.simplify(points)
+        self.assertEqual(simplified, [points[0], points[99], points[100]])
+        self.assertEqual(SegmentGeometry.simplify(points[:2]), points[:2])
+
+
+class TestSegmentGeometryCache(TempDB):
+
+    def setUp(self):
+        super().setUp()
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("INSERT INTO segments (_id, name, distance, gain, loss) VALUES (1, 's', 0, 0, 0)")
+
+    def test_cache(self):
+        points = [SegmentPoint(None, 1, lat, lon, 0) for lat, lon in climb(300)]
+        geometry = SegmentSearchAbstract.segment_geometry(1, points)
+        with patch.object(SegmentGeometry, "resample", side_effect=AssertionError) as resample:
+            np.testing.assert_array_equal(SegmentSearchAbstract.segment_geometry(1, points), geometry)
+        resample.assert_not_called()
+
+        # The cache depends on the spacing.
+        with patch.object(SegmentGeometry, "SPACING", 20.0):
+            self.assertIsNone(Database().get_segment_geometry(1, SegmentGeometry.SPACING))
+            self.assertLess(len(SegmentSearchAbstract.segment_geometry(1, points)), len(geometry))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+
+from pyopentracks.models.location import Location
+from pyopentracks.utils.segment_matcher import SegmentMatcher
+
+
+def inside(bbox, lat, lon):
+    return (
+        bbox.south.latitude < lat < bbox.north.latitude and
+        bbox.west.longitude < lon < bbox.east.longitude
+    )
+
+
+def brute_force(segments, latitudes, longitudes, times):
+    """Look for every segment with a scan of the track points per endpoint."""
+    result = []
+    for key, start_bbox, end_bbox in segments:
+        starts = np.array(
+            [i for i in range(len(latitudes)) if inside(start_bbox, latitudes[i], longitudes[i])], dtype=np.int64
+        )
+        for start in SegmentMatcher.filter_starts(starts, times):
+            for end in range(start + 1, len(latitudes)):
+                if inside(end_bbox, latitudes[end], longitudes[end]):
+                    result.append((key, start, end))
+                    break
+    return result
+
+
+class TestSegmentMatcher(unittest.TestCase):
+
+    def _track(self, n=3000, seed=0):
+        rng = np.random.default_rng(seed)
+        latitudes = 38.5 + np.cumsum(rng.normal(0, 0.00004, n))
+        longitudes = -0.5 + np.cumsum(rng.normal(0, 0.00004, n))
+        times = np.arange(n, dtype=np.int64) * 1000
+        return latitudes, longitudes, times
+
+    def test_same_than_brute_force(self):
+        latitudes, longitudes, times = self._track()
+        rng = np.random.default_rng(1)
+        segments = []
+        for key in range(200):
+            # Endpoints on the track, near it or far away from it.
+            i, j = sorted(rng.integers(0, len(latitudes), 2))
+            offset = rng.choice([0, 0.00005, 0.01])
+            start_bbox = Location(latitudes[i] + offset, longitudes[i]).bounding_box(11)
+            end_bbox = Location(latitudes[j], longitudes[j] - offset).bounding_box(11)
+            segments.append((key, start_bbox, end_bbox))
+
+        matcher = SegmentMatcher()
+        for segment in segments:
+            matcher.add(*segment)
+        self.assertEqual(len(matcher), 200)
+        result = matcher.match(latitudes, longitudes, times)
+        self.assertGreater(len(result), 50)
+        self.assertEqual(sorted(result), sorted(brute_force(segments, latitudes, longitudes, times)))
+
+    def test_filter_starts(self):
+        times = np.array([0, 1000, 2000, 30000, 70000, 75000, 200000])
+        self.assertEqual(SegmentMatcher.filter_starts(np.array([0, 1, 2, 3, 4, 5, 6]), times), [3, 5, 6])
+        self.assertEqual(SegmentMatcher.filter_starts(np.array([], dtype=np.int64), times), [])
+
+    def test_round_trip(self):
+        # The segment's end is the start: the end is looked for after the start.
+        latitudes = np.array([38.0, 38.01, 38.02, 38.01, 38.0])
+        longitudes = np.full(5, -0.5)
+        times = np.arange(5) * 600000
+        bbox = Location(38.0, -0.5).bounding_box(11)
+        matcher = SegmentMatcher()
+        matcher.add("loop", bbox, bbox)
+        self.assertEqual(matcher.match(latitudes, longitudes, times), [("loop", 0, 4)])
+
+    def test_empty(self):
+        matcher = SegmentMatcher()
+        self.assertEqual(matcher.match(np.array([38.0]), np.array([-0.5]), np.array([0])), [])
+        matcher.add(1, Location(0, 0).bounding_box(11), Location(0, 0.01).bounding_box(11))
+        self.assertEqual(matcher.match(np.array([]), np.array([]), np.array([])), [])
+        self.assertEqual(matcher.match(np.array([38.0]), np.array([-0.5]), np.array([0])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+
+from unittest.mock import patch
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pyopentracks.models.location import Location
+from pyopentracks.tasks.segment_search import SegmentSearchAbstract, match_segments
+from pyopentracks.tasks.shared_tracks import SharedTrackArrays
+from pyopentracks.utils.segment_geometry import SegmentGeometry
+
+
+def track(activity_id, n, lat0):
+    return [(activity_id * 10000 + i, 1000 * i, lat0 + i * 0.00005, -0.5) for i in range(n)]
+
+
+def sum_latitudes(handle, activity_id):
+    shared = SharedTrackArrays.attach(handle)
+    try:
+        return float(shared.arrays(activity_id)[2].sum())
+    finally:
+        shared.close()
+
+
+class TestSharedTrackArrays(unittest.TestCase):
+
+    def setUp(self):
+        self._tracks = {1: track(1, 100, 38.5), 2: track(2, 50, 40.0), 3: []}
+
+    def test_views(self):
+        with SharedTrackArrays.create(self._tracks) as shared:
+            self.assertEqual(len(shared), 150)
+            self.assertEqual(shared.activities_ids(), [1, 2, 3])
+            ids, times, latitudes, longitudes = shared.arrays(2)
+            self.assertEqual(ids.dtype, np.int64)
+            self.assertEqual(list(ids), [row[0] for row in self._tracks[2]])
+            self.assertEqual(list(times), [row[1] for row in self._tracks[2]])
+            np.testing.assert_array_equal(latitudes, [row[2] for row in self._tracks[2]])
+            self.assertEqual(len(shared.arrays(3)[0]), 0)
+            self.assertEqual(shared.row(1, 5), self._tracks[1][5])
+            self.assertIsInstance(shared.row(1, 5)[0], int)
+
+            # Workers see the same memory, without copies.
+            attached = SharedTrackArrays.attach(shared.handle)
+            ids[0] = -1
+            self.assertEqual(attached.row(2, 0)[0], -1)
+            del ids, times, latitudes, longitudes
+            attached.close()
+            name = shared.handle[0]
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+    def test_allocate_and_write(self):
+        with SharedTrackArrays.allocate({1: 100, 2: 60}) as shared:
+            shared.write(1, self._tracks[1])
+            # The activity lost points after it was counted.
+            shared.write(2, self._tracks[2])
+            self.assertEqual(len(shared.arrays(2)[0]), 50)
+            self.assertEqual(shared.row(2, 49), self._tracks[2][49])
+            self.assertEqual(shared.row(1, 99), self._tracks[1][99])
+            attached = SharedTrackArrays.attach(shared.handle)
+            self.assertEqual(len(attached.arrays(2)[0]), 50)
+            attached.close()
+
+    def test_process_pool(self):
+        with SharedTrackArrays.create(self._tracks) as shared:
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                sums = list(executor.map(sum_latitudes, [shared.handle] * 2, [1, 2]))
+        self.assertAlmostEqual(sums[0], sum(row[2] for row in self._tracks[1]))
+        self.assertAlmostEqual(sums[1], sum(row[2] for row in self._tracks[2]))
+
+
+class TestMatchSegments(unittest.TestCase):
+
+    def _segment(self, segment_id, points):
+        coordinates = np.array([(row[2], row[3]) for row in points])
+        return (
+            segment_id,
+            Location(*coordinates[0]).bounding_box(11),
+            Location(*coordinates[-1]).bounding_box(11),
+            SegmentGeometry.resample(coordinates)
+        )
+
+    def test_match_segments(self):
+        tracks = {1: track(1, 200, 38.5), 2: track(2, 200, 40.0)}
+        # Segment 3 starts and ends on the track but it goes somewhere else.
+        detour = [tracks[1][20]] + [(0, 0, 38.502, -0.49)] + [tracks[1][60]]
+        segments = [self._segment(1, tracks[1][10:90]), self._segment(2, tracks[2][100:]), self._segment(3, detour)]
+        with SharedTrackArrays.create(tracks) as shared:
+            result = match_segments(shared.handle, [1, 2], segments)
+            # The last point of the start's box and the first one of the end's box.
+            self.assertEqual(sorted(result), [(1, 1, 11, 88), (2, 2, 101, 198)])
+
+            jobs = SegmentSearchAbstract._jobs([1, 2], segments, 10 ** 9)
+            self.assertEqual(sorted(a for job in jobs for a in job[0]), [1, 2])
+            with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+                results = executor.map(match_segments, [shared.handle] * len(jobs), *zip(*jobs))
+                self.assertEqual(sorted(m for r in results for m in r), sorted(result))
+
+    def test_jobs(self):
+        self.assertEqual(SegmentSearchAbstract._jobs([1, 2], ["s"], 10), [([1, 2], ["s"])])
+        with patch.object(SegmentSearchAbstract, "WORKERS", 2):
+            jobs = SegmentSearchAbstract._jobs([1], ["a", "b", "c"], 10 ** 9)
+            self.assertEqual(jobs, [([1], ["a", "c"]), ([1], ["b"])])
+            jobs = SegmentSearchAbstract._jobs([1, 2, 3], ["a"], 10 ** 9)
+            self.assertEqual(jobs, [([1, 3], ["a"]), ([2], ["a"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
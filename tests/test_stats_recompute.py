@@ -0,0 +1,107 @@
+import sqlite3
+import unittest
+
+from unittest.mock import patch
+
+from temp_db import TempDB
+
+from pyopentracks.tasks.stats_recompute import StatsRecompute
+
+
+class TestStatsRecompute(TempDB):
+
+    def setUp(self):
+        super().setUp()
+        with sqlite3.connect(self._db_file) as conn:
+            for i in range(1, 6):
+                # Stale stats.
+                conn.execute(
+                    "INSERT INTO stats (_id, starttime, totaldistance, elevationgain, totalcalories) "
+                    "VALUES (?, 0, 1, 1, 500)", (i,)
+                )
+                conn.execute(
+                    "INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (?, 'a', 'running', 0, ?)",
+                    (i, i)
+                )
+                conn.execute("INSERT INTO sections (_id, name, activityid) VALUES (?, 's', ?)", (i, i))
+                conn.executemany(
+                    "INSERT INTO trackpoints (sectionid, longitude, latitude, time, speed, altitude, gain, loss, heartrate) "
+                    "VALUES (?, ?, 38.0, ?, 2, ?, ?, 0, ?)",
+                    [(i, -0.5 + p * 0.001, 1000 * i + 10000 * p, 100 + p, 1 if p else 0, 100 + i) for p in range(11)]
+                )
+            # An activity without track points (sets) isn't recomputed.
+            conn.execute("INSERT INTO stats (_id, totalcalories) VALUES (6, 100)")
+            conn.execute("INSERT INTO activities (_id, name, category, starttime, statsid) VALUES (6, 'b', 'gym', 0, 6)")
+
+    def _stats(self, activity_id):
+        with sqlite3.connect(self._db_file) as conn:
+            return conn.execute(
+                "SELECT starttime, stoptime, totaldistance, totaltime, elevationgain, maxhr, totalcalories "
+                "FROM stats WHERE _id=?", (activity_id,)
+            ).fetchone()
+
+    def test_recompute(self):
+        job = StatsRecompute(self._db_file, chunk_size=2, workers=2)
+        self.assertEqual(job.start(), 5)
+        progress = []
+        self.assertEqual(job.run(lambda done, total: progress.append((done, total))), 5)
+        self.assertEqual(progress[-1], (5, 5))
+        self.assertEqual(job.pending(), 0)
+        starttime, stoptime, distance, totaltime, gain, maxhr, calories = self._stats(3)
+        self.assertEqual((starttime, stoptime, totaltime), (3000, 103000, 100000))
+        self.assertAlmostEqual(distance, 876.2, 0)
+        self.assertEqual(gain, 10)
+        self.assertEqual(maxhr, 103)
+        # Columns not computed from the track points are kept.
+        self.assertEqual(calories, 500)
+        self.assertEqual(self._stats(6), (None, None, None, None, None, None, 100))
+
+    def test_resume(self):
+        job = StatsRecompute(self._db_file, chunk_size=1, workers=1)
+        job.start()
+
+        def stop(done, total):
+            job.stop()
+
+        done = job.run(stop)
+        self.assertGreaterEqual(done, 1)
+        self.assertEqual(job.pending(), 5 - done)
+
+        # start() doesn't fill the checkpoint again: the run is resumed.
+        job = StatsRecompute(self._db_file, chunk_size=1, workers=1)
+        self.assertEqual(job.start(), 5 - done)
+        self.assertEqual(job.run(), 5 - done)
+        self.assertEqual(job.pending(), 0)
+        for i in range(1, 6):
+            self.assertEqual(self._stats(i)[4], 10)
+
+        self.assertEqual(job.start(restart=True), 5)
+
+    def test_gain_loss(self):
+        job = StatsRecompute(self._db_file, workers=1, gain_loss=True)
+        job.start()
+        job.run()
+        # One meter per point is over GainLossManager's accumulation threshold.
+        self.assertEqual(self._stats(1)[4], 10)
+        with sqlite3.connect(self._db_file) as conn:
+            conn.execute("UPDATE trackpoints SET altitude=100 + 0.5 * (_id % 2)")
+        job.start()
+        job.run()
+        self.assertIsNone(self._stats(1)[4])
+
+    def test_gain_loss_invalidates_caches(self):
+        job = StatsRecompute(self._db_file, workers=1, gain_loss=True)
+        job.start()
+        with patch("pyopentracks.tasks.stats_recompute.SectionsCache") as sections, \
+                patch("pyopentracks.tasks.stats_recompute.ChartSeriesCache") as series, \
+                patch("pyopentracks.tasks.stats_recompute.IntervalStatsCache") as intervals:
+            job.run()
+        ids = list(range(1, 6))
+        self.assertEqual(sorted(c.args[0] for c in sections.invalidate.call_args_list), ids)
+        keys = [("activity", i) for i in ids]
+        self.assertEqual(sorted(c.args[0] for c in series.invalidate.call_args_list), keys)
+        self.assertEqual(sorted(c.args[0] for c in intervals.invalidate.call_args_list), keys)
+
+
+if __name__ == "__main__":
+    unittest.main()